@@ -93,6 +93,7 @@ class AppFactory:
 
         from crminaec.auth.routes import auth_bp
         from crminaec.platforms.arkhon.routes import arkhon_bp
+        from crminaec.platforms.emek.inventory_routes import inventory_bp
         from crminaec.platforms.emek.routes import emek_bp
         from crminaec.platforms.pearson.routes import pearson_bp
         from crminaec.routes import main_bp
@@ -102,6 +103,7 @@ class AppFactory:
         app.register_blueprint(pearson_bp, url_prefix='/pearson')
         app.register_blueprint(arkhon_bp, url_prefix='/arkhon')
         app.register_blueprint(emek_bp, url_prefix='/emek')
+        app.register_blueprint(inventory_bp)  # Keeps its own /api/inventory prefix for the scanner PWA
         
         return app
 
@@ -8,6 +8,7 @@ from werkzeug.exceptions import NotFound
 
 from crminaec import oauth
 from crminaec.core.models import Party, UserAccount, db
+from crminaec.core.parties import find_party
 from crminaec.core.security import confirm_token, generate_confirmation_token
 
 auth_bp = Blueprint('auth', __name__)
@@ -21,7 +22,7 @@ def login():
         password = request.form.get('password')
         
         # Query the CRM Party
-        party = db.session.scalar(db.select(Party).filter_by(email=email))
+        party = find_party(email=email)
         
         # Check if they exist AND if they have a linked portal account with a valid password
         if party and party.account and password and party.account.check_password(password):
@@ -58,7 +59,7 @@ def google_callback():
         return redirect(url_for('auth.login'))
 
     email = user_info.get('email')
-    party = db.session.scalar(db.select(Party).filter_by(email=email))
+    party = find_party(email=email)
 
     # If the email isn't in our database yet, create BOTH records
     if not party:
@@ -140,7 +141,7 @@ def register():
             return redirect(url_for('auth.register'))
             
         # 2. Query the PARTY table (because that is where the email lives)
-        existing_party = db.session.scalar(db.select(Party).filter_by(email=email))
+        existing_party = find_party(email=email)
         
         if existing_party:
             # Check if this CRM contact already claimed a portal account
@@ -202,7 +203,7 @@ def confirm_email(token):
         return redirect(url_for('auth.login'))
         
     # Query the Party first, then access the linked account
-    party = db.session.scalar(db.select(Party).filter_by(email=email))
+    party = find_party(email=email)
     if not party:
         raise NotFound("Party not found")
     user_account = party.account
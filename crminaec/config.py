@@ -28,6 +28,78 @@ class Config:
     UPLOAD_FOLDER: Path = Path(__file__).parent / 'web' / 'static' / 'uploads'
     ALLOWED_EXTENSIONS: set[str] = {'md'}
 
+    # CPU Workers (QR rasters, PDFs, images). 0 = one less than the CPU count
+    WORKER_PROCESSES: int = int(os.environ.get('WORKER_PROCESSES', 0))
+
+    # Order attachment images (platforms/arkhon/attachments.py): longest edge per variant, format
+    # (WEBP, or JPEG when Pillow lacks WebP support) and encoder quality
+    ATTACHMENT_VARIANT_SIZES: ClassVar[dict[str, int]] = {'web': 1600, 'thumb': 320}
+    ATTACHMENT_VARIANT_FORMAT: str = os.environ.get('ATTACHMENT_VARIANT_FORMAT', 'WEBP')
+    ATTACHMENT_VARIANT_QUALITY: int = int(os.environ.get('ATTACHMENT_VARIANT_QUALITY', 80))
+
+    # Inventory Labels
+    QR_CACHE_DIR: Path = BASE_DIR / 'data' / 'qr_cache'
+    LABEL_FONT_PATH: Optional[str] = os.environ.get('LABEL_FONT_PATH')
+
+    # Quote / summary PDFs rendered locally, cached per quote revision. The bundled DejaVu Sans
+    # covers ı, İ, ş, ğ and ₺, which the built-in Helvetica renders blank
+    PDF_CACHE_DIR: Path = BASE_DIR / 'data' / 'pdf_cache'
+    PDF_FONT_PATH: Optional[str] = os.environ.get(
+        'PDF_FONT_PATH',
+        os.environ.get('LABEL_FONT_PATH', str(Path(__file__).parent / 'web' / 'static' / 'fonts' / 'DejaVuSans.ttf'))
+    )
+    PDF_RENDER_TIMEOUT: int = int(os.environ.get('PDF_RENDER_TIMEOUT', 120))
+
+    # Google Docs quote export (master template and target Drive folder)
+    GDOC_QUOTE_TEMPLATE_ID: str = os.environ.get('GDOC_QUOTE_TEMPLATE_ID', '1X1VEL2p54n2BIrcWslEmbiyV24KmL4XVy0JWBVAJfnQ')
+    GDOC_QUOTE_FOLDER_ID: Optional[str] = os.environ.get('GDOC_QUOTE_FOLDER_ID', '1WH9vQuJVEvKEFYK4vi-np3KSDhp2o8jT')
+
+    # Dashboard counters cache (seconds); writes to orders invalidate it immediately
+    DASHBOARD_CACHE_TTL: int = int(os.environ.get('DASHBOARD_CACHE_TTL', 60))
+    CATALOG_SEARCH_CACHE_TTL: int = int(os.environ.get('CATALOG_SEARCH_CACHE_TTL', 300))
+
+    # Live movement stream (each SSE client holds one waitress thread)
+    SSE_MAX_CLIENTS: int = int(os.environ.get('SSE_MAX_CLIENTS', 2))
+    SSE_HEARTBEAT_SECONDS: int = 15
+    SSE_MAX_LIFETIME_SECONDS: int = 300
+
+    # Background jobs (imports): runner threads, where uploads wait, how long finished jobs are kept.
+    # Running jobs beat every JOB_HEARTBEAT_SECONDS; one silent for JOB_STALE_SECONDS lost its process
+    JOB_WORKER_THREADS: int = int(os.environ.get('JOB_WORKER_THREADS', 2))
+    JOB_UPLOAD_DIR: Path = BASE_DIR / 'data' / 'job_uploads'
+    JOB_RETENTION_DAYS: int = int(os.environ.get('JOB_RETENTION_DAYS', 30))
+    JOB_HEARTBEAT_SECONDS: int = int(os.environ.get('JOB_HEARTBEAT_SECONDS', 30))
+    JOB_STALE_SECONDS: int = int(os.environ.get('JOB_STALE_SECONDS', 300))
+
+    # Document numbers (core/sequences.py): pattern per series ({seq}, {date} and caller fields such as
+    # {prefix}); each process reserves NUMBER_BLOCK_SIZE values per series at a time
+    NUMBER_BLOCK_SIZE: int = int(os.environ.get('NUMBER_BLOCK_SIZE', 20))
+    NUMBER_FORMATS: ClassVar[dict[str, str]] = {
+        'lead': 'LD-{date:%y%m%d}-{seq:05d}',
+        'kelebek_order': '{prefix}-{seq:05d}',
+        'lead_email': 'lead_{seq:06d}@crminaec.local',
+        'import_email': 'temp_{seq:06d}@crminaec.local',
+    }
+
+    # SMTP (Flask-Mail). Mail goes out as MAIL_DEFAULT_SENDER, or the SMTP login when that is unset
+    MAIL_SERVER: str = os.environ.get('MAIL_SERVER', 'localhost')
+    MAIL_PORT: int = int(os.environ.get('MAIL_PORT', 25))
+    MAIL_USE_TLS: bool = os.environ.get('MAIL_USE_TLS', 'false').lower() in ('1', 'true', 'yes')
+    MAIL_USERNAME: Optional[str] = os.environ.get('MAIL_USERNAME')
+    MAIL_PASSWORD: Optional[str] = os.environ.get('MAIL_PASSWORD')
+    MAIL_DEFAULT_SENDER: Optional[str] = os.environ.get('MAIL_DEFAULT_SENDER', os.environ.get('MAIL_USERNAME'))
+
+    # Email outbox: the background sender's batch size, retries (first retry after MAIL_OUTBOX_RETRY_SECONDS,
+    # doubling) and idle poll. A claimed batch is leased for MAIL_OUTBOX_LEASE_SECONDS; messages still
+    # 'sending' after that lost their sender and are re-queued.
+    # With MAIL_OUTBOX_SINK_DIR set, mail is written there as .eml instead of sent
+    MAIL_OUTBOX_BATCH_SIZE: int = int(os.environ.get('MAIL_OUTBOX_BATCH_SIZE', 50))
+    MAIL_OUTBOX_MAX_ATTEMPTS: int = int(os.environ.get('MAIL_OUTBOX_MAX_ATTEMPTS', 5))
+    MAIL_OUTBOX_RETRY_SECONDS: int = int(os.environ.get('MAIL_OUTBOX_RETRY_SECONDS', 60))
+    MAIL_OUTBOX_POLL_SECONDS: int = int(os.environ.get('MAIL_OUTBOX_POLL_SECONDS', 30))
+    MAIL_OUTBOX_LEASE_SECONDS: int = int(os.environ.get('MAIL_OUTBOX_LEASE_SECONDS', 600))
+    MAIL_OUTBOX_SINK_DIR: Optional[str] = os.environ.get('MAIL_OUTBOX_SINK_DIR')
+
     # Application (Fixed: Added .parent so it points to the directory, not the file)
     PROJECT_ROOT: ClassVar[Path] = Path(__file__).parent.absolute()
     DATA_DIR: ClassVar[Path] = PROJECT_ROOT / 'data'
@@ -71,6 +143,8 @@ class TestingConfig(Config):
 
     GOOGLE_CALLBACK_URL = os.environ.get('LOCAL_CALLBACK_URL', 'http://127.0.0.1:5000/login/google/callback')
     GOOGLE_CLIENT_SECRETS = os.environ.get('LOCAL_CLIENT_SECRETS', 'dummy_credentials.json')
+    MAIL_OUTBOX_SINK_DIR: Optional[str] = os.environ.get('MAIL_OUTBOX_SINK_DIR', str(BASE_DIR / 'data' / 'mail_sink'))
+    MAIL_DEFAULT_SENDER: Optional[str] = os.environ.get('MAIL_DEFAULT_SENDER', 'arkhon@crminaec.local')
    
     @classmethod
     def init_app(cls, app):
@@ -0,0 +1,118 @@
+# crminaec/core/cache.py
+"""
+In-Process TTL Cache
+Small thread-safe cache for hot read paths (dashboard counters, catalog search).
+Entries live in named namespaces that are dropped wholesale when a commit
+touches one of the models registered against them, so readers never see data
+older than the last write and never older than the TTL.
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Set, Tuple, Type
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Namespace -> {key: (expires_at, value)}. Bounded per namespace."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._limits: Dict[str, int] = {}
+        self._data: Dict[str, Dict[Hashable, Tuple[float, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def set_limit(self, namespace: str, max_entries: int) -> None:
+        """Overrides the entry bound for one namespace (for per-key caches such as price intervals)."""
+        with self._lock:
+            self._limits[namespace] = max_entries
+
+    def get(self, namespace: str, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(namespace, {}).get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return default
+        return entry[1]
+
+    def set(self, namespace: str, key: Hashable, value: Any, ttl: float) -> None:
+        with self._lock:
+            bucket = self._data.setdefault(namespace, {})
+            if len(bucket) >= self._limits.get(namespace, self.max_entries):
+                # Cheap eviction: forget the oldest insertion
+                bucket.pop(next(iter(bucket)))
+            bucket[key] = (time.monotonic() + ttl, value)
+
+    def get_or_set(self, namespace: str, key: Hashable, factory: Callable[[], Any], ttl: float) -> Any:
+        value = self.get(namespace, key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(namespace, key, value, ttl)
+        return value
+
+    def invalidate(self, *namespaces: str) -> None:
+        with self._lock:
+            for namespace in namespaces:
+                self._data.pop(namespace, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+cache = TTLCache()
+
+# Model class -> namespaces to drop when a committed transaction wrote it
+_WATCHERS: Dict[Type, Set[str]] = {}
+
+
+def invalidate_on_write(namespace: str, models: Iterable[Type]) -> None:
+    """Registers `namespace` to be cleared after any commit that inserts, updates or deletes `models`."""
+    for model in models:
+        _WATCHERS.setdefault(model, set()).add(namespace)
+
+
+def _touched_namespaces(session: Session) -> Set[str]:
+    touched: Set[str] = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        for model, namespaces in _WATCHERS.items():
+            if isinstance(obj, model):
+                touched |= namespaces
+    return touched
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_dirty_namespaces(session: Session, flush_context) -> None:
+    if _WATCHERS:
+        session.info.setdefault('cache_invalidate', set()).update(_touched_namespaces(session))
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session: Session) -> None:
+    namespaces = session.info.pop('cache_invalidate', None)
+    if namespaces:
+        cache.invalidate(*namespaces)
+        logger.debug(f"Cache invalidated: {', '.join(sorted(namespaces))}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session: Session) -> None:
+    session.info.pop('cache_invalidate', None)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_bulk_writes(orm_execute_state) -> None:
+    """Bulk UPDATE/DELETE statements bypass the unit of work; catch them here."""
+    if not _WATCHERS or not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+        return
+    mapper: Optional[Any] = orm_execute_state.bind_mapper
+    if mapper is None:
+        return
+    for model, namespaces in _WATCHERS.items():
+        if issubclass(mapper.class_, model):
+            orm_execute_state.session.info.setdefault('cache_invalidate', set()).update(namespaces)
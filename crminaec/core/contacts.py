@@ -0,0 +1,90 @@
+# crminaec/core/contacts.py
+"""
+Contact Normalisation
+Canonical forms of the contact fields parties are matched on. Party keeps them
+in indexed columns (email_normalized, phone_e164, name_key), so lead intake and
+the dedupe job compare "+90 532 123 45 67" and "0532 123 4567" as one number
+with an index lookup instead of a scan over raw strings.
+
+Pure functions only; the model calls them, and they must not import it.
+"""
+import re
+import unicodedata
+from typing import Optional
+
+DEFAULT_COUNTRY_CODE = '90'
+# Placeholder addresses given to leads without an email (see arkhon.create_lead)
+PLACEHOLDER_EMAIL_DOMAIN = '@crminaec.local'
+
+_NON_DIGITS = re.compile(r'\D+')
+_NON_LETTERS = re.compile(r'[^a-z ]+')
+_TURKISH_FOLD = str.maketrans({'ç': 'c', 'ğ': 'g', 'ı': 'i', 'ö': 'o', 'ş': 's', 'ü': 'u',
+                               'Ç': 'c', 'Ğ': 'g', 'I': 'i', 'İ': 'i', 'Ö': 'o', 'Ş': 's', 'Ü': 'u'})
+
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    """Trimmed, lower-cased address; None for empty and placeholder addresses."""
+    email = (email or '').strip().lower()
+    if not email or '@' not in email or email.endswith(PLACEHOLDER_EMAIL_DOMAIN):
+        return None
+    return email
+
+
+def normalize_phone(phone: Optional[str], country_code: str = DEFAULT_COUNTRY_CODE) -> Optional[str]:
+    """
+    E.164 form (+905321234567). Numbers without a country code are taken as domestic:
+    0532 123 45 67 and 532 123 45 67 both become +90532... None when too short to be a number.
+    """
+    raw = (phone or '').strip()
+    digits = _NON_DIGITS.sub('', raw)
+    if raw.startswith('+'):
+        pass
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    elif digits.startswith('0'):
+        digits = country_code + digits[1:]
+    elif not digits.startswith(country_code) or len(digits) <= 10:
+        digits = country_code + digits
+
+    # E.164 allows at most 15 digits; anything under 8 is an extension or a typo
+    if not 8 <= len(digits) <= 15:
+        return None
+    return f"+{digits}"
+
+
+def phone_prefix(term: Optional[str], country_code: str = DEFAULT_COUNTRY_CODE) -> Optional[str]:
+    """
+    E.164 prefix for a partly typed number, with the same country rules as normalize_phone:
+    '0532 12' -> '+9053212', '+49 30' -> '+4930'. None when fewer than 3 digits were typed.
+    """
+    raw = (term or '').strip()
+    digits = _NON_DIGITS.sub('', raw)
+    if len(digits) < 3:
+        return None
+    if raw.startswith('+'):
+        return f"+{digits}"
+    if digits.startswith('00'):
+        return f"+{digits[2:]}"
+    if digits.startswith('0'):
+        return f"+{country_code}{digits[1:]}"
+    return f"+{country_code}{digits}"
+
+
+def fold_name(*parts: Optional[str]) -> str:
+    """Lower-case ASCII name with Turkish letters folded and punctuation dropped ('Şükrü Öz' -> 'sukru oz')."""
+    text = ' '.join(p for p in parts if p).translate(_TURKISH_FOLD).lower()
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(_NON_LETTERS.sub(' ', text).split())
+
+
+def name_key(first_name: Optional[str], last_name: Optional[str]) -> Optional[str]:
+    """
+    Blocking key for fuzzy name matching: first 4 letters of the surname + first initial.
+    Spelling variants usually share it ('Yılmaz Ahmet', 'Yilmaz A.'), so candidates are
+    compared only within one key.
+    """
+    last = fold_name(last_name).replace(' ', '')
+    first = fold_name(first_name).replace(' ', '')
+    if not last and not first:
+        return None
+    return f"{last[:4]}:{first[:1]}"
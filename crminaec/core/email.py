@@ -1,26 +1,76 @@
 # crminaec/core/email.py
-from flask import current_app
+"""
+Email Outbox
+Notifications are written to email_outbox inside the caller's transaction and
+delivered by one background sender thread, so a slow or unreachable SMTP server
+never holds a waitress thread and a message is not lost when sending fails.
+
+The sender wakes after every commit that queued mail (and every
+MAIL_OUTBOX_POLL_SECONDS), claims due messages in batches, and sends each batch
+over a single SMTP connection. A claim leases the message for
+MAIL_OUTBOX_LEASE_SECONDS, so two processes never send it twice and one that
+died mid-send is retried once the lease runs out. Failures are retried with
+exponential backoff until MAIL_OUTBOX_MAX_ATTEMPTS. With MAIL_OUTBOX_SINK_DIR set, messages are
+written there as .eml files instead (local debugging, tests).
+"""
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from flask import Flask, current_app
 from flask_mail import Message
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
 from crminaec import mail
+from crminaec.core.models import EmailStatus, OutboxEmail, db
+
+logger = logging.getLogger(__name__)
 
-# Assuming you initialize 'mail' in your main __init__.py alongside 'db'
-# If your mail object is initialized differently, adjust this import!
+_sender: Optional[threading.Thread] = None
+_sender_lock = threading.Lock()
+_wake = threading.Event()
 
 
+# ==============================================================================
+# 1. QUEUEING
+# ==============================================================================
+def queue_email(recipients: Iterable[str], subject: str, body: str, html: Optional[str] = None,
+                sender: Optional[str] = None) -> OutboxEmail:
+    """
+    Adds a message to the outbox in the current session. It goes out after the caller commits;
+    a rollback discards it together with the rest of the transaction.
+    Without an explicit sender the configured default is used when the message is sent.
+    """
+    email = OutboxEmail(**{
+        'recipients': list(recipients),
+        'subject': subject[:255],
+        'body': body,
+        'html': html,
+        'sender': sender
+    })
+    db.session.add(email)
+    db.session.info['outbox_wake'] = True
+    _ensure_sender(current_app._get_current_object())  # type: ignore[attr-defined]
+    return email
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_after_commit(session: Session) -> None:
+    if session.info.pop('outbox_wake', False):
+        _wake.set()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session: Session) -> None:
+    session.info.pop('outbox_wake', None)
+
 
 def send_confirmation_email(to_email, confirm_url):
-    """Sends the registration confirmation email using Flask-Mail."""
-    
-    msg = Message(
-        subject="EMEK Architecture Arkhon Portal - Hesabınızı Onaylayın",
-        recipients=[to_email]
-    )
-    
-    # Fallback plain text version
-    msg.body = f"Arkhon portalına hoş geldiniz! Hesabınızı onaylamak için şu linke tıklayın: {confirm_url}"
-    
-    # Professional HTML version
-    msg.html = f"""
+    """Queues the registration confirmation email and commits it."""
+    html = f"""
     <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #e0e0e0; border-radius: 8px;">
         <h2 style="color: #333; text-align: center;">Arkhon Portalına Hoş Geldiniz</h2>
         <p style="color: #555; font-size: 16px;">Hesabınızı başarıyla oluşturduk. Sisteme giriş yapabilmek için lütfen aşağıdaki butona tıklayarak e-posta adresinizi onaylayın.</p>
@@ -32,11 +82,199 @@ def send_confirmation_email(to_email, confirm_url):
         <p style="font-size: 12px; color: #999; text-align: center;">EMEK Architecture &copy; {current_app.config.get('CURRENT_YEAR', '2026')}</p>
     </div>
     """
-    
+
     try:
-        mail.send(msg)
-        current_app.logger.info(f"✅ Confirmation email successfully sent to {to_email}")
+        queue_email(
+            [to_email],
+            subject="EMEK Architecture Arkhon Portal - Hesabınızı Onaylayın",
+            # Fallback plain text version
+            body=f"Arkhon portalına hoş geldiniz! Hesabınızı onaylamak için şu linke tıklayın: {confirm_url}",
+            html=html
+        )
+        db.session.commit()
+        current_app.logger.info(f"✅ Confirmation email queued for {to_email}")
         return True
     except Exception as e:
-        current_app.logger.error(f"❌ Failed to send email to {to_email}: {e}")
-        return False
\ No newline at end of file
+        db.session.rollback()
+        current_app.logger.error(f"❌ Failed to queue email to {to_email}: {e}")
+        return False
+
+
+# ==============================================================================
+# 2. BACKGROUND SENDER
+# ==============================================================================
+def _ensure_sender(app: Flask) -> None:
+    global _sender
+    if _sender is not None:
+        return
+
+    with _sender_lock:
+        if _sender is None:
+            _sender = threading.Thread(target=_sender_loop, args=(app,), name='crminaec-mail', daemon=True)
+            _sender.start()
+
+
+def _sender_loop(app: Flask) -> None:
+    poll = float(app.config.get('MAIL_OUTBOX_POLL_SECONDS', 30) or 30)
+    with app.app_context():
+        _recover_outbox(app)
+
+    while True:
+        _wake.wait(poll)
+        _wake.clear()
+        with app.app_context():
+            try:
+                deliver_due()
+            except Exception as e:
+                db.session.rollback()
+                logger.exception(f"Mail outbox run failed: {e}")
+
+
+def _recover_outbox(app: Flask) -> None:
+    """First run in a process: messages whose sender died mid-send are retried, old sent ones are purged."""
+    requeued = _requeue_expired(datetime.now(timezone.utc))
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=int(app.config.get('JOB_RETENTION_DAYS', 30) or 30))
+    purged = db.session.execute(
+        db.delete(OutboxEmail).where(OutboxEmail.status == EmailStatus.SENT, OutboxEmail.created_at < cutoff)
+    ).rowcount or 0
+    db.session.commit()
+
+    if requeued or purged:
+        logger.info(f"Mail outbox recovered: {requeued} re-queued, {purged} purged.")
+    # Whatever is still pending from the previous process goes out now
+    _wake.set()
+
+
+def _requeue_expired(now: datetime) -> int:
+    """
+    Returns 'sending' messages whose lease ran out to the queue. A live sender in another
+    process still holds its lease, so its batch is left alone. The caller commits.
+    """
+    return db.session.execute(
+        db.update(OutboxEmail)
+        .where(OutboxEmail.status == EmailStatus.SENDING, OutboxEmail.next_attempt_at <= now)
+        .values(status=EmailStatus.PENDING)
+        .execution_options(synchronize_session=False)
+    ).rowcount or 0
+
+
+def _backoff(attempts: int) -> timedelta:
+    base = int(current_app.config.get('MAIL_OUTBOX_RETRY_SECONDS', 60) or 60)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), 3600))
+
+
+def _default_sender() -> str:
+    sender = current_app.config.get('MAIL_DEFAULT_SENDER')
+    if not sender:
+        # Recorded on the message like any send failure, so it is retried once the setting exists
+        raise RuntimeError("MAIL_DEFAULT_SENDER is not configured; set it (or MAIL_USERNAME) to send mail.")
+    return sender
+
+
+def _message(email: OutboxEmail) -> Message:
+    return Message(subject=email.subject, recipients=list(email.recipients), body=email.body, html=email.html,
+                   sender=email.sender or _default_sender())
+
+
+def _claim(candidates: List[int], now: datetime) -> List[int]:
+    """
+    Moves each candidate from 'pending' to 'sending' under a lease. The status check in the UPDATE
+    makes the claim atomic: a message another process claimed first matches no row and is skipped.
+    """
+    lease_until = now + timedelta(seconds=int(current_app.config.get('MAIL_OUTBOX_LEASE_SECONDS', 600) or 600))
+    claimed = []
+    for email_id in candidates:
+        rowcount = db.session.execute(
+            db.update(OutboxEmail)
+            .where(OutboxEmail.email_id == email_id, OutboxEmail.status == EmailStatus.PENDING)
+            .values(status=EmailStatus.SENDING, attempts=OutboxEmail.attempts + 1, next_attempt_at=lease_until)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if rowcount:
+            claimed.append(email_id)
+    db.session.commit()
+    return claimed
+
+
+def deliver_due() -> int:
+    """Sends every message that is due, batch by batch. Returns how many were delivered."""
+    batch_size = int(current_app.config.get('MAIL_OUTBOX_BATCH_SIZE', 50) or 50)
+    max_attempts = int(current_app.config.get('MAIL_OUTBOX_MAX_ATTEMPTS', 5) or 5)
+    sink_dir = current_app.config.get('MAIL_OUTBOX_SINK_DIR')
+    delivered = 0
+
+    if _requeue_expired(datetime.now(timezone.utc)):
+        db.session.commit()
+
+    while True:
+        now = datetime.now(timezone.utc)
+        candidates = list(db.session.scalars(
+            db.select(OutboxEmail.email_id)
+            .where(OutboxEmail.status == EmailStatus.PENDING, OutboxEmail.next_attempt_at <= now)
+            .order_by(OutboxEmail.next_attempt_at, OutboxEmail.email_id)
+            .limit(batch_size)
+        ))
+        if not candidates:
+            return delivered
+
+        claimed = _claim(candidates, now)
+        batch: List[OutboxEmail] = list(db.session.scalars(
+            db.select(OutboxEmail).where(OutboxEmail.email_id.in_(claimed)).order_by(OutboxEmail.email_id)
+        ))
+
+        failures = _deliver_to_sink(batch, Path(sink_dir)) if sink_dir else _deliver_smtp(batch)
+
+        for email in batch:
+            error = failures.get(email.email_id)
+            if error is None:
+                email.status = EmailStatus.SENT
+                email.sent_at = datetime.now(timezone.utc)
+                email.last_error = None
+                delivered += 1
+            elif email.attempts >= max_attempts:
+                email.status = EmailStatus.FAILED
+                email.last_error = error
+                logger.error(f"Email {email.email_id} to {email.recipients} given up after {email.attempts} attempts: {error}")
+            else:
+                email.status = EmailStatus.PENDING
+                email.next_attempt_at = datetime.now(timezone.utc) + _backoff(email.attempts)
+                email.last_error = error
+        db.session.commit()
+
+        if failures:
+            logger.warning(f"Mail outbox: {len(failures)} of {len(batch)} messages failed in this batch.")
+        if len(candidates) < batch_size:
+            return delivered
+
+
+def _deliver_smtp(batch: List[OutboxEmail]) -> Dict[int, str]:
+    """One SMTP connection for the whole batch. Returns {email_id: error} for the messages that failed."""
+    failures: Dict[int, str] = {}
+    sent = set()
+    try:
+        with mail.connect() as connection:
+            for email in batch:
+                try:
+                    connection.send(_message(email))
+                    sent.add(email.email_id)
+                except Exception as e:
+                    failures[email.email_id] = str(e)
+    except Exception as e:
+        # Connecting (or closing) failed: only what was not sent yet is retried
+        for email in batch:
+            if email.email_id not in sent:
+                failures.setdefault(email.email_id, f"SMTP: {e}")
+    return failures
+
+
+def _deliver_to_sink(batch: List[OutboxEmail], sink_dir: Path) -> Dict[int, str]:
+    """Debug sink: writes each message as an .eml file instead of sending it."""
+    sink_dir.mkdir(parents=True, exist_ok=True)
+    failures: Dict[int, str] = {}
+    for email in batch:
+        try:
+            (sink_dir / f"{email.email_id:06d}.eml").write_text(_message(email).as_string(), encoding='utf-8')
+        except Exception as e:
+            failures[email.email_id] = str(e)
+    return failures
@@ -2,6 +2,7 @@
 Unified Interoperability Manager - Single interface for all platforms.
 """
 import logging
+import threading
 from datetime import datetime
 from typing import TYPE_CHECKING, Any, Dict, List, Optional, Union
 
@@ -112,4 +113,23 @@ class InteropManager:
 
 def create_interop_manager() -> InteropManager:
     """Factory function for initialization."""
-    return InteropManager()
\ No newline at end of file
+    return InteropManager()
+
+
+_manager: Optional[InteropManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_interop_manager() -> InteropManager:
+    """
+    Process-wide manager, built on first use. Its clients keep their credentials and
+    discovery-built services, so later calls skip the imports, config read and OAuth handshake.
+    """
+    global _manager
+    if _manager is not None:
+        return _manager
+
+    with _manager_lock:
+        if _manager is None:
+            _manager = create_interop_manager()
+    return _manager
\ No newline at end of file
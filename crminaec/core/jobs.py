@@ -0,0 +1,288 @@
+# crminaec/core/jobs.py
+"""
+Background Job Runner
+Heavy imports run on a small thread pool instead of waitress's request threads.
+Every job is a row in background_jobs, so status and results are shared by all
+threads and survive a restart; the request that submits it returns the job_id
+immediately and the browser polls /api/jobs/<job_id>.
+
+Progress is reported into memory while a job runs (writing it to the table
+would contend with the job's own open transaction on SQLite) and written back
+when the job finishes.
+
+Several processes can share the table: a job is claimed with a conditional
+UPDATE and stamped with its owner process, which refreshes heartbeat_at while
+the job runs. Only RUNNING jobs whose heartbeat has gone stale (their process
+died) are failed by recovery; jobs of live processes are left alone.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from flask import Flask, current_app
+from sqlalchemy.orm import Session
+from werkzeug.utils import secure_filename
+
+from crminaec.core.models import BackgroundJob, JobStatus, db
+
+logger = logging.getLogger(__name__)
+
+_HANDLERS: Dict[str, Callable[..., Optional[Dict[str, Any]]]] = {}
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+# job_id -> (progress, message) for RUNNING jobs of this process
+_live: Dict[str, Tuple[float, Optional[str]]] = {}
+_live_lock = threading.Lock()
+
+_heartbeat: Optional[threading.Thread] = None
+_owner: Optional[Tuple[int, str]] = None
+
+
+def _owner_id() -> str:
+    """host:pid:nonce of this process (recomputed after a fork, so children never inherit it)."""
+    global _owner
+    if _owner is None or _owner[0] != os.getpid():
+        _owner = (os.getpid(), f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"[:64])
+    return _owner[1]
+
+
+def job_handler(kind: str):
+    """Registers the function that executes jobs of `kind`. It is called as handler(job, **payload)."""
+    def decorator(func):
+        _HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+class JobContext:
+    """Handed to a handler so it can report how far it has come."""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+
+    def progress(self, fraction: float, message: Optional[str] = None) -> None:
+        fraction = max(0.0, min(1.0, float(fraction)))
+        with _live_lock:
+            _live[self.job_id] = (fraction, message)
+
+
+# ==============================================================================
+# 1. SUBMISSION
+# ==============================================================================
+def save_upload(file_storage) -> str:
+    """Copies an uploaded file to JOB_UPLOAD_DIR (the request stream is gone once the response is sent)."""
+    upload_dir = current_app.config.get('JOB_UPLOAD_DIR')
+    os.makedirs(upload_dir, exist_ok=True)
+    name = secure_filename(file_storage.filename or '') or 'upload'
+    path = os.path.join(upload_dir, f"{uuid.uuid4().hex}_{name}")
+    file_storage.save(path)
+    return path
+
+
+def submit_job(kind: str, payload: Optional[Dict[str, Any]] = None, uploads: Optional[List[str]] = None,
+               created_by: Optional[int] = None, return_url: Optional[str] = None) -> str:
+    """
+    Persists a QUEUED job and hands it to the runner. Returns the job_id.
+    `uploads` are files written by save_upload; they are deleted when the job ends.
+    """
+    if kind not in _HANDLERS:
+        raise ValueError(f"Bilinmeyen iş türü (Unknown job kind): {kind}")
+
+    app = current_app._get_current_object()  # type: ignore[attr-defined]
+    executor = _get_executor(app)
+
+    job = BackgroundJob(**{
+        'kind': kind,
+        'payload': {**(payload or {}), 'uploads': list(uploads or [])},
+        'created_by': created_by,
+        'return_url': return_url
+    })
+    db.session.add(job)
+    db.session.commit()
+
+    executor.submit(_run_job, app, job.job_id)
+    logger.info(f"Job {job.job_id} ({kind}) queued.")
+    return job.job_id
+
+
+def _get_executor(app: Flask) -> ThreadPoolExecutor:
+    global _executor, _heartbeat
+    if _executor is not None:
+        return _executor
+
+    with _executor_lock:
+        if _executor is None:
+            workers = int(app.config.get('JOB_WORKER_THREADS', 2) or 2)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='crminaec-job')
+            _recover_jobs(app, _executor)
+            _heartbeat = threading.Thread(target=_heartbeat_loop, args=(app,), name='crminaec-job-heartbeat',
+                                          daemon=True)
+            _heartbeat.start()
+    return _executor
+
+
+def _stale_cutoff(app: Flask, now: datetime) -> datetime:
+    return now - timedelta(seconds=int(app.config.get('JOB_STALE_SECONDS', 300) or 300))
+
+
+def _fail_stale_jobs(session: Session, app: Flask, now: datetime) -> int:
+    """Fails RUNNING jobs whose owner stopped beating (a crashed or restarted process)."""
+    return session.execute(
+        db.update(BackgroundJob)
+        .where(BackgroundJob.status == JobStatus.RUNNING,
+               db.func.coalesce(BackgroundJob.heartbeat_at, BackgroundJob.started_at) < _stale_cutoff(app, now))
+        .values(status=JobStatus.FAILED, finished_at=now,
+                error="Sunucu yeniden başlatıldı (interrupted by a server restart)")
+        .execution_options(synchronize_session=False)
+    ).rowcount or 0
+
+
+def _recover_jobs(app: Flask, executor: ThreadPoolExecutor) -> None:
+    """
+    First use in a process: RUNNING jobs whose owner has stopped beating are failed, jobs still
+    QUEUED are picked up again (the claim in _run_job keeps two processes from both running one),
+    and finished jobs past retention are deleted. Uses its own session, so the request that
+    triggered it keeps its transaction to itself.
+    """
+    now = datetime.now(timezone.utc)
+    cutoff = now - timedelta(days=int(app.config.get('JOB_RETENTION_DAYS', 30) or 30))
+    with Session(db.engine) as session:
+        interrupted = _fail_stale_jobs(session, app, now)
+        purged = session.execute(
+            db.delete(BackgroundJob)
+            .where(BackgroundJob.status.in_([JobStatus.SUCCEEDED, JobStatus.FAILED]),
+                   BackgroundJob.created_at < cutoff)
+            .execution_options(synchronize_session=False)
+        ).rowcount or 0
+        session.commit()
+
+        queued = session.scalars(
+            db.select(BackgroundJob.job_id)
+            .where(BackgroundJob.status == JobStatus.QUEUED)
+            .order_by(BackgroundJob.created_at)
+        ).all()
+
+    for job_id in queued:
+        executor.submit(_run_job, app, job_id)
+
+    if interrupted or purged or queued:
+        logger.info(f"Jobs recovered: {len(queued)} re-queued, {interrupted} interrupted, {purged} purged.")
+
+
+def _heartbeat_loop(app: Flask) -> None:
+    """Keeps this process's RUNNING jobs fresh and fails the ones other processes left behind."""
+    interval = float(app.config.get('JOB_HEARTBEAT_SECONDS', 30) or 30)
+    while True:
+        time.sleep(interval)
+        with _live_lock:
+            running = list(_live)
+        now = datetime.now(timezone.utc)
+        try:
+            with app.app_context(), Session(db.engine) as session:
+                if running:
+                    session.execute(
+                        db.update(BackgroundJob)
+                        .where(BackgroundJob.job_id.in_(running), BackgroundJob.owner == _owner_id())
+                        .values(heartbeat_at=now)
+                        .execution_options(synchronize_session=False)
+                    )
+                interrupted = _fail_stale_jobs(session, app, now)
+                session.commit()
+            if interrupted:
+                logger.warning(f"{interrupted} stale background job(s) marked as failed.")
+        except Exception as e:
+            logger.exception(f"Job heartbeat failed: {e}")
+
+
+# ==============================================================================
+# 2. EXECUTION
+# ==============================================================================
+def _run_job(app: Flask, job_id: str) -> None:
+    with app.app_context():
+        # Atomic claim: only one runner (in any process) moves the job out of QUEUED
+        now = datetime.now(timezone.utc)
+        claimed = db.session.execute(
+            db.update(BackgroundJob)
+            .where(BackgroundJob.job_id == job_id, BackgroundJob.status == JobStatus.QUEUED)
+            .values(status=JobStatus.RUNNING, started_at=now, heartbeat_at=now, owner=_owner_id())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if not claimed:
+            return
+
+        with _live_lock:
+            _live[job_id] = (0.0, None)
+        job = db.session.get(BackgroundJob, job_id)
+        kind = job.kind
+        payload = dict(job.payload or {})
+        uploads = payload.pop('uploads', [])
+
+        started = time.monotonic()
+        try:
+            result = _HANDLERS[kind](JobContext(job_id), **payload)
+        except Exception as e:
+            db.session.rollback()
+            logger.exception(f"Job {job_id} ({kind}) failed: {e}")
+            _finish(job_id, JobStatus.FAILED, error=str(e))
+        else:
+            _finish(job_id, JobStatus.SUCCEEDED, result=result or {})
+            logger.info(f"Job {job_id} ({kind}) finished in {time.monotonic() - started:.1f}s.")
+        finally:
+            with _live_lock:
+                _live.pop(job_id, None)
+            for path in uploads:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def _finish(job_id: str, status: JobStatus, result: Optional[Dict[str, Any]] = None,
+            error: Optional[str] = None) -> None:
+    job = db.session.get(BackgroundJob, job_id)
+    if job is None:
+        return
+    with _live_lock:
+        progress, message = _live.get(job_id, (job.progress, None))
+    message = (result or {}).get('message') or message
+    job.status = status
+    job.progress = 1.0 if status == JobStatus.SUCCEEDED else progress
+    job.message = message[:255] if message else None
+    job.result = result
+    job.error = error
+    job.finished_at = datetime.now(timezone.utc)
+    db.session.commit()
+
+
+# ==============================================================================
+# 3. STATUS
+# ==============================================================================
+def job_status(job: BackgroundJob) -> Dict[str, Any]:
+    """Public JSON view of a job, with the live progress of a running one."""
+    progress, message = job.progress, job.message
+    if job.status == JobStatus.RUNNING:
+        with _live_lock:
+            progress, message = _live.get(job.job_id, (progress, message))
+
+    result = job.result or {}
+    return {
+        'job_id': job.job_id,
+        'kind': job.kind,
+        'status': job.status.value,
+        'progress': round(progress or 0.0, 3),
+        'message': message,
+        'error': job.error,
+        'result': {k: v for k, v in result.items() if k != 'redirect'},
+        'finished': job.is_finished,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
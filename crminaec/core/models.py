@@ -1,3 +1,4 @@
+import enum
 import uuid
 from datetime import datetime, timezone
 from decimal import Decimal
@@ -5,12 +6,15 @@ from typing import Any, Dict, List, Optional, cast
 
 from flask_login import UserMixin
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import (Boolean, DateTime, Float, ForeignKey, Index, Integer,
-                        Numeric, String, Text, UniqueConstraint)
+from sqlalchemy import (JSON, Boolean, DateTime, Enum, Float, ForeignKey, Index,
+                        Integer, Numeric, String, Text, UniqueConstraint, event,
+                        inspect, text)
 from sqlalchemy.orm import (DeclarativeBase, Mapped, MappedAsDataclass,
                             mapped_column, relationship, validates)
 from werkzeug.security import check_password_hash, generate_password_hash
 
+from crminaec.core import contacts, search
+
 
 # --- THE SINGLE INITIALIZATION POINT ---
 class Base(MappedAsDataclass, DeclarativeBase, kw_only=True):
@@ -71,9 +75,9 @@ class Party(db.Model, UserMixin):
     # 🟢 OPTIONAL / DEFAULT FIELDS
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     # REMOVED: role (Role is now strictly managed in UserAccount)
-    first_name: Mapped[Optional[str]] = mapped_column(String(50), default=None)
-    last_name: Mapped[Optional[str]] = mapped_column(String(50), default=None)
-    phone: Mapped[Optional[str]] = mapped_column(String(20), default=None)
+    first_name: Mapped[Optional[str]] = mapped_column(String(50), default=None, index=True)
+    last_name: Mapped[Optional[str]] = mapped_column(String(50), default=None, index=True)
+    phone: Mapped[Optional[str]] = mapped_column(String(20), default=None, index=True)
     regid: Mapped[Optional[str]] = mapped_column(String(11), default=None)
     address: Mapped[Optional[str]] = mapped_column(Text, default=None)
     city: Mapped[Optional[str]] = mapped_column(String(50), default=None)
@@ -83,6 +87,14 @@ class Party(db.Model, UserMixin):
     is_deleted: Mapped[bool] = mapped_column(Boolean, default=False)
     is_archived: Mapped[bool] = mapped_column(Boolean, default=False)
 
+    # Matching keys (core/contacts.py), recomputed from email / phone / names on every flush
+    email_normalized: Mapped[Optional[str]] = mapped_column(String(120), default=None, init=False, index=True)
+    phone_e164: Mapped[Optional[str]] = mapped_column(String(20), default=None, init=False, index=True)
+    name_key: Mapped[Optional[str]] = mapped_column(String(20), default=None, init=False, index=True)
+    # Folded names for the customer typeahead (case-sensitive prefix ranges on an index)
+    first_name_folded: Mapped[Optional[str]] = mapped_column(String(50), default=None, init=False, index=True)
+    last_name_folded: Mapped[Optional[str]] = mapped_column(String(50), default=None, init=False, index=True)
+
     # 🔗 RELATIONS
     orders: Mapped[List["Order"]] = relationship("Order", back_populates="party", default_factory=list)
     
@@ -95,6 +107,17 @@ class Party(db.Model, UserMixin):
         default=None
     )
 
+
+@event.listens_for(Party, 'before_insert')
+@event.listens_for(Party, 'before_update')
+def _set_match_keys(mapper, connection, target: Party) -> None:
+    # At flush time, after the dataclass __init__ has assigned every field
+    target.email_normalized = contacts.normalize_email(target.email)
+    target.phone_e164 = contacts.normalize_phone(target.phone)
+    target.name_key = contacts.name_key(target.first_name, target.last_name)
+    target.first_name_folded = contacts.fold_name(target.first_name) or None
+    target.last_name_folded = contacts.fold_name(target.last_name) or None
+
 # ================================================================
 # 💰 THE ERP PRICING ENGINE (New)
 # ================================================================
@@ -140,6 +163,11 @@ class PriceRecord(db.Model):
     # RELATIONS: 1 PriceRecord -> Many OrderItems
     order_items: Mapped[List["OrderItem"]] = relationship("OrderItem", back_populates="price_record", init=False, default_factory=list)
 
+    # Effective-price resolution (core/pricing.py) filters by code, type and supplier, then walks valid_from
+    __table_args__ = (
+        Index('ix_price_records_lookup', 'entity_code', 'price_type', 'supplier', 'valid_from'),
+    )
+
 
 # ================================================================
 # 👥 ARKHON PLATFORM (Arkhon)
@@ -171,11 +199,59 @@ class CatalogProduct(db.Model):
     category: Mapped[str] = mapped_column(String(50), nullable=False) 
     brand: Mapped[str] = mapped_column(String(100), nullable=False) 
     product_code: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
-    product_name: Mapped[str] = mapped_column(String(255), nullable=False)
+    product_name: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
     
     default_price: Mapped[Optional[float]] = mapped_column(Numeric(12, 2), default=None)
     image_url: Mapped[Optional[str]] = mapped_column(String(255), default=None)  
 
+    # Typeahead search filters by category, then brand, then orders by name
+    __table_args__ = (
+        Index('ix_catalog_products_category_brand_name', 'category', 'brand', 'product_name'),
+        Index('ix_catalog_products_brand_name', 'brand', 'product_name'),
+    )
+
+
+class CatalogProductWord(db.Model):
+    """Word index over catalogue codes, brands and names (core/search.py); kept in step by the hooks below."""
+    __tablename__ = 'catalog_product_words'
+
+    word: Mapped[str] = mapped_column(String(search.MAX_WORD_LENGTH), primary_key=True)
+    product_id: Mapped[int] = mapped_column(ForeignKey('catalog_products.product_id', ondelete="CASCADE"),
+                                            primary_key=True, index=True)
+
+
+# The columns search_words() reads; edits to anything else leave the word index as it is
+CATALOG_WORD_FIELDS = ('product_code', 'brand', 'product_name')
+
+
+def catalog_product_words(product) -> List[str]:
+    return search.search_words(product.product_code, product.brand, product.product_name)
+
+
+@event.listens_for(CatalogProduct, 'after_insert')
+def _index_catalog_words(mapper, connection, product: CatalogProduct) -> None:
+    """Rewrites a product's words in the same transaction as the row itself."""
+    table = CatalogProductWord.__table__
+    connection.execute(table.delete().where(table.c.product_id == product.product_id))
+    words = catalog_product_words(product)
+    if words:
+        connection.execute(table.insert(), [{'word': w, 'product_id': product.product_id} for w in words])
+
+
+@event.listens_for(CatalogProduct, 'after_update')
+def _maintain_catalog_words(mapper, connection, product: CatalogProduct) -> None:
+    """Reindexes only when a searched field changed (price or image edits don't touch the words)."""
+    attrs = inspect(product).attrs
+    if not any(attrs[field].history.has_changes() for field in CATALOG_WORD_FIELDS):
+        return
+    _index_catalog_words(mapper, connection, product)
+
+
+@event.listens_for(CatalogProduct, 'after_delete')
+def _drop_catalog_words(mapper, connection, product: CatalogProduct) -> None:
+    table = CatalogProductWord.__table__
+    connection.execute(table.delete().where(table.c.product_id == product.product_id))
+
 
 class Order(db.Model):
     __tablename__ = 'orders'
@@ -215,6 +291,15 @@ class Order(db.Model):
     attachments: Mapped[List["OrderAttachment"]] = relationship("OrderAttachment", back_populates="order", default_factory=list, cascade="all, delete-orphan")
     issues: Mapped[List["CustomerIssue"]] = relationship("CustomerIssue", back_populates="order", default_factory=list, cascade="all, delete-orphan")
 
+    # Dashboard lists / counters filter the soft-delete flags, per customer or across all orders
+    # (open-order reservation sync adds handover_date). The partial index's WHERE must match how
+    # `Order.is_deleted.is_not(True)` renders on each backend, or the planner ignores it.
+    __table_args__ = (
+        Index('ix_orders_party_flags', 'party_id', 'is_deleted', 'is_archived', 'order_id'),
+        Index('ix_orders_live_open', 'is_archived', 'handover_date',
+              sqlite_where=text('is_deleted IS NOT 1'), postgresql_where=text('is_deleted IS NOT true')),
+    )
+
 
 class CustomerIssue(db.Model):
     """Müşteri Şikayetleri ve Satış Sonrası Destek (After-Sales Support)."""
@@ -252,10 +337,18 @@ class OrderAttachment(db.Model):
     file_type: Mapped[str] = mapped_column(String(50)) # image or document
     context: Mapped[str] = mapped_column(String(50), default='Measurement')
     upload_date: Mapped[datetime] = mapped_column(DateTime, default_factory=lambda: datetime.now(timezone.utc))
+    # Downscaled, EXIF-free copies of image uploads (platforms/arkhon/attachments.py); None until rendered
+    web_path: Mapped[Optional[str]] = mapped_column(String(500), default=None)
+    thumb_path: Mapped[Optional[str]] = mapped_column(String(500), default=None)
 
     # RELATIONS:
     order: Mapped["Order"] = relationship("Order", back_populates="attachments", init=False)
 
+    @property
+    def view_path(self) -> str:
+        """What pages link to: the web-sized copy once it exists, else the original."""
+        return self.web_path or self.file_path
+
 class OrderItem(db.Model):
     """
     Arkhon Order Item Model (Kelebek Furniture Spec & EMEK Construction Items)
@@ -304,6 +397,11 @@ class OrderItem(db.Model):
     typology: Mapped[Optional["ProjectTypology"]] = relationship("ProjectTypology", back_populates="items", init=False, default=None)
     price_record: Mapped[Optional["PriceRecord"]] = relationship("PriceRecord", back_populates="order_items", init=False, default=None)
 
+    # Every per-order read (lines, quote subtotals per typology, preference extraction) starts here
+    __table_args__ = (
+        Index('ix_order_items_order_typology', 'order_id', 'typology_id'),
+    )
+
 
 class Quote(db.Model):
     """Tracks Quote versions, ProSAP pricing, and legally binding customer approvals."""
@@ -320,6 +418,11 @@ class Quote(db.Model):
     discount_amount: Mapped[Optional[float]] = mapped_column(Numeric(12, 2), default=None)
     tax_rate: Mapped[float] = mapped_column(Float, default=20.0)
     total_amount: Mapped[Optional[float]] = mapped_column(Numeric(12, 2), default=None)
+
+    # Server-computed totals (platforms/arkhon/quotes.py): typology breakdown, stamped with a revision per save
+    totals: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSON, default=None)
+    totals_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=None)
+    revision: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
     
     validity_days: Mapped[int] = mapped_column(Integer, default=15)
     payment_terms: Mapped[Optional[str]] = mapped_column(Text, default=None)
@@ -410,4 +513,95 @@ class PaymentInstallment(db.Model):
     transaction_reference: Mapped[Optional[str]] = mapped_column(String(100), default=None) # Receipt or Wire Transfer ID
 
     # RELATIONS:
-    quote: Mapped["Quote"] = relationship("Quote", back_populates="installments", init=False)
\ No newline at end of file
+    quote: Mapped["Quote"] = relationship("Quote", back_populates="installments", init=False)
+
+
+# ================================================================
+# ⚙️ BACKGROUND JOBS (core.jobs)
+# ================================================================
+
+class JobStatus(enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class BackgroundJob(db.Model):
+    """A heavy task (file imports) executed off the request thread. Polled via /api/jobs/<job_id>."""
+    __tablename__ = 'background_jobs'
+
+    job_id: Mapped[str] = mapped_column(String(32), primary_key=True, default_factory=lambda: uuid.uuid4().hex)
+    kind: Mapped[str] = mapped_column(String(50), index=True)
+    status: Mapped[JobStatus] = mapped_column(Enum(JobStatus), default=JobStatus.QUEUED, index=True)
+
+    # 0.0 - 1.0; the live value is held in memory while RUNNING and written back when the job ends
+    progress: Mapped[float] = mapped_column(Float, default=0.0)
+    message: Mapped[Optional[str]] = mapped_column(String(255), default=None)
+
+    payload: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSON, default=None)
+    result: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSON, default=None)
+    error: Mapped[Optional[str]] = mapped_column(Text, default=None)
+
+    # Where the browser goes when the job fails (or when the result names no page)
+    return_url: Mapped[Optional[str]] = mapped_column(String(255), default=None)
+    created_by: Mapped[Optional[int]] = mapped_column(ForeignKey('parties.party_id', ondelete="SET NULL"), default=None)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default_factory=lambda: datetime.now(timezone.utc))
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=None)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=None)
+
+    # Process running the job (host:pid:nonce) and its last sign of life; recovery only fails stale ones
+    owner: Mapped[Optional[str]] = mapped_column(String(64), default=None)
+    heartbeat_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=None)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (JobStatus.SUCCEEDED, JobStatus.FAILED)
+
+
+# ================================================================
+# 📧 EMAIL OUTBOX (core.email)
+# ================================================================
+
+class EmailStatus(enum.Enum):
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
+
+
+class OutboxEmail(db.Model):
+    """A notification queued in the sender's transaction and delivered by the background mail sender."""
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        Index('ix_email_outbox_due', 'status', 'next_attempt_at'),
+    )
+
+    email_id: Mapped[int] = mapped_column(primary_key=True, init=False)
+    recipients: Mapped[List[str]] = mapped_column(JSON)
+    subject: Mapped[str] = mapped_column(String(255))
+    body: Mapped[str] = mapped_column(Text)
+    html: Mapped[Optional[str]] = mapped_column(Text, default=None)
+    # None = MAIL_DEFAULT_SENDER, resolved when the message is sent
+    sender: Mapped[Optional[str]] = mapped_column(String(255), default=None)
+
+    status: Mapped[EmailStatus] = mapped_column(Enum(EmailStatus), default=EmailStatus.PENDING)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, default_factory=lambda: datetime.now(timezone.utc))
+    last_error: Mapped[Optional[str]] = mapped_column(Text, default=None)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default_factory=lambda: datetime.now(timezone.utc))
+    sent_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=None)
+
+
+# ================================================================
+# 🔢 NUMBER SEQUENCES (core.sequences)
+# ================================================================
+
+class NumberSequence(db.Model):
+    """Next unreserved value of a document number series (lead, order, placeholder email). Reserved in blocks."""
+    __tablename__ = 'number_sequences'
+
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    next_value: Mapped[int] = mapped_column(Integer, default=1)
@@ -0,0 +1,220 @@
+# crminaec/core/parties.py
+"""
+Party Lookup & Dedupe
+Finds parties by normalised contact keys (indexed columns, see core/contacts.py)
+and clusters likely duplicates in a background job:
+
+- same normalised email or E.164 phone: certain duplicates,
+- similar names within one name_key block: likely duplicates, unless the two
+  parties carry different phone numbers.
+
+The job only reports clusters; merging stays a manual decision.
+"""
+import logging
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional, Set
+
+from crminaec.core.contacts import (fold_name, name_key, normalize_email,
+                                   normalize_phone, phone_prefix)
+from crminaec.core.jobs import job_handler
+from crminaec.core.models import Party, db
+from crminaec.core.search import prefix_bounds
+
+logger = logging.getLogger(__name__)
+
+# difflib ratio two folded full names need to count as the same person
+NAME_MATCH_THRESHOLD = 0.88
+# Larger name_key blocks are skipped for fuzzy matching (pairwise cost grows quadratically)
+MAX_BLOCK_SIZE = 300
+BACKFILL_BATCH = 1000
+# Clusters kept in the job result, largest first
+MAX_REPORTED_CLUSTERS = 500
+
+
+# ==============================================================================
+# 1. LOOKUP
+# ==============================================================================
+def find_party(email: Optional[str] = None, phone: Optional[str] = None) -> Optional[Party]:
+    """The party with this email, else the oldest with this phone number (both compared normalised)."""
+    email_key = normalize_email(email)
+    if email_key:
+        party = db.session.scalar(db.select(Party).where(Party.email_normalized == email_key).limit(1))
+        if party:
+            return party
+
+    phone_key = normalize_phone(phone)
+    if phone_key:
+        return db.session.scalar(
+            db.select(Party).where(Party.phone_e164 == phone_key).order_by(Party.party_id).limit(1)
+        )
+    return None
+
+
+def _prefix(column, prefix: str):
+    """Case-sensitive prefix match as a range, so any B-tree index on the column serves it (LIKE can't)."""
+    low, high = prefix_bounds(prefix)
+    return db.and_(column >= low, column < high)
+
+
+def search_parties_stmt(term: str, limit: int = 20):
+    """
+    Customer typeahead: prefix match on the folded first / last name, the normalised email
+    and the E.164 or raw phone. Every branch is an index range, so SQLite answers the OR
+    with one index search per column instead of scanning parties.
+    """
+    branches = []
+    folded = fold_name(term)
+    if folded:
+        branches += [_prefix(Party.first_name_folded, folded), _prefix(Party.last_name_folded, folded)]
+    email = term.strip().lower()
+    if email:
+        branches.append(_prefix(Party.email_normalized, email))
+    phone = phone_prefix(term)
+    if phone:
+        branches.append(_prefix(Party.phone_e164, phone))
+    if term.strip():
+        branches.append(_prefix(Party.phone, term.strip()))
+
+    return (
+        db.select(Party.party_id, Party.first_name, Party.last_name, Party.email, Party.phone)
+        .filter(Party.is_deleted.is_not(True), db.or_(*branches) if branches else db.false())
+        .order_by(Party.first_name, Party.last_name)
+        .limit(limit)
+    )
+
+
+# ==============================================================================
+# 2. KEY BACKFILL
+# ==============================================================================
+def backfill_contact_keys() -> int:
+    """
+    Recomputes the matching keys of every party and writes back the ones that differ
+    (rows created before the columns existed, or after a normalisation rule change).
+    Nothing is committed. Returns the number of parties updated.
+    """
+    rows = db.session.execute(
+        db.select(Party.party_id, Party.email, Party.phone, Party.first_name, Party.last_name,
+                  Party.email_normalized, Party.phone_e164, Party.name_key,
+                  Party.first_name_folded, Party.last_name_folded)
+    ).all()
+
+    changes: List[Dict[str, Any]] = []
+    for row in rows:
+        keys = {
+            'email_normalized': normalize_email(row.email),
+            'phone_e164': normalize_phone(row.phone),
+            'name_key': name_key(row.first_name, row.last_name),
+            'first_name_folded': fold_name(row.first_name) or None,
+            'last_name_folded': fold_name(row.last_name) or None
+        }
+        if any(keys[column] != getattr(row, column) for column in keys):
+            changes.append({'party_id': row.party_id, **keys})
+
+    for start in range(0, len(changes), BACKFILL_BATCH):
+        db.session.execute(db.update(Party), changes[start:start + BACKFILL_BATCH])
+    return len(changes)
+
+
+# ==============================================================================
+# 3. DUPLICATE CLUSTERING
+# ==============================================================================
+class _DisjointSet:
+    def __init__(self):
+        self.parent: Dict[int, int] = {}
+
+    def find(self, item: int) -> int:
+        root = self.parent.setdefault(item, item)
+        while root != self.parent[root]:
+            root = self.parent[root]
+        # Path compression
+        while item != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a: int, b: int) -> None:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+def find_duplicate_clusters() -> List[Dict[str, Any]]:
+    """
+    Groups of party_ids that are probably the same person, with why they were grouped
+    ('email', 'phone', 'name'). Deleted parties are ignored. Largest groups first.
+    """
+    rows = db.session.execute(
+        db.select(Party.party_id, Party.first_name, Party.last_name,
+                  Party.email_normalized, Party.phone_e164, Party.name_key)
+        .where(Party.is_deleted.is_(False))
+    ).all()
+
+    links = _DisjointSet()
+    reasons: Dict[int, Set[str]] = {}
+
+    def link(a: int, b: int, reason: str) -> None:
+        links.union(a, b)
+        reasons.setdefault(a, set()).add(reason)
+        reasons.setdefault(b, set()).add(reason)
+
+    # Exact keys: everyone sharing a key is linked to the first holder
+    for reason, attr in (('email', 'email_normalized'), ('phone', 'phone_e164')):
+        first_holder: Dict[str, int] = {}
+        for row in rows:
+            key = getattr(row, attr)
+            if key:
+                if key in first_holder:
+                    link(first_holder[key], row.party_id, reason)
+                else:
+                    first_holder[key] = row.party_id
+
+    # Fuzzy names, compared only inside a blocking key
+    blocks: Dict[str, List[Any]] = {}
+    for row in rows:
+        if row.name_key:
+            blocks.setdefault(row.name_key, []).append(row)
+
+    skipped = 0
+    for block in blocks.values():
+        if len(block) > MAX_BLOCK_SIZE:
+            skipped += 1
+            continue
+        names = [fold_name(row.first_name, row.last_name) for row in block]
+        for i in range(len(block)):
+            for j in range(i + 1, len(block)):
+                a, b = block[i], block[j]
+                if a.phone_e164 and b.phone_e164 and a.phone_e164 != b.phone_e164:
+                    continue
+                if SequenceMatcher(None, names[i], names[j]).ratio() >= NAME_MATCH_THRESHOLD:
+                    link(a.party_id, b.party_id, 'name')
+    if skipped:
+        logger.warning(f"Party dedupe: {skipped} name blocks over {MAX_BLOCK_SIZE} parties were not compared.")
+
+    clusters: Dict[int, List[int]] = {}
+    for party_id in reasons:
+        clusters.setdefault(links.find(party_id), []).append(party_id)
+
+    result = [
+        {'party_ids': sorted(members),
+         'reasons': sorted(set().union(*(reasons[m] for m in members)))}
+        for members in clusters.values()
+    ]
+    result.sort(key=lambda c: (-len(c['party_ids']), c['party_ids'][0]))
+    return result
+
+
+@job_handler('party_dedupe')
+def run_party_dedupe(job) -> Dict[str, Any]:
+    """Refreshes the matching keys, then reports clusters of likely duplicate parties."""
+    updated = backfill_contact_keys()
+    db.session.commit()
+    job.progress(0.4, f"{updated} kişinin eşleştirme anahtarı güncellendi")
+
+    clusters = find_duplicate_clusters()
+    duplicates = sum(len(c['party_ids']) for c in clusters)
+    logger.info(f"Party dedupe: {len(clusters)} clusters covering {duplicates} parties.")
+    return {
+        'message': f"{len(clusters)} olası mükerrer kişi grubu bulundu ({duplicates} kayıt).",
+        'keys_updated': updated,
+        'cluster_count': len(clusters),
+        'clusters': clusters[:MAX_REPORTED_CLUSTERS]
+    }
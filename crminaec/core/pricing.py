@@ -0,0 +1,314 @@
+# crminaec/core/pricing.py
+"""
+Effective Price Resolution
+Answers "what is the price of code X, for quantity Q, on date D" from the
+PriceRecord history instead of trusting whichever record a line happens to link.
+
+For every (price_type, supplier, code) the active records are loaded once into
+an interval list (valid_from/valid_to/min_quantity) kept in the shared TTL cache;
+any write to price_records drops the whole namespace. Lookups for many codes are
+batched into a few IN (...) queries on ix_price_records_lookup, and the rest is
+resolved in memory.
+
+Rule: among active records valid on D with min_quantity <= Q, the highest
+quantity tier wins, then the most recent valid_from, then the newest record.
+A quantity below every tier gets the lowest tier.
+
+reprice_price_records() recomputes sell prices from their cost breakdown for
+the whole table at once (NumPy), e.g. after a company-wide margin change.
+Cost records (supplier imports, hand-entered costs) are inputs, never rewritten.
+"""
+import logging
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import (Any, Callable, Dict, Iterable, List, NamedTuple, Optional,
+                    Sequence, Tuple)
+
+from sqlalchemy.orm import aliased
+
+from crminaec.core.cache import cache, invalidate_on_write
+from crminaec.core.jobs import job_handler
+from crminaec.core.models import OrderItem, PriceRecord, db
+
+logger = logging.getLogger(__name__)
+
+INTERVAL_NAMESPACE = 'price_intervals'
+INTERVAL_TTL = 600
+# Codes per IN (...) query (SQLite parameter limit)
+LOOKUP_CHUNK_SIZE = 500
+
+cache.set_limit(INTERVAL_NAMESPACE, 50000)
+invalidate_on_write(INTERVAL_NAMESPACE, [PriceRecord])
+
+
+class ResolvedPrice(NamedTuple):
+    price_id: int
+    entity_code: str
+    supplier: str
+    unit_price: Decimal
+    currency: str
+    min_quantity: float
+    valid_from: datetime
+    valid_to: Optional[datetime]
+
+
+# (valid_from, valid_to, ResolvedPrice), sorted best-first: min_quantity, valid_from, price_id descending
+_Interval = Tuple[datetime, Optional[datetime], ResolvedPrice]
+
+
+def _naive_utc(value: datetime) -> datetime:
+    """DateTime columns come back naive (UTC) from SQLite; compare everything that way."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+# ==============================================================================
+# 1. INTERVAL LOADING
+# ==============================================================================
+def _load_intervals(codes: Sequence[str], price_type: str, supplier: Optional[str]) -> Dict[str, List[_Interval]]:
+    intervals: Dict[str, List[_Interval]] = {code: [] for code in codes}
+    for start in range(0, len(codes), LOOKUP_CHUNK_SIZE):
+        stmt = (
+            db.select(PriceRecord.price_id, PriceRecord.entity_code, PriceRecord.supplier,
+                      PriceRecord.final_unit_price, PriceRecord.currency, PriceRecord.min_quantity,
+                      PriceRecord.valid_from, PriceRecord.valid_to)
+            .where(PriceRecord.entity_code.in_(codes[start:start + LOOKUP_CHUNK_SIZE]),
+                   PriceRecord.price_type == price_type,
+                   PriceRecord.is_active.is_(True),
+                   PriceRecord.final_unit_price.is_not(None))
+        )
+        if supplier is not None:
+            stmt = stmt.where(PriceRecord.supplier == supplier)
+
+        for row in db.session.execute(stmt):
+            valid_from = _naive_utc(row.valid_from)
+            valid_to = _naive_utc(row.valid_to) if row.valid_to else None
+            intervals[row.entity_code].append((valid_from, valid_to, ResolvedPrice(
+                row.price_id, row.entity_code, row.supplier, Decimal(row.final_unit_price),
+                row.currency, float(row.min_quantity or 0.0), valid_from, valid_to
+            )))
+
+    for rows in intervals.values():
+        rows.sort(key=lambda r: (r[2].min_quantity, r[0], r[2].price_id), reverse=True)
+    return intervals
+
+
+def _intervals_for(codes: Iterable[str], price_type: str, supplier: Optional[str]) -> Dict[str, Tuple[_Interval, ...]]:
+    found: Dict[str, Tuple[_Interval, ...]] = {}
+    missing: List[str] = []
+    for code in set(codes):
+        rows = cache.get(INTERVAL_NAMESPACE, (price_type, supplier, code))
+        if rows is None:
+            missing.append(code)
+        else:
+            found[code] = rows
+
+    if missing:
+        for code, rows in _load_intervals(missing, price_type, supplier).items():
+            # Codes without records are cached too (as empty), so they are not queried again
+            found[code] = tuple(rows)
+            cache.set(INTERVAL_NAMESPACE, (price_type, supplier, code), found[code], INTERVAL_TTL)
+    return found
+
+
+# ==============================================================================
+# 2. RESOLUTION
+# ==============================================================================
+def _pick(rows: Tuple[_Interval, ...], on: datetime, quantity: float) -> Optional[ResolvedPrice]:
+    base = None
+    for valid_from, valid_to, price in rows:
+        if valid_from <= on and (valid_to is None or on < valid_to):
+            if price.min_quantity <= quantity:
+                return price
+            # Below every tier (e.g. 0.5 m against a 1.0 base): fall back to the lowest tier
+            if base is None or price.min_quantity < base.min_quantity:
+                base = price
+    return base
+
+
+def resolve_prices(codes: Iterable[str], on: Optional[datetime] = None,
+                   quantities: Optional[Dict[str, float]] = None, price_type: str = 'cost',
+                   supplier: Optional[str] = None) -> Dict[str, ResolvedPrice]:
+    """
+    Effective price of every code on date `on` (default: now).
+    `quantities` gives the quantity per code for tier selection (default 1).
+    `supplier=None` considers all suppliers. Codes without a valid price are left out of the result.
+    """
+    on = _naive_utc(on or datetime.now(timezone.utc))
+    quantities = quantities or {}
+    resolved: Dict[str, ResolvedPrice] = {}
+    for code, rows in _intervals_for([c for c in codes if c], price_type, supplier).items():
+        price = _pick(rows, on, float(quantities.get(code, 1.0)))
+        if price is not None:
+            resolved[code] = price
+    return resolved
+
+
+def resolve_price(code: str, on: Optional[datetime] = None, quantity: float = 1.0,
+                  price_type: str = 'cost', supplier: Optional[str] = None) -> Optional[ResolvedPrice]:
+    """Single-code convenience wrapper around resolve_prices."""
+    return resolve_prices([code], on, {code: quantity}, price_type, supplier).get(code)
+
+
+def order_item_unit_prices(items: Iterable[OrderItem], on: Optional[datetime] = None,
+                           price_type: str = 'cost') -> Dict[int, Decimal]:
+    """
+    {item_id: unit price} for order lines. A line keeps the supplier of the record it links
+    (so a ProSAP line stays ProSAP) but gets that supplier's price effective on `on`;
+    if none is effective, the linked record's own price is used. Unlinked lines use any supplier.
+    """
+    by_supplier: Dict[Optional[str], List[OrderItem]] = {}
+    for item in items:
+        supplier = item.price_record.supplier if item.price_record else None
+        by_supplier.setdefault(supplier, []).append(item)
+
+    on = _naive_utc(on or datetime.now(timezone.utc))
+    prices: Dict[int, Decimal] = {}
+    for supplier, group in by_supplier.items():
+        intervals = _intervals_for([item.urk for item in group if item.urk], price_type, supplier)
+
+        for item in group:
+            # Tiers are picked per line, since lines of one code can carry different quantities
+            price = _pick(intervals[item.urk], on, float(item.adet or 1.0)) if item.urk else None
+            if price is not None:
+                prices[item.item_id] = price.unit_price
+            elif item.price_record and item.price_record.final_unit_price is not None:
+                prices[item.item_id] = Decimal(item.price_record.final_unit_price)
+    return prices
+
+
+def order_item_unit_price_expr(on: Optional[datetime] = None, price_type: str = 'cost'):
+    """
+    SQL twin of order_item_unit_prices: a correlated scalar expression giving an OrderItem row's
+    unit price, so callers can aggregate lines in the database. Same rule as _pick (tier for the
+    line's adet, else the lowest tier; then most recent valid_from; then newest record), restricted
+    to the supplier of the linked record, falling back to the linked record's own price.
+    NULL when the line has no price at all.
+    """
+    on = _naive_utc(on or datetime.now(timezone.utc))
+    linked = aliased(PriceRecord)
+    linked_row = linked.price_id == OrderItem.price_record_id
+    # correlate_except: order_items comes from the outer query, also inside the nested subquery
+    linked_supplier = db.select(linked.supplier).where(linked_row).correlate_except(linked).scalar_subquery()
+    linked_price = db.select(linked.final_unit_price).where(linked_row).correlate_except(linked).scalar_subquery()
+
+    min_quantity = db.func.coalesce(PriceRecord.min_quantity, 0.0)
+    candidates = (
+        db.select(PriceRecord.final_unit_price)
+        .where(PriceRecord.entity_code == OrderItem.urk,
+               PriceRecord.price_type == price_type,
+               PriceRecord.is_active.is_(True),
+               PriceRecord.final_unit_price.is_not(None),
+               PriceRecord.valid_from <= on,
+               db.or_(PriceRecord.valid_to.is_(None), PriceRecord.valid_to > on),
+               db.or_(linked_supplier.is_(None), PriceRecord.supplier == linked_supplier))
+        .limit(1)
+        .correlate_except(PriceRecord)
+    )
+    # Two lookups instead of one ORDER BY on the line's adet: SQLite rejects outer columns in ORDER BY
+    tier = (candidates.where(min_quantity <= db.func.coalesce(OrderItem.adet, 1.0))
+            .order_by(min_quantity.desc(), PriceRecord.valid_from.desc(), PriceRecord.price_id.desc()))
+    lowest_tier = candidates.order_by(min_quantity, PriceRecord.valid_from.desc(), PriceRecord.price_id.desc())
+    return db.func.coalesce(tier.scalar_subquery(), lowest_tier.scalar_subquery(), linked_price)
+
+
+# ==============================================================================
+# 3. REPRICING
+# ==============================================================================
+REPRICE_WRITE_BATCH = 5000
+# Only derived prices are recomputed; 'cost' / 'procurement' rows are what suppliers charged
+REPRICEABLE_PRICE_TYPES = ('sell',)
+
+
+def reprice_price_records(price_type: str = 'sell', supplier: Optional[str] = None,
+                          profit_margin_pct: Optional[float] = None,
+                          general_expenses_pct: Optional[float] = None,
+                          include_tax: bool = False,
+                          on_progress: Optional[Callable[[float, str], None]] = None) -> Dict[str, int]:
+    """
+    Recomputes final_unit_price for every active sell record with a cost breakdown, in one vectorised pass:
+
+        (material + labor + logistics) x (1 + general_expenses%) x (1 + margin%) [x (1 + tax%)]
+
+    final_unit_price is a net price (quotes add VAT themselves), so tax is only applied with
+    `include_tax`. Passing `profit_margin_pct` / `general_expenses_pct` first sets that policy on
+    every selected record. Records without a breakdown (hand-set prices) are neither selected nor
+    touched, and only prices that actually change are written back. Nothing is committed.
+
+    Raises:
+        ValueError: for a price_type outside REPRICEABLE_PRICE_TYPES (cost rows are never rewritten).
+
+    Returns:
+        {'scanned': ..., 'updated': ...}
+    """
+    import numpy as np
+    import pandas as pd
+
+    if price_type not in REPRICEABLE_PRICE_TYPES:
+        raise ValueError(f"Bu fiyat tipi yeniden hesaplanamaz (Price type cannot be repriced): {price_type}")
+
+    breakdown = (db.func.coalesce(PriceRecord.base_material_cost, 0) + db.func.coalesce(PriceRecord.base_labor_cost, 0)
+                 + db.func.coalesce(PriceRecord.logistics_cost, 0))
+    filters = [PriceRecord.is_active.is_(True), PriceRecord.price_type == price_type, breakdown > 0]
+    if supplier is not None:
+        filters.append(PriceRecord.supplier == supplier)
+
+    # 1. Policy change: one UPDATE for the whole selection
+    policy = {}
+    if profit_margin_pct is not None:
+        policy['profit_margin_pct'] = float(profit_margin_pct)
+    if general_expenses_pct is not None:
+        policy['general_expenses_pct'] = float(general_expenses_pct)
+    if policy:
+        db.session.execute(db.update(PriceRecord).where(*filters).values(**policy)
+                           .execution_options(synchronize_session=False))
+
+    # 2. Load the breakdown columns as arrays
+    stmt = db.select(
+        PriceRecord.price_id, PriceRecord.base_material_cost, PriceRecord.base_labor_cost,
+        PriceRecord.logistics_cost, PriceRecord.general_expenses_pct, PriceRecord.profit_margin_pct,
+        PriceRecord.tax_rate_pct, PriceRecord.final_unit_price
+    ).where(*filters)
+    frame = pd.read_sql(stmt, db.session.connection())
+    if on_progress:
+        on_progress(0.3, f"{len(frame)} fiyat kaydı okundu")
+
+    def column(name: str) -> np.ndarray:
+        return pd.to_numeric(frame[name], errors='coerce').fillna(0.0).to_numpy(dtype=np.float64)
+
+    subtotal = column('base_material_cost') + column('base_labor_cost') + column('logistics_cost')
+    price = subtotal * (1.0 + column('general_expenses_pct') / 100.0) * (1.0 + column('profit_margin_pct') / 100.0)
+    if include_tax:
+        price *= 1.0 + column('tax_rate_pct') / 100.0
+    # Numeric(12, 2) rounding, half-up (the epsilon absorbs binary noise such as 1.005 -> 1.00499...)
+    price = np.floor(price * 100.0 + 0.5 + 1e-9) / 100.0
+
+    current = pd.to_numeric(frame['final_unit_price'], errors='coerce').to_numpy(dtype=np.float64)
+    changed = (subtotal > 0) & (np.isnan(current) | (np.abs(current - price) >= 0.005))
+
+    # 3. Write back only what moved, as primary-key executemany batches
+    ids = frame['price_id'].to_numpy()[changed]
+    values = price[changed]
+    for start in range(0, len(ids), REPRICE_WRITE_BATCH):
+        end = min(start + REPRICE_WRITE_BATCH, len(ids))
+        db.session.execute(db.update(PriceRecord), [
+            {'price_id': int(price_id), 'final_unit_price': Decimal(f"{value:.2f}")}
+            for price_id, value in zip(ids[start:end], values[start:end])
+        ])
+        if on_progress:
+            on_progress(0.3 + 0.7 * end / len(ids), f"{end} fiyat güncellendi")
+
+    logger.info(f"Repricing: {len(ids)} of {len(frame)} price records changed.")
+    return {'scanned': int(len(frame)), 'updated': int(len(ids))}
+
+
+@job_handler('price_reprice')
+def run_reprice(job, **options: Any) -> Dict[str, Any]:
+    """Background wrapper around reprice_price_records (admin margin-policy changes)."""
+    counts = reprice_price_records(on_progress=job.progress, **options)
+    db.session.commit()
+    return {
+        'message': f"{counts['updated']} / {counts['scanned']} fiyat kaydı yeniden hesaplandı.",
+        **counts
+    }
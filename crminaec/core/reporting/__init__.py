@@ -3,8 +3,8 @@
 Reporting module for crminaec Course Management System.
 Provides template management and multi-format export capabilities.
 """
-from crminaec.core.reporting.multi_exporter import MultiExporter
+from crminaec.core.reporting.multi_exporter import MultiExporter, html_to_pdf
 from crminaec.core.reporting.template_manager import (CourseDataBuilder,
                                                     TemplateManager)
 
-__all__ = ['TemplateManager', 'CourseDataBuilder', 'MultiExporter']
+__all__ = ['TemplateManager', 'CourseDataBuilder', 'MultiExporter', 'html_to_pdf']
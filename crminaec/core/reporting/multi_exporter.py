@@ -3,15 +3,38 @@
 Multi-Format Exporter for EMEK portal
 Export to PDF, HTML, and Markdown formats.
 """
+import io
 import os
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Union
+from urllib.parse import urlparse
 
 import markdown
 from xhtml2pdf import pisa
 
 
+def html_to_pdf(html: str, static_dir: Optional[str] = None) -> bytes:
+    """
+    Renders a complete HTML document to PDF bytes.
+    Module-level (picklable) so it can run in the shared worker pool.
+    /static/... URLs (stylesheets, fonts, images) are read from `static_dir`.
+    """
+    def link_callback(uri: str, rel: Optional[str]) -> str:
+        path = urlparse(uri).path
+        if static_dir and path.startswith('/static/'):
+            local = os.path.join(static_dir, path[len('/static/'):])
+            if os.path.exists(local):
+                return local
+        return uri
+
+    buffer = io.BytesIO()
+    pisa_status = pisa.CreatePDF(html, dest=buffer, encoding='utf-8', link_callback=link_callback)
+    if getattr(pisa_status, "err", False):
+        raise RuntimeError(f"PDF rendering failed with {pisa_status.err} error(s)")
+    return buffer.getvalue()
+
+
 class MultiExporter:
     """Handle export of course materials to multiple formats."""
     
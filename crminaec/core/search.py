@@ -0,0 +1,29 @@
+# crminaec/core/search.py
+"""
+Search Keys
+Folds free text (catalogue codes, brands, product names) into the lower-case
+ASCII words the word indexes store, so a typed prefix is matched with a
+case-sensitive range on a B-tree index instead of an ilike scan.
+
+Pure functions only; models and migrations call them.
+"""
+import re
+import unicodedata
+from typing import List, Optional
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+_TURKISH_FOLD = str.maketrans({'ı': 'i', 'I': 'i', 'İ': 'i'})
+# Longest word stored (catalog_product_words.word)
+MAX_WORD_LENGTH = 100
+
+
+def search_words(*texts: Optional[str]) -> List[str]:
+    """Distinct folded words in order of appearance ('Bosch Serie|6 Fırın' -> ['bosch', 'serie', '6', 'firin'])."""
+    text = ' '.join(t for t in texts if t).translate(_TURKISH_FOLD).lower()
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return list(dict.fromkeys(word[:MAX_WORD_LENGTH] for word in _NON_WORD.split(text) if word))
+
+
+def prefix_bounds(prefix: str):
+    """(low, high) such that low <= value < high holds exactly for values starting with prefix."""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
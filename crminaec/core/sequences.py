@@ -0,0 +1,75 @@
+# crminaec/core/sequences.py
+"""
+Document Number Allocator
+Lead / order numbers and placeholder emails used to be built from the current
+minute, so two leads entered in the same minute collided on the unique
+constraint. They now come from counters in number_sequences.
+
+Each process reserves a block of NUMBER_BLOCK_SIZE values per series in one
+short transaction on its own connection, then hands them out from memory, so
+most allocations cost no database round trip and concurrent tablets or
+processes never get the same value. Numbers are unique and increasing per
+process, not gapless: the unused rest of a block is skipped after a restart.
+
+The reservation runs outside the caller's session. On SQLite, allocate before
+the session has written anything in the current transaction (it would hold
+the write lock the reservation waits for).
+"""
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Tuple
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from crminaec.core.models import NumberSequence, db
+
+logger = logging.getLogger(__name__)
+
+# series -> (next value to hand out, end of the reserved block, exclusive)
+_blocks: Dict[str, Tuple[int, int]] = {}
+_lock = threading.Lock()
+
+
+def _reserve_block(series: str, size: int) -> Tuple[int, int]:
+    """Moves the series counter forward by `size` in its own committed transaction. Returns [start, end)."""
+    table = NumberSequence.__table__
+    for _ in range(3):
+        try:
+            with db.engine.begin() as conn:
+                updated = conn.execute(
+                    table.update().where(table.c.name == series)
+                    .values(next_value=table.c.next_value + size)
+                ).rowcount
+                if updated:
+                    end = conn.execute(db.select(table.c.next_value).where(table.c.name == series)).scalar_one()
+                    return end - size, end
+                # First use of the series
+                conn.execute(table.insert().values(name=series, next_value=1 + size))
+                return 1, 1 + size
+        except IntegrityError:
+            # Another process created the series first; its row exists now
+            continue
+    raise RuntimeError(f"Numara serisi ayrılamadı (Could not reserve number block): {series}")
+
+
+def allocate(series: str) -> int:
+    """Next value of a series, unique across threads and processes."""
+    with _lock:
+        start, end = _blocks.get(series, (0, 0))
+        if start >= end:
+            size = max(1, int(current_app.config.get('NUMBER_BLOCK_SIZE', 20) or 1))
+            start, end = _reserve_block(series, size)
+            logger.debug(f"Number block reserved for {series}: {start}-{end - 1}")
+        _blocks[series] = (start + 1, end)
+        return start
+
+
+def next_number(series: str, **fields: Any) -> str:
+    """
+    Formats the next value of `series` with its NUMBER_FORMATS pattern. Patterns may use
+    {seq} (the counter), {date} (now) and any keyword passed here, e.g. {prefix}.
+    """
+    pattern = current_app.config['NUMBER_FORMATS'][series]
+    return pattern.format(seq=allocate(series), date=datetime.now(), **fields)
@@ -0,0 +1,56 @@
+# crminaec/core/workers.py
+"""
+Shared CPU Worker Pool
+Lazily creates one process pool per web/CLI process for CPU-bound work
+(QR rasters, PDF rendering, image resizing) so waitress threads stay free.
+"""
+import atexit
+import logging
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[Executor] = None
+_pool_lock = threading.Lock()
+
+
+def _default_worker_count() -> int:
+    # Leave one core for the web server threads
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def get_process_pool(max_workers: Optional[int] = None) -> Executor:
+    """Returns the process-wide executor, creating it on first use.
+
+    Falls back to a thread pool on platforms where worker processes cannot be
+    spawned (e.g. restricted IIS sandboxes), so callers never need to care.
+    """
+    global _pool
+    if _pool is not None:
+        return _pool
+
+    with _pool_lock:
+        if _pool is None:
+            workers = max_workers or int(os.environ.get('WORKER_PROCESSES', 0) or 0) or _default_worker_count()
+            try:
+                _pool = ProcessPoolExecutor(max_workers=workers)
+            except (OSError, NotImplementedError) as e:
+                logger.warning(f"Process pool unavailable ({e}); falling back to threads.")
+                _pool = ThreadPoolExecutor(max_workers=workers)
+            logger.info(f"Worker pool started with {workers} workers.")
+    return _pool
+
+
+def shutdown_process_pool() -> None:
+    """Stops the shared pool (called automatically at interpreter exit)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+atexit.register(shutdown_process_pool)
@@ -0,0 +1,161 @@
+"""
+Order Attachment Images
+Phone photos are stored exactly as uploaded (often 5-10 MB). After upload, a
+background job renders a web-sized and a thumbnail copy of each image in the
+shared worker pool and records them on OrderAttachment; pages show the
+thumbnail and link to the web copy, the original is kept for the archive.
+
+Variants are re-encoded from pixels only, so EXIF (GPS position, camera data)
+is not carried over; the EXIF orientation is applied first so portrait photos
+stay upright. JPEG sources are decoded at reduced scale (Image.draft), which
+is most of the saving on large photos.
+"""
+import logging
+import os
+from concurrent.futures import as_completed
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from flask import current_app
+
+from crminaec.core.jobs import job_handler, submit_job
+from crminaec.core.models import OrderAttachment, db
+from crminaec.core.workers import get_process_pool
+
+logger = logging.getLogger(__name__)
+
+# Variants live next to the originals (uploads/orders), so they are served as static files too
+VARIANT_SUBDIR = 'variants'
+_EXTENSIONS = {'WEBP': '.webp', 'JPEG': '.jpg'}
+
+
+def _disk_path(url_path: str) -> Path:
+    """'/static/uploads/orders/x.jpg' -> <static folder>/uploads/orders/x.jpg"""
+    return Path(str(current_app.static_folder)) / url_path.removeprefix('/static/')
+
+
+# ==============================================================================
+# 1. RENDERING (runs in the worker pool)
+# ==============================================================================
+def render_variants(source: str, target_dir: str, stem: str, sizes: Dict[str, int],
+                    fmt: str = 'WEBP', quality: int = 80) -> Dict[str, str]:
+    """
+    Writes one downscaled copy per {variant: longest edge} into target_dir and returns
+    {variant: file name}. Top-level so worker processes can pickle it.
+    """
+    from PIL import Image, ImageOps, features
+
+    # WebP needs libwebp in the Pillow build; JPEG is always there
+    fmt = 'WEBP' if fmt.upper() == 'WEBP' and features.check('webp') else 'JPEG'
+    ext = _EXTENSIONS[fmt]
+
+    target = Path(target_dir)
+    target.mkdir(parents=True, exist_ok=True)
+    largest = max(sizes.values())
+
+    with Image.open(source) as original:
+        # JPEG: let the decoder skip detail the largest variant does not need
+        original.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(original)
+        icc_profile = original.info.get('icc_profile')
+
+        if image.mode not in ('RGB', 'RGBA'):
+            has_alpha = image.mode in ('LA', 'PA') or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+        if fmt == 'JPEG' and image.mode == 'RGBA':
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+
+        names: Dict[str, str] = {}
+        # Largest first: each smaller variant is scaled down from the previous one
+        for variant, edge in sorted(sizes.items(), key=lambda kv: -kv[1]):
+            image.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+            name = f"{stem}_{variant}{ext}"
+            options: Dict[str, Any] = {'quality': quality}
+            if fmt == 'JPEG':
+                options.update(optimize=True, progressive=True)
+            else:
+                options['method'] = 4
+            if icc_profile:
+                options['icc_profile'] = icc_profile
+
+            # Write to a temp name first so a concurrent reader never sees half a file
+            tmp_path = target / f"{name}.{os.getpid()}.tmp"
+            image.save(tmp_path, fmt, **options)
+            os.replace(tmp_path, target / name)
+            names[variant] = name
+    return names
+
+
+# ==============================================================================
+# 2. BACKGROUND JOB
+# ==============================================================================
+def queue_attachment_variants(attachments: Iterable[OrderAttachment], created_by: Optional[int] = None) -> Optional[str]:
+    """Submits a variant job for the committed image attachments among `attachments`. Returns the job_id."""
+    ids = [att.attachment_id for att in attachments if att.file_type == 'image' and att.attachment_id]
+    if not ids:
+        return None
+    try:
+        return submit_job('attachment_variants', {'attachment_ids': ids}, created_by=created_by)
+    except Exception as e:
+        # The upload itself succeeded; pages fall back to the original until the variants exist
+        logger.error(f"Could not queue image variants for attachments {ids}: {e}")
+        return None
+
+
+@job_handler('attachment_variants')
+def run_attachment_variants(job, attachment_ids: Optional[List[int]] = None) -> Dict[str, Any]:
+    """
+    Renders the variants of the given attachments, or of every image attachment that
+    has none yet when attachment_ids is empty (backfill of older uploads).
+    """
+    query = db.select(OrderAttachment).where(OrderAttachment.file_type == 'image')
+    if attachment_ids:
+        query = query.where(OrderAttachment.attachment_id.in_(attachment_ids))
+    else:
+        query = query.where(OrderAttachment.thumb_path.is_(None))
+    attachments = db.session.scalars(query).all()
+    if not attachments:
+        return {'message': "İşlenecek görsel bulunamadı.", 'processed': 0, 'failed': 0}
+
+    config = current_app.config
+    sizes = dict(config.get('ATTACHMENT_VARIANT_SIZES') or {'web': 1600, 'thumb': 320})
+    fmt = config.get('ATTACHMENT_VARIANT_FORMAT', 'WEBP')
+    quality = int(config.get('ATTACHMENT_VARIANT_QUALITY', 80) or 80)
+    pool = get_process_pool(config.get('WORKER_PROCESSES') or None)
+
+    futures = {}
+    for att in attachments:
+        source = _disk_path(att.file_path)
+        if not source.exists():
+            logger.warning(f"Attachment {att.attachment_id}: original missing at {source}")
+            continue
+        target_dir = source.parent / VARIANT_SUBDIR
+        futures[pool.submit(render_variants, str(source), str(target_dir), source.stem, sizes, fmt, quality)] = att
+
+    processed = failed = 0
+    for done, future in enumerate(as_completed(futures), 1):
+        att = futures[future]
+        try:
+            names = future.result()
+        except Exception as e:
+            # e.g. HEIC or a damaged file: the page keeps linking the original
+            failed += 1
+            logger.warning(f"Attachment {att.attachment_id}: variants failed ({e})")
+        else:
+            url_dir = f"{att.file_path.rsplit('/', 1)[0]}/{VARIANT_SUBDIR}"
+            att.web_path = f"{url_dir}/{names['web']}" if 'web' in names else None
+            att.thumb_path = f"{url_dir}/{names['thumb']}" if 'thumb' in names else None
+            processed += 1
+        job.progress(done / len(futures), f"{done}/{len(futures)} görsel işlendi")
+    db.session.commit()
+
+    missing = len(attachments) - len(futures)
+    logger.info(f"Attachment variants: {processed} rendered, {failed} failed, {missing} originals missing.")
+    return {
+        'message': f"{processed} görsel küçültüldü ({failed} hatalı, {missing} dosya bulunamadı).",
+        'processed': processed,
+        'failed': failed,
+        'missing': missing
+    }
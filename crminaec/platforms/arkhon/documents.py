@@ -0,0 +1,292 @@
+"""
+Quote Documents
+Local PDF: renders quote contracts and ghost summaries without Google Docs.
+Templates are rendered to HTML in the request (they need the session), the
+CPU-heavy xhtml2pdf step runs in the shared worker pool, and the PDFs are kept
+in PDF_CACHE_DIR: quotes per (revision, status, hash of the printed lines),
+ghost summaries per content hash. A cached file is served straight from disk.
+
+Google Docs: the template copy + batchUpdate runs as a background job on the
+process-wide interop client.
+"""
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from flask import current_app, render_template
+
+from crminaec.core.interop import Platform
+from crminaec.core.interop.manager import get_interop_manager
+from crminaec.core.jobs import job_handler
+from crminaec.core.models import Order, OrderItem, Quote, db
+from crminaec.core.reporting.multi_exporter import html_to_pdf
+from crminaec.core.workers import get_process_pool
+from crminaec.platforms.arkhon.quotes import (compute_quote_totals,
+                                              stored_typologies)
+
+logger = logging.getLogger(__name__)
+
+
+def _cache_dir() -> Path:
+    path = Path(current_app.config['PDF_CACHE_DIR'])
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _submit(html: str) -> Future:
+    pool = get_process_pool(current_app.config.get('WORKER_PROCESSES') or None)
+    return pool.submit(html_to_pdf, html, current_app.static_folder)
+
+
+def _store(path: Path, data: bytes, stale_pattern: str) -> Path:
+    """Writes atomically (readers never see half a file) and drops older versions of the same document."""
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    for old in path.parent.glob(stale_pattern):
+        if old != path:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+    return path
+
+
+# ==============================================================================
+# 1. QUOTE CONTRACTS
+# ==============================================================================
+def _visible_items(order: Order) -> List[OrderItem]:
+    return db.session.scalars(
+        db.select(OrderItem)
+        .where(OrderItem.order_id == order.order_id, OrderItem.is_visible_on_quote.is_(True))
+        .order_by(OrderItem.typology_id, OrderItem.item_id)
+    ).all()
+
+
+def _lines_digest(items: Iterable[OrderItem]) -> str:
+    """Hash of the line fields the contract prints. Lines are read live, not from the revision."""
+    lines = '\n'.join(f"{i.item_id}|{i.category}|{i.urk}|{i.ura}|{i.adet}|{i.brm}" for i in items)
+    return hashlib.sha1(lines.encode('utf-8')).hexdigest()[:12]
+
+
+def quote_pdf_path(quote: Quote, visible_items: Optional[List[OrderItem]] = None) -> Path:
+    # Approval changes the document (signature block) without a new revision, and so can a line edit
+    if visible_items is None:
+        visible_items = _visible_items(quote.order)
+    digest = _lines_digest(visible_items)
+    return _cache_dir() / f"quote-{quote.quote_id}-r{quote.revision}-{quote.status}-{digest}.pdf"
+
+
+def render_quote_html(quote: Quote, visible_items: Optional[List[OrderItem]] = None) -> str:
+    order = quote.order
+    if visible_items is None:
+        visible_items = _visible_items(order)
+    return render_template(
+        'arkhon/pdf/quote.html',
+        quote=quote,
+        order=order,
+        typologies=stored_typologies(quote) or compute_quote_totals(order)['typologies'],
+        visible_items=visible_items,
+        pdf_font=current_app.config.get('PDF_FONT_PATH'),
+        current_date=datetime.now().strftime('%d.%m.%Y')
+    )
+
+
+def render_quote_pdfs(quotes: Iterable[Quote]) -> Dict[int, Path]:
+    """
+    Returns {quote_id: pdf_path}. Cached revisions are reused; the rest are rendered
+    to HTML here and converted in parallel in the worker pool.
+    """
+    timeout = current_app.config.get('PDF_RENDER_TIMEOUT', 120)
+    paths: Dict[int, Path] = {}
+    pending: List[Tuple[Quote, Path, Future]] = []
+
+    for quote in quotes:
+        # One read of the lines feeds both the cache key and the render, so they can't disagree
+        visible_items = _visible_items(quote.order)
+        path = quote_pdf_path(quote, visible_items)
+        if path.exists():
+            paths[quote.quote_id] = path
+        else:
+            pending.append((quote, path, _submit(render_quote_html(quote, visible_items))))
+
+    for quote, path, future in pending:
+        paths[quote.quote_id] = _store(path, future.result(timeout=timeout), f"quote-{quote.quote_id}-*.pdf")
+
+    if pending:
+        logger.info(f"Quote PDFs: {len(pending)} rendered, {len(paths) - len(pending)} cached.")
+    return paths
+
+
+def quote_pdf(quote: Quote) -> Path:
+    return render_quote_pdfs([quote])[quote.quote_id]
+
+
+# ==============================================================================
+# 2. GHOST SUMMARIES
+# ==============================================================================
+def ghost_summary_pdf(order: Order) -> Path:
+    """The negotiation summary as PDF. Cached by the hash of its HTML, as it has no revision of its own."""
+    html = render_template('arkhon/ghost_summary.html', order=order,
+                           current_date=datetime.now().strftime('%Y-%m-%d'), pdf_mode=True)
+    digest = hashlib.sha1(html.encode('utf-8')).hexdigest()[:16]
+    path = _cache_dir() / f"ghost-{order.order_id}-{digest}.pdf"
+    if not path.exists():
+        data = _submit(html).result(timeout=current_app.config.get('PDF_RENDER_TIMEOUT', 120))
+        _store(path, data, f"ghost-{order.order_id}-*.pdf")
+    return path
+
+
+# ==============================================================================
+# 3. GOOGLE DOCS EXPORT
+# ==============================================================================
+# The Google API client's HTTP transport is not thread-safe; exports share one client, so they take turns
+_GDOCS_LOCK = threading.Lock()
+
+
+def format_try(amount) -> str:
+    """Formats a float to Turkish Lira string: 1.234.567,89"""
+    if amount is None:
+        amount = 0.0
+    formatted = f"{float(amount):,.2f}"
+    return formatted.replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
+def _model_name(order: Order) -> str:
+    """Kitchen model name: from the preferences chart, else the first line that carries one."""
+    if order.preferences and order.preferences.model_name:
+        return order.preferences.model_name
+    for item in order.items:
+        if item.oza and item.oza.strip() and item.oza.strip() != '-':
+            code_str = f" ({item.ozk.strip()})" if item.ozk and item.ozk.strip() not in ["", "-"] else ""
+            return f"{item.oza.strip()}{code_str}"
+    return "Standart Mutfak"
+
+
+def _item_lines(items: Iterable[OrderItem]) -> List[str]:
+    return [f"• [{i.urk}] {i.ura} - {i.adet} {i.brm}" for i in items]
+
+
+def build_gdoc_replacements(quote: Quote) -> Tuple[str, List[Dict[str, str]]]:
+    """Document title and template tag replacements for a quote (from the totals saved with its revision)."""
+    order = quote.order
+    customer_fullname = (f"{order.party.first_name or ''} {order.party.last_name or ''}".strip() or "Müşteri") if order.party else "Müşteri"
+    project_name = getattr(order, 'project_name', 'Konut Projesi')
+    validity_date_str = (datetime.now() + timedelta(days=quote.validity_days)).strftime('%d.%m.%Y')
+
+    visible_by_typology: Dict[Any, List[OrderItem]] = {}
+    for item in db.session.scalars(
+        db.select(OrderItem)
+        .where(OrderItem.order_id == order.order_id, OrderItem.is_visible_on_quote.is_(True))
+        .order_by(OrderItem.item_id)
+    ):
+        visible_by_typology.setdefault(item.typology_id, []).append(item)
+
+    typology_lines: List[str] = []
+    summary_lines: List[str] = []
+    itemized_lines: List[str] = []
+    total_kitchen_count = 0
+
+    typology_totals = stored_typologies(quote) or compute_quote_totals(order)['typologies']
+    if any(group['typology_id'] is not None for group in typology_totals):
+        # B2B typology logic with ERP pricing
+        grand_total = 0.0
+        for group in typology_totals:
+            row_total = float(group['row_total'])
+            if group['typology_id'] is None:
+                # Lines not assigned to any typology
+                if row_total:
+                    grand_total += row_total
+                    summary_lines.append(f"• Diğer Kalemler : {format_try(row_total)} ₺")
+                continue
+
+            total_kitchen_count += group['quantity']
+            grand_total += row_total
+            typology_lines.append(f"• {group['name']} MUTFAK ({group['description']}) - {group['quantity']} ADET")
+            summary_lines.append(f"• {group['name']} ({group['description']}) : {format_try(row_total)} ₺")
+            itemized_lines.append(f"\n--- {group['name']} MUTFAK ÜNİTELERİ ---")
+            itemized_lines.extend(_item_lines(visible_by_typology.get(group['typology_id'], [])))
+        summary_lines.append(f"\nGENEL TOPLAM: {format_try(grand_total)} ₺")
+    else:
+        model_name = _model_name(order)
+        total_kitchen_count = 1
+        summary_lines.append(f"• {model_name} : {format_try(quote.total_amount)} ₺")
+        itemized_lines.append(f"\n--- {model_name} MUTFAK ÜNİTELERİ ---")
+        itemized_lines.extend(_item_lines(item for items in visible_by_typology.values() for item in items))
+
+    if quote.installments:
+        installment_text = "\n".join(
+            f"• {inst.date.strftime('%d.%m.%Y') if inst.date else 'Belirtilmedi'}  |  {inst.method}  |  {format_try(inst.amount)} ₺"
+            for inst in quote.installments
+        ) + "\n"
+    else:
+        installment_text = "Özel bir ödeme planı belirtilmemiştir."
+
+    replacements = [
+        {'{{quote_number}}': f"{order.order_number}-V{quote.version}"},
+        {'{{date}}': datetime.now().strftime('%d.%m.%Y')},
+        {'{{customer_name}}': customer_fullname},
+        {'{{project_name}}': project_name},
+        {'{{total_kitchen_count}}': str(total_kitchen_count)},
+        {'{{typology_list_bulleted}}': "\n".join(typology_lines)},
+        {'{{project_summary_table}}': "\n".join(summary_lines) + "\n"},
+        {'{{typology_itemized_pages}}': "\n".join(itemized_lines) + "\n"},
+        {'{{installment_plan_table}}': installment_text},
+        {'{{payment_terms}}': quote.payment_terms or "Ödeme planı ektedir."},
+        {'{{validity_date}}': validity_date_str}
+    ]
+    return f"Teklif_{order.order_number}_{customer_fullname}", replacements
+
+
+# ==============================================================================
+# ⚙️ BACKGROUND JOB HANDLERS
+# ==============================================================================
+@job_handler('quote_gdoc_export')
+def run_quote_gdoc_export(job, quote_id: int) -> Dict[str, Any]:
+    """Copies the quote template in Google Docs and fills it in. The result carries the document link."""
+    quote = db.session.get(Quote, quote_id)
+    if quote is None:
+        raise ValueError(f"Teklif bulunamadı (Quote not found): {quote_id}")
+
+    title, replacements = build_gdoc_replacements(quote)
+    job.progress(0.2, "Google Docs şablonu kopyalanıyor...")
+
+    gdocs_client = get_interop_manager().clients.get(Platform.GOOGLE_DOCS)
+    if not gdocs_client or not hasattr(gdocs_client, 'generate_from_template'):
+        raise RuntimeError("Google Docs platform is not enabled or failed to initialize.")
+
+    with _GDOCS_LOCK:
+        new_doc_id = gdocs_client.generate_from_template(  # type: ignore
+            template_id=current_app.config['GDOC_QUOTE_TEMPLATE_ID'],
+            title=title,
+            replacements=replacements,
+            folder_id=current_app.config.get('GDOC_QUOTE_FOLDER_ID')
+        )
+    if not new_doc_id:
+        raise RuntimeError('Google Docs API reddetti. Konsol loglarını kontrol edin.')
+
+    document_url = f"https://docs.google.com/document/d/{new_doc_id}/edit"
+    return {
+        'message': f"Google Docs teklifi oluşturuldu: {title}",
+        'document_id': new_doc_id,
+        'document_url': document_url,
+        'redirect_url': document_url
+    }
+
+
+@job_handler('quote_pdf_batch')
+def run_quote_pdf_batch(job, quote_ids: List[int]) -> Dict[str, object]:
+    """Pre-renders many quote PDFs (e.g. month-end contracts) so downloads are served from the cache."""
+    done = 0
+    # Chunks keep progress moving while still filling every worker process
+    chunk = max(1, (os.cpu_count() or 2) * 2)
+    for start in range(0, len(quote_ids), chunk):
+        quotes = db.session.scalars(db.select(Quote).where(Quote.quote_id.in_(quote_ids[start:start + chunk]))).all()
+        done += len(render_quote_pdfs(quotes))
+        job.progress(done / len(quote_ids), f"{done} / {len(quote_ids)} PDF hazır")
+    return {'message': f"{done} teklif PDF'i hazırlandı.", 'count': done}
@@ -0,0 +1,325 @@
+"""
+Kelebek Order Import
+Streams an uploaded export through KelebekOrderParser and bulk-inserts the order
+lines in batches while the file is still being read, so worker memory stays flat
+no matter how large the upload is.
+
+The upload routes hand files to core.jobs; the @job_handler functions at the
+bottom do the work off the request thread and report progress.
+"""
+import csv
+import logging
+import os
+from datetime import datetime, timezone
+from decimal import ROUND_HALF_UP, Decimal
+from typing import (IO, Any, Callable, Dict, FrozenSet, Iterable, Iterator,
+                    List, Optional, Set, Tuple)
+
+from sqlalchemy import inspect
+
+from crminaec.core.jobs import job_handler
+from crminaec.core.models import Order, OrderItem, Party, PriceRecord, db
+from crminaec.core.parties import find_party
+from crminaec.core.sequences import next_number
+from crminaec.platforms.arkhon.orderparser import KelebekOrderParser
+from crminaec.platforms.emek.reservations import sync_order_reservations
+
+logger = logging.getLogger(__name__)
+
+# Rows per executemany. Large enough that a typical multi-unit project is a single statement,
+# small enough to keep the buffered mappings to a few MB on the biggest exports.
+IMPORT_BATCH_SIZE = 5000
+PROGRESS_EVERY = 250
+# Codes per IN (...) / CASE statement; keeps bound parameters under SQLite's limit
+PRICE_CHUNK_SIZE = 400
+PROSAP_SUPPLIER = "Kelebek (ProSAP)"
+
+_CENTS = Decimal('0.01')
+
+_LINE_COLUMNS: Optional[FrozenSet[str]] = None
+
+
+def order_item_columns() -> FrozenSet[str]:
+    """Writable OrderItem columns a parsed row may fill (worked out once per process)."""
+    global _LINE_COLUMNS
+    if _LINE_COLUMNS is None:
+        mapper = inspect(OrderItem)
+        _LINE_COLUMNS = frozenset(
+            attr.key for attr in mapper.column_attrs
+            if attr.key not in ('item_id', 'order_id')
+        )
+    return _LINE_COLUMNS
+
+
+def import_kelebek_items(order: Order, fileobj: IO[bytes], encoding: str = 'utf-8',
+                         on_progress: Optional[Callable[[int], None]] = None) -> Tuple[int, Dict[str, str]]:
+    """
+    Parses `fileobj` chunk by chunk and inserts every product row as a line of `order`.
+    Lines go in as plain row mappings: one executemany per IMPORT_BATCH_SIZE rows, no ORM objects.
+    The order must already have an order_id (flush it first). Nothing is committed:
+    the caller commits, or rolls back to discard the partial import.
+    `on_progress(lines_so_far)` is called every PROGRESS_EVERY lines.
+
+    Returns:
+        (item_count, customer): number of lines written and the customer details found in the export.
+    """
+    reader = KelebekOrderParser.stream(fileobj, encoding)
+    columns = order_item_columns()
+    order_id = order.order_id
+    keys: Optional[List[str]] = None
+    batch: List[Dict[str, Any]] = []
+
+    for item_data in reader:
+        if keys is None:
+            # Every parsed row carries the same keys, so the filter is resolved on the first one
+            keys = [k for k in item_data if k in columns]
+        row = {k: item_data[k] for k in keys}
+        row['order_id'] = order_id
+        batch.append(row)
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            _insert_batch(batch)
+        if on_progress and reader.item_count % PROGRESS_EVERY == 0:
+            on_progress(reader.item_count)
+    _insert_batch(batch)
+
+    if reader.item_count:
+        # The order's loaded `items` collection (if any) no longer reflects the table
+        db.session.expire(order, ['items'])
+    logger.info(f"Kelebek import: {reader.item_count} lines written to order {order_id}.")
+    return reader.item_count, reader.customer
+
+
+def _insert_batch(batch: List[Dict[str, Any]]) -> None:
+    if not batch:
+        return
+    db.session.execute(db.insert(OrderItem), batch)
+    batch.clear()
+
+
+# ==============================================================================
+# 💰 PRICE RECORD INGESTION
+# ==============================================================================
+def _price_key(value: Any) -> Decimal:
+    """Prices are stored as Numeric(12, 2); compare them at that precision."""
+    return Decimal(str(value)).quantize(_CENTS, rounding=ROUND_HALF_UP)
+
+
+def _chunks(values: Iterable[Any], size: int = PRICE_CHUNK_SIZE) -> Iterator[List[Any]]:
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _order_item_codes(order_id: int, codes: Iterable[str]) -> Set[str]:
+    """The subset of `codes` used by at least one line of the order."""
+    found: Set[str] = set()
+    for chunk in _chunks(codes):
+        found.update(db.session.scalars(
+            db.select(OrderItem.urk).distinct()
+            .where(OrderItem.order_id == order_id, OrderItem.urk.in_(chunk))
+        ))
+    return found
+
+
+def upsert_price_records(supplier: str, prices: Dict[str, float], price_type: str = 'cost') -> Dict[str, int]:
+    """
+    Returns {entity_code: price_id} for the given unit prices, reusing any active record of the
+    same supplier, type, code and price and bulk-inserting only the missing ones.
+    Nothing is committed.
+    """
+    wanted = {code: _price_key(price) for code, price in prices.items()}
+    if not wanted:
+        return {}
+
+    def lookup() -> Dict[str, int]:
+        found: Dict[str, int] = {}
+        for chunk in _chunks(wanted):
+            rows = db.session.execute(
+                db.select(PriceRecord.entity_code, PriceRecord.final_unit_price, db.func.min(PriceRecord.price_id))
+                .where(PriceRecord.supplier == supplier,
+                       PriceRecord.price_type == price_type,
+                       PriceRecord.is_active.is_(True),
+                       PriceRecord.entity_code.in_(chunk))
+                .group_by(PriceRecord.entity_code, PriceRecord.final_unit_price)
+            )
+            for code, price, price_id in rows:
+                if price is not None and _price_key(price) == wanted[code]:
+                    found[code] = price_id
+        return found
+
+    price_ids = lookup()
+    missing = [code for code in wanted if code not in price_ids]
+    if missing:
+        now = datetime.now(timezone.utc)
+        db.session.execute(db.insert(PriceRecord), [{
+            'entity_code': code,
+            'supplier': supplier,
+            'price_type': price_type,
+            'valid_from': now,
+            'is_active': True,
+            'base_material_cost': wanted[code],
+            'final_unit_price': wanted[code]
+        } for code in missing])
+        price_ids = lookup()
+        logger.info(f"Price records: {len(missing)} created, {len(wanted) - len(missing)} reused ({supplier}).")
+    return price_ids
+
+
+def _link_price_records(order_id: int, price_ids: Dict[str, int]) -> int:
+    """Points every line of the order at the record for its code: UPDATE ... SET = CASE urk WHEN ..."""
+    updated = 0
+    for chunk in _chunks(price_ids):
+        result = db.session.execute(
+            db.update(OrderItem)
+            .where(OrderItem.order_id == order_id, OrderItem.urk.in_(chunk))
+            .values(price_record_id=db.case({code: price_ids[code] for code in chunk}, value=OrderItem.urk))
+            .execution_options(synchronize_session=False)
+        )
+        updated += result.rowcount or 0
+    return updated
+
+
+def _file_progress(job, fileobj: IO[bytes], size: int, label: str) -> Callable[[int], None]:
+    """Progress callback that reports how much of the upload has been read."""
+    def report(count: int) -> None:
+        job.progress(fileobj.tell() / size if size else 0.0, f"{count} {label}")
+    return report
+
+
+def _sync_reservations_quietly(order_id: int) -> None:
+    try:
+        sync_order_reservations([order_id])
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Stock reservation sync failed for order {order_id}: {e}")
+
+
+def _link_customer(order: Order, cust_info: Dict[str, str], placeholder_email: str) -> None:
+    """
+    Finds (by normalised e-mail, then phone) or creates the export's customer (placeholder_email
+    if the export has none) and attaches it to the order.
+    """
+    email = cust_info.get('email', '')
+    first_name = cust_info.get('first_name', '')
+    last_name = cust_info.get('last_name', '')
+    if not (email or first_name or last_name):
+        return
+
+    party = find_party(email=email, phone=cust_info.get('phone'))
+    if not party:
+        party = Party(**{
+            'email': email or placeholder_email,
+            'first_name': first_name,
+            'last_name': last_name
+        })
+        db.session.add(party)
+        db.session.flush()
+
+    # Attach phone and address if model supports it
+    if hasattr(party, 'phone') and cust_info.get('phone'):
+        party.phone = cust_info.get('phone')
+    if hasattr(party, 'address') and cust_info.get('address'):
+        party.address = cust_info.get('address')
+
+    order.party_id = party.party_id
+    order.party = party
+
+
+# ==============================================================================
+# ⚙️ BACKGROUND JOB HANDLERS
+# ==============================================================================
+@job_handler('kelebek_order_import')
+def run_kelebek_order_import(job, path: str, filename: str) -> Dict[str, Any]:
+    """Creates a new order (and customer) from a Kelebek HTML export."""
+    base_filename = os.path.splitext(filename)[0]
+    # Allocated up front: the reservation must not wait on this session's write lock (SQLite)
+    order_number = next_number('kelebek_order', prefix=base_filename)
+    placeholder_email = next_number('import_email')
+
+    # Only pass valid Order fields to constructor
+    new_order = Order(**{'order_number': order_number})
+    db.session.add(new_order)
+    db.session.flush()
+
+    with open(path, 'rb') as fileobj:
+        progress = _file_progress(job, fileobj, os.path.getsize(path), 'kalem okundu')
+        item_count, cust_info = import_kelebek_items(new_order, fileobj, on_progress=progress)
+
+    if not item_count:
+        db.session.rollback()
+        return {
+            'message': 'No valid products found in the uploaded HTML file. Is it a valid Kelebek export?',
+            'category': 'warning'
+        }
+
+    _link_customer(new_order, cust_info, placeholder_email)
+    db.session.commit()
+    _sync_reservations_quietly(new_order.order_id)
+
+    return {
+        'message': f'Successfully imported order #{new_order.order_number} with {item_count} items!',
+        'order_id': new_order.order_id,
+        'item_count': item_count,
+        'redirect': {'endpoint': 'arkhon.order_detail', 'values': {'order_id': new_order.order_id}}
+    }
+
+
+@job_handler('kelebek_order_append')
+def run_kelebek_order_append(job, path: str, order_id: int) -> Dict[str, Any]:
+    """Appends the lines of a Kelebek HTML export to an existing order."""
+    order = db.session.get(Order, order_id)
+    if order is None:
+        raise ValueError(f"Sipariş bulunamadı (Order not found): {order_id}")
+
+    with open(path, 'rb') as fileobj:
+        progress = _file_progress(job, fileobj, os.path.getsize(path), 'kalem okundu')
+        item_count, _ = import_kelebek_items(order, fileobj, on_progress=progress)
+
+    if not item_count:
+        db.session.rollback()
+        return {'message': 'Yüklenen HTML dosyasında geçerli ürün bulunamadı.', 'category': 'warning'}
+
+    db.session.commit()
+    _sync_reservations_quietly(order.order_id)
+    return {
+        'message': f'Başarıyla {item_count} adet ürün {order.order_number} siparişine eklendi!',
+        'item_count': item_count
+    }
+
+
+@job_handler('prosap_price_import')
+def run_prosap_price_import(job, path: str, order_id: int) -> Dict[str, Any]:
+    """Reads a ProSAP CSV and injects prices into the Order's PriceRecords."""
+    order = db.session.get(Order, order_id)
+    if order is None:
+        raise ValueError(f"Sipariş bulunamadı (Order not found): {order_id}")
+
+    # 1. Read the CSV File (Decoding it to string)
+    with open(path, 'r', encoding='utf-8', newline=None) as handle:
+        # NOTE: Adjust delimiter to ';' if ProSAP uses semicolons for Turkish Excel formatting!
+        csv_input = csv.DictReader(handle, delimiter=',')
+
+        # 2. Convert CSV rows into a fast lookup dictionary: { 'URK_CODE': 12500.00 }
+        # You will need to change 'Ünite Kodu' and 'Fiyat' to match the exact column headers in the ProSAP CSV
+        prosap_prices = {}
+        for row in csv_input:
+            unit_code = row.get('Ünite Kodu', '').strip()
+            raw_price = row.get('Fiyat', '0').replace('.', '').replace(',', '.') # Handle Turkish number format
+
+            if unit_code:
+                prosap_prices[unit_code] = float(raw_price)
+    job.progress(0.5, f"{len(prosap_prices)} fiyat okundu")
+
+    # 3. One PriceRecord per (code, price), reused across items and re-imports
+    matched = _order_item_codes(order.order_id, prosap_prices.keys())
+    price_ids = upsert_price_records(PROSAP_SUPPLIER, {code: prosap_prices[code] for code in matched})
+    job.progress(0.8, f"{len(price_ids)} fiyat kaydı hazır")
+
+    # 4. Link every matching item with one CASE UPDATE per chunk of codes
+    updated_count = _link_price_records(order.order_id, price_ids)
+
+    db.session.commit()
+    return {
+        'message': f'{updated_count} kalemin fiyatı ProSAP CSV dosyasından başarıyla güncellendi!',
+        'updated_count': updated_count
+    }
@@ -1,15 +1,200 @@
 """
 Kelebek Furniture HTML Order Parser
 Integrated with crminaec Data-First Architecture
+
+Two engines produce identical output:
+- 'stream' (default): one regex pass over the tags, collecting <input> values per
+  enclosing <tr> as they go by. No tree is built and text nodes are never materialized.
+- 'soup': the original BeautifulSoup tree walk, kept as the reference implementation.
 """
+import codecs
+import html
 import logging
-from typing import Any, Dict, List, Optional
-
-from bs4 import BeautifulSoup
+import re
+from collections import deque
+from typing import (IO, Any, Deque, Dict, Iterator, List, Optional, Tuple)
 
 # Set up a logger so we can track parsing issues without printing to stdout
 logger = logging.getLogger(__name__)
 
+# Tags BeautifulSoup's HTML builder treats as void (closed immediately on a plain start tag)
+_VOID_TAGS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link', 'menuitem',
+    'meta', 'param', 'source', 'track', 'wbr',
+    'basefont', 'bgsound', 'command', 'frame', 'image', 'isindex', 'nextid', 'spacer'
+])
+
+# Comments, declarations / processing instructions, and start or end tags.
+# Quoted attribute values may contain '<' and '>' (Kelebek puts raw "<br />" in nitelikdetay).
+# Every alternative is unambiguous, so an unterminated tag fails in linear time.
+_TOKEN_RE = re.compile(r"""
+    <!--.*?(?:-->|\Z)
+  | <[!?][^>]*>
+  | <(?P<end>/?)(?P<tag>[a-zA-Z][^\s/>]*)
+      (?P<attrs>(?:[^>"'=]|=\s*"[^"]*"|=\s*'[^']*'|=(?!\s*["']))*)>
+""", re.S | re.X)
+# Fallback for tags with a stray quote: anything up to the next '>' (only tried when one exists)
+_LOOSE_TAG_RE = re.compile(r"""<(?P<end>/?)(?P<tag>[a-zA-Z][^\s/>]*)(?P<attrs>(?:[^>"'=]|=\s*"[^"]*"|=\s*'[^']*'|[="'])*)>""")
+_ATTR_RE = re.compile(r"""([^\s/>"'=]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]*)))?""")
+
+_TOKEN_LEADS = frozenset('!?/abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ')
+
+# Raw-text elements: their content is not markup (same as HTMLParser's CDATA_CONTENT_ELEMENTS)
+_RAW_TEXT_END = {tag: re.compile(r'</\s*%s\s*>' % tag, re.I) for tag in ('script', 'style')}
+_RAW_TEXT_TAIL = 64
+
+# Incremental reads: chunk size, and the longest tag we wait for before treating '<' as text
+READ_CHUNK_SIZE = 64 * 1024
+_MAX_TOKEN = 1024 * 1024
+
+
+class _Row:
+    __slots__ = ('fields', 'closed')
+
+    def __init__(self):
+        self.fields: Dict[str, str] = {}
+        self.closed = False
+
+
+class _KelebekStreamParser:
+    """
+    Single-pass tag scanner that mirrors how BeautifulSoup('html.parser') nests the document:
+    an open-tag stack where an end tag closes back to its most recent matching start tag
+    (and is ignored when there is none), and void tags close themselves.
+
+    Every <input> is credited to each <tr> currently open (first one per name wins), which is
+    exactly what row.find('input', {'name': field}) returns on the tree.
+
+    Input can arrive in chunks: feed() keeps only an unfinished tag as carry-over, and
+    pop_rows() hands out rows once they (and every row started before them) are closed,
+    so memory does not grow with the document.
+    """
+
+    def __init__(self, row_fields, lookup_keys=()):
+        self.row_fields = frozenset(row_fields)
+        self.lookup_keys = frozenset(lookup_keys)
+        self.stack: List[Tuple[str, Optional[_Row]]] = []
+        self.pending: Deque[_Row] = deque()         # <tr> rows not yet handed out, in start-tag order
+        self.open_rows: List[_Row] = []
+        self.first_by_name: Dict[str, str] = {}     # first <input> per lookup key, by name
+        self.first_by_id: Dict[str, str] = {}
+        self._closed_voids: Dict[str, int] = {}     # void tags awaiting a stray end tag
+        self._raw_text: Optional[str] = None        # inside <script>/<style>
+        self._buffer = ''
+
+    def feed(self, text: str, final: bool = False) -> None:
+        buf = self._buffer + text if self._buffer else text
+        size = len(buf)
+        pos = 0
+        while True:
+            if self._raw_text:
+                end = _RAW_TEXT_END[self._raw_text].search(buf, pos)
+                if end is None:
+                    # Only the tail could still hold the start of the closing tag
+                    pos = size if final else max(pos, size - _RAW_TEXT_TAIL)
+                    break
+                pos = end.end()
+                self._close(self._raw_text)
+                self._raw_text = None
+                continue
+
+            start = buf.find('<', pos)
+            if start < 0:
+                pos = size
+                break
+            match = _TOKEN_RE.match(buf, start)
+            if not final and (match is None or not match.group(0).endswith('>')):
+                # Possibly a tag cut by the chunk boundary: wait for more data, within reason
+                if size - start < _MAX_TOKEN and (size - start < 2 or buf[start + 1] in _TOKEN_LEADS):
+                    pos = start
+                    break
+            if match is None and buf.find('>', start) >= 0:
+                match = _LOOSE_TAG_RE.match(buf, start)
+            if match is None:
+                pos = start + 1  # a stray '<' in text
+                continue
+            pos = match.end()
+            self._handle(match)
+
+        self._buffer = buf[pos:]
+
+    def close(self) -> None:
+        self.feed('', final=True)
+        for row in self.open_rows:
+            row.closed = True
+        self.open_rows = []
+
+    def pop_rows(self) -> Iterator[Dict[str, str]]:
+        """Rows whose content is final, in document order."""
+        while self.pending and self.pending[0].closed:
+            yield self.pending.popleft().fields
+
+    def _handle(self, match) -> None:
+        tag = match.groupdict().get('tag')
+        if tag is None:
+            return  # comment or declaration
+        tag = tag.lower()
+
+        if match.group('end'):
+            self.handle_endtag(tag)
+        elif match.group('attrs').endswith('/'):
+            # Closes itself without consuming an earlier void tag's pending stray end tag
+            self._open(tag, match.group('attrs'))
+            self._close(tag)
+        else:
+            self._open(tag, match.group('attrs'))
+            if tag in _VOID_TAGS:
+                self._close(tag)
+                self._closed_voids[tag] = self._closed_voids.get(tag, 0) + 1
+            elif tag in _RAW_TEXT_END:
+                # Script/style bodies are not markup; an unterminated one swallows the rest
+                self._raw_text = tag
+
+    def _open(self, tag: str, attrs: str) -> None:
+        row = None
+        if tag == 'tr':
+            row = _Row()
+            self.pending.append(row)
+            self.open_rows.append(row)
+        elif tag == 'input':
+            self._collect_input(attrs)
+        self.stack.append((tag, row))
+
+    def _close(self, tag: str) -> None:
+        for depth in range(len(self.stack) - 1, -1, -1):
+            if self.stack[depth][0] == tag:
+                for _, row in self.stack[depth:]:
+                    if row is not None:
+                        row.closed = True
+                        self.open_rows.remove(row)
+                del self.stack[depth:]
+                return
+
+    def _collect_input(self, attrs: str) -> None:
+        values: Dict[str, str] = {}
+        for key, double, single, bare in _ATTR_RE.findall(attrs):
+            # Valueless attributes become '' and duplicates keep the last value, as in bs4
+            values[key.lower()] = html.unescape(double or single or bare)
+
+        value = values.get('value', '')
+        name = values.get('name')
+        if name is not None:
+            if name in self.lookup_keys:
+                self.first_by_name.setdefault(name, value)
+            if name in self.row_fields:
+                for row in self.open_rows:
+                    row.fields.setdefault(name, value)
+        input_id = values.get('id')
+        if input_id is not None and input_id in self.lookup_keys:
+            self.first_by_id.setdefault(input_id, value)
+
+    def handle_endtag(self, tag: str) -> None:
+        if self._closed_voids.get(tag):
+            self._closed_voids[tag] -= 1
+            return
+        self._close(tag)
+
+
 class KelebekOrderParser:
     """Parses Kelebek HTML order exports into structured data."""
     
@@ -20,13 +205,25 @@ class KelebekOrderParser:
         'konfigurasyon', 'konfigurasyonXML', 'nitelikdetay'
     ]
 
+    # Common Kelebek/ProSAP hidden inputs or IDs related to the customer, in priority order
+    CUSTOMER_FIELDS = {
+        'first_name': ['MusteriAdi', 'Ad', 'Müşteri Adı'],
+        'last_name': ['MusteriSoyadi', 'Soyad', 'Müşteri Soyadı'],
+        'email': ['MusteriEmail', 'EPosta', 'Email', 'E-Posta'],
+        'phone': ['MusteriTelefon', 'CepTel', 'Telefon', 'Cep Telefonu'],
+        'address': ['FaturaAdresi', 'Adres', 'Teslimat Adresi']
+    }
+
+    DEFAULT_ENGINE = 'stream'
+
     @classmethod
-    def parse_html(cls, html_content: str) -> Dict[str, Any]:
+    def parse_html(cls, html_content: str, engine: Optional[str] = None) -> Dict[str, Any]:
         """
         Extracts product rows and hidden input configurations from the Kelebek HTML table.
         
         Args:
             html_content (str): The raw HTML string uploaded by the user.
+            engine (str): 'stream' (single pass, default) or 'soup' (BeautifulSoup tree).
             
         Returns:
             Dict: A dictionary containing 'items' (list of products) and 'customer' (dict of details).
@@ -35,6 +232,69 @@ class KelebekOrderParser:
             logger.warning("Empty HTML content provided to parser.")
             return {'items': [], 'customer': {}}
 
+        if (engine or cls.DEFAULT_ENGINE) == 'soup':
+            return cls._parse_with_soup(html_content)
+        return cls._parse_stream(html_content)
+
+    @classmethod
+    def _new_stream_parser(cls) -> _KelebekStreamParser:
+        lookup_keys = [key for keys in cls.CUSTOMER_FIELDS.values() for key in keys]
+        return _KelebekStreamParser(['pozno'] + cls.EXPECTED_FIELDS, lookup_keys)
+
+    @classmethod
+    def _customer_from(cls, parser: _KelebekStreamParser) -> Dict[str, str]:
+        """First input by name, else by id, for each candidate key."""
+        customer = {field: '' for field in cls.CUSTOMER_FIELDS}
+        for field, keys in cls.CUSTOMER_FIELDS.items():
+            for key in keys:
+                value = parser.first_by_name.get(key)
+                if value is None:
+                    value = parser.first_by_id.get(key)
+                if value:
+                    customer[field] = value.strip()
+                    break
+        return customer
+
+    @classmethod
+    def _products_from(cls, parser: _KelebekStreamParser) -> Iterator[Dict[str, Any]]:
+        """Finished rows that carry a non-empty pozno, in document order."""
+        for row in parser.pop_rows():
+            pozno_val = row.get('pozno')
+            if not pozno_val:
+                continue
+            product: Dict[str, Any] = {'pozno': pozno_val}
+            for field in cls.EXPECTED_FIELDS:
+                product[field] = row.get(field)
+            yield product
+
+    @classmethod
+    def _parse_stream(cls, html_content: str) -> Dict[str, Any]:
+        """One pass over the tags; no tree, no repeated find() scans."""
+        try:
+            parser = cls._new_stream_parser()
+            parser.feed(html_content)
+            parser.close()
+
+            products = list(cls._products_from(parser))
+            logger.info(f"Successfully parsed {len(products)} products from Kelebek HTML.")
+            return {'items': products, 'customer': cls._customer_from(parser)}
+
+        except Exception as e:
+            logger.error(f"Failed to parse Kelebek order HTML: {e}")
+            # Return empty structure to prevent 500 crashes
+            return {'items': [], 'customer': {}}
+
+    @classmethod
+    def stream(cls, fileobj: IO[bytes], encoding: str = 'utf-8',
+               chunk_size: int = READ_CHUNK_SIZE) -> "KelebekStreamReader":
+        """Incremental counterpart of parse_html for uploads too large to hold in memory."""
+        return KelebekStreamReader(cls, fileobj, encoding, chunk_size)
+
+    @classmethod
+    def _parse_with_soup(cls, html_content: str) -> Dict[str, Any]:
+        """Reference implementation on a full BeautifulSoup tree."""
+        from bs4 import BeautifulSoup
+
         try:
             soup = BeautifulSoup(html_content, 'html.parser')
             products: List[Dict[str, Any]] = []
@@ -44,16 +304,7 @@ class KelebekOrderParser:
                 'first_name': '', 'last_name': '', 'email': '', 'phone': '', 'address': ''
             }
             
-            # Search for common Kelebek/ProSAP hidden inputs or IDs related to the customer
-            search_map = {
-                'first_name': ['MusteriAdi', 'Ad', 'Müşteri Adı'],
-                'last_name': ['MusteriSoyadi', 'Soyad', 'Müşteri Soyadı'],
-                'email': ['MusteriEmail', 'EPosta', 'Email', 'E-Posta'],
-                'phone': ['MusteriTelefon', 'CepTel', 'Telefon', 'Cep Telefonu'],
-                'address': ['FaturaAdresi', 'Adres', 'Teslimat Adresi']
-            }
-            
-            for field, keys in search_map.items():
+            for field, keys in cls.CUSTOMER_FIELDS.items():
                 for key in keys:
                     # Try input name or id
                     inp = soup.find('input', {'name': key}) or soup.find('input', {'id': key})
@@ -94,4 +345,54 @@ class KelebekOrderParser:
         except Exception as e:
             logger.error(f"Failed to parse Kelebek order HTML: {e}")
             # Return empty structure to prevent 500 crashes
-            return {'items': [], 'customer': {}}
\ No newline at end of file
+            return {'items': [], 'customer': {}}
+
+
+class KelebekStreamReader:
+    """
+    Reads a Kelebek export from a binary file object in fixed-size chunks.
+    Iterating yields one product dict at a time (same shape as parse_html's items);
+    `customer` is complete once iteration has finished.
+
+        reader = KelebekOrderParser.stream(file.stream)
+        for item in reader:
+            ...
+        reader.customer
+    """
+
+    def __init__(self, parser_cls, fileobj: IO[bytes], encoding: str = 'utf-8',
+                 chunk_size: int = READ_CHUNK_SIZE):
+        self.parser_cls = parser_cls
+        self.fileobj = fileobj
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+        self.item_count = 0
+        self._parser = parser_cls._new_stream_parser()
+        self._done = False
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        if self._done:
+            return
+        decoder = codecs.getincrementaldecoder(self.encoding)(errors='ignore')
+        while True:
+            chunk = self.fileobj.read(self.chunk_size)
+            if not chunk:
+                break
+            self._parser.feed(decoder.decode(chunk))
+            for product in self.parser_cls._products_from(self._parser):
+                self.item_count += 1
+                yield product
+
+        self._parser.feed(decoder.decode(b'', final=True))
+        self._parser.close()
+        self._done = True
+        for product in self.parser_cls._products_from(self._parser):
+            self.item_count += 1
+            yield product
+        logger.info(f"Streamed {self.item_count} products from Kelebek HTML.")
+
+    @property
+    def customer(self) -> Dict[str, str]:
+        if not self._done:
+            raise RuntimeError("Customer details are only complete after the stream has been read.")
+        return self.parser_cls._customer_from(self._parser)
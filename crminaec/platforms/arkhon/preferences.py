@@ -0,0 +1,178 @@
+"""
+Preference Auto-Extraction
+Fills the preferences chart (Müşteri ve Sipariş Takip Formu) from a Kelebek
+order's lines. Item names are matched against a keyword table compiled into a
+single regex, so each line is scanned once however many keywords there are;
+new accessory keywords are a change to NAME_KEYWORDS only.
+
+Only the columns the rules read are loaded, and the result is cached by a hash
+of those values, so opening the form again for an unchanged order does no
+extraction at all.
+"""
+import hashlib
+import logging
+import re
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from crminaec.core.cache import cache
+from crminaec.core.models import OrderItem, ProjectPreference, db
+
+logger = logging.getLogger(__name__)
+
+CACHE_NAMESPACE = 'order_preferences'
+CACHE_TTL = 3600
+
+cache.set_limit(CACHE_NAMESPACE, 2000)
+
+# ==============================================================================
+# 1. RULE TABLE
+# ==============================================================================
+# (flag, keywords): a line gets the flag when its lower-cased name (ura) contains any keyword
+NAME_KEYWORDS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ('handle', ('kulp',)),
+    ('plinth', ('tamel', 'baza')),
+    ('cutlery', ('kaşıklık', 'kaşıklığı', 'kasiklik')),
+    ('trash', ('çöp', 'cop')),
+    ('mechanism', ('kiler', 'kör köşe', 'mekanizma', 'şişelik', 'siselik', 'fasulye', 'le mans')),
+    ('spot', ('spot',)),
+    ('led', ('led', 'aydınlatma')),
+    ('sensor', ('sensör', 'sensor')),
+    ('counter', ('tezgah',)),
+    ('bluetooth', ('bluetooth',)),
+    ('double', ('çift',)),
+    ('door', ('kapak',)),
+)
+
+# (flag, regex) on the item code (urk): Kelebek handles start with YH, plinths carry M7600
+CODE_PATTERNS: Tuple[Tuple[str, str], ...] = (
+    ('handle', r'^YH'),
+    ('plinth', r'M7600'),
+)
+
+# Fields a rebuild clears before extracting again (manual-only fields included)
+RESET_VALUES: Dict[str, Any] = {
+    'model_name': None, 'body_color': None, 'front_color': None, 'handle_code': None,
+    'cabinet_grouping_notes': None, 'plinth_height': None, 'plinth_material': None,
+    'plinth_color': None, 'cutlery_tray': None, 'trash_bin': None, 'mechanisms': None,
+    'glazed_door_model': None, 'glazed_door_frame_color': None, 'glazing_type': None,
+    'appliance_refrigerator': None, 'appliance_dishwasher': None,
+    'appliance_washing_machine': None, 'appliance_oven_mw': None,
+    'light_cab_spot': False, 'light_cab_led': None, 'light_counter_spot': False,
+    'light_counter_led': False, 'light_bt_led': False, 'sensor_dimmer': False,
+    'sensor_door': False, 'light_control_wall': False, 'light_control_switch': False,
+}
+
+
+def _compile(rules: Iterable[Tuple[str, str]]) -> 're.Pattern[str]':
+    """
+    A lookahead gate over all patterns, then one optional lookahead per flag. The scan only stops
+    where some keyword starts, and there every flag whose pattern matches is captured, so keywords
+    of different flags are all found even when they overlap or start at the same position.
+    """
+    rules = list(rules)
+    gate = '|'.join(pattern for _, pattern in rules)
+    groups = ''.join(f"(?:(?=(?P<{flag}>{pattern})))?" for flag, pattern in rules)
+    return re.compile(f"(?=(?:{gate})){groups}")
+
+
+def _keyword_pattern(keywords: Iterable[str]) -> str:
+    # Longest first, so 'kaşıklığı' is not cut short by 'kaşıklık'
+    return '|'.join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))
+
+
+_NAME_MATCHER = _compile((flag, _keyword_pattern(words)) for flag, words in NAME_KEYWORDS)
+_CODE_MATCHER = _compile(CODE_PATTERNS)
+
+
+def _flags(matcher: 're.Pattern[str]', text: str) -> Set[str]:
+    return {flag for m in matcher.finditer(text) for flag, found in m.groupdict().items() if found is not None}
+
+
+# ==============================================================================
+# 2. EXTRACTION
+# ==============================================================================
+# Only these columns are read, and they are what the cache key is built from
+_COLUMNS = (OrderItem.item_id, OrderItem.urk, OrderItem.ura, OrderItem.oza, OrderItem.ozk,
+            OrderItem.govderna, OrderItem.govdernk, OrderItem.rna, OrderItem.rnk)
+
+
+def _with_code(name: Any, code: Any) -> Any:
+    """'Name (CODE)' from a Kelebek name/code pair; None when the name is empty or '-'."""
+    if not name or name.strip() in ('', '-'):
+        return None
+    code_str = f" ({code.strip()})" if code and code.strip() not in ('', '-') else ""
+    return f"{name.strip()}{code_str}"
+
+
+def extract_from_rows(rows: Iterable[Any]) -> Dict[str, Any]:
+    """
+    Preference values for order lines (anything with the _COLUMNS attributes), in one pass.
+    Text fields keep the first line that matches; lighting and sensor flags add up.
+    """
+    values: Dict[str, Any] = {}
+    mechanisms: List[str] = []
+
+    for row in rows:
+        for field, name, code in (('model_name', row.oza, row.ozk),
+                                  ('body_color', row.govderna, row.govdernk),
+                                  ('front_color', row.rna, row.rnk)):
+            if field not in values:
+                text = _with_code(name, code)
+                if text:
+                    values[field] = text
+
+        urk = str(row.urk) if row.urk else ""
+        flags = _flags(_NAME_MATCHER, (row.ura or "").lower())
+        if urk:
+            flags |= _flags(_CODE_MATCHER, urk)
+        if not flags:
+            continue
+
+        if 'handle' in flags:
+            values.setdefault('handle_code', row.ura)
+        if 'plinth' in flags:
+            values.setdefault('plinth_height', "12cm" if "05" in urk else "15cm")
+        if 'cutlery' in flags:
+            values.setdefault('cutlery_tray', row.ura)
+        if 'trash' in flags:
+            values.setdefault('trash_bin', row.ura)
+        if 'mechanism' in flags:
+            mechanisms.append(row.ura)
+
+        if 'spot' in flags:
+            values['light_counter_spot' if 'counter' in flags else 'light_cab_spot'] = True
+        if 'led' in flags:
+            if 'bluetooth' in flags:
+                values['light_bt_led'] = True
+            elif 'counter' in flags:
+                values['light_counter_led'] = True
+            else:
+                values['light_cab_led'] = "Çift Yan" if 'double' in flags else "Tek Yan"
+        if 'sensor' in flags:
+            values['sensor_door' if 'door' in flags else 'sensor_dimmer'] = True
+
+    if mechanisms:
+        # Deduplicated, in order of appearance
+        values['mechanisms'] = " \n".join(dict.fromkeys(mechanisms))
+    return values
+
+
+def extract_order_preferences(order_id: int) -> Dict[str, Any]:
+    """Extracted preference values for an order; cached per content of its lines."""
+    rows = db.session.execute(
+        db.select(*_COLUMNS).where(OrderItem.order_id == order_id).order_by(OrderItem.item_id)
+    ).all()
+    digest = hashlib.sha1(repr([tuple(row) for row in rows]).encode('utf-8')).hexdigest()
+
+    values = cache.get(CACHE_NAMESPACE, digest)
+    if values is None:
+        values = extract_from_rows(rows)
+        cache.set(CACHE_NAMESPACE, digest, values, CACHE_TTL)
+        logger.debug(f"Preferences extracted for order {order_id} ({len(rows)} lines).")
+    return dict(values)
+
+
+def apply_extracted_preferences(prefs: ProjectPreference, values: Dict[str, Any], reset: bool = False) -> None:
+    """Writes extracted values onto a preferences chart; `reset` clears every field first (rebuild)."""
+    for field, value in ({**RESET_VALUES, **values} if reset else values).items():
+        setattr(prefs, field, value)
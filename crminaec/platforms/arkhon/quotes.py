@@ -0,0 +1,140 @@
+"""
+Quote Totals
+Server-side price computation for quotes. Visible order lines are priced by the
+effective-price rule (core/pricing.order_item_unit_price_expr: the price of the
+line's code effective today, from the supplier of its linked record) and summed
+per ProjectTypology in one grouped query; each typology's per-unit total is
+multiplied by its unit count, then the discount and VAT are applied.
+
+The result is stored on the Quote (list_price, total_amount and the typology
+breakdown in `totals`) and `revision` is bumped on every save, so documents
+rendered from a quote (Google Docs, PDF, public page) all show the same
+numbers and can be cached per revision.
+"""
+import logging
+from datetime import datetime, timezone
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Dict, List, Optional
+
+from crminaec.core.models import (Order, OrderItem, ProjectTypology, Quote,
+                                  db)
+from crminaec.core.pricing import order_item_unit_price_expr
+
+logger = logging.getLogger(__name__)
+
+_CENTS = Decimal('0.01')
+
+
+def _money(value: Any) -> Decimal:
+    return Decimal(str(value or 0)).quantize(_CENTS, rounding=ROUND_HALF_UP)
+
+
+def typology_subtotals(order_id: int, on: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """
+    Per-unit price of every typology of the order (sum of visible lines: unit price x adet),
+    plus a typology_id=None group for lines not assigned to a typology. Lines are priced as of
+    `on` (default: now); lines without any price count as 0.
+    """
+    unit_price = order_item_unit_price_expr(on)
+    line_total = db.func.coalesce(unit_price, 0) * db.func.coalesce(OrderItem.adet, 1)
+    rows = db.session.execute(
+        db.select(OrderItem.typology_id,
+                  db.func.sum(line_total).label('unit_total'),
+                  db.func.count(OrderItem.item_id).label('line_count'),
+                  db.func.count(unit_price).label('priced_count'))
+        .where(OrderItem.order_id == order_id, OrderItem.is_visible_on_quote.is_(True))
+        .group_by(OrderItem.typology_id)
+    ).all()
+    sums = {row.typology_id: row for row in rows}
+
+    typologies = db.session.execute(
+        db.select(ProjectTypology.typology_id, ProjectTypology.name,
+                  ProjectTypology.description, ProjectTypology.quantity)
+        .where(ProjectTypology.order_id == order_id)
+        .order_by(ProjectTypology.typology_id)
+    ).all()
+
+    groups: List[Dict[str, Any]] = []
+    for typo in typologies:
+        row = sums.pop(typo.typology_id, None)
+        groups.append({
+            'typology_id': typo.typology_id,
+            'name': typo.name,
+            'description': typo.description,
+            'quantity': int(typo.quantity or 0),
+            'unit_total': _money(row.unit_total if row else 0),
+            'line_count': row.line_count if row else 0,
+            'priced_count': row.priced_count if row else 0
+        })
+
+    row = sums.pop(None, None)
+    if row is not None:
+        groups.append({
+            'typology_id': None,
+            'name': None,
+            'description': None,
+            'quantity': 1,
+            'unit_total': _money(row.unit_total),
+            'line_count': row.line_count,
+            'priced_count': row.priced_count
+        })
+    return groups
+
+
+def compute_quote_totals(order: Order, discount_amount: Any = 0, tax_rate: Any = 20.0,
+                         manual_list_price: Any = None, on: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    List price, discount, VAT and grand total for the order's current lines, priced as of `on`.
+    `manual_list_price` is only used when no visible line carries a price yet
+    (orders quoted before their ProSAP prices are imported).
+    Amounts are Decimals rounded to 2 places.
+    """
+    groups = typology_subtotals(order.order_id, on=on)
+    for group in groups:
+        group['row_total'] = _money(group['unit_total'] * group['quantity'])
+
+    priced = any(group['priced_count'] for group in groups)
+    list_price = sum((group['row_total'] for group in groups), Decimal('0')) if priced else _money(manual_list_price)
+
+    discount = min(max(_money(discount_amount), Decimal('0')), list_price)
+    rate = Decimal(str(tax_rate or 0))
+    subtotal = list_price - discount
+    tax_amount = _money(subtotal * rate / 100)
+
+    return {
+        'typologies': groups,
+        'is_priced': priced,
+        'list_price': list_price,
+        'discount_amount': discount,
+        'tax_rate': float(rate),
+        'tax_amount': tax_amount,
+        'total_amount': subtotal + tax_amount
+    }
+
+
+def apply_quote_totals(quote: Quote, totals: Dict[str, Any]) -> None:
+    """Stores computed totals on the quote and stamps a new revision. Nothing is committed."""
+    quote.list_price = totals['list_price']
+    quote.discount_amount = totals['discount_amount']
+    quote.tax_rate = totals['tax_rate']
+    quote.total_amount = totals['total_amount']
+    quote.totals = {
+        'is_priced': totals['is_priced'],
+        'tax_amount': str(totals['tax_amount']),
+        'typologies': [
+            {**group, 'unit_total': str(group['unit_total']), 'row_total': str(group['row_total'])}
+            for group in totals['typologies']
+        ]
+    }
+    quote.totals_at = datetime.now(timezone.utc)
+    quote.revision = (quote.revision or 0) + 1
+
+
+def stored_typologies(quote: Quote) -> Optional[List[Dict[str, Any]]]:
+    """The typology breakdown saved with the quote (amounts as Decimals), or None for quotes saved before it existed."""
+    if not quote.totals:
+        return None
+    return [
+        {**group, 'unit_total': Decimal(group['unit_total']), 'row_total': Decimal(group['row_total'])}
+        for group in quote.totals.get('typologies', [])
+    ]
@@ -2,29 +2,67 @@
 Flask Routes for Arkhon Platform (AEC & Kelebek Orders)
 Fully Integrated with crminaec Data-First Architecture
 """
-import csv
-import io
+import hashlib
 import logging
 import os
 import re
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 
-from flask import (Blueprint, abort, current_app, flash, redirect,
-                   render_template, request, url_for)
+from flask import (Blueprint, abort, current_app, flash, jsonify,
+                   make_response, redirect, render_template, request,
+                   send_file, session, url_for)
 from flask_login import current_user, login_required
+from sqlalchemy.orm import selectinload
 from werkzeug.utils import secure_filename
 
-from crminaec.core.interop.manager import Platform, create_interop_manager
-from crminaec.core.models import (CatalogProduct, CustomerIssue, Order,
-                                  OrderAttachment, OrderItem, Party,
-                                  PaymentInstallment, PriceRecord,
-                                  ProjectPreference, Quote, db)
+from crminaec.core.cache import cache, invalidate_on_write
+from crminaec.core.email import queue_email
+from crminaec.core.jobs import save_upload, submit_job
+from crminaec.core.models import (CatalogProduct, CatalogProductWord,
+                                  CustomerIssue, Order, OrderAttachment,
+                                  OrderItem, Party,
+                                  PaymentInstallment, ProjectPreference, Quote,
+                                  db)
+from crminaec.core.parties import find_party, search_parties_stmt
+from crminaec.core.search import prefix_bounds, search_words
 from crminaec.core.security import role_required
-from crminaec.platforms.arkhon.orderparser import KelebekOrderParser
+from crminaec.core.sequences import next_number
+from crminaec.platforms.arkhon import documents
+from crminaec.platforms.arkhon import importers  # noqa: F401 (registers the import job handlers)
+from crminaec.platforms.arkhon.attachments import queue_attachment_variants
+from crminaec.platforms.arkhon.preferences import (apply_extracted_preferences,
+                                                   extract_order_preferences)
+from crminaec.platforms.arkhon.quotes import (apply_quote_totals,
+                                              compute_quote_totals)
+from crminaec.platforms.arkhon.timeline import DEFAULT_PAGE_SIZE, fetch_timeline
+from crminaec.platforms.emek.reservations import sync_order_reservations
 
 arkhon_bp = Blueprint('arkhon', __name__)
 logger = logging.getLogger(__name__)
 
+# Dashboard counters are dropped as soon as any order or order line is written
+invalidate_on_write('arkhon_dashboard', [Order, OrderItem])
+invalidate_on_write('catalog_search', [CatalogProduct, CatalogProductWord])
+# Rendered public quote pages: anything shown on them (quote, approval, lines, preferences, plan)
+invalidate_on_write('public_quote', [Quote, Order, OrderItem, ProjectPreference, PaymentInstallment])
+PUBLIC_QUOTE_TTL = 3600
+
+
+def _sync_stock_reservations(order_id):
+    """Keeps EMEK stock reservations in step with an order's lines and dates. Never blocks the order flow."""
+    try:
+        sync_order_reservations([order_id])
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Stock reservation sync failed for order {order_id}: {e}")
+
+
+def _submit_upload_job(kind, file, payload, return_url):
+    """Stores the upload on disk and queues a background job for it. Returns the job_id."""
+    path = save_upload(file)
+    return submit_job(kind, {**payload, 'path': path}, uploads=[path],
+                      created_by=current_user.party_id, return_url=return_url)
+
 # ==============================================================================
 # 🚀 LEAD MANAGEMENT & PRE-SALES WORKFLOW
 # ==============================================================================
@@ -50,19 +88,20 @@ def create_lead():
         except ValueError:
             pass
     
+    # Numbers are allocated before anything is written (their reservation runs on its own connection)
+    order_number = next_number('lead')
+
     party = None
     if party_id:
         party = db.session.get(Party, party_id)
         
-    # Reliable Tracking: Fallback to find Party by email OR phone couple
-    if not party and email:
-        party = db.session.scalar(db.select(Party).filter_by(email=email))
-    if not party and phone:
-        party = db.session.scalar(db.select(Party).filter_by(phone=phone))
+    # Reliable Tracking: Fallback to find Party by email OR phone (normalised, indexed)
+    if not party:
+        party = find_party(email=email, phone=phone)
         
     if not party:
         party = Party(**{
-            'email': email if email else f"lead_{datetime.now().strftime('%Y%m%d%H%M')}@crminaec.local",
+            'email': email if email else next_number('lead_email'),
             'first_name': first_name,
             'last_name': last_name,
             'phone': phone,
@@ -77,7 +116,6 @@ def create_lead():
         if not party.first_name and first_name: party.first_name = first_name
         if not party.last_name and last_name: party.last_name = last_name
         
-    order_number = f"LD-{datetime.now().strftime('%Y%m%d-%H%M')}"
     new_order = Order(**{
         'order_number': order_number,
         'party_id': party.party_id,
@@ -102,23 +140,14 @@ def send_kvkk_link(order_id):
         flash("Müşterinin geçerli bir e-posta adresi bulunmuyor.", "warning")
         return redirect(url_for('arkhon.order_detail', order_id=order.order_id))
         
-    try:
-        from flask_mail import Message
-
-        from crminaec import mail
-        
-        reg_url = url_for('auth.register', _external=True)
-        msg = Message(
-            subject="Arkhon Mimarlık - Portal Kaydı ve KVKK Onayı",
-            recipients=[order.party.email],
-            body=f"Merhaba {order.party.first_name or ''},\n\nMağazamızı ziyaret ettiğiniz için teşekkür ederiz. Arkhon Mimarlık portalına kayıt olmak ve KVKK aydınlatma metnini onaylamak için aşağıdaki bağlantıya tıklayabilirsiniz:\n\n{reg_url}\n\nSaygılarımızla,\nArkhon Mimarlık"
-        )
-        sender = current_app.config.get('MAIL_DEFAULT_SENDER')
-        if sender: msg.sender = sender
-        mail.send(msg)
-        flash("KVKK ve Kayıt linki müşteriye başarıyla gönderildi.", "success")
-    except Exception as e:
-        flash(f"E-posta gönderilemedi: {e}", "danger")
+    reg_url = url_for('auth.register', _external=True)
+    queue_email(
+        [order.party.email],
+        subject="Arkhon Mimarlık - Portal Kaydı ve KVKK Onayı",
+        body=f"Merhaba {order.party.first_name or ''},\n\nMağazamızı ziyaret ettiğiniz için teşekkür ederiz. Arkhon Mimarlık portalına kayıt olmak ve KVKK aydınlatma metnini onaylamak için aşağıdaki bağlantıya tıklayabilirsiniz:\n\n{reg_url}\n\nSaygılarımızla,\nArkhon Mimarlık"
+    )
+    db.session.commit()
+    flash("KVKK ve Kayıt linki müşteriye gönderilmek üzere sıraya alındı.", "success")
     return redirect(url_for('arkhon.order_detail', order_id=order.order_id))
 
 @arkhon_bp.route('/order/<int:order_id>/log_info_docs', methods=['POST'])
@@ -181,6 +210,8 @@ def upload_order_attachment(order_id):
     }) # type: ignore
     order.attachments.append(new_attachment)
     db.session.commit()
+    # Web-sized copy and thumbnail are rendered in the background
+    queue_attachment_variants([new_attachment], created_by=current_user.party_id)
     
     flash(f"Dosya yüklendi ve otomatik olarak {semantic_filename} adını aldı.", "success")
     return redirect(url_for('arkhon.order_detail', order_id=order.order_id))
@@ -193,141 +224,36 @@ def customer_detail(party_id):
     if current_user.account.role not in ['admin', 'power_user'] and current_user.party_id != party_id:
         abort(403)
         
-    party = db.get_or_404(Party, party_id)
-    
-    # --- TIMELINE AGGREGATION ---
-    events = []
-    for order in party.orders:
-        # 1. Order Creation
-        events.append({
-            'date': order.date,
-            'icon': 'fa-user-clock' if order.status == 'lead' else 'fa-file-import',
-            'title': f"Yeni {'Keşif Talebi' if order.status == 'lead' else 'Proje Başlatıldı'} ({order.order_number})",
-            'desc': f"İlgi Alanı: {order.project_type}",
-            'color': 'primary' if order.status == 'lead' else 'secondary'
-        })
-        
-        # 2. Measurement Appointment
-        if order.measurement_date:
-            events.append({
-                'date': order.measurement_date,
-                'icon': 'fa-ruler-combined',
-                'title': f"Ölçü / Keşif Randevusu ({order.order_number})",
-                'desc': "Saha ziyareti ve ölçüm planlandı.",
-                'color': 'info'
-            })
-            
-        # 3. Informational Documents Sent
-        if order.info_docs_sent_at:
-            events.append({
-                'date': order.info_docs_sent_at,
-                'icon': 'fa-info-circle',
-                'title': f"Bilgilendirme İletildi ({order.order_number})",
-                'desc': "Süreç prosedürleri müşteriye gönderildi.",
-                'color': 'warning'
-            })
-            
-        # 4. Digital Approvals
-        for quote in order.quotes:
-            if quote.approval_date:
-                events.append({
-                    'date': quote.approval_date,
-                    'icon': 'fa-signature',
-                    'title': f"Sözleşme Onaylandı (v{quote.version})",
-                    'desc': f"Kategori: {quote.quote_category} | Dijital IP: {quote.approval_ip or 'Bilinmiyor'}",
-                    'color': 'success'
-                })
-                
-        # 4.5. Post-Sales / Installation Milestones
-        if order.factory_delivery_date:
-            events.append({
-                'date': order.factory_delivery_date,
-                'icon': 'fa-truck',
-                'title': f"Fabrika/Depo Teslimi ({order.order_number})",
-                'desc': "Ürünler üretimden çıkıp depoya ulaştı.",
-                'color': 'info'
-            })
-        if order.installation_appointment_date:
-            events.append({
-                'date': order.installation_appointment_date,
-                'icon': 'fa-calendar-check',
-                'title': f"Montaj Randevusu ({order.order_number})",
-                'desc': "Montaj ekipleri için planlama yapıldı.",
-                'color': 'primary'
-            })
-        if order.kitchen_installation_date:
-            events.append({
-                'date': order.kitchen_installation_date,
-                'icon': 'fa-hammer',
-                'title': f"Mutfak Montajı ({order.order_number})",
-                'desc': "Ana mobilya modüllerinin kurulumu yapıldı.",
-                'color': 'success'
-            })
-        if order.countertop_installation_date:
-            events.append({
-                'date': order.countertop_installation_date,
-                'icon': 'fa-layer-group',
-                'title': f"Tezgah Montajı ({order.order_number})",
-                'desc': "Tezgah ölçümü ve montajı yapıldı.",
-                'color': 'success'
-            })
-        if order.appliance_installation_date:
-            events.append({
-                'date': order.appliance_installation_date,
-                'icon': 'fa-plug',
-                'title': f"Cihaz Montajı ({order.order_number})",
-                'desc': "Ankastre cihazlar ve beyaz eşyalar kuruldu.",
-                'color': 'success'
-            })
-        if order.handover_date:
-            events.append({
-                'date': order.handover_date,
-                'icon': 'fa-key',
-                'title': f"Teslimat ve Devir ({order.order_number})",
-                'desc': "Proje başarıyla müşteriye teslim edildi.",
-                'color': 'success'
-            })
-            
-        # 5. File Uploads
-        for att in order.attachments:
-            events.append({
-                'date': att.upload_date,
-                'icon': 'fa-image' if att.file_type == 'image' else 'fa-file-pdf',
-                'title': f"Dosya Yüklendi: {att.context}",
-                'desc': att.semantic_filename,
-                'color': 'dark'
-            })
-            
-        # 6. Customer Issues & Support
-        for issue in order.issues:
-            events.append({
-                'date': issue.reported_date,
-                'icon': 'fa-exclamation-triangle',
-                'title': f"Müşteri Şikayeti / Talep: {issue.title}",
-                'desc': issue.description,
-                'color': 'danger'
-            })
-            if issue.investigation_date:
-                events.append({
-                    'date': issue.investigation_date,
-                    'icon': 'fa-search',
-                    'title': f"Çözüm İncelemesi: {issue.title}",
-                    'desc': "Teknik ekip/satış temsilcisi konuyu inceliyor.",
-                    'color': 'warning'
-                })
-            if issue.solution_date:
-                events.append({
-                    'date': issue.solution_date,
-                    'icon': 'fa-check-double',
-                    'title': f"Çözüm Teslimi: {issue.title}",
-                    'desc': issue.resolution_notes or "Müşteri sorunu çözüldü.",
-                    'color': 'success'
-                })
-                
-    # Sort events newest to oldest
-    events.sort(key=lambda x: x['date'], reverse=True)
-    
-    return render_template('arkhon/customer_detail.html', party=party, events=events)
+    # Orders and their documents for the tabs in three batched SELECTs instead of one per order
+    party = db.session.scalar(
+        db.select(Party)
+        .filter(Party.party_id == party_id)
+        .options(selectinload(Party.orders).selectinload(Order.quotes),
+                 selectinload(Party.orders).selectinload(Order.attachments),
+                 selectinload(Party.orders).selectinload(Order.issues))
+    )
+    if party is None:
+        abort(404)
+
+    # The timeline tab pages itself in through customer_timeline()
+    timeline = fetch_timeline(party_id)
+    return render_template('arkhon/customer_detail.html', party=party,
+                           events=timeline['events'], next_cursor=timeline['next_cursor'])
+
+@arkhon_bp.route('/customer/<int:party_id>/timeline')
+@login_required
+def customer_timeline(party_id):
+    """JSON page of the Customer 360 timeline, newest first. ?cursor= continues from the previous page."""
+    if current_user.account.role not in ['admin', 'power_user'] and current_user.party_id != party_id:
+        abort(403)
+
+    try:
+        page = fetch_timeline(party_id,
+                              limit=request.args.get('limit', DEFAULT_PAGE_SIZE, type=int),
+                              cursor=request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(page)
 
 @arkhon_bp.route('/order/<int:order_id>/update_milestones', methods=['POST'])
 @login_required
@@ -353,71 +279,82 @@ def update_milestones(order_id):
     order.countertop_installation_date = parse_dt(request.form.get('countertop_installation_date'))
     order.appliance_installation_date = parse_dt(request.form.get('appliance_installation_date'))
     order.handover_date = parse_dt(request.form.get('handover_date'))
-    
-    db.session.commit()
-    
-    # --- AUTOMATED EMAIL NOTIFICATION SYSTEM ---
-    notifications_sent = 0
+
+    # --- AUTOMATED EMAIL NOTIFICATION SYSTEM (queued with the dates, sent by the outbox) ---
+    notification_queued = False
     if order.party and order.party.email and '@crminaec.local' not in order.party.email:
-        try:
-            from flask_mail import Message
+        messages_to_send = []
+
+        factory_date = order.factory_delivery_date
+        if factory_date and factory_date != old_factory:
+            date_str = factory_date.strftime('%d.%m.%Y')
+            messages_to_send.append(f"Ürünlerinizin fabrikadan depomuza tahmini varış tarihi {date_str} olarak güncellenmiştir.")
+
+        appt_date = order.installation_appointment_date
+        if appt_date and appt_date != old_appointment:
+            date_str = appt_date.strftime('%d.%m.%Y %H:%M')
+            messages_to_send.append(f"Montaj keşif/randevu tarihiniz {date_str} olarak belirlenmiştir.")
+
+        kitchen_date = order.kitchen_installation_date
+        if kitchen_date and kitchen_date != old_kitchen:
+            date_str = kitchen_date.strftime('%d.%m.%Y %H:%M')
+            messages_to_send.append(f"Mutfak montaj tarihiniz {date_str} olarak planlanmıştır.")
+
+        if messages_to_send:
+            body = "\n".join([
+                f"Merhaba {order.party.first_name or ''},\n",
+                f"Projenizle ({order.order_number}) ilgili takvim güncellemeleri aşağıdadır:\n",
+                *(f"- {msg}" for msg in messages_to_send),
+                "\nSürecin detaylarını Arkhon portalı üzerinden takip edebilirsiniz.\n",
+                "Saygılarımızla,\nArkhon Mimarlık"
+            ])
+            queue_email(
+                [order.party.email],
+                subject=f"Arkhon Mimarlık - Proje Takvimi Güncellemesi ({order.order_number})",
+                body=body
+            )
+            notification_queued = True
 
-            from crminaec import mail
-            
-            messages_to_send = []
-            
-            factory_date = order.factory_delivery_date
-            if factory_date and factory_date != old_factory:
-                date_str = factory_date.strftime('%d.%m.%Y')
-                messages_to_send.append(f"Ürünlerinizin fabrikadan depomuza tahmini varış tarihi {date_str} olarak güncellenmiştir.")
-                
-            appt_date = order.installation_appointment_date
-            if appt_date and appt_date != old_appointment:
-                date_str = appt_date.strftime('%d.%m.%Y %H:%M')
-                messages_to_send.append(f"Montaj keşif/randevu tarihiniz {date_str} olarak belirlenmiştir.")
-                
-            kitchen_date = order.kitchen_installation_date
-            if kitchen_date and kitchen_date != old_kitchen:
-                date_str = kitchen_date.strftime('%d.%m.%Y %H:%M')
-                messages_to_send.append(f"Mutfak montaj tarihiniz {date_str} olarak planlanmıştır.")
-                
-            if messages_to_send:
-                body = f"Merhaba {order.party.first_name or ''},\n\nProjenizle ({order.order_number}) ilgili takvim güncellemeleri aşağıdadır:\n\n"
-                for msg in messages_to_send:
-                    body += f"- {msg}\n"
-                body += "\nSürecin detaylarını Arkhon portalı üzerinden takip edebilirsiniz.\n\nSaygılarımızla,\nArkhon Mimarlık"
-                
-                email_msg = Message(
-                    subject=f"Arkhon Mimarlık - Proje Takvimi Güncellemesi ({order.order_number})",
-                    recipients=[order.party.email],
-                    body=body
-                )
-                sender = current_app.config.get('MAIL_DEFAULT_SENDER')
-                if sender: email_msg.sender = sender
-                mail.send(email_msg)
-                notifications_sent += 1
-        except Exception as e:
-            logger.error(f"Milestone notification failed: {e}")
-            flash(f"Tarihler güncellendi ancak e-posta bildirimi gönderilemedi (E-posta sunucusu hatası).", "warning")
-            return redirect(url_for('arkhon.order_detail', order_id=order.order_id))
+    db.session.commit()
+    _sync_stock_reservations(order.order_id)
 
-    if notifications_sent > 0:
-        flash("Montaj tarihleri güncellendi ve müşteriye e-posta ile bildirildi.", "success")
+    if notification_queued:
+        flash("Montaj tarihleri güncellendi; müşteriye e-posta bildirimi gönderilecek.", "success")
     else:
         flash("Montaj ve teslimat tarihleri güncellendi.", "success")
-        
+
     return redirect(url_for('arkhon.order_detail', order_id=order.order_id))
 
 # ==============================================================================
 # 🏢 ARKHON DASHBOARD
 # ==============================================================================
 
+def _dashboard_stats(party_id, show_archived):
+    """Order / item counters for one dashboard scope (party_id=None means all orders). Cached briefly."""
+    def compute():
+        order_filter = [Order.is_deleted.is_not(True)]
+        if not show_archived:
+            order_filter.append(Order.is_archived.is_not(True))
+        if party_id is not None:
+            order_filter.append(Order.party_id == party_id)
+
+        total_orders = db.session.scalar(db.select(db.func.count(Order.order_id)).filter(*order_filter)) or 0
+        if party_id is not None:
+            total_items = db.session.scalar(db.select(db.func.count(OrderItem.item_id)).join(Order).filter(Order.party_id == party_id)) or 0
+        else:
+            total_items = db.session.scalar(db.select(db.func.count(OrderItem.item_id))) or 0
+        return {'total_orders': total_orders, 'total_items': total_items}
+
+    return cache.get_or_set('arkhon_dashboard', (party_id, show_archived), compute,
+                            ttl=current_app.config.get('DASHBOARD_CACHE_TTL', 60))
+
 @arkhon_bp.route('/')
 @login_required
 def index():
     """Arkhon Dashboard / Order Overview"""
     try:
         show_archived = request.args.get('show_archived', '0') == '1'
+        is_staff = current_user.account.role in ['admin', 'power_user']
         query = db.select(Order)
         
         # Hide soft-deleted orders from the main dashboard
@@ -426,31 +363,87 @@ def index():
             query = query.filter(Order.is_archived.is_not(True))
         
         # DATA SEGREGATION: Customers only see their own orders
-        if current_user.account.role not in ['admin', 'power_user']:
+        if not is_staff:
             query = query.filter(Order.party_id == current_user.party_id)
             
         recent_orders = db.session.scalars(query.order_by(Order.order_id.desc()).limit(10)).all()
-        total_orders = db.session.scalar(db.select(db.func.count()).select_from(query.subquery())) or 0
-        
-        if current_user.account.role not in ['admin', 'power_user']:
-            total_items = db.session.scalar(db.select(db.func.count(OrderItem.item_id)).join(Order).filter(Order.party_id == current_user.party_id)) or 0
-        else:
-            total_items = db.session.scalar(db.select(db.func.count(OrderItem.item_id))) or 0
-        
-        stats = {
-            'total_orders': total_orders,
-            'total_items': total_items
-        }
+        stats = _dashboard_stats(None if is_staff else current_user.party_id, show_archived)
         
-        parties = []
-        if current_user.account.role in ['admin', 'power_user']:
-            parties = db.session.scalars(db.select(Party).order_by(Party.first_name)).all()
-        
-        return render_template('arkhon/arkhon_dashboard.html', orders=recent_orders, stats=stats, parties=parties)
+        # The customer picker is filled on demand by party_search()
+        return render_template('arkhon/arkhon_dashboard.html', orders=recent_orders, stats=stats)
     except Exception as e:
         logger.error(f"Dashboard load error: {e}")
         flash("Could not load dashboard data.", "error")
-        return render_template('arkhon/arkhon_dashboard.html', orders=[], stats={}, parties=[])
+        return render_template('arkhon/arkhon_dashboard.html', orders=[], stats={})
+
+@arkhon_bp.route('/api/parties/search')
+@login_required
+@role_required('admin', 'power_user')
+def party_search():
+    """
+    Typeahead for customer pickers (Select2 AJAX format).
+    Prefix match on the indexed folded name / email / phone keys, capped at 20 rows.
+    """
+    term = (request.args.get('q') or '').strip()
+    if len(term) < 2:
+        return jsonify({'results': []})
+
+    parties = db.session.execute(search_parties_stmt(term)).all()
+
+    return jsonify({'results': [{
+        'id': p.party_id,
+        'text': f"{p.first_name or ''} {p.last_name or ''} | {p.email} | {p.phone or 'Tel Yok'}"
+    } for p in parties]})
+
+CATALOG_PAGE_SIZE = 30
+
+def catalog_search_stmt(term, category=''):
+    """Products whose code / brand / name words start with every search word (index ranges, no ilike scan)."""
+    query = db.select(CatalogProduct.product_id, CatalogProduct.category, CatalogProduct.brand,
+                      CatalogProduct.product_code, CatalogProduct.product_name)
+    if category:
+        query = query.filter(CatalogProduct.category == category)
+    for word in search_words(term)[:5]:
+        low, high = prefix_bounds(word)
+        query = query.filter(CatalogProduct.product_id.in_(
+            db.select(CatalogProductWord.product_id)
+            .where(CatalogProductWord.word >= low, CatalogProductWord.word < high)
+        ))
+    return query.order_by(CatalogProduct.brand, CatalogProduct.product_name, CatalogProduct.product_id)
+
+@arkhon_bp.route('/api/catalog/search')
+@login_required
+@role_required('admin', 'power_user')
+def catalog_search():
+    """
+    Paginated typeahead over CatalogProduct (Select2 AJAX format).
+    Every search word must prefix-match a word of the code, brand or name (catalog_product_words
+    index ranges, see core/search.py). ?category= narrows first.
+    """
+    term = (request.args.get('q') or '').strip()
+    category = (request.args.get('category') or '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+
+    def compute():
+        rows = db.session.execute(
+            catalog_search_stmt(term, category)
+            .offset((page - 1) * CATALOG_PAGE_SIZE)
+            .limit(CATALOG_PAGE_SIZE + 1)
+        ).all()
+        return {
+            'results': [{
+                'id': r.product_id,
+                'text': f"[{r.category}] {r.brand} - {r.product_name}",
+                'code': r.product_code
+            } for r in rows[:CATALOG_PAGE_SIZE]],
+            'pagination': {'more': len(rows) > CATALOG_PAGE_SIZE}
+        }
+
+    payload = cache.get_or_set('catalog_search', (tuple(search_words(term)[:5]), category, page), compute,
+                               ttl=current_app.config.get('CATALOG_SEARCH_CACHE_TTL', 300))
+    response = jsonify(payload)
+    response.headers['Cache-Control'] = 'private, max-age=60'
+    return response
 
 @arkhon_bp.route('/order/<int:order_id>')
 @login_required
@@ -462,15 +455,8 @@ def order_detail(order_id):
     if current_user.account.role not in ['admin', 'power_user'] and order.party_id != current_user.party_id:
         abort(403)
         
-    # Fetch catalog items to populate the Add Appliance dropdown in the UI
-    catalog_items = db.session.scalars(db.select(CatalogProduct)).all()
-    
-    # Fetch parties to populate the "Assign Customer" dropdown
-    parties = []
-    if current_user.account.role in ['admin', 'power_user']:
-        parties = db.session.scalars(db.select(Party).order_by(Party.first_name)).all()
-        
-    return render_template('arkhon/order_detail.html', order=order, items=order.items, catalog_items=catalog_items, parties=parties)
+    # The "Add Appliance" and "Assign Customer" pickers search through catalog_search() / party_search()
+    return render_template('arkhon/order_detail.html', order=order, items=order.items)
 
 
 @arkhon_bp.route('/order/<int:order_id>/delete', methods=['POST'])
@@ -577,59 +563,11 @@ def import_kelebek_order():
         return redirect(request.url)
         
     try:
-        html_content = file.read().decode('utf-8', errors='ignore')
-        parsed_data = KelebekOrderParser.parse_html(html_content)
-        
-        # Handle dictionary structure
-        parsed_items = parsed_data.get('items', [])
-        cust_info = parsed_data.get('customer', {})
-
-        if not parsed_items:
-            flash('No valid products found in the uploaded HTML file. Is it a valid Kelebek export?', 'warning')
-            return redirect(request.url)
-            
-        base_filename = os.path.splitext(secure_filename(file.filename))[0]
-        timestamp = datetime.now().strftime("%Y%m%d-%H%M")
-        generated_order_number = f"{base_filename}-{timestamp}"
-        
-        # Only pass valid Order fields to constructor
-        new_order = Order(**{'order_number': generated_order_number})
-        
-        for item_data in parsed_items:
-            safe_data = {k: v for k, v in item_data.items() if hasattr(OrderItem, k)}
-            order_item = OrderItem(**safe_data)
-            new_order.items.append(order_item)
-            
-        # --- AUTO-LINK CUSTOMER PARTY ---
-        email = cust_info.get('email', '')
-        first_name = cust_info.get('first_name', '')
-        last_name = cust_info.get('last_name', '')
-        
-        if email or first_name or last_name:
-            party = db.session.scalar(db.select(Party).filter_by(email=email)) if email else None
-            if not party:
-                party = Party(**{
-                    'email': email if email else f"temp_{timestamp}@crminaec.local",
-                    'first_name': first_name,
-                    'last_name': last_name
-                })
-                db.session.add(party)
-                db.session.flush()
-            
-            # Attach phone and address if model supports it
-            if hasattr(party, 'phone') and cust_info.get('phone'):
-                party.phone = cust_info.get('phone')
-            if hasattr(party, 'address') and cust_info.get('address'):
-                party.address = cust_info.get('address')
-                
-            new_order.party_id = party.party_id
-            new_order.party = party
-
-        db.session.add(new_order)
-        db.session.commit()
-        
-        flash(f'Successfully imported order #{new_order.order_number} with {len(parsed_items)} items!', 'success')
-        return redirect(url_for('arkhon.order_detail', order_id=new_order.order_id))
+        # Parsing and writing run as a background job; the browser follows its progress page
+        job_id = _submit_upload_job('kelebek_order_import', file,
+                                    {'filename': secure_filename(file.filename)},
+                                    return_url=url_for('arkhon.import_kelebek_order'))
+        return redirect(url_for('main.job_progress', job_id=job_id))
         
     except Exception as e:
         db.session.rollback()
@@ -659,20 +597,10 @@ def import_kelebek_for_order(order_id):
         return redirect(url_for('arkhon.order_detail', order_id=order.order_id))
         
     try:
-        html_content = file.read().decode('utf-8', errors='ignore')
-        parsed_data = KelebekOrderParser.parse_html(html_content)
-        parsed_items = parsed_data.get('items', [])
-
-        if not parsed_items:
-            flash('Yüklenen HTML dosyasında geçerli ürün bulunamadı.', 'warning')
-            return redirect(url_for('arkhon.order_detail', order_id=order.order_id))
-            
-        for item_data in parsed_items:
-            safe_data = {k: v for k, v in item_data.items() if hasattr(OrderItem, k)}
-            order.items.append(OrderItem(**safe_data))
-
-        db.session.commit()
-        flash(f'Başarıyla {len(parsed_items)} adet ürün {order.order_number} siparişine eklendi!', 'success')
+        return_url = url_for('arkhon.order_detail', order_id=order.order_id)
+        job_id = _submit_upload_job('kelebek_order_append', file, {'order_id': order.order_id},
+                                    return_url=return_url)
+        return redirect(url_for('main.job_progress', job_id=job_id))
         
     except Exception as e:
         db.session.rollback()
@@ -747,45 +675,10 @@ def import_prosap_csv(order_id):
         return redirect(url_for('arkhon.order_detail', order_id=order.order_id))
 
     try:
-        # 1. Read the CSV File (Decoding it to string)
-        stream = io.StringIO(file.stream.read().decode("UTF8"), newline=None)
-        
-        # NOTE: Adjust delimiter to ';' if ProSAP uses semicolons for Turkish Excel formatting!
-        csv_input = csv.DictReader(stream, delimiter=',') 
-        
-        # 2. Convert CSV rows into a fast lookup dictionary: { 'URK_CODE': 12500.00 }
-        # You will need to change 'Ünite Kodu' and 'Fiyat' to match the exact column headers in the ProSAP CSV
-        prosap_prices = {}
-        for row in csv_input:
-            unit_code = row.get('Ünite Kodu', '').strip()
-            raw_price = row.get('Fiyat', '0').replace('.', '').replace(',', '.') # Handle Turkish number format
-            
-            if unit_code:
-                prosap_prices[unit_code] = float(raw_price)
-
-        # 3. Match and Update the Database
-        updated_count = 0
-        for item in order.items:
-            # If the item has a code AND it exists in our CSV lookup
-            if item.urk and item.urk in prosap_prices:
-                new_price_val = prosap_prices[item.urk]
-                
-                # Create a new historical PriceRecord
-                new_price_record = PriceRecord(**{
-                    'entity_code': item.urk or "BİLİNMEYEN",
-                    'supplier': "Kelebek (ProSAP)",
-                    'price_type': "cost",
-                    'base_material_cost': new_price_val,
-                    'final_unit_price': new_price_val 
-                })
-                db.session.add(new_price_record)
-                
-                # Link the item to this new price record
-                item.price_record = new_price_record
-                updated_count += 1
-
-        db.session.commit()
-        flash(f'{updated_count} kalemin fiyatı ProSAP CSV dosyasından başarıyla güncellendi!', 'success')
+        return_url = url_for('arkhon.order_detail', order_id=order.order_id)
+        job_id = _submit_upload_job('prosap_price_import', file, {'order_id': order.order_id},
+                                    return_url=return_url)
+        return redirect(url_for('main.job_progress', job_id=job_id))
         
     except Exception as e:
         db.session.rollback()
@@ -821,6 +714,7 @@ def add_catalog_item(order_id):
             })
             order.items.append(new_item)
             db.session.commit()
+            _sync_stock_reservations(order.order_id)
             flash(f'Added {product.product_name} to the order.', 'success')
         else:
             flash('Product not found in catalog.', 'danger')
@@ -857,10 +751,13 @@ def build_quote(order_id):
                 item.is_visible_on_quote = is_visible
                 item.category = category
 
-            list_price = float(request.form.get('list_price', 0))
-            discount = float(request.form.get('discount_amount', 0))
-            tax_rate = float(request.form.get('tax_rate', 20.0))
-            total_amount = float(request.form.get('total_amount', 0))
+            # Totals are computed here from the priced lines; the browser's figures are only a preview
+            totals = compute_quote_totals(
+                order,
+                discount_amount=request.form.get('discount_amount') or 0,
+                tax_rate=request.form.get('tax_rate') or 20.0,
+                manual_list_price=request.form.get('list_price') or 0
+            )
             validity_days = int(request.form.get('validity_days', 15))
             payment_terms = request.form.get('payment_terms', '')
             delivery_place = request.form.get('delivery_place', '')
@@ -868,10 +765,6 @@ def build_quote(order_id):
 
             if is_edit_mode and quote_to_load:
                 # Update existing quote in place
-                quote_to_load.list_price = list_price
-                quote_to_load.discount_amount = discount
-                quote_to_load.tax_rate = tax_rate
-                quote_to_load.total_amount = total_amount
                 quote_to_load.validity_days = validity_days
                 quote_to_load.payment_terms = payment_terms
                 quote_to_load.delivery_place = delivery_place
@@ -890,10 +783,6 @@ def build_quote(order_id):
 
                 target_quote = Quote(**{
                     'version': next_version,
-                    'list_price': list_price,
-                    'discount_amount': discount,
-                    'tax_rate': tax_rate,
-                    'total_amount': total_amount,
                     'validity_days': validity_days,
                     'payment_terms': payment_terms,
                     'delivery_place': delivery_place,
@@ -901,6 +790,8 @@ def build_quote(order_id):
                 })
                 order.quotes.append(target_quote)
                 flash_msg = f'Teklif Versiyon {next_version} başarıyla oluşturuldu!'
+
+            apply_quote_totals(target_quote, totals)
             
             # ==========================================
             # 🛑 NEW: PROCESS DYNAMIC PAYMENT INSTALLMENTS
@@ -933,7 +824,9 @@ def build_quote(order_id):
             db.session.rollback()
             flash(f'Teklif oluşturulurken hata: {str(e)}', 'danger')
 
-    return render_template('arkhon/quote_builder.html', order=order, source_quote=quote_to_load, is_edit_mode=is_edit_mode)
+    totals = compute_quote_totals(order)
+    return render_template('arkhon/quote_builder.html', order=order, source_quote=quote_to_load, is_edit_mode=is_edit_mode,
+                           computed_totals=totals)
 
 @arkhon_bp.route('/quote/<int:quote_id>/archive', methods=['POST'])
 @login_required
@@ -962,29 +855,15 @@ def email_quote(quote_id):
         flash("Müşterinin e-posta adresi kayıtlı değil. Lütfen 'Tercihler' kısmından ekleyin.", "warning")
         return redirect(url_for('arkhon.order_detail', order_id=order.order_id))
         
-    try:
-        from flask_mail import Message
-
-        from crminaec import mail
-        
-        portal_url = url_for('arkhon.public_quote', access_token=quote.access_token, _external=True)
-        customer_name = order.party.first_name or "Değerli Müşterimiz"
-        
-        msg = Message(
-            subject=f"Arkhon Mimarlık - {quote.quote_category} Teklifiniz (v{quote.version})",
-            recipients=[order.party.email],
-            body=f"Merhaba {customer_name},\n\n{quote.quote_category} teklifinizi (Versiyon {quote.version}) incelemek ve dijital olarak onaylamak için aşağıdaki bağlantıya tıklayabilirsiniz:\n\n{portal_url}\n\nSaygılarımızla,\nArkhon Mimarlık",
-        )
-        sender = current_app.config.get('MAIL_DEFAULT_SENDER')
-        if sender:
-            msg.sender = sender
-            
-        mail.send(msg)
-        flash(f"Teklif bağlantısı başarıyla {order.party.email} adresine gönderildi.", "success")
-    except Exception as e:
-        logger.error(f"Email sending failed: {e}")
-        flash(f"E-posta gönderilirken bir hata oluştu: {str(e)}", "danger")
-        
+    portal_url = url_for('arkhon.public_quote', access_token=quote.access_token, _external=True)
+    customer_name = order.party.first_name or "Değerli Müşterimiz"
+    queue_email(
+        [order.party.email],
+        subject=f"Arkhon Mimarlık - {quote.quote_category} Teklifiniz (v{quote.version})",
+        body=f"Merhaba {customer_name},\n\n{quote.quote_category} teklifinizi (Versiyon {quote.version}) incelemek ve dijital olarak onaylamak için aşağıdaki bağlantıya tıklayabilirsiniz:\n\n{portal_url}\n\nSaygılarımızla,\nArkhon Mimarlık"
+    )
+    db.session.commit()
+    flash(f"Teklif bağlantısı {order.party.email} adresine gönderilmek üzere sıraya alındı.", "success")
     return redirect(url_for('arkhon.order_detail', order_id=order.order_id))
 
 @arkhon_bp.route('/order/<int:order_id>/ghost_summary')
@@ -995,6 +874,59 @@ def ghost_summary(order_id):
     order = db.get_or_404(Order, order_id)
     return render_template('arkhon/ghost_summary.html', order=order, current_date=datetime.now().strftime('%Y-%m-%d'))
 
+@arkhon_bp.route('/order/<int:order_id>/ghost_summary.pdf')
+@login_required
+@role_required('admin', 'power_user')
+def ghost_summary_pdf(order_id):
+    """The ghost summary as a locally rendered PDF."""
+    order = db.get_or_404(Order, order_id)
+    path = documents.ghost_summary_pdf(order)
+    return send_file(path, mimetype='application/pdf', download_name=f"Ozet_{order.order_number}.pdf")
+
+# ==============================================================================
+# 📄 LOCAL QUOTE PDFs (No Google round trip)
+# ==============================================================================
+@arkhon_bp.route('/quote/<int:quote_id>/pdf')
+@login_required
+@role_required('admin', 'power_user')
+def quote_pdf(quote_id):
+    """Downloads the quote contract as PDF, rendered once per quote revision."""
+    quote = db.get_or_404(Quote, quote_id)
+    try:
+        path = documents.quote_pdf(quote)
+    except Exception as e:
+        logger.error(f"Quote PDF failed for quote {quote_id}: {e}")
+        flash(f'PDF oluşturulurken bir hata oluştu: {str(e)}', 'danger')
+        return redirect(url_for('arkhon.order_detail', order_id=quote.order_id))
+    return send_file(path, mimetype='application/pdf',
+                     download_name=f"Teklif_{quote.order.order_number}_V{quote.version}.pdf")
+
+@arkhon_bp.route('/quotes/pdf/batch', methods=['POST'])
+@login_required
+@role_required('admin', 'power_user')
+def quote_pdf_batch():
+    """Queues PDF rendering for every quote approved in a month (default: this month)."""
+    month = request.form.get('month') or datetime.now().strftime('%Y-%m')
+    try:
+        start = datetime.strptime(month, '%Y-%m')
+    except ValueError:
+        flash('Geçersiz ay (YYYY-AA bekleniyor).', 'danger')
+        return redirect(url_for('arkhon.index'))
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+
+    quote_ids = db.session.scalars(
+        db.select(Quote.quote_id)
+        .where(Quote.status == 'approved', Quote.approval_date >= start, Quote.approval_date < end)
+        .order_by(Quote.quote_id)
+    ).all()
+    if not quote_ids:
+        flash(f'{month} ayında onaylanmış teklif bulunamadı.', 'info')
+        return redirect(url_for('arkhon.index'))
+
+    job_id = submit_job('quote_pdf_batch', {'quote_ids': list(quote_ids)}, created_by=current_user.party_id,
+                        return_url=url_for('arkhon.index'))
+    return redirect(url_for('main.job_progress', job_id=job_id))
+
 
 @arkhon_bp.route('/customer/<int:party_id>/issue/new', methods=['POST'])
 @login_required
@@ -1013,6 +945,7 @@ def create_issue(party_id):
     if order and order.party_id == party_id:
         new_issue = CustomerIssue(**{'title': title, 'description': description})
         order.issues.append(new_issue)
+        new_attachment = None
         
         # --- HANDLE OPTIONAL FILE ATTACHMENT ---
         if 'issue_file' in request.files and request.files['issue_file'].filename:
@@ -1054,6 +987,8 @@ def create_issue(party_id):
             order.attachments.append(new_attachment)
             
         db.session.commit()
+        if new_attachment:
+            queue_attachment_variants([new_attachment], created_by=current_user.party_id)
         flash("Yeni destek talebi başarıyla oluşturuldu.", "success")
         
     return redirect(url_for('arkhon.customer_detail', party_id=party_id))
@@ -1086,17 +1021,53 @@ def update_issue(issue_id):
 @arkhon_bp.route('/quote/p/<access_token>', methods=['GET'])
 def public_quote(access_token):
     """The secure, public-facing portal for the client to view their quote."""
+    # A pending flash (e.g. right after approving) is per-visitor: render fresh and don't cache
+    if session.get('_flashes'):
+        html, _ = _render_public_quote(access_token)
+        response = make_response(html)
+        response.cache_control.no_store = True
+        return response
+
+    cached = cache.get('public_quote', access_token)
+    if cached is None:
+        cached = _render_public_quote(access_token)
+        cache.set('public_quote', access_token, cached, PUBLIC_QUOTE_TTL)
+    html, etag = cached
+
+    response = make_response(html)
+    response.set_etag(etag)
+    # Browsers keep the page but revalidate every view, so approvals and edits show up at once
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+def _render_public_quote(access_token):
+    """Renders the public quote page. Returns (html, etag); the ETag carries the quote revision."""
     quote = db.first_or_404(db.select(Quote).filter_by(access_token=access_token))
     order = quote.order
     
-    visible_items = [item for item in order.items if item.is_visible_on_quote]
+    visible_items = db.session.scalars(
+        db.select(OrderItem)
+        .where(OrderItem.order_id == order.order_id, OrderItem.is_visible_on_quote.is_(True))
+        .order_by(OrderItem.item_id)
+    ).all()
     
-    return render_template(
+    html = render_template(
         'arkhon/public_quote.html', 
         quote=quote, 
         order=order, 
         visible_items=visible_items
     )
+    digest = hashlib.sha1(html.encode('utf-8')).hexdigest()[:16]
+    return html, f"q{quote.quote_id}-r{quote.revision}-{digest}"
+
+@arkhon_bp.route('/quote/p/<access_token>/pdf', methods=['GET'])
+def public_quote_pdf(access_token):
+    """The client's copy of the quote (and, once approved, the signed contract) as PDF."""
+    quote = db.first_or_404(db.select(Quote).filter_by(access_token=access_token))
+    path = documents.quote_pdf(quote)
+    return send_file(path, mimetype='application/pdf',
+                     download_name=f"Teklif_{quote.order.order_number}_V{quote.version}.pdf")
 
 @arkhon_bp.route('/quote/p/<access_token>/approve', methods=['POST'])
 def approve_quote(access_token):
@@ -1138,114 +1109,15 @@ def order_preferences(order_id):
     if current_user.account.role not in ['admin', 'power_user'] and order.party_id != current_user.party_id:
         abort(403)
         
-    # 1. AUTO-EXTRACTION ENGINE (Runs if preferences don't exist, OR if user forces a rebuild)
-    rebuild = request.args.get('rebuild', type=int) == 1
-    
-    if not order.preferences or rebuild:
-        prefs = order.preferences if order.preferences else ProjectPreference()
-        
-        if rebuild:
-            prefs.model_name = None
-            prefs.body_color = None
-            prefs.front_color = None
-            prefs.handle_code = None
-            prefs.cabinet_grouping_notes = None
-            prefs.plinth_height = None
-            prefs.plinth_material = None
-            prefs.plinth_color = None
-            prefs.cutlery_tray = None
-            prefs.trash_bin = None
-            prefs.mechanisms = None
-            prefs.glazed_door_model = None
-            prefs.glazed_door_frame_color = None
-            prefs.glazing_type = None
-            prefs.appliance_refrigerator = None
-            prefs.appliance_dishwasher = None
-            prefs.appliance_washing_machine = None
-            prefs.appliance_oven_mw = None
-            
-            prefs.light_cab_spot = False
-            prefs.light_cab_led = None
-            prefs.light_counter_spot = False
-            prefs.light_counter_led = False
-            prefs.light_bt_led = False
-            prefs.sensor_dimmer = False
-            prefs.sensor_door = False
-            prefs.light_control_wall = False
-            prefs.light_control_switch = False
-            
-        mechanisms_list = []
-        
-        for item in order.items:
-            name_lower = (item.ura or "").lower()
-            
-            # Extract Global Model & Colors
-            if not prefs.model_name and hasattr(item, 'oza') and item.oza and item.oza.strip() != "-":
-                code_str = f" ({item.ozk.strip()})" if hasattr(item, 'ozk') and item.ozk and item.ozk.strip() not in ["", "-"] else ""
-                prefs.model_name = f"{item.oza.strip()}{code_str}"
-                
-            if not prefs.body_color and hasattr(item, 'govderna') and item.govderna and item.govderna.strip() != "-":
-                code_str = f" ({item.govdernk.strip()})" if hasattr(item, 'govdernk') and item.govdernk and item.govdernk.strip() not in ["", "-"] else ""
-                prefs.body_color = f"{item.govderna.strip()}{code_str}"
-                
-            if not prefs.front_color and hasattr(item, 'rna') and item.rna and item.rna.strip() != "-":
-                code_str = f" ({item.rnk.strip()})" if hasattr(item, 'rnk') and item.rnk and item.rnk.strip() not in ["", "-"] else ""
-                prefs.front_color = f"{item.rna.strip()}{code_str}"
-                
-            # Extract Handle (Kulp) - Kelebek handles usually start with YH in URK
-            if "kulp" in name_lower or (item.urk and str(item.urk).startswith("YH")):
-                if not prefs.handle_code:
-                    prefs.handle_code = item.ura
-                    
-            # Extract Plinth (Baza/Tamel) - Kelebek plinths usually start with M7600
-            if "tamel" in name_lower or "baza" in name_lower or (item.urk and "M7600" in str(item.urk)):
-                if not prefs.plinth_height:
-                    prefs.plinth_height = "12cm" if "05" in str(item.urk) else "15cm"
-                
-            # Extract Accessories & Mechanisms
-            if "kaşıklık" in name_lower or "kasiklik" in name_lower or "kaşıklığı" in name_lower:
-                if not prefs.cutlery_tray:
-                    prefs.cutlery_tray = item.ura
-            if "çöp" in name_lower or "cop" in name_lower:
-                if not prefs.trash_bin:
-                    prefs.trash_bin = item.ura
-                
-            if any(x in name_lower for x in ["kiler", "kör köşe", "mekanizma", "şişelik", "siselik", "fasulye", "le mans"]):
-                mechanisms_list.append(item.ura)
-                
-            # Extract Lighting & Sensors & Controls
-            if "spot" in name_lower:
-                if "tezgah" in name_lower or "tezgah arası" in name_lower:
-                    prefs.light_counter_spot = True
-                else:
-                    prefs.light_cab_spot = True
-            if "led" in name_lower or "aydınlatma" in name_lower:
-                if "bluetooth" in name_lower:
-                    prefs.light_bt_led = True
-                elif "tezgah" in name_lower or "tezgah arası" in name_lower:
-                    prefs.light_counter_led = True
-                else:
-                    prefs.light_cab_led = "Çift Yan" if "çift" in name_lower else "Tek Yan"
-            if "sensör" in name_lower or "sensor" in name_lower:
-                if "kapak" in name_lower:
-                    prefs.sensor_door = True
-                else:
-                    prefs.sensor_dimmer = True
-
-        if mechanisms_list:
-            # Deduplicate and join multiple mechanisms neatly
-            prefs.mechanisms = " \n".join(list(set(mechanisms_list)))
-            
+    # 1. AUTO-EXTRACTION ENGINE: a rebuild overwrites the saved chart with freshly extracted values
+    if request.args.get('rebuild', type=int) == 1:
+        prefs = order.preferences or ProjectPreference()
+        apply_extracted_preferences(prefs, extract_order_preferences(order.order_id), reset=True)
         if not order.preferences:
             order.preferences = prefs
-            
         db.session.commit()
-        
-        if rebuild:
-            flash('Tercihler Kelebek verilerinden yeniden çekilerek güncellendi!', 'success')
-            return redirect(url_for('arkhon.order_preferences', order_id=order.order_id))
-        else:
-            flash('Tercihler Kelebek sipariş verilerinden otomatik olarak ayıklandı!', 'success')
+        flash('Tercihler Kelebek verilerinden yeniden çekilerek güncellendi!', 'success')
+        return redirect(url_for('arkhon.order_preferences', order_id=order.order_id))
 
     # 2. HANDLE FORM SUBMISSION (Updating the values manually)
     if request.method == 'POST':
@@ -1259,7 +1131,7 @@ def order_preferences(order_id):
             
             if cust_first or cust_email:
                 # Find existing by email, or use the currently linked party
-                party = db.session.scalar(db.select(Party).filter_by(email=cust_email)) if cust_email else None
+                party = find_party(email=cust_email) if cust_email else None
                 
                 if not party and order.party:
                     party = order.party
@@ -1276,6 +1148,8 @@ def order_preferences(order_id):
                 order.party = party
 
             # --- 2. PROCESS PREFERENCES ---
+            if not order.preferences:
+                order.preferences = ProjectPreference()
             order.preferences.model_name = request.form.get('model_name')
             order.preferences.front_color = request.form.get('front_color')
             order.preferences.body_color = request.form.get('body_color')
@@ -1318,171 +1192,22 @@ def order_preferences(order_id):
             db.session.rollback()
             flash(f'Hata: {str(e)}', 'danger')
 
-    return render_template('arkhon/preferences_form.html', order=order)
+    prefs = order.preferences
+    if prefs is None:
+        # Nothing is saved until the form is submitted; the extracted values only prefill it
+        prefs = ProjectPreference(**extract_order_preferences(order.order_id))
+        flash('Tercihler Kelebek sipariş verilerinden otomatik olarak ayıklandı! Kaydetmek için formu gönderin.', 'info')
 
-logger = logging.getLogger(__name__)
+    return render_template('arkhon/preferences_form.html', order=order, prefs=prefs)
 
-# --- Helper Function for Turkish Currency Formatting ---
-def format_try(amount):
-    """Formats a float to Turkish Lira string: 1.234.567,89"""
-    if amount is None:
-        amount = 0.0
-    formatted = f"{amount:,.2f}"
-    return formatted.replace(',', 'X').replace('.', ',').replace('X', '.')
+logger = logging.getLogger(__name__)
 
 @arkhon_bp.route('/quote/<int:quote_id>/export/gdoc', methods=['POST'])
 @login_required
 @role_required('admin', 'power_user')
 def export_quote_gdoc(quote_id):
-    """Gathers B2B project quote data and sends it to Google Docs."""
+    """Queues the Google Docs export; the new tab shows its progress and then opens the document."""
     quote = db.get_or_404(Quote, quote_id)
-    order = quote.order
-    
-    try:
-        # 1. Prepare Customer & Project Meta Data
-        customer_fullname = (f"{order.party.first_name or ''} {order.party.last_name or ''}".strip() or "Müşteri") if order.party else "Müşteri"
-        project_name = getattr(order, 'project_name', 'Konut Projesi')
-        validity_date_str = (datetime.now() + timedelta(days=quote.validity_days)).strftime('%d.%m.%Y')
-        
-        total_kitchen_count = 0
-        typology_list_bulleted = ""
-        project_summary_table = []
-        typology_itemized_pages = []
-        grand_total = 0.0
-        
-        # Determine Kitchen Model Name dynamically
-        model_name = "Standart Mutfak"
-        if order.preferences and order.preferences.model_name:
-            model_name = order.preferences.model_name
-        else:
-            for item in order.items:
-                if hasattr(item, 'oza') and item.oza and item.oza.strip() and item.oza.strip() != '-':
-                    code_str = f" ({item.ozk.strip()})" if hasattr(item, 'ozk') and item.ozk and item.ozk.strip() not in ["", "-"] else ""
-                    model_name = f"{item.oza.strip()}{code_str}"
-                    break
-        
-        # 2. B2B Typology Logic with ERP Pricing
-        if hasattr(order, 'typologies') and order.typologies:
-            for typo in order.typologies:
-                total_kitchen_count += typo.quantity
-                typology_list_bulleted += f"• {typo.name} MUTFAK ({typo.description}) - {typo.quantity} ADET\n"
-                
-                visible_items = [item for item in typo.items if item.is_visible_on_quote]
-                
-                unit_cost = 0.0
-                for item in visible_items:
-                    if item.price_record and item.price_record.final_unit_price is not None:
-                        unit_cost += float(item.price_record.final_unit_price)
-
-                row_total = unit_cost * typo.quantity
-                grand_total += row_total
-                
-                project_summary_table.append({
-                    "MUTFAK TİPİ": f"{typo.name} ({typo.description})",
-                    "ADET FİYATI": format_try(unit_cost),
-                    "TOPLAM FİYAT": format_try(row_total)
-                })
-                
-                typology_itemized_pages.append({
-                    "typology_name": typo.name,
-                    "items": [{"name": i.ura, "code": i.urk, "qty": i.adet, "unit": i.brm} for i in visible_items]
-                })
-                
-            project_summary_table.append({
-                "MUTFAK TİPİ": "TOPLAM",
-                "ADET FİYATI": "",
-                "TOPLAM FİYAT": format_try(grand_total)
-            })
-            
-        else:
-            total_kitchen_count = 1
-            visible_items = [item for item in order.items if item.is_visible_on_quote]
-            
-            project_summary_table.append({
-                "MUTFAK TİPİ": model_name,
-                "ADET FİYATI": format_try(quote.total_amount),
-                "TOPLAM FİYAT": format_try(quote.total_amount)
-            })
-            typology_itemized_pages.append({
-                "typology_name": model_name,
-                "items": [{"name": i.ura, "code": i.urk, "qty": i.adet, "unit": i.brm} for i in visible_items]
-            })
-
-        # 3. Format the tables into clean strings for the Google Doc
-        summary_text = ""
-        for row in project_summary_table:
-            if row.get("MUTFAK TİPİ") == "TOPLAM":
-                summary_text += f"\nGENEL TOPLAM: {row.get('TOPLAM FİYAT')} ₺\n"
-            else:
-                summary_text += f"• {row.get('MUTFAK TİPİ')} : {row.get('TOPLAM FİYAT')} ₺\n"
-
-        itemized_text = ""
-        for page in typology_itemized_pages:
-            itemized_text += f"\n--- {page['typology_name']} MUTFAK ÜNİTELERİ ---\n"
-            for item in page['items']:
-                itemized_text += f"• [{item['code']}] {item['name']} - {item['qty']} {item['unit']}\n"
-
-        # 3.5 Build the Installment Breakdown Table
-        installment_text = ""
-        if quote.installments:
-            for inst in quote.installments:
-                date_str = inst.date.strftime('%d.%m.%Y') if inst.date else "Belirtilmedi"
-                installment_text += f"• {date_str}  |  {inst.method}  |  {format_try(inst.amount)} ₺\n"
-        else:
-            installment_text = "Özel bir ödeme planı belirtilmemiştir."
-
-        # 4. Build the Replacement Dictionary (Tag -> Value)
-        replacements = [
-            {'{{quote_number}}': f"{order.order_number}-V{quote.version}"},
-            {'{{date}}': datetime.now().strftime('%d.%m.%Y')},
-            {'{{customer_name}}': customer_fullname},
-            {'{{project_name}}': project_name},
-            {'{{total_kitchen_count}}': str(total_kitchen_count)},
-            {'{{typology_list_bulleted}}': typology_list_bulleted.strip()},
-            {'{{project_summary_table}}': summary_text},
-            {'{{typology_itemized_pages}}': itemized_text},
-            {'{{installment_plan_table}}': installment_text},
-            {'{{payment_terms}}': quote.payment_terms or "Ödeme planı ektedir."},
-            {'{{validity_date}}': validity_date_str}
-        ]
-        
-        # 5. Initialize the Universal Manager
-        interop = create_interop_manager()
-        gdocs_client = interop.clients.get(Platform.GOOGLE_DOCS)
-        
-        # PYLANCE LEAK 1: If client doesn't exist, we MUST return a redirect!
-        if not gdocs_client:
-            flash("Google Docs platform is not enabled or failed to initialize.", "danger")
-            return redirect(url_for('arkhon.order_detail', order_id=order.order_id))
-
-        TEMPLATE_ID = "1X1VEL2p54n2BIrcWslEmbiyV24KmL4XVy0JWBVAJfnQ" 
-        FOLDER_ID = "1WH9vQuJVEvKEFYK4vi-np3KSDhp2o8jT"
-        NEW_TITLE = f"Teklif_{order.order_number}_{customer_fullname}"
-        
-        # 6. Generate!
-        if hasattr(gdocs_client, 'generate_from_template'):
-            new_doc_id = gdocs_client.generate_from_template( # type: ignore
-                template_id=TEMPLATE_ID,
-                title=NEW_TITLE,
-                replacements=replacements,
-                folder_id=FOLDER_ID
-            )
-            
-            if new_doc_id:
-                gdoc_url = f"https://docs.google.com/document/d/{new_doc_id}/edit"
-                # Instantly redirect the new tab directly to the Google Doc
-                return redirect(gdoc_url)
-            else:
-                flash('Google Docs API reddetti. Konsol loglarını kontrol edin.', 'danger')
-        else:
-            flash("The selected client does not support template generation.", "danger")
-            
-        # PYLANCE LEAK 2: The successful try block MUST return a redirect!
-        return redirect(url_for('arkhon.order_detail', order_id=order.order_id))
-        
-    except Exception as e:
-        logger.error(f"Google Docs Export Failed: {e}")
-        flash(f'Google Docs oluşturulurken bir hata oluştu: {str(e)}', 'danger')
-        # PYLANCE LEAK 3: The exception block MUST return a redirect!
-        return redirect(url_for('arkhon.order_detail', order_id=order.order_id))
-    
\ No newline at end of file
+    job_id = submit_job('quote_gdoc_export', {'quote_id': quote.quote_id}, created_by=current_user.party_id,
+                        return_url=url_for('arkhon.order_detail', order_id=quote.order_id))
+    return redirect(url_for('main.job_progress', job_id=job_id))
@@ -0,0 +1,182 @@
+"""
+Customer 360 Timeline
+Builds a party's interaction history as one UNION ALL over the order milestone
+columns and the quote / attachment / issue tables, ordered and keyset-paginated
+in SQL. Presentation (icon, colour, Turkish copy) is applied to the page only.
+"""
+import base64
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import Integer, String, and_, cast, literal, or_, union_all
+
+from crminaec.core.models import (CustomerIssue, Order, OrderAttachment, Quote,
+                                  db)
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+# Event kinds. The number is the tie-breaker inside one timestamp, so keep it stable.
+ORDER_CREATED, MEASUREMENT, INFO_DOCS, QUOTE_APPROVED = 1, 2, 3, 4
+FACTORY_DELIVERY, INSTALL_APPOINTMENT, KITCHEN_INSTALL = 5, 6, 7
+COUNTERTOP_INSTALL, APPLIANCE_INSTALL, HANDOVER = 8, 9, 10
+ATTACHMENT, ISSUE_REPORTED, ISSUE_INVESTIGATION, ISSUE_SOLVED = 11, 12, 13, 14
+
+
+def _part(kind: int, event_at, source_id, label=None, detail=None, extra=None):
+    """One SELECT of the union. Every part yields the same 7 columns."""
+    return db.select(
+        event_at.label('event_at'),
+        literal(kind, Integer).label('kind'),
+        source_id.label('source_id'),
+        Order.order_number.label('order_number'),
+        cast(label if label is not None else literal(None), String).label('label'),
+        cast(detail if detail is not None else literal(None), String).label('detail'),
+        cast(extra if extra is not None else literal(None), String).label('extra'),
+    )
+
+
+def timeline_query(party_id: int):
+    """The full, unpaginated UNION ALL of a party's events."""
+    owned = Order.party_id == party_id
+
+    milestone_columns = [
+        (MEASUREMENT, Order.measurement_date),
+        (INFO_DOCS, Order.info_docs_sent_at),
+        (FACTORY_DELIVERY, Order.factory_delivery_date),
+        (INSTALL_APPOINTMENT, Order.installation_appointment_date),
+        (KITCHEN_INSTALL, Order.kitchen_installation_date),
+        (COUNTERTOP_INSTALL, Order.countertop_installation_date),
+        (APPLIANCE_INSTALL, Order.appliance_installation_date),
+        (HANDOVER, Order.handover_date),
+    ]
+
+    parts = [
+        _part(ORDER_CREATED, Order.date, Order.order_id, Order.status, Order.project_type).filter(owned)
+    ]
+    parts += [
+        _part(kind, column, Order.order_id).filter(owned, column.is_not(None))
+        for kind, column in milestone_columns
+    ]
+    parts += [
+        _part(QUOTE_APPROVED, Quote.approval_date, Quote.quote_id, Quote.version, Quote.quote_category, Quote.approval_ip)
+        .join(Order, Order.order_id == Quote.order_id)
+        .filter(owned, Quote.approval_date.is_not(None)),
+
+        _part(ATTACHMENT, OrderAttachment.upload_date, OrderAttachment.attachment_id,
+              OrderAttachment.context, OrderAttachment.semantic_filename, OrderAttachment.file_type)
+        .join(Order, Order.order_id == OrderAttachment.order_id)
+        .filter(owned),
+    ]
+    for kind, column, detail in (
+        (ISSUE_REPORTED, CustomerIssue.reported_date, CustomerIssue.description),
+        (ISSUE_INVESTIGATION, CustomerIssue.investigation_date, None),
+        (ISSUE_SOLVED, CustomerIssue.solution_date, CustomerIssue.resolution_notes),
+    ):
+        parts.append(
+            _part(kind, column, CustomerIssue.issue_id, CustomerIssue.title, detail)
+            .join(Order, Order.order_id == CustomerIssue.order_id)
+            .filter(owned, column.is_not(None))
+        )
+
+    return union_all(*parts).subquery('timeline')
+
+
+# ==============================================================================
+# KEYSET CURSOR: "<iso timestamp>|<kind>|<source_id>", base64 url-safe
+# ==============================================================================
+def encode_cursor(event_at: datetime, kind: int, source_id: int) -> str:
+    raw = f"{event_at.isoformat()}|{kind}|{source_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int, int]:
+    """Raises ValueError on anything that isn't a cursor this module produced."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        stamp, kind, source_id = raw.split('|')
+        return datetime.fromisoformat(stamp), int(kind), int(source_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def fetch_timeline(party_id: int, limit: int = DEFAULT_PAGE_SIZE,
+                   cursor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    One page of events, newest first. Returns {'events': [...], 'next_cursor': str|None}.
+    Fetches limit + 1 rows to know whether an older page exists.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    t = timeline_query(party_id)
+
+    stmt = db.select(t).order_by(t.c.event_at.desc(), t.c.kind.desc(), t.c.source_id.desc())
+    if cursor:
+        at, kind, source_id = decode_cursor(cursor)
+        stmt = stmt.filter(or_(
+            t.c.event_at < at,
+            and_(t.c.event_at == at, t.c.kind < kind),
+            and_(t.c.event_at == at, t.c.kind == kind, t.c.source_id < source_id),
+        ))
+
+    rows = db.session.execute(stmt.limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    events = [present_event(row) for row in rows]
+    next_cursor = encode_cursor(rows[-1].event_at, rows[-1].kind, rows[-1].source_id) if has_more and rows else None
+    return {'events': events, 'next_cursor': next_cursor}
+
+
+# ==============================================================================
+# PRESENTATION (same copy the profile page has always shown)
+# ==============================================================================
+_MILESTONES = {
+    MEASUREMENT: ('fa-ruler-combined', "Ölçü / Keşif Randevusu", "Saha ziyareti ve ölçüm planlandı.", 'info'),
+    INFO_DOCS: ('fa-info-circle', "Bilgilendirme İletildi", "Süreç prosedürleri müşteriye gönderildi.", 'warning'),
+    FACTORY_DELIVERY: ('fa-truck', "Fabrika/Depo Teslimi", "Ürünler üretimden çıkıp depoya ulaştı.", 'info'),
+    INSTALL_APPOINTMENT: ('fa-calendar-check', "Montaj Randevusu", "Montaj ekipleri için planlama yapıldı.", 'primary'),
+    KITCHEN_INSTALL: ('fa-hammer', "Mutfak Montajı", "Ana mobilya modüllerinin kurulumu yapıldı.", 'success'),
+    COUNTERTOP_INSTALL: ('fa-layer-group', "Tezgah Montajı", "Tezgah ölçümü ve montajı yapıldı.", 'success'),
+    APPLIANCE_INSTALL: ('fa-plug', "Cihaz Montajı", "Ankastre cihazlar ve beyaz eşyalar kuruldu.", 'success'),
+    HANDOVER: ('fa-key', "Teslimat ve Devir", "Proje başarıyla müşteriye teslim edildi.", 'success'),
+}
+
+
+def present_event(row: Any) -> Dict[str, Any]:
+    kind = row.kind
+    if kind == ORDER_CREATED:
+        is_lead = row.label == 'lead'
+        icon = 'fa-user-clock' if is_lead else 'fa-file-import'
+        title = f"Yeni {'Keşif Talebi' if is_lead else 'Proje Başlatıldı'} ({row.order_number})"
+        desc = f"İlgi Alanı: {row.detail}"
+        color = 'primary' if is_lead else 'secondary'
+    elif kind in _MILESTONES:
+        icon, name, desc, color = _MILESTONES[kind]
+        title = f"{name} ({row.order_number})"
+    elif kind == QUOTE_APPROVED:
+        icon, color = 'fa-signature', 'success'
+        title = f"Sözleşme Onaylandı (v{row.label})"
+        desc = f"Kategori: {row.detail} | Dijital IP: {row.extra or 'Bilinmiyor'}"
+    elif kind == ATTACHMENT:
+        icon = 'fa-image' if row.extra == 'image' else 'fa-file-pdf'
+        title, desc, color = f"Dosya Yüklendi: {row.label}", row.detail, 'dark'
+    elif kind == ISSUE_REPORTED:
+        icon, color = 'fa-exclamation-triangle', 'danger'
+        title, desc = f"Müşteri Şikayeti / Talep: {row.label}", row.detail
+    elif kind == ISSUE_INVESTIGATION:
+        icon, color = 'fa-search', 'warning'
+        title, desc = f"Çözüm İncelemesi: {row.label}", "Teknik ekip/satış temsilcisi konuyu inceliyor."
+    else:
+        icon, color = 'fa-check-double', 'success'
+        title, desc = f"Çözüm Teslimi: {row.label}", row.detail or "Müşteri sorunu çözüldü."
+
+    event_at = row.event_at
+    return {
+        'date': event_at.isoformat() if event_at else None,
+        'date_display': event_at.strftime('%d.%m.%Y %H:%M') if event_at else '',
+        'icon': icon,
+        'title': title,
+        'desc': desc,
+        'color': color,
+    }
+
@@ -0,0 +1,207 @@
+"""
+EMEK Catalogue Imports
+Bulk item / composition CSV imports and flat BOM lists, executed as background
+jobs (core.jobs) so large files never hold a web request thread.
+"""
+import json
+import logging
+from typing import Any, Dict, Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from crminaec.core.jobs import job_handler
+from crminaec.core.models import db
+from crminaec.platforms.emek.models import (Item, ItemComposition, NodeType,
+                                            PriceSource)
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_EVERY = 100
+
+
+@job_handler('emek_items_csv')
+def run_items_csv_import(job, path: str, comps_path: Optional[str] = None, merge: bool = True) -> Dict[str, Any]:
+    """Imports items and compositions from the uploaded items.csv (and optional compositions CSV)."""
+    try:
+        _import_items_csv(job, path, comps_path, merge)
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        raise ValueError(f'Veritabanı Çakışması (Integrity Error): {e.orig}') from e
+    return {'message': 'Toplu içe aktarım başarıyla tamamlandı!'}
+
+
+def _import_items_csv(job, path: str, comps_path: Optional[str], merge: bool) -> None:
+    import pandas as pd
+
+    # 1. Parse Items
+    df_items = pd.read_csv(path, sep=None, engine='python', dtype=str, encoding='utf-8-sig').fillna('')
+    df_items.columns = [c.lower().strip() for c in df_items.columns]
+
+    # 2. Parse Compositions (if provided)
+    df_comps = None
+    if comps_path:
+        df_comps = pd.read_csv(comps_path, sep=None, engine='python', dtype=str, encoding='utf-8-sig').fillna('')
+        df_comps.columns = [c.lower().strip() for c in df_comps.columns]
+
+    def parse_json(val_str):
+        if not val_str: return {}
+        try:
+            val_str = str(val_str).replace('""', '"')
+            return json.loads(val_str)
+        except json.JSONDecodeError:
+            return {}
+
+    # Cache existing items to speed up lookups
+    existing_items = db.session.execute(db.select(Item.item_id, Item.code, Item.name)).all()
+    code_to_id = {item.code: item.item_id for item in existing_items}
+    name_to_id = {item.name: item.item_id for item in existing_items}
+    id_translation_map = {}
+
+    # IMPORT ITEMS
+    total_rows = len(df_items) + (len(df_comps) if df_comps is not None else 0)
+    for done, (_, row) in enumerate(df_items.iterrows(), 1):
+        if done % PROGRESS_EVERY == 0:
+            job.progress(done / total_rows, f"{done} / {len(df_items)} kalem işlendi")
+        csv_id_str = row.get('item_id')
+        if not csv_id_str: continue
+        csv_id = int(csv_id_str)
+
+        raw_code = str(row.get('code', '')).strip().upper()
+        raw_name = str(row.get('name', '')).strip()
+        if not raw_code: continue
+
+        if db.session.get(Item, csv_id):
+            id_translation_map[csv_id] = csv_id
+            continue
+
+        is_duplicate = raw_code in code_to_id or raw_name in name_to_id
+        if is_duplicate:
+            if merge:
+                matched_id = code_to_id.get(raw_code) or name_to_id.get(raw_name)
+                id_translation_map[csv_id] = matched_id
+                continue
+            else:
+                if raw_code in code_to_id: raw_code = f"{raw_code}.{csv_id}"
+                if raw_name in name_to_id: raw_name = f"{raw_name}.{csv_id}"
+
+        p_source_str = str(row.get('price_source', 'MANUAL')).upper()
+        p_source = getattr(PriceSource, p_source_str, PriceSource.MANUAL)
+
+        new_item = Item(**{
+            'code': raw_code,
+            'name': raw_name,
+            'brand': str(row.get('brand', 'Generic')).strip() or 'Generic',
+            'is_category': str(row.get('is_category', '')).lower() == 'true',
+            'product_group': str(row.get('product_group', '')).strip() or None,
+            'product_type': str(row.get('product_type', '')).strip() or None,
+            'uom': str(row.get('uom', 'adet')).strip().lower() or 'adet',
+            'dim_x': float(row.get('dim_x', 0.0) or 0.0),
+            'dim_y': float(row.get('dim_y', 0.0) or 0.0),
+            'dim_z': float(row.get('dim_z', 0.0) or 0.0),
+            'base_cost': float(row.get('base_cost', 0.0) or 0.0),
+            'technical_specs': parse_json(row.get('technical_specs')),
+            'price_source': p_source,
+            'reliability_score': int(row.get('reliability_score', 100) or 100)
+        })
+        new_item.item_id = csv_id
+        db.session.add(new_item)
+
+        code_to_id[raw_code] = csv_id
+        name_to_id[raw_name] = csv_id
+        id_translation_map[csv_id] = csv_id
+
+    db.session.flush()
+
+    # IMPORT COMPOSITIONS
+    if df_comps is not None:
+        for done, (_, row) in enumerate(df_comps.iterrows(), 1):
+            if done % PROGRESS_EVERY == 0:
+                job.progress((len(df_items) + done) / total_rows, f"{done} / {len(df_comps)} bağlantı işlendi")
+            if not row.get('parent_id') or not row.get('child_id'): continue
+            p_id = id_translation_map.get(int(row.get('parent_id', 0)))
+            c_id = id_translation_map.get(int(row.get('child_id', 0)))
+            if not p_id or not c_id: continue
+
+            qty = float(row.get('quantity', 1.0) or 1.0)
+            s_order = int(row.get('sort_order', 0) or 0)
+            opt_attrs = parse_json(row.get('optional_attributes'))
+
+            existing_link = db.session.scalar(db.select(ItemComposition).filter_by(parent_id=p_id, child_id=c_id))
+            if existing_link: continue
+
+            parent_obj = db.session.get(Item, p_id)
+            child_obj = db.session.get(Item, c_id)
+            if parent_obj and child_obj:
+                new_link = ItemComposition(**{
+                    'parent_item': parent_obj,
+                    'child_item': child_obj,
+                    'quantity': qty,
+                    'sort_order': s_order,
+                    'optional_attributes': opt_attrs
+                })
+                db.session.add(new_link)
+
+
+@job_handler('emek_flat_bom')
+def run_flat_bom_import(job, path: str, filename: str, parent_id: int) -> Dict[str, Any]:
+    """Imports a flat Excel/CSV parts list directly into a selected parent node."""
+    import pandas as pd
+
+    parent_item = db.session.get(Item, parent_id)
+    if not parent_item:
+        raise ValueError('Hedef klasör/ürün bulunamadı.')
+
+    if filename.endswith('.csv'):
+        df = pd.read_csv(path, sep=None, engine='python', dtype=str).fillna('')
+    else:
+        df = pd.read_excel(path, dtype=str).fillna('')
+
+    # Smart Column Detection (Case insensitive, trims whitespace)
+    col_map = {str(c).strip().lower(): str(c) for c in df.columns}
+
+    code_col = next((col_map[c] for c in ['code', 'kod', 'pozno', 'item code', 'ürün kodu'] if c in col_map), None)
+    name_col = next((col_map[c] for c in ['name', 'tanım', 'tanim', 'description', 'ürün adı'] if c in col_map), None)
+    qty_col = next((col_map[c] for c in ['quantity', 'qty', 'miktar', 'adet'] if c in col_map), None)
+    cost_col = next((col_map[c] for c in ['cost', 'price', 'fiyat', 'maliyet', 'birim fiyat'] if c in col_map), None)
+
+    if not code_col or not name_col:
+        raise ValueError('Dosyada "Kod" ve "Tanım" (veya benzeri) sütunlar bulunamadı.')
+
+    imported_count = 0
+    for done, (_, row) in enumerate(df.iterrows(), 1):
+        if done % PROGRESS_EVERY == 0:
+            job.progress(done / len(df), f"{done} / {len(df)} satır işlendi")
+        raw_code = str(row.get(code_col, '')).strip().upper()
+        raw_name = str(row.get(name_col, '')).strip()
+        if not raw_code: continue
+
+        raw_qty = str(row.get(qty_col, '1')).replace(',', '.') if qty_col else '1'
+        try: qty = float(raw_qty)
+        except ValueError: qty = 1.0
+
+        raw_cost = str(row.get(cost_col, '0')).replace(',', '.') if cost_col else '0'
+        try: cost = float(raw_cost)
+        except ValueError: cost = 0.0
+
+        # Find or Create Item
+        item = db.session.scalar(db.select(Item).filter_by(code=raw_code))
+        if not item:
+            item = Item(**{'code': raw_code, 'name': raw_name, 'base_cost': cost, 'is_category': False, 'item_type': 'raw_material', 'node_type': NodeType.PRODUCT})
+            db.session.add(item)
+            db.session.flush() # Get ID for relationships
+        elif cost > 0 and (not item.base_cost or item.base_cost == 0):
+            item.base_cost = cost # Update cost if it was missing
+
+        # Link to Parent
+        try:
+            parent_item.add_component(item, qty)
+            imported_count += 1
+        except ValueError:
+            pass # Ignore circular dependencies silently for bulk imports
+
+    db.session.commit()
+    return {
+        'message': f'{imported_count} kalem başarıyla "{parent_item.name}" altına aktarıldı!',
+        'imported_count': imported_count
+    }
@@ -3,14 +3,26 @@ Inventory & Warehouse Management API
 Handles Barcode/QR Code scanning and Stock Movement ledgers for mobile devices.
 """
 import logging
+from datetime import date, datetime, timedelta
 
-from flask import Blueprint, flash, jsonify, redirect, render_template, request
+from flask import (Blueprint, Response, current_app, flash, jsonify, redirect,
+                   render_template, request, stream_with_context)
 from flask_login import login_required
 from sqlalchemy import or_
 
 from crminaec.core.models import db
 from crminaec.core.security import role_required
-from crminaec.platforms.emek.models import Item, MovementType, StockMovement
+from crminaec.platforms.emek.labels import (collect_subtree_ids,
+                                            generate_label_sheet)
+from crminaec.platforms.emek import stock_reports
+from crminaec.platforms.emek.models import (Item, MovementType, StockInbound,
+                                            StockMovement, ValuationMethod)
+from crminaec.platforms.emek.reservations import (availability, plan_lines,
+                                                  sync_open_orders,
+                                                  sync_order_reservations)
+from crminaec.platforms.emek.stock import post_movement
+from crminaec.platforms.emek.stream import broker, iter_sse, movement_event
+from crminaec.platforms.emek.valuation import value_inventory
 
 logger = logging.getLogger(__name__)
 
@@ -43,6 +55,52 @@ def print_label(item_id):
         
     return render_template('emek/print_label.html', item=item)
 
+@inventory_bp.route('/print-labels', methods=['POST'])
+@login_required
+@role_required('admin', 'power_user')
+def print_labels():
+    """
+    Generates one multi-page QR label PDF for many items at once.
+    Accepts JSON or form data with 'item_ids' and/or a 'category_id' whose whole subtree is labelled.
+    """
+    data = request.get_json(silent=True) or {}
+    if data:
+        item_ids = data.get('item_ids') or []
+        category_id = data.get('category_id')
+        layout = data.get('layout', 'a4')
+    else:
+        item_ids = request.form.getlist('item_ids', type=int)
+        category_id = request.form.get('category_id', type=int)
+        layout = request.form.get('layout', 'a4')
+
+    try:
+        item_ids = [int(i) for i in item_ids]
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Geçersiz ürün ID listesi (Invalid item IDs).'}), 400
+    try:
+        category_id = int(category_id) if category_id not in (None, '') else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Geçersiz kategori ID (Invalid category ID).'}), 400
+
+    if not item_ids and not category_id:
+        return jsonify({'error': 'Ürün ID listesi veya kategori zorunludur.'}), 400
+
+    pdf_bytes = generate_label_sheet(
+        item_ids=item_ids,
+        category_id=category_id,
+        cache_dir=current_app.config['QR_CACHE_DIR'],
+        layout=layout,
+        font_path=current_app.config.get('LABEL_FONT_PATH'),
+        max_workers=current_app.config.get('WORKER_PROCESSES') or None
+    )
+    if pdf_bytes is None:
+        return jsonify({'error': 'Etiketlenecek ürün bulunamadı (No printable items).'}), 404
+
+    filename = f"EMEK_Labels_{datetime.now().strftime('%Y%m%d-%H%M')}.pdf"
+    response = Response(pdf_bytes, mimetype='application/pdf')
+    response.headers["Content-Disposition"] = f"inline; filename={filename}"
+    return response
+
 @inventory_bp.route('/scan/<path:scanned_code>', methods=['GET'])
 @login_required
 @role_required('admin', 'power_user')
@@ -95,43 +153,42 @@ def record_movement():
         movement_type = MovementType[mov_type_str]
     except KeyError:
         return jsonify({'error': f'Geçersiz hareket tipi (Invalid movement type): {mov_type_str}'}), 400
+
+    try:
+        unit_cost = float(data['unit_cost']) if data.get('unit_cost') not in (None, '') else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Geçersiz birim maliyet (Invalid unit cost).'}), 400
         
     item = db.session.get(Item, item_id)
     if not item:
         return jsonify({'error': 'Ürün bulunamadı (Item not found).'}), 404
         
-    # 1. Create the immutable Ledger Entry
-    movement = StockMovement(**{
-        'movement_type': movement_type,
-        'quantity': quantity,
-        'scanned_code': data.get('scanned_code'),
-        'reference_document': data.get('reference_document'),
-        'notes': data.get('notes')
-    })
-    item.stock_movements.append(movement)
-    
-    # 2. Automatically update the cached stock value
-    if movement_type in [MovementType.IN, MovementType.RETURN]:
-        item.stock_quantity += quantity
-    elif movement_type == MovementType.OUT:
-        item.stock_quantity -= quantity
-    elif movement_type == MovementType.ADJUSTMENT:
-        # For ADJ, we assume the quantity provided is a relative delta (either positive or negative)
-        item.stock_quantity += quantity
-        
+    # Ledger entry + cached stock level (+ daily rollup via the insert hook)
+    movement = post_movement(
+        item, movement_type, quantity,
+        scanned_code=data.get('scanned_code'),
+        reference_document=data.get('reference_document'),
+        notes=data.get('notes'),
+        unit_cost=unit_cost
+    )
+    # Serialise before the commit expires the objects (no reload afterwards)
+    db.session.flush()
+    event = movement_event(item, movement)
+    moved_at = movement.timestamp
     db.session.commit()
+    broker.publish([event])
     
-    logger.info(f"Stock {movement_type.name} recorded for {item.code}: {quantity} {item.uom}")
+    logger.info(f"Stock {movement_type.name} recorded for {event['code']}: {quantity} {event['uom']}")
     
     return jsonify({
         'success': True,
         'message': 'Stok hareketi başarıyla kaydedildi.',
-        'new_stock_quantity': item.stock_quantity,
+        'new_stock_quantity': event['stock_quantity'],
         'movement': {
-            'item_name': item.name,
+            'item_name': event['item_name'],
             'type': movement_type.name,
             'quantity': quantity,
-            'time': movement.timestamp.strftime('%H:%M') if movement.timestamp else ''
+            'time': moved_at.strftime('%H:%M') if moved_at else ''
         }
     })
 
@@ -149,6 +206,7 @@ def sync_offline_movements():
         
     synced_count = 0
     errors = []
+    posted = []
     
     for data in payloads:
         item_id = data.get('item_id')
@@ -174,13 +232,255 @@ def sync_offline_movements():
         except KeyError:
             continue
             
-        # Perform the actual stock math using an internal helper to avoid code duplication
-        movement = StockMovement(**{'movement_type': movement_type, 'quantity': quantity, 'scanned_code': scanned_code, 'reference_document': 'OFFLINE_SYNC'})
-        item.stock_movements.append(movement)
-        item.stock_quantity += quantity if movement_type in [MovementType.IN, MovementType.RETURN, MovementType.ADJUSTMENT] else -quantity
+        # Same write path as the live endpoint
+        posted.append((item, post_movement(item, movement_type, quantity, scanned_code=scanned_code, reference_document='OFFLINE_SYNC')))
         synced_count += 1
 
+    db.session.flush()
+    events = [movement_event(item, movement) for item, movement in posted]
     db.session.commit()
+    broker.publish(events)
     logger.info(f"Offline Sync Complete: {synced_count} records processed.")
     
-    return jsonify({'success': True, 'synced_count': synced_count, 'errors': errors})
\ No newline at end of file
+    return jsonify({'success': True, 'synced_count': synced_count, 'errors': errors})
+
+@inventory_bp.route('/stream', methods=['GET'])
+@login_required
+@role_required('admin', 'power_user')
+def movement_stream():
+    """
+    Server-Sent Events feed of committed stock movements and the resulting stock levels.
+    Optional filters: ?item_id=1&item_id=2 and/or ?category_id=5 (whole subtree).
+    """
+    item_ids = set(request.args.getlist('item_id', type=int))
+    category_id = request.args.get('category_id', type=int)
+    if category_id:
+        # Resolved once per connection; the broker then filters with a set lookup
+        item_ids.update(collect_subtree_ids(category_id))
+        if not item_ids:
+            return jsonify({'error': 'Kategoride ürün bulunamadı (Category has no items).'}), 404
+
+    filtered = bool(item_ids) or bool(category_id)
+    max_clients = current_app.config.get('SSE_MAX_CLIENTS', 0)
+    if max_clients and broker.client_count >= max_clients:
+        return jsonify({'error': 'Canlı akış kapasitesi dolu (Too many live clients).'}), 503
+
+    # Release the DB connection; the stream itself never touches the session
+    db.session.remove()
+
+    # The generator subscribes when streaming starts and unsubscribes when it ends
+    response = Response(
+        stream_with_context(iter_sse(item_ids if filtered else None, max_clients=max_clients,
+                                     heartbeat=current_app.config.get('SSE_HEARTBEAT_SECONDS', 15),
+                                     lifetime=current_app.config.get('SSE_MAX_LIFETIME_SECONDS', 300))),
+        mimetype='text/event-stream'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# ==============================================================================
+# 📊 STOCK REPORTS (served from emek_stock_daily_rollups)
+# ==============================================================================
+def _report_params(default_bucket: str = 'day'):
+    """Parses the shared ?start=&end=&bucket=&item_id=&category_id= filters. Defaults to the last 90 days."""
+    try:
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else date.today()
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else end - timedelta(days=89)
+    except ValueError:
+        raise ValueError('Tarih formatı YYYY-AA-GG olmalıdır (Dates must be ISO formatted).')
+
+    if start > end:
+        raise ValueError('Başlangıç tarihi bitişten sonra olamaz (start must be before end).')
+
+    bucket = request.args.get('bucket', default_bucket)
+    if bucket not in stock_reports.BUCKETS:
+        raise ValueError(f'Geçersiz periyot (Invalid bucket): {bucket}')
+
+    return {
+        'start': start,
+        'end': end,
+        'bucket': bucket,
+        'item_ids': request.args.getlist('item_id', type=int),
+        'category_id': request.args.get('category_id', type=int)
+    }
+
+@inventory_bp.route('/reports/throughput', methods=['GET'])
+@login_required
+@role_required('admin', 'power_user')
+def report_throughput():
+    """Warehouse IN/OUT/RETURN/ADJ totals per day, week or month."""
+    try:
+        params = _report_params('day')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    rows = stock_reports.throughput(**params)
+    return jsonify({'start': params['start'].isoformat(), 'end': params['end'].isoformat(),
+                    'bucket': params['bucket'], 'rows': rows})
+
+@inventory_bp.route('/reports/consumption', methods=['GET'])
+@login_required
+@role_required('admin', 'power_user')
+def report_consumption():
+    """Per-item consumption trend (OUT minus RETURN), weekly by default."""
+    try:
+        params = _report_params('week')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    items = stock_reports.consumption(limit=limit, **params)
+    return jsonify({'start': params['start'].isoformat(), 'end': params['end'].isoformat(),
+                    'bucket': params['bucket'], 'items': items})
+
+@inventory_bp.route('/reports/turnover', methods=['GET'])
+@login_required
+@role_required('admin', 'power_user')
+def report_turnover():
+    """Inventory turnover and days of supply per item for the period."""
+    try:
+        params = _report_params()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    params.pop('bucket')
+    limit = min(request.args.get('limit', 100, type=int), 1000)
+    items = stock_reports.turnover(limit=limit, **params)
+    return jsonify({'start': params['start'].isoformat(), 'end': params['end'].isoformat(), 'items': items})
+
+@inventory_bp.route('/valuation', methods=['GET'])
+@login_required
+@role_required('admin')
+def inventory_valuation():
+    """
+    Warehouse valuation as of the end of a day (?as_of=YYYY-MM-DD, default today).
+    ?method=fifo|avg (default avg), optional ?category_id= / ?item_id= scope.
+    """
+    try:
+        as_of = date.fromisoformat(request.args['as_of']) if request.args.get('as_of') else date.today()
+    except ValueError:
+        return jsonify({'error': 'Tarih formatı YYYY-AA-GG olmalıdır (Dates must be ISO formatted).'}), 400
+
+    method_str = request.args.get('method', 'avg').upper()
+    method = {'FIFO': ValuationMethod.FIFO, 'AVG': ValuationMethod.WEIGHTED_AVERAGE}.get(method_str)
+    if method is None:
+        return jsonify({'error': f'Geçersiz değerleme yöntemi (Invalid method): {method_str}'}), 400
+
+    result = value_inventory(
+        as_of=as_of,
+        method=method,
+        item_ids=request.args.getlist('item_id', type=int),
+        category_id=request.args.get('category_id', type=int)
+    )
+    return jsonify(result)
+
+
+# ==============================================================================
+# 📅 RESERVATIONS & AVAILABILITY (Arkhon orders -> EMEK stock)
+# ==============================================================================
+def _parse_iso_datetime(value, end_of_day=False):
+    if not value:
+        return None
+    # A bare date starts at midnight, or means "by the end of that day" for an upper bound
+    parsed = datetime.fromisoformat(value)
+    if end_of_day and len(value) <= 10:
+        return parsed.replace(hour=23, minute=59, second=59)
+    return parsed
+
+@inventory_bp.route('/availability', methods=['POST'])
+@login_required
+@role_required('admin', 'power_user')
+def stock_availability():
+    """
+    Free / reserved / incoming quantities for many items in one query.
+    JSON body: {"item_ids": [...], "codes": [...], "until": "YYYY-MM-DD"}
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        item_ids = [int(i) for i in data.get('item_ids') or []]
+        until = _parse_iso_datetime(data.get('until'), end_of_day=True)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Geçersiz ürün ID veya tarih (Invalid item IDs or date).'}), 400
+
+    codes = [str(c) for c in data.get('codes') or []]
+    if not item_ids and not codes:
+        return jsonify({'error': 'Ürün ID listesi veya kod listesi zorunludur.'}), 400
+
+    return jsonify({'until': until.isoformat() if until else None,
+                    'items': availability(item_ids=item_ids, codes=codes, until=until)})
+
+@inventory_bp.route('/reservations/plan', methods=['GET'])
+@login_required
+@role_required('admin', 'power_user')
+def reservation_plan():
+    """Open reservation lines due in a window (default: this week) with coverage and shortages."""
+    try:
+        today = date.today()
+        start = _parse_iso_datetime(request.args.get('start')) or datetime.combine(today - timedelta(days=today.weekday()), datetime.min.time())
+        end = _parse_iso_datetime(request.args.get('end'), end_of_day=True) or start + timedelta(days=7) - timedelta(seconds=1)
+    except ValueError:
+        return jsonify({'error': 'Tarih formatı YYYY-AA-GG olmalıdır (Dates must be ISO formatted).'}), 400
+
+    lines = plan_lines(start, end)
+    return jsonify({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'short_lines': sum(1 for line in lines if not line['covered']),
+        'lines': lines
+    })
+
+@inventory_bp.route('/reservations/sync', methods=['POST'])
+@login_required
+@role_required('admin', 'power_user')
+def sync_reservations():
+    """Rebuilds reservations for the given order_ids, or for every open order when none are given."""
+    data = request.get_json(silent=True) or {}
+    try:
+        order_ids = [int(i) for i in data.get('order_ids') or []]
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Geçersiz sipariş ID listesi (Invalid order IDs).'}), 400
+
+    active = sync_order_reservations(order_ids) if order_ids else sync_open_orders()
+    return jsonify({'success': True, 'active_reservations': active})
+
+@inventory_bp.route('/inbound', methods=['POST'])
+@login_required
+@role_required('admin', 'power_user')
+def register_inbound():
+    """
+    Registers expected deliveries (purchase / factory order lines) as incoming supply.
+    JSON body: {"reference_document": "...", "expected_on": "YYYY-MM-DD", "lines": [{"item_id": 1, "quantity": 5}]}
+    reference_document is required: IN movements carrying the same number book against them.
+    """
+    data = request.get_json(silent=True) or {}
+    # Receipts find their inbound by this number, so a line without one could never be received
+    reference_document = str(data.get('reference_document') or '').strip()
+    if not reference_document:
+        return jsonify({'error': 'İrsaliye / sipariş numarası zorunludur (reference_document is required).'}), 400
+
+    try:
+        expected_on = _parse_iso_datetime(data.get('expected_on'))
+        lines = [(int(line['item_id']), float(line['quantity'])) for line in data.get('lines') or []]
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'Geçersiz teslimat satırı veya tarih (Invalid delivery lines or date).'}), 400
+
+    if not lines or any(quantity <= 0 for _, quantity in lines):
+        return jsonify({'error': 'Pozitif miktarlı en az bir satır zorunludur.'}), 400
+
+    known = set(db.session.scalars(db.select(Item.item_id).filter(Item.item_id.in_([i for i, _ in lines]))))
+    missing = sorted({i for i, _ in lines} - known)
+    if missing:
+        return jsonify({'error': f'Ürün bulunamadı (Item not found): {missing}'}), 404
+
+    db.session.add_all([
+        StockInbound(**{
+            'item_id': item_id,
+            'quantity': quantity,
+            'reference_document': reference_document,
+            'expected_on': expected_on
+        })
+        for item_id, quantity in lines
+    ])
+    db.session.commit()
+    return jsonify({'success': True, 'lines': len(lines)}), 201
@@ -0,0 +1,257 @@
+"""
+Batch QR Label Sheets
+Resolves items (explicit IDs or a category subtree), assigns missing QR codes
+in one UPDATE, renders QR rasters through the shared worker pool with an
+on-disk cache, and lays everything out into a single multi-page PDF.
+"""
+import hashlib
+import io
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+from sqlalchemy import String, cast, func, literal
+
+from crminaec.core.models import db
+from crminaec.core.workers import get_process_pool
+from crminaec.platforms.emek.models import Item, ItemComposition
+
+logger = logging.getLogger(__name__)
+
+# Same format print_label has always used, so old and new labels scan identically
+QR_CODE_PREFIX = "EMEK"
+
+# SQLite's historical bound-parameter limit is 999; stay well below it
+_ID_CHUNK = 500
+
+# Below this many uncached codes the pool start-up costs more than it saves
+_POOL_THRESHOLD = 32
+
+# Sheet layouts: (page size in mm, label size in mm, columns, rows)
+LAYOUTS = {
+    'a4': {'page': (210.0, 297.0), 'label': (50.0, 50.0), 'cols': 4, 'rows': 5},
+    'roll': {'page': (50.0, 50.0), 'label': (50.0, 50.0), 'cols': 1, 'rows': 1},
+}
+
+
+def _chunks(values: Sequence[int], size: int = _ID_CHUNK) -> Iterable[Sequence[int]]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+# ==============================================================================
+# 1. ITEM RESOLUTION
+# ==============================================================================
+def subtree_ids_select(root_id: int):
+    """SELECT of every descendant item ID of a node (one recursive CTE), usable inside IN (...)."""
+    tree = (
+        db.select(ItemComposition.child_id.label('item_id'))
+        .filter(ItemComposition.parent_id == root_id)
+        .cte('item_subtree', recursive=True)
+    )
+    tree = tree.union(
+        db.select(ItemComposition.child_id).join(tree, ItemComposition.parent_id == tree.c.item_id)
+    )
+    return db.select(tree.c.item_id)
+
+
+def collect_subtree_ids(root_id: int) -> List[int]:
+    """Returns every descendant item ID of a category."""
+    return list(db.session.scalars(subtree_ids_select(root_id)).all())
+
+
+def resolve_label_items(item_ids: Optional[Sequence[int]] = None,
+                        category_id: Optional[int] = None) -> List[Item]:
+    """Loads the printable (non-folder, non-deleted) items for a label run, ordered by code."""
+    ids = set(int(i) for i in (item_ids or []))
+    if category_id:
+        ids.update(collect_subtree_ids(int(category_id)))
+
+    if not ids:
+        return []
+
+    items: List[Item] = []
+    for chunk in _chunks(sorted(ids)):
+        items.extend(db.session.scalars(
+            db.select(Item).filter(
+                Item.item_id.in_(chunk),
+                Item.is_deleted.is_not(True),
+                Item.is_category.is_not(True)
+            )
+        ).all())
+
+    items.sort(key=lambda i: i.code or '')
+    return items
+
+
+def assign_missing_qr_codes(items: Sequence[Item]) -> int:
+    """Gives every item without a QR code its formal EMEK code in bulk UPDATEs."""
+    missing = [i.item_id for i in items if not i.qr_code]
+    if not missing:
+        return 0
+
+    all_ids = [i.item_id for i in items]
+    # A NULL code would make the whole concatenation NULL and leave the item without a QR code
+    qr_expr = (literal(f"{QR_CODE_PREFIX}-", String) + cast(Item.item_id, String) + "-"
+               + func.coalesce(Item.code, ''))
+    for chunk in _chunks(missing):
+        db.session.execute(
+            db.update(Item)
+            .where(Item.item_id.in_(chunk), Item.qr_code.is_(None))
+            .values(qr_code=qr_expr)
+            .execution_options(synchronize_session=False)
+        )
+    db.session.commit()
+
+    # The commit expired every item; reload them chunk-wise instead of one lazy load each
+    for chunk in _chunks(all_ids):
+        db.session.scalars(db.select(Item).filter(Item.item_id.in_(chunk))).all()
+    return len(missing)
+
+
+# ==============================================================================
+# 2. QR RASTER CACHE
+# ==============================================================================
+def qr_cache_path(code: str, cache_dir: Union[str, Path]) -> Path:
+    """Cache file for a code. Hashing keeps odd characters out of file names."""
+    digest = hashlib.sha1(code.encode('utf-8')).hexdigest()
+    return Path(cache_dir) / digest[:2] / f"{digest}.png"
+
+
+def render_qr_png(code: str, cache_dir: str) -> str:
+    """Renders one QR PNG into the cache. Top-level so worker processes can pickle it."""
+    import qrcode
+    from qrcode.constants import ERROR_CORRECT_H
+
+    target = qr_cache_path(code, cache_dir)
+    if target.exists():
+        return str(target)
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    qr = qrcode.QRCode(error_correction=ERROR_CORRECT_H, box_size=10, border=1)
+    qr.add_data(code)
+    qr.make(fit=True)
+
+    # Write to a temp name first so a concurrent reader never sees half a file
+    tmp_path = target.with_suffix(f".{os.getpid()}.tmp")
+    qr.make_image(fill_color="black", back_color="white").save(str(tmp_path))
+    os.replace(tmp_path, target)
+    return str(target)
+
+
+def render_qr_images(codes: Iterable[str], cache_dir: Union[str, Path],
+                     max_workers: Optional[int] = None) -> Dict[str, str]:
+    """Returns {code: png_path}, rendering only the codes not already cached."""
+    cache_dir = str(cache_dir)
+    paths: Dict[str, str] = {}
+    pending: List[str] = []
+
+    for code in dict.fromkeys(codes):
+        cached = qr_cache_path(code, cache_dir)
+        if cached.exists():
+            paths[code] = str(cached)
+        else:
+            pending.append(code)
+
+    if len(pending) < _POOL_THRESHOLD:
+        for code in pending:
+            paths[code] = render_qr_png(code, cache_dir)
+    else:
+        pool = get_process_pool(max_workers)
+        chunksize = max(1, len(pending) // 64)
+        for code, path in zip(pending, pool.map(render_qr_png, pending, [cache_dir] * len(pending), chunksize=chunksize)):
+            paths[code] = path
+
+    logger.info(f"QR rasters ready: {len(paths) - len(pending)} cached, {len(pending)} rendered.")
+    return paths
+
+
+# ==============================================================================
+# 3. PDF LAYOUT
+# ==============================================================================
+def _fit_text(text: str, font: str, size: float, max_width: float) -> str:
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    if stringWidth(text, font, size) <= max_width:
+        return text
+    while text and stringWidth(text + "...", font, size) > max_width:
+        text = text[:-1]
+    return text + "..."
+
+
+def build_label_sheet(items: Sequence[Item], qr_paths: Dict[str, str],
+                      layout: str = 'a4', font_path: Optional[str] = None) -> bytes:
+    """Draws one label per item (code, name, QR) into a multi-page PDF."""
+    from reportlab.lib.units import mm
+    from reportlab.pdfgen import canvas
+
+    spec = LAYOUTS.get(layout, LAYOUTS['a4'])
+    page_w, page_h = spec['page'][0] * mm, spec['page'][1] * mm
+    label_w, label_h = spec['label'][0] * mm, spec['label'][1] * mm
+    cols, rows = spec['cols'], spec['rows']
+    margin_x = (page_w - cols * label_w) / 2
+    margin_y = (page_h - rows * label_h) / 2
+
+    font = "Helvetica"
+    bold_font = "Helvetica-Bold"
+    if font_path and os.path.exists(font_path):
+        # Standard PDF fonts lack Turkish glyphs (ğ, ş, ı); a TTF fixes that
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+        pdfmetrics.registerFont(TTFont("LabelFont", font_path))
+        font = bold_font = "LabelFont"
+
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=(page_w, page_h))
+    pdf.setTitle("EMEK QR Labels")
+    per_page = cols * rows
+    qr_size = label_h * 0.62
+    pad = 3 * mm
+
+    for index, item in enumerate(items):
+        slot = index % per_page
+        if index and slot == 0:
+            pdf.showPage()
+
+        col, row = slot % cols, slot // cols
+        x = margin_x + col * label_w
+        y = page_h - margin_y - (row + 1) * label_h
+        text_w = label_w - 2 * pad
+
+        pdf.setFont(bold_font, 9)
+        # Items created before code was required may have none; the QR value still identifies them
+        title = item.code or item.qr_code or ""
+        pdf.drawCentredString(x + label_w / 2, y + label_h - pad - 8, _fit_text(title, bold_font, 9, text_w))
+        pdf.setFont(font, 6.5)
+        pdf.drawCentredString(x + label_w / 2, y + label_h - pad - 16, _fit_text(item.name or "", font, 6.5, text_w))
+
+        qr_path = qr_paths.get(item.qr_code or "")
+        if qr_path:
+            pdf.drawImage(qr_path, x + (label_w - qr_size) / 2, y + pad, qr_size, qr_size)
+
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+# ==============================================================================
+# 4. ONE-SHOT PIPELINE
+# ==============================================================================
+def generate_label_sheet(item_ids: Optional[Sequence[int]] = None,
+                         category_id: Optional[int] = None,
+                         cache_dir: Union[str, Path] = "data/qr_cache",
+                         layout: str = 'a4',
+                         font_path: Optional[str] = None,
+                         max_workers: Optional[int] = None) -> Optional[bytes]:
+    """Full label run. Returns the PDF bytes, or None when nothing is printable."""
+    items = resolve_label_items(item_ids, category_id)
+    if not items:
+        return None
+
+    assigned = assign_missing_qr_codes(items)
+    if assigned:
+        logger.info(f"Assigned {assigned} new QR codes for label run.")
+
+    qr_paths = render_qr_images([i.qr_code for i in items if i.qr_code], cache_dir, max_workers)
+    return build_label_sheet(items, qr_paths, layout=layout, font_path=font_path)
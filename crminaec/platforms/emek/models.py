@@ -5,11 +5,11 @@ import os
 import re
 import unicodedata
 import uuid
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 from typing import Any, Dict, List, Optional
 
-from sqlalchemy import (JSON, Boolean, DateTime, Enum, Float, ForeignKey,
-                        Integer, String, Text)
+from sqlalchemy import (JSON, Boolean, Date, DateTime, Enum, Float, ForeignKey,
+                        Index, Integer, String, Text, event, text)
 from sqlalchemy.orm import (Mapped, MappedAsDataclass, mapped_column,
                             relationship)
 
@@ -45,6 +45,20 @@ class MovementType(enum.Enum):
     RETURN = "RETURN"   # Returned product from the field
 
 
+class ReservationStatus(enum.Enum):
+    ACTIVE = "Active"           # Promised to an order, not yet issued
+    FULFILLED = "Fulfilled"     # Issued (OUT) or handed over
+
+class InboundStatus(enum.Enum):
+    OPEN = "Open"               # Ordered from the factory/supplier, not yet received
+    RECEIVED = "Received"       # Fully booked in by IN movements
+
+
+class ValuationMethod(enum.Enum):
+    FIFO = "FIFO"               # Oldest cost layers are consumed first
+    WEIGHTED_AVERAGE = "AVG"    # Perpetual moving average cost
+
+
 # ==============================================================================
 # 1. ITEM CROSS REFERENCE (The Semantic Layer)
 # ==============================================================================
@@ -154,6 +168,15 @@ class Item(db.Model):
         default_factory=list
     )
 
+    # Catalogue / search / Pearson course lists filter by item_type and the soft-delete flags;
+    # the unfiltered catalogue pages by code over live rows only. The partial index's WHERE must
+    # match how `Item.is_deleted.is_not(True)` renders on each backend, or the planner ignores it.
+    __table_args__ = (
+        Index('ix_emek_items_type_flags_code', 'item_type', 'is_deleted', 'is_archived', 'code'),
+        Index('ix_emek_items_live_code', 'code', 'is_archived',
+              sqlite_where=text('is_deleted IS NOT 1'), postgresql_where=text('is_deleted IS NOT true')),
+    )
+
     @property
     def total_cost(self) -> float:
         """
@@ -232,6 +255,13 @@ class ItemComposition(db.Model):
     # Parametric Relationship Data (e.g. {"opt1": "L"})
     optional_attributes: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSON, nullable=True, default=dict)
 
+    # The primary key covers parent lookups; children are listed in sort_order and
+    # tree roots / Pearson lessons look links up by child
+    __table_args__ = (
+        Index('ix_emek_item_compositions_parent_sort', 'parent_id', 'sort_order'),
+        Index('ix_emek_item_compositions_child', 'child_id'),
+    )
+
 
 # ==============================================================================
 # 4. Define ItemAttachment (The PDM Vault)
@@ -264,6 +294,8 @@ class StockMovement(db.Model):
     
     movement_type: Mapped[MovementType] = mapped_column(Enum(MovementType), default=MovementType.IN)
     quantity: Mapped[float] = mapped_column(Float, default=0.0)
+    # Cost per unit at the time of the movement (snapshotted on IN, so later base_cost edits don't rewrite history)
+    unit_cost: Mapped[Optional[float]] = mapped_column(Float, nullable=True, default=None)
     
     # Scanning & Traceability
     scanned_code: Mapped[Optional[str]] = mapped_column(String(255), nullable=True, default=None) # The exact barcode/QR read
@@ -273,4 +305,167 @@ class StockMovement(db.Model):
     notes: Mapped[Optional[str]] = mapped_column(Text, nullable=True, default=None)
 
     # Relationship
-    item: Mapped["Item"] = relationship("Item", back_populates="stock_movements", init=False)
\ No newline at end of file
+    item: Mapped["Item"] = relationship("Item", back_populates="stock_movements", init=False)
+
+    # Valuation and reports replay the ledger per item in this exact order
+    __table_args__ = (
+        Index('ix_emek_stock_movements_item_ts', 'item_id', 'timestamp', 'movement_id'),
+    )
+
+
+# ==============================================================================
+# 6. INVENTORY ROLLUPS (Pre-aggregated Reporting Layer)
+# ==============================================================================
+class StockDailyRollup(db.Model):
+    """Per-item, per-day movement totals. Reports read this instead of the raw ledger."""
+    __tablename__ = 'emek_stock_daily_rollups'
+
+    item_id: Mapped[int] = mapped_column(ForeignKey('emek_items.item_id', ondelete="CASCADE"), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True, index=True)
+
+    qty_in: Mapped[float] = mapped_column(Float, default=0.0)
+    qty_out: Mapped[float] = mapped_column(Float, default=0.0)
+    qty_return: Mapped[float] = mapped_column(Float, default=0.0)
+    qty_adj: Mapped[float] = mapped_column(Float, default=0.0)
+    movement_count: Mapped[int] = mapped_column(Integer, default=0)
+
+
+# Which rollup column each ledger entry type accumulates into
+ROLLUP_COLUMNS: Dict[MovementType, str] = {
+    MovementType.IN: 'qty_in',
+    MovementType.OUT: 'qty_out',
+    MovementType.RETURN: 'qty_return',
+    MovementType.ADJUSTMENT: 'qty_adj',
+}
+
+
+def _bucket_values(item_id: int, day: date, column: str, quantity: float) -> Dict[str, Any]:
+    values: Dict[str, Any] = {
+        'item_id': item_id, 'day': day,
+        'qty_in': 0.0, 'qty_out': 0.0, 'qty_return': 0.0, 'qty_adj': 0.0,
+        'movement_count': 1
+    }
+    values[column] = quantity
+    return values
+
+
+def rollup_upsert_statement(dialect_name: str, item_id: int, day: date, column: str, quantity: float):
+    """Builds an atomic 'add to this day's bucket' statement for the given dialect, or None if unsupported."""
+    table = StockDailyRollup.__table__
+
+    if dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+
+    stmt = insert(table).values(**_bucket_values(item_id, day, column, quantity))
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.item_id, table.c.day],
+        set_={
+            column: table.c[column] + quantity,
+            'movement_count': table.c.movement_count + 1
+        }
+    )
+
+
+@event.listens_for(StockMovement, 'after_insert')
+def _maintain_daily_rollup(mapper, connection, movement: StockMovement) -> None:
+    """Keeps emek_stock_daily_rollups in step with every ledger INSERT, in the same transaction."""
+    column = ROLLUP_COLUMNS.get(movement.movement_type)
+    if column is None or movement.item_id is None:
+        return
+
+    moved_at = movement.timestamp or datetime.now(timezone.utc)
+    quantity = float(movement.quantity or 0.0)
+    stmt = rollup_upsert_statement(connection.dialect.name, movement.item_id, moved_at.date(), column, quantity)
+
+    if stmt is not None:
+        connection.execute(stmt)
+        return
+
+    # Generic fallback for dialects without ON CONFLICT: update, insert if the bucket is new
+    table = StockDailyRollup.__table__
+    result = connection.execute(
+        table.update()
+        .where(table.c.item_id == movement.item_id, table.c.day == moved_at.date())
+        .values({column: table.c[column] + quantity, 'movement_count': table.c.movement_count + 1})
+    )
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(**_bucket_values(movement.item_id, moved_at.date(), column, quantity)))
+
+
+# ==============================================================================
+# 7. INVENTORY VALUATION CHECKPOINTS
+# ==============================================================================
+class StockValuationCheckpoint(db.Model):
+    """
+    Saved valuation state per item and method, positioned after a given ledger entry.
+    Valuation runs resume from here and only replay movements recorded since.
+    """
+    __tablename__ = 'emek_stock_valuation_checkpoints'
+
+    item_id: Mapped[int] = mapped_column(ForeignKey('emek_items.item_id', ondelete="CASCADE"), primary_key=True)
+    method: Mapped[ValuationMethod] = mapped_column(Enum(ValuationMethod), primary_key=True)
+
+    # Ledger position: (timestamp, movement_id) of the last movement folded into this state
+    last_timestamp: Mapped[datetime] = mapped_column(DateTime)
+    last_movement_id: Mapped[int] = mapped_column(Integer)
+
+    quantity: Mapped[float] = mapped_column(Float, default=0.0)
+    value: Mapped[float] = mapped_column(Float, default=0.0)
+    # FIFO: [[qty, unit_cost], ...] oldest first. AVG: unused.
+    layers: Mapped[Optional[List[Any]]] = mapped_column(JSON, nullable=True, default=None)
+
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default_factory=lambda: datetime.now(timezone.utc))
+
+
+# ==============================================================================
+# 8. STOCK RESERVATIONS (Arkhon Orders -> EMEK Stock)
+# ==============================================================================
+class StockReservation(db.Model):
+    """Quantity of an item promised to an order line, due on the order's installation date."""
+    __tablename__ = 'emek_stock_reservations'
+
+    reservation_id: Mapped[int] = mapped_column(primary_key=True, init=False)
+    item_id: Mapped[int] = mapped_column(ForeignKey('emek_items.item_id', ondelete="CASCADE"), index=True)
+    order_id: Mapped[int] = mapped_column(ForeignKey('orders.order_id', ondelete="CASCADE"), index=True)
+    order_item_id: Mapped[Optional[int]] = mapped_column(ForeignKey('order_items.item_id', ondelete="SET NULL"), nullable=True, default=None)
+
+    quantity: Mapped[float] = mapped_column(Float, default=0.0)
+    fulfilled_quantity: Mapped[float] = mapped_column(Float, default=0.0)
+
+    # When the installation team needs it, and when the factory delivery is expected (incoming supply)
+    needed_by: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True, default=None)
+    expected_on: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True, default=None)
+
+    status: Mapped[ReservationStatus] = mapped_column(Enum(ReservationStatus), default=ReservationStatus.ACTIVE)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default_factory=lambda: datetime.now(timezone.utc))
+
+    # Availability aggregates always filter on (item_id, status)
+    __table_args__ = (
+        Index('ix_emek_stock_reservations_item_status', 'item_id', 'status', 'needed_by'),
+    )
+
+
+class StockInbound(db.Model):
+    """An expected delivery (purchase / factory order line): the only source of 'incoming' supply."""
+    __tablename__ = 'emek_stock_inbound'
+
+    inbound_id: Mapped[int] = mapped_column(primary_key=True, init=False)
+    item_id: Mapped[int] = mapped_column(ForeignKey('emek_items.item_id', ondelete="CASCADE"), index=True)
+
+    quantity: Mapped[float] = mapped_column(Float, default=0.0)
+    received_quantity: Mapped[float] = mapped_column(Float, default=0.0)
+
+    # Waybill / purchase order number; IN movements with the same reference_document book against it
+    reference_document: Mapped[Optional[str]] = mapped_column(String(100), nullable=True, default=None)
+    expected_on: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True, default=None)
+
+    status: Mapped[InboundStatus] = mapped_column(Enum(InboundStatus), default=InboundStatus.OPEN)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default_factory=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        Index('ix_emek_stock_inbound_item_status', 'item_id', 'status', 'expected_on'),
+    )
@@ -0,0 +1,329 @@
+"""
+Order-Driven Stock Reservations
+Links Arkhon order lines (OrderItem.urk) to EMEK items (Item.code), keeps one
+StockReservation per matched line, and answers availability questions with
+set-based aggregates instead of per-line lookups.
+
+    on_hand  = Item.stock_quantity
+    reserved = open reservation quantity needed by the horizon
+    incoming = open StockInbound quantity (expected deliveries) due by the horizon
+    free     = on_hand + incoming - reserved
+
+A reservation's own expected_on only records when the order's goods leave the
+factory; it is never counted as supply, or every reservation would cancel itself.
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import and_, literal
+
+from crminaec.core.models import Order, OrderItem, db
+from crminaec.platforms.emek.models import (InboundStatus, Item,
+                                            ReservationStatus, StockInbound,
+                                            StockReservation)
+
+logger = logging.getLogger(__name__)
+
+R = StockReservation
+S = StockInbound
+_ID_CHUNK = 500
+
+# Sorts undated reservations after every dated one
+_FAR_FUTURE = datetime(9999, 12, 31)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _open_quantity():
+    return R.quantity - R.fulfilled_quantity
+
+
+def _inbound_quantity():
+    return S.quantity - S.received_quantity
+
+
+def needed_by_for(category: Optional[str], order_row: Any) -> Optional[datetime]:
+    """Picks the installation milestone a line is needed for, falling back to the earliest known one."""
+    category = (category or '').lower()
+    if 'countertop' in category or 'tezgah' in category:
+        preferred = order_row.countertop_installation_date
+    elif 'appliance' in category or 'cihaz' in category:
+        preferred = order_row.appliance_installation_date
+    else:
+        preferred = order_row.kitchen_installation_date
+
+    if preferred:
+        return preferred
+    fallbacks = [d for d in (order_row.kitchen_installation_date, order_row.countertop_installation_date,
+                             order_row.appliance_installation_date, order_row.installation_appointment_date) if d]
+    return min(fallbacks) if fallbacks else None
+
+
+# ==============================================================================
+# 1. SYNC (Orders -> Reservations)
+# ==============================================================================
+def sync_order_reservations(order_ids: Sequence[int]) -> int:
+    """
+    Rebuilds the ACTIVE reservations of the given orders from their current lines and dates.
+    Fulfilled quantities are carried over per order line. Deleted or archived orders lose their
+    reservations; handed-over orders keep them as fulfilled. Returns the number of active reservations written.
+    """
+    order_ids = list(dict.fromkeys(int(i) for i in order_ids))
+    if not order_ids:
+        return 0
+
+    now = _now()
+    written = 0
+    for start in range(0, len(order_ids), _ID_CHUNK):
+        chunk = order_ids[start:start + _ID_CHUNK]
+
+        # 1. Every matched line of every order in one join (urk -> Item.code)
+        lines = db.session.execute(
+            db.select(
+                OrderItem.item_id.label('order_item_id'), OrderItem.order_id, OrderItem.adet, OrderItem.category,
+                Item.item_id.label('stock_item_id'),
+                Order.is_deleted, Order.is_archived, Order.handover_date, Order.factory_delivery_date,
+                Order.kitchen_installation_date, Order.countertop_installation_date,
+                Order.appliance_installation_date, Order.installation_appointment_date
+            )
+            .join(Order, Order.order_id == OrderItem.order_id)
+            .join(Item, and_(Item.code == OrderItem.urk, Item.is_deleted.is_not(True), Item.is_category.is_not(True)))
+            .filter(OrderItem.order_id.in_(chunk))
+        ).all()
+
+        # 2. What has already been issued against these orders survives the rebuild
+        fulfilled = {
+            (row.order_id, row.order_item_id, row.item_id): float(row.done or 0.0)
+            for row in db.session.execute(
+                db.select(R.order_id, R.order_item_id, R.item_id, db.func.sum(R.fulfilled_quantity).label('done'))
+                .filter(R.order_id.in_(chunk))
+                .group_by(R.order_id, R.order_item_id, R.item_id)
+            )
+        }
+
+        db.session.execute(
+            db.delete(R).where(R.order_id.in_(chunk)).execution_options(synchronize_session=False)
+        )
+
+        rows = []
+        for line in lines:
+            quantity = float(line.adet or 0.0)
+            if quantity <= 0 or line.is_deleted or line.is_archived:
+                continue
+
+            done = fulfilled.get((line.order_id, line.order_item_id, line.stock_item_id), 0.0)
+            handed_over = line.handover_date is not None and line.handover_date <= now
+            rows.append({
+                'item_id': line.stock_item_id,
+                'order_id': line.order_id,
+                'order_item_id': line.order_item_id,
+                'quantity': quantity,
+                'fulfilled_quantity': quantity if handed_over else min(done, quantity),
+                'needed_by': needed_by_for(line.category, line),
+                'expected_on': line.factory_delivery_date,
+                'status': ReservationStatus.FULFILLED if handed_over or done >= quantity else ReservationStatus.ACTIVE,
+                'created_at': now
+            })
+
+        if rows:
+            db.session.execute(db.insert(R), rows)
+        written += sum(1 for r in rows if r['status'] == ReservationStatus.ACTIVE)
+
+    db.session.commit()
+    logger.info(f"Reservations synced for {len(order_ids)} orders: {written} active lines.")
+    return written
+
+
+def sync_open_orders() -> int:
+    """Re-syncs every order that is not deleted, archived or handed over (nightly / CLI)."""
+    now = _now()
+    order_ids = db.session.scalars(
+        db.select(Order.order_id).filter(
+            Order.is_deleted.is_not(True),
+            Order.is_archived.is_not(True),
+            db.or_(Order.handover_date.is_(None), Order.handover_date > now)
+        )
+    ).all()
+    return sync_order_reservations(order_ids)
+
+
+def consume_reservations(item_id: int, quantity: float, reference_document: Optional[str]) -> float:
+    """
+    Applies an OUT movement to the active reservations of the order named in reference_document
+    (its order_number), earliest need first. Returns the quantity that was matched.
+    """
+    if not reference_document or quantity <= 0:
+        return 0.0
+
+    open_rows = db.session.scalars(
+        db.select(R)
+        .join(Order, Order.order_id == R.order_id)
+        .filter(R.item_id == item_id, R.status == ReservationStatus.ACTIVE,
+                Order.order_number == reference_document)
+        .order_by(db.func.coalesce(R.needed_by, _FAR_FUTURE), R.reservation_id)
+    ).all()
+
+    remaining = quantity
+    for reservation in open_rows:
+        if remaining <= 0:
+            break
+        take = min(reservation.quantity - reservation.fulfilled_quantity, remaining)
+        reservation.fulfilled_quantity += take
+        remaining -= take
+        if reservation.fulfilled_quantity >= reservation.quantity:
+            reservation.status = ReservationStatus.FULFILLED
+    return quantity - remaining
+
+
+def receive_inbound(item_id: int, quantity: float, reference_document: Optional[str]) -> float:
+    """
+    Applies an IN movement to the open expected deliveries of the item carrying the same
+    reference_document (waybill / purchase order), earliest expected first. Returns the quantity matched.
+    """
+    if not reference_document or quantity <= 0:
+        return 0.0
+
+    open_rows = db.session.scalars(
+        db.select(S)
+        .filter(S.item_id == item_id, S.status == InboundStatus.OPEN, S.reference_document == reference_document)
+        .order_by(db.func.coalesce(S.expected_on, _FAR_FUTURE), S.inbound_id)
+    ).all()
+
+    remaining = quantity
+    for inbound in open_rows:
+        if remaining <= 0:
+            break
+        take = min(inbound.quantity - inbound.received_quantity, remaining)
+        inbound.received_quantity += take
+        remaining -= take
+        if inbound.received_quantity >= inbound.quantity:
+            inbound.status = InboundStatus.RECEIVED
+    return quantity - remaining
+
+
+# ==============================================================================
+# 2. AVAILABILITY (one aggregate per request)
+# ==============================================================================
+def availability(item_ids: Optional[Sequence[int]] = None,
+                 codes: Optional[Sequence[str]] = None,
+                 until: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """
+    On-hand, reserved, incoming and free quantities for many items in a single grouped query.
+    `until` limits reserved/incoming to what is due by that horizon (default: everything open).
+    """
+    item_ids = list(item_ids or [])
+    codes = list(codes or [])
+    if not item_ids and not codes:
+        return []
+
+    open_qty = _open_quantity()
+    # Undated reservations always count as reserved; undated deliveries only without a horizon
+    reserved_when = literal(True) if until is None else db.or_(R.needed_by.is_(None), R.needed_by <= until)
+
+    # Aggregated separately so the reservation join can't multiply delivery quantities
+    incoming = (
+        db.select(S.item_id, db.func.sum(_inbound_quantity()).label('quantity'))
+        .filter(S.status == InboundStatus.OPEN)
+        .group_by(S.item_id)
+    )
+    if until is not None:
+        incoming = incoming.filter(S.expected_on <= until)
+    incoming = incoming.subquery('incoming')
+
+    stmt = (
+        db.select(
+            Item.item_id, Item.code, Item.name, Item.uom, Item.stock_quantity,
+            db.func.coalesce(db.func.sum(db.case((reserved_when, open_qty), else_=0.0)), 0.0).label('reserved'),
+            db.func.coalesce(db.func.max(incoming.c.quantity), 0.0).label('incoming'),
+            db.func.count(R.reservation_id).label('open_reservations'),
+            db.func.min(R.needed_by).label('next_needed_by')
+        )
+        .outerjoin(R, and_(R.item_id == Item.item_id, R.status == ReservationStatus.ACTIVE))
+        .outerjoin(incoming, incoming.c.item_id == Item.item_id)
+        .filter(db.or_(Item.item_id.in_(item_ids), Item.code.in_(codes)))
+        .group_by(Item.item_id, Item.code, Item.name, Item.uom, Item.stock_quantity)
+        .order_by(Item.code)
+    )
+
+    results = []
+    for row in db.session.execute(stmt):
+        on_hand = float(row.stock_quantity or 0.0)
+        reserved = float(row.reserved)
+        incoming = float(row.incoming)
+        results.append({
+            'item_id': row.item_id,
+            'code': row.code,
+            'name': row.name,
+            'uom': row.uom,
+            'on_hand': on_hand,
+            'reserved': reserved,
+            'incoming': incoming,
+            'free': on_hand + incoming - reserved,
+            'open_reservations': row.open_reservations,
+            'next_needed_by': row.next_needed_by.isoformat() if row.next_needed_by else None
+        })
+    return results
+
+
+def plan_lines(start: datetime, end: datetime) -> List[Dict[str, Any]]:
+    """
+    Installation planning: every open reservation needed between start and end, with whether the
+    stock on hand plus deliveries arriving by its date covers it after all earlier-due reservations.
+    Cumulative demand comes from a window function, so the whole week is one query.
+    """
+    open_qty = _open_quantity()
+    due_key = db.func.coalesce(R.needed_by, _FAR_FUTURE)
+
+    ranked = (
+        db.select(
+            R.reservation_id, R.item_id, R.order_id, R.needed_by, R.expected_on,
+            open_qty.label('open_qty'),
+            db.func.sum(open_qty).over(
+                partition_by=R.item_id,
+                order_by=(due_key, R.reservation_id),
+                rows=(None, 0)
+            ).label('cumulative_demand')
+        )
+        .filter(R.status == ReservationStatus.ACTIVE)
+        .subquery('ranked')
+    )
+
+    # Open deliveries expected by each line's date (late ones are still counted as coming)
+    incoming_by = (
+        db.select(db.func.coalesce(db.func.sum(_inbound_quantity()), 0.0))
+        .filter(S.item_id == ranked.c.item_id, S.status == InboundStatus.OPEN,
+                S.expected_on <= ranked.c.needed_by)
+        .scalar_subquery()
+    )
+
+    stmt = (
+        db.select(ranked, Item.code, Item.name, Item.uom, Item.stock_quantity,
+                  Order.order_number, incoming_by.label('incoming_by_date'))
+        .join(Item, Item.item_id == ranked.c.item_id)
+        .join(Order, Order.order_id == ranked.c.order_id)
+        .filter(ranked.c.needed_by >= start, ranked.c.needed_by <= end)
+        .order_by(ranked.c.needed_by, Item.code)
+    )
+
+    lines = []
+    for row in db.session.execute(stmt):
+        supply = float(row.stock_quantity or 0.0) + float(row.incoming_by_date or 0.0)
+        shortage = max(0.0, float(row.cumulative_demand) - supply)
+        lines.append({
+            'reservation_id': row.reservation_id,
+            'order_id': row.order_id,
+            'order_number': row.order_number,
+            'item_id': row.item_id,
+            'code': row.code,
+            'name': row.name,
+            'uom': row.uom,
+            'quantity': float(row.open_qty),
+            'needed_by': row.needed_by.isoformat() if row.needed_by else None,
+            'expected_on': row.expected_on.isoformat() if row.expected_on else None,
+            'covered': shortage <= 0,
+            'shortage': min(shortage, float(row.open_qty))
+        })
+    return lines
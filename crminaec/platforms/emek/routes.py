@@ -6,13 +6,15 @@ import unicodedata
 import uuid
 
 from flask import (Blueprint, Response, current_app, jsonify, render_template,
-                   request)
-from flask_login import login_required
+                   request, url_for)
+from flask_login import current_user, login_required
 from sqlalchemy import or_
 from werkzeug.utils import secure_filename
 
+from crminaec.core.jobs import save_upload, submit_job
 from crminaec.core.models import db
 from crminaec.core.security import role_required
+from crminaec.platforms.emek import importers  # noqa: F401 (registers the import job handlers)
 from crminaec.platforms.emek.models import (Item, ItemAttachment,
                                             ItemComposition, NodeType,
                                             PriceSource)
@@ -618,7 +620,7 @@ def export_bom_csv(item_id):
 @login_required
 @role_required('admin', 'power_user')
 def import_csv():
-    """Imports items and compositions from uploaded CSV files."""
+    """Queues an import of items and compositions from uploaded CSV files. Returns the job to poll."""
     if 'items_file' not in request.files:
         return jsonify({'error': 'Lütfen items.csv dosyasını yükleyin.'}), 400
 
@@ -627,120 +629,16 @@ def import_csv():
     merge = request.form.get('merge', 'true').lower() == 'true'
 
     try:
-        import json
-
-        import pandas as pd
-        from sqlalchemy.exc import IntegrityError
-
-        # 1. Parse Items
-        df_items = pd.read_csv(items_file.stream, sep=None, engine='python', dtype=str, encoding='utf-8-sig').fillna('')
-        df_items.columns = [c.lower().strip() for c in df_items.columns]
-
-        # 2. Parse Compositions (if provided)
-        df_comps = None
+        uploads = [save_upload(items_file)]
+        comps_path = None
         if comps_file and comps_file.filename:
-            df_comps = pd.read_csv(comps_file.stream, sep=None, engine='python', dtype=str, encoding='utf-8-sig').fillna('')
-            df_comps.columns = [c.lower().strip() for c in df_comps.columns]
+            comps_path = save_upload(comps_file)
+            uploads.append(comps_path)
 
-        def parse_json(val_str):
-            if not val_str: return {}
-            try:
-                val_str = str(val_str).replace('""', '"')
-                return json.loads(val_str)
-            except json.JSONDecodeError:
-                return {}
-
-        # Cache existing items to speed up lookups
-        existing_items = db.session.execute(db.select(Item.item_id, Item.code, Item.name)).all()
-        code_to_id = {item.code: item.item_id for item in existing_items}
-        name_to_id = {item.name: item.item_id for item in existing_items}
-        id_translation_map = {}
-
-        # IMPORT ITEMS
-        for _, row in df_items.iterrows():
-            csv_id_str = row.get('item_id')
-            if not csv_id_str: continue
-            csv_id = int(csv_id_str)
-            
-            raw_code = str(row.get('code', '')).strip().upper()
-            raw_name = str(row.get('name', '')).strip()
-            if not raw_code: continue
-
-            if db.session.get(Item, csv_id):
-                id_translation_map[csv_id] = csv_id
-                continue
-
-            is_duplicate = raw_code in code_to_id or raw_name in name_to_id
-            if is_duplicate:
-                if merge:
-                    matched_id = code_to_id.get(raw_code) or name_to_id.get(raw_name)
-                    id_translation_map[csv_id] = matched_id
-                    continue
-                else:
-                    if raw_code in code_to_id: raw_code = f"{raw_code}.{csv_id}"
-                    if raw_name in name_to_id: raw_name = f"{raw_name}.{csv_id}"
-
-            p_source_str = str(row.get('price_source', 'MANUAL')).upper()
-            p_source = getattr(PriceSource, p_source_str, PriceSource.MANUAL)
-
-            new_item = Item(**{
-                'code': raw_code,
-                'name': raw_name,
-                'brand': str(row.get('brand', 'Generic')).strip() or 'Generic',
-                'is_category': str(row.get('is_category', '')).lower() == 'true',
-                'product_group': str(row.get('product_group', '')).strip() or None,
-                'product_type': str(row.get('product_type', '')).strip() or None,
-                'uom': str(row.get('uom', 'adet')).strip().lower() or 'adet',
-                'dim_x': float(row.get('dim_x', 0.0) or 0.0),
-                'dim_y': float(row.get('dim_y', 0.0) or 0.0),
-                'dim_z': float(row.get('dim_z', 0.0) or 0.0),
-                'base_cost': float(row.get('base_cost', 0.0) or 0.0),
-                'technical_specs': parse_json(row.get('technical_specs')),
-                'price_source': p_source,
-                'reliability_score': int(row.get('reliability_score', 100) or 100)
-            })
-            new_item.item_id = csv_id
-            db.session.add(new_item)
-            
-            code_to_id[raw_code] = csv_id
-            name_to_id[raw_name] = csv_id
-            id_translation_map[csv_id] = csv_id
-
-        db.session.flush()
-
-        # IMPORT COMPOSITIONS
-        if df_comps is not None:
-            for _, row in df_comps.iterrows():
-                if not row.get('parent_id') or not row.get('child_id'): continue
-                p_id = id_translation_map.get(int(row.get('parent_id', 0)))
-                c_id = id_translation_map.get(int(row.get('child_id', 0)))
-                if not p_id or not c_id: continue
-
-                qty = float(row.get('quantity', 1.0) or 1.0)
-                s_order = int(row.get('sort_order', 0) or 0)
-                opt_attrs = parse_json(row.get('optional_attributes'))
-
-                existing_link = db.session.scalar(db.select(ItemComposition).filter_by(parent_id=p_id, child_id=c_id))
-                if existing_link: continue
-
-                parent_obj = db.session.get(Item, p_id)
-                child_obj = db.session.get(Item, c_id)
-                if parent_obj and child_obj:
-                    new_link = ItemComposition(**{
-                        'parent_item': parent_obj,
-                        'child_item': child_obj,
-                        'quantity': qty,
-                        'sort_order': s_order,
-                        'optional_attributes': opt_attrs
-                    })
-                    db.session.add(new_link)
-
-        db.session.commit()
-        return jsonify({'success': True, 'message': 'Toplu içe aktarım başarıyla tamamlandı!'})
+        job_id = submit_job('emek_items_csv', {'path': uploads[0], 'comps_path': comps_path, 'merge': merge},
+                            uploads=uploads, created_by=current_user.party_id)
+        return _job_accepted(job_id)
 
-    except IntegrityError as e:
-        db.session.rollback()
-        return jsonify({'error': f'Veritabanı Çakışması (Integrity Error): {e.orig}'}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Beklenmeyen Hata: {str(e)}'}), 500
@@ -749,7 +647,7 @@ def import_csv():
 @login_required
 @role_required('admin', 'power_user')
 def import_flat_bom(parent_id):
-    """Imports a flat Excel/CSV parts list directly into a selected parent node."""
+    """Queues a flat Excel/CSV parts list import into a selected parent node. Returns the job to poll."""
     parent_item = db.session.get(Item, parent_id)
     if not parent_item:
         return jsonify({'error': 'Hedef klasör/ürün bulunamadı.'}), 404
@@ -759,64 +657,27 @@ def import_flat_bom(parent_id):
 
     file = request.files['file']
     filename = str(file.filename).lower()
+    if not filename.endswith(('.csv', '.xlsx', '.xls')):
+        return jsonify({'error': 'Desteklenmeyen format. Sadece .csv, .xlsx, .xls yükleyin.'}), 400
 
     try:
-        import pandas as pd
-        if filename.endswith('.csv'):
-            df = pd.read_csv(file.stream, sep=None, engine='python', dtype=str).fillna('')
-        elif filename.endswith('.xlsx') or filename.endswith('.xls'):
-            df = pd.read_excel(file.stream, dtype=str).fillna('')
-        else:
-            return jsonify({'error': 'Desteklenmeyen format. Sadece .csv, .xlsx, .xls yükleyin.'}), 400
-
-        # Smart Column Detection (Case insensitive, trims whitespace)
-        col_map = {str(c).strip().lower(): str(c) for c in df.columns}
-        
-        code_col = next((col_map[c] for c in ['code', 'kod', 'pozno', 'item code', 'ürün kodu'] if c in col_map), None)
-        name_col = next((col_map[c] for c in ['name', 'tanım', 'tanim', 'description', 'ürün adı'] if c in col_map), None)
-        qty_col = next((col_map[c] for c in ['quantity', 'qty', 'miktar', 'adet'] if c in col_map), None)
-        cost_col = next((col_map[c] for c in ['cost', 'price', 'fiyat', 'maliyet', 'birim fiyat'] if c in col_map), None)
-
-        if not code_col or not name_col:
-            return jsonify({'error': 'Dosyada "Kod" ve "Tanım" (veya benzeri) sütunlar bulunamadı.'}), 400
-
-        imported_count = 0
-        for _, row in df.iterrows():
-            raw_code = str(row.get(code_col, '')).strip().upper()
-            raw_name = str(row.get(name_col, '')).strip()
-            if not raw_code: continue
-
-            raw_qty = str(row.get(qty_col, '1')).replace(',', '.') if qty_col else '1'
-            try: qty = float(raw_qty)
-            except ValueError: qty = 1.0
-
-            raw_cost = str(row.get(cost_col, '0')).replace(',', '.') if cost_col else '0'
-            try: cost = float(raw_cost)
-            except ValueError: cost = 0.0
-
-            # Find or Create Item
-            item = db.session.scalar(db.select(Item).filter_by(code=raw_code))
-            if not item:
-                item = Item(**{'code': raw_code, 'name': raw_name, 'base_cost': cost, 'is_category': False, 'item_type': 'raw_material', 'node_type': NodeType.PRODUCT})
-                db.session.add(item)
-                db.session.flush() # Get ID for relationships
-            elif cost > 0 and (not item.base_cost or item.base_cost == 0):
-                item.base_cost = cost # Update cost if it was missing
-
-            # Link to Parent
-            try:
-                parent_item.add_component(item, qty)
-                imported_count += 1
-            except ValueError:
-                pass # Ignore circular dependencies silently for bulk imports
-
-        db.session.commit()
-        return jsonify({'success': True, 'message': f'{imported_count} kalem başarıyla "{parent_item.name}" altına aktarıldı!'})
+        path = save_upload(file)
+        job_id = submit_job('emek_flat_bom', {'path': path, 'filename': filename, 'parent_id': parent_id},
+                            uploads=[path], created_by=current_user.party_id)
+        return _job_accepted(job_id)
 
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Hata: {str(e)}'}), 500
 
+def _job_accepted(job_id):
+    """202 response pointing the client at the job's polling endpoint."""
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status_url': url_for('main.job_status_api', job_id=job_id)
+    }), 202
+
 # --- SERVICES ---
 #-----------------------------------------------------------------------------
 def process_prosap_quote(full_sku: str, prosap_total_price: float):
@@ -0,0 +1,95 @@
+"""
+Stock Ledger Services
+The single write path for StockMovement rows, shared by the scanner's live
+endpoint and the offline sync queue, plus the rollup backfill.
+"""
+import logging
+from typing import Optional
+
+from crminaec.core.models import db
+from crminaec.platforms.emek.models import (ROLLUP_COLUMNS, Item,
+                                            MovementType, StockDailyRollup,
+                                            StockMovement)
+from crminaec.platforms.emek.reservations import (consume_reservations,
+                                                  receive_inbound)
+
+logger = logging.getLogger(__name__)
+
+# OUT is the only type that reduces stock. ADJ quantities are relative deltas.
+STOCK_SIGN = {
+    MovementType.IN: 1.0,
+    MovementType.RETURN: 1.0,
+    MovementType.ADJUSTMENT: 1.0,
+    MovementType.OUT: -1.0,
+}
+
+
+def post_movement(item: Item, movement_type: MovementType, quantity: float,
+                  scanned_code: Optional[str] = None,
+                  reference_document: Optional[str] = None,
+                  notes: Optional[str] = None,
+                  unit_cost: Optional[float] = None) -> StockMovement:
+    """
+    Appends an immutable ledger entry and updates the cached stock level.
+    Receipts without an explicit unit_cost snapshot the item's current base_cost.
+    The daily rollup is maintained by the StockMovement insert hook at flush time.
+    The caller owns the transaction (commit/rollback).
+    """
+    movement = StockMovement(**{
+        'movement_type': movement_type,
+        'quantity': quantity,
+        'scanned_code': scanned_code,
+        'reference_document': reference_document,
+        'notes': notes,
+        'unit_cost': unit_cost
+    })
+    if unit_cost is None and movement_type == MovementType.IN:
+        movement.unit_cost = float(item.base_cost or 0.0)
+    if movement_type == MovementType.OUT and reference_document:
+        # Issues against an order number draw down that order's reservations
+        consume_reservations(item.item_id, quantity, reference_document)
+    if movement_type == MovementType.IN and reference_document:
+        # Receipts against a waybill / purchase order close its expected delivery
+        receive_inbound(item.item_id, quantity, reference_document)
+    item.stock_movements.append(movement)
+    item.stock_quantity = float(item.stock_quantity or 0.0) + STOCK_SIGN[movement_type] * quantity
+    return movement
+
+
+def rebuild_daily_rollups() -> int:
+    """
+    Recomputes emek_stock_daily_rollups from the full ledger in one INSERT ... SELECT.
+    Only needed once for movements recorded before rollups existed, or after manual ledger edits.
+    """
+    day_expr = db.func.date(StockMovement.timestamp)
+
+    def qty_for(movement_type: MovementType):
+        return db.func.coalesce(db.func.sum(
+            db.case((StockMovement.movement_type == movement_type, StockMovement.quantity), else_=0.0)
+        ), 0.0)
+
+    aggregate = (
+        db.select(
+            StockMovement.item_id,
+            day_expr,
+            qty_for(MovementType.IN),
+            qty_for(MovementType.OUT),
+            qty_for(MovementType.RETURN),
+            qty_for(MovementType.ADJUSTMENT),
+            db.func.count(StockMovement.movement_id)
+        )
+        .group_by(StockMovement.item_id, day_expr)
+    )
+
+    table = StockDailyRollup.__table__
+    db.session.execute(table.delete())
+    db.session.execute(table.insert().from_select(
+        ['item_id', 'day', ROLLUP_COLUMNS[MovementType.IN], ROLLUP_COLUMNS[MovementType.OUT],
+         ROLLUP_COLUMNS[MovementType.RETURN], ROLLUP_COLUMNS[MovementType.ADJUSTMENT], 'movement_count'],
+        aggregate
+    ))
+    db.session.commit()
+
+    count = db.session.scalar(db.select(db.func.count()).select_from(table)) or 0
+    logger.info(f"Rebuilt {count} daily stock rollup rows from the ledger.")
+    return count
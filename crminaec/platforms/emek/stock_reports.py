@@ -0,0 +1,165 @@
+"""
+Inventory Reporting Queries
+Throughput, turnover and consumption trends served from the daily rollup
+table (emek_stock_daily_rollups), never from the raw StockMovement ledger.
+"""
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import Date, cast
+
+from crminaec.core.models import db
+from crminaec.platforms.emek.labels import subtree_ids_select
+from crminaec.platforms.emek.models import Item, StockDailyRollup
+
+R = StockDailyRollup
+BUCKETS = ('day', 'week', 'month')
+
+
+def _bucket_expr(bucket: str):
+    """Start-of-bucket expression for the active dialect (weeks start on Monday)."""
+    if bucket == 'day':
+        return R.day
+
+    if db.engine.dialect.name == 'postgresql':
+        return cast(db.func.date_trunc(bucket, R.day), Date)
+
+    # SQLite date modifiers
+    if bucket == 'week':
+        return db.func.date(R.day, 'weekday 0', '-6 days')
+    return db.func.date(R.day, 'start of month')
+
+
+def _iso(value: Any) -> str:
+    # SQLite hands dates back as 'YYYY-MM-DD' text, PostgreSQL as date objects
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)[:10]
+
+
+def _scope_filters(start: date, end: date, item_ids: Optional[Sequence[int]] = None,
+                   category_id: Optional[int] = None) -> List[Any]:
+    filters: List[Any] = [R.day >= start, R.day <= end]
+    if item_ids:
+        filters.append(R.item_id.in_(list(item_ids)))
+    if category_id:
+        filters.append(R.item_id.in_(subtree_ids_select(category_id)))
+    return filters
+
+
+def throughput(start: date, end: date, bucket: str = 'day',
+               item_ids: Optional[Sequence[int]] = None,
+               category_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Warehouse-wide IN/OUT/RETURN/ADJ totals per time bucket."""
+    bucket_col = _bucket_expr(bucket).label('bucket')
+    stmt = (
+        db.select(
+            bucket_col,
+            db.func.sum(R.qty_in), db.func.sum(R.qty_out),
+            db.func.sum(R.qty_return), db.func.sum(R.qty_adj),
+            db.func.sum(R.movement_count)
+        )
+        .filter(*_scope_filters(start, end, item_ids, category_id))
+        .group_by(bucket_col)
+        .order_by(bucket_col)
+    )
+    return [{
+        'period': _iso(period),
+        'in': float(qty_in or 0.0),
+        'out': float(qty_out or 0.0),
+        'return': float(qty_return or 0.0),
+        'adjustment': float(qty_adj or 0.0),
+        'movements': int(count or 0)
+    } for period, qty_in, qty_out, qty_return, qty_adj, count in db.session.execute(stmt)]
+
+
+def consumption(start: date, end: date, bucket: str = 'week',
+                item_ids: Optional[Sequence[int]] = None,
+                category_id: Optional[int] = None,
+                limit: int = 50) -> List[Dict[str, Any]]:
+    """Net consumption (OUT minus RETURN) per item and bucket, for the top consumers."""
+    filters = _scope_filters(start, end, item_ids, category_id)
+    net_out = db.func.sum(R.qty_out - R.qty_return)
+
+    # 1. Pick the items worth charting in one grouped query
+    top = db.session.execute(
+        db.select(R.item_id, Item.code, Item.name, Item.uom, net_out.label('total'))
+        .join(Item, Item.item_id == R.item_id)
+        .filter(*filters)
+        .group_by(R.item_id, Item.code, Item.name, Item.uom)
+        .order_by(net_out.desc())
+        .limit(limit)
+    ).all()
+    if not top:
+        return []
+
+    series: Dict[int, Dict[str, Any]] = {
+        row.item_id: {
+            'item_id': row.item_id, 'code': row.code, 'name': row.name, 'uom': row.uom,
+            'total': float(row.total or 0.0), 'series': []
+        } for row in top
+    }
+
+    # 2. Their per-bucket figures in a second grouped query
+    bucket_col = _bucket_expr(bucket).label('bucket')
+    rows = db.session.execute(
+        db.select(R.item_id, bucket_col, net_out)
+        .filter(*filters, R.item_id.in_(list(series.keys())))
+        .group_by(R.item_id, bucket_col)
+        .order_by(R.item_id, bucket_col)
+    )
+    for item_id, period, qty in rows:
+        series[item_id]['series'].append({'period': _iso(period), 'quantity': float(qty or 0.0)})
+
+    return [series[row.item_id] for row in top]
+
+
+def turnover(start: date, end: date,
+             item_ids: Optional[Sequence[int]] = None,
+             category_id: Optional[int] = None,
+             limit: int = 100) -> List[Dict[str, Any]]:
+    """
+    Inventory turnover per item for the period: consumption / average stock.
+    Closing stock is rebuilt from the cached stock level minus the net movements after `end`,
+    opening stock from closing minus the net movements inside the period.
+    """
+    net = R.qty_in + R.qty_return + R.qty_adj - R.qty_out
+    in_period = db.and_(R.day >= start, R.day <= end)
+
+    stmt = (
+        db.select(
+            Item.item_id, Item.code, Item.name, Item.uom, Item.stock_quantity,
+            db.func.sum(db.case((in_period, R.qty_out - R.qty_return), else_=0.0)).label('consumed'),
+            db.func.sum(db.case((in_period, net), else_=0.0)).label('net_period'),
+            db.func.sum(db.case((R.day > end, net), else_=0.0)).label('net_after')
+        )
+        .join(R, R.item_id == Item.item_id)
+        .filter(R.day >= start)
+        .group_by(Item.item_id, Item.code, Item.name, Item.uom, Item.stock_quantity)
+    )
+    if item_ids:
+        stmt = stmt.filter(Item.item_id.in_(list(item_ids)))
+    if category_id:
+        stmt = stmt.filter(Item.item_id.in_(subtree_ids_select(category_id)))
+
+    days = max((end - start).days + 1, 1)
+    results = []
+    for row in db.session.execute(stmt):
+        consumed = float(row.consumed or 0.0)
+        closing = float(row.stock_quantity or 0.0) - float(row.net_after or 0.0)
+        opening = closing - float(row.net_period or 0.0)
+        average = (opening + closing) / 2
+        daily_use = consumed / days
+        results.append({
+            'item_id': row.item_id,
+            'code': row.code,
+            'name': row.name,
+            'uom': row.uom,
+            'consumed': consumed,
+            'opening_stock': opening,
+            'closing_stock': closing,
+            'average_stock': average,
+            'turnover': round(consumed / average, 4) if average > 0 else None,
+            'days_of_supply': round(closing / daily_use, 1) if daily_use > 0 else None
+        })
+
+    results.sort(key=lambda r: r['consumed'], reverse=True)
+    return results[:limit]
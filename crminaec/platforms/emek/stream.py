@@ -0,0 +1,144 @@
+"""
+Live Stock Movement Stream
+In-process pub/sub that the inventory endpoints publish committed movements to,
+and that the SSE endpoint fans out to connected dashboards.
+
+Each waitress worker process keeps its own broker, which is fine for the single
+process deployment behind IIS. Note that every open SSE connection holds one
+waitress thread, so the number of subscribers is capped (SSE_MAX_CLIENTS).
+"""
+import json
+import logging
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# A client that falls this far behind is dropped instead of growing memory forever
+_CLIENT_BUFFER = 256
+
+
+class Subscription:
+    """One connected client: a bounded queue plus its item filter (None = everything)."""
+
+    def __init__(self, item_ids: Optional[Set[int]] = None):
+        self.item_ids = item_ids
+        self.events: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=_CLIENT_BUFFER)
+        self.dropped = False
+
+    def wants(self, event: Dict[str, Any]) -> bool:
+        return self.item_ids is None or event.get('item_id') in self.item_ids
+
+
+class MovementBroker:
+    """Thread-safe fan-out of movement events to every matching subscription."""
+
+    def __init__(self):
+        self._subscribers: List[Subscription] = []
+        self._lock = threading.Lock()
+
+    @property
+    def client_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, item_ids: Optional[Iterable[int]] = None, max_clients: int = 0) -> Optional[Subscription]:
+        """Registers a client. Returns None when the broker is already at max_clients."""
+        sub = Subscription(set(item_ids) if item_ids is not None else None)
+        with self._lock:
+            if max_clients and len(self._subscribers) >= max_clients:
+                return None
+            self._subscribers.append(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+
+    def publish(self, events: Iterable[Dict[str, Any]]) -> None:
+        """Delivers already-committed events. Never blocks the publishing request."""
+        events = list(events)
+        if not events:
+            return
+
+        with self._lock:
+            subscribers = list(self._subscribers)
+
+        for sub in subscribers:
+            for event in events:
+                if not sub.wants(event):
+                    continue
+                try:
+                    sub.events.put_nowait(event)
+                except queue.Full:
+                    # Slow consumer: its generator sees the flag and closes the stream
+                    sub.dropped = True
+                    self.unsubscribe(sub)
+                    logger.warning("SSE client dropped: event buffer full.")
+                    break
+
+
+broker = MovementBroker()
+
+
+def movement_event(item, movement) -> Dict[str, Any]:
+    """
+    Serialises a movement together with the item's new stock level. Call it after the
+    flush and before the commit: the commit expires both objects, and reading them
+    afterwards costs two SELECTs per movement. Publish the result after the commit.
+    """
+    return {
+        'movement_id': movement.movement_id,
+        'item_id': item.item_id,
+        'code': item.code,
+        'item_name': item.name,
+        'type': movement.movement_type.name,
+        'quantity': movement.quantity,
+        'stock_quantity': item.stock_quantity,
+        'uom': item.uom,
+        'reference_document': movement.reference_document,
+        'time': movement.timestamp.isoformat() if movement.timestamp else None
+    }
+
+
+def sse_format(data: Dict[str, Any], event: str = 'movement', event_id: Optional[int] = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def iter_sse(item_ids: Optional[Iterable[int]] = None, max_clients: int = 0,
+             heartbeat: float = 15.0, lifetime: float = 300.0) -> Iterator[str]:
+    """
+    Subscribes and yields SSE frames for one client. A comment line is sent every
+    `heartbeat` seconds so proxies (IIS ARR) keep the connection open; after `lifetime`
+    seconds the stream ends and EventSource reconnects, which frees the waitress thread.
+
+    The subscription is made inside the generator, so it exists only while the response
+    is actually streaming: a client that disconnects before the first frame never leaves
+    a subscription behind.
+    """
+    sub = broker.subscribe(item_ids, max_clients=max_clients)
+    if sub is None:
+        # Lost the race for the last slot after the route's capacity check
+        yield "retry: 30000\n\n"
+        yield sse_format({'error': 'Canlı akış kapasitesi dolu (Too many live clients).'}, event='busy')
+        return
+
+    deadline = time.monotonic() + lifetime
+    try:
+        yield "retry: 3000\n\n"
+        while time.monotonic() < deadline and not sub.dropped:
+            try:
+                event = sub.events.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            yield sse_format(event, event_id=event.get('movement_id'))
+    finally:
+        broker.unsubscribe(sub)
@@ -0,0 +1,332 @@
+"""
+Inventory Valuation Engine
+Replays the StockMovement ledger per item in (timestamp, movement_id) order and
+values stock with FIFO cost layers or a perpetual weighted-average cost.
+
+State is checkpointed per item and method (emek_stock_valuation_checkpoints),
+so a month-end run only streams the movements recorded since the last run.
+"""
+import itertools
+import logging
+from collections import deque
+from datetime import date, datetime, time, timezone
+from typing import Any, Deque, Dict, List, Optional, Sequence, Union
+
+from sqlalchemy import and_, or_
+
+from crminaec.core.models import db
+from crminaec.platforms.emek.labels import subtree_ids_select
+from crminaec.platforms.emek.models import (Item, MovementType,
+                                            StockMovement,
+                                            StockValuationCheckpoint,
+                                            ValuationMethod)
+
+logger = logging.getLogger(__name__)
+
+_EPSILON = 1e-9
+_STREAM_BATCH = 5000
+
+
+# ==============================================================================
+# 1. COST STATES (pure Python, one instance per item)
+# ==============================================================================
+class AverageCostState:
+    """Perpetual weighted average: receipts blend into the average, issues leave it unchanged."""
+
+    def __init__(self, quantity: float = 0.0, value: float = 0.0):
+        self.quantity = quantity
+        self.value = value
+
+    @property
+    def unit_cost(self) -> float:
+        return self.value / self.quantity if self.quantity > _EPSILON else 0.0
+
+    def receive(self, quantity: float, unit_cost: float) -> None:
+        if self.quantity < -_EPSILON:
+            # Stock was negative: the receipt first covers the shortfall at the new cost
+            self.value = (self.quantity + quantity) * unit_cost
+        else:
+            self.value += quantity * unit_cost
+        self.quantity += quantity
+
+    def issue(self, quantity: float, fallback_cost: float) -> None:
+        cost = self.unit_cost if self.quantity > _EPSILON else fallback_cost
+        self.quantity -= quantity
+        self.value -= quantity * cost
+
+    def to_checkpoint(self) -> Dict[str, Any]:
+        return {'quantity': self.quantity, 'value': self.value, 'layers': None}
+
+    @classmethod
+    def from_checkpoint(cls, cp: StockValuationCheckpoint) -> "AverageCostState":
+        return cls(cp.quantity, cp.value)
+
+
+class FifoState:
+    """FIFO cost layers. Issues beyond the available layers become a shortfall that the next receipt fills."""
+
+    def __init__(self, layers: Optional[Sequence[Sequence[float]]] = None,
+                 shortfall: float = 0.0, last_cost: float = 0.0):
+        self.layers: Deque[List[float]] = deque([float(q), float(c)] for q, c in (layers or []))
+        self.shortfall = shortfall
+        self.last_cost = last_cost
+
+    @property
+    def quantity(self) -> float:
+        return sum(q for q, _ in self.layers) - self.shortfall
+
+    @property
+    def value(self) -> float:
+        # The shortfall is valued at the most recent known cost
+        return sum(q * c for q, c in self.layers) - self.shortfall * self.last_cost
+
+    @property
+    def unit_cost(self) -> float:
+        qty = self.quantity
+        return self.value / qty if qty > _EPSILON else 0.0
+
+    def receive(self, quantity: float, unit_cost: float) -> None:
+        self.last_cost = unit_cost
+        covered = min(self.shortfall, quantity)
+        self.shortfall -= covered
+        if quantity - covered > _EPSILON:
+            self.layers.append([quantity - covered, unit_cost])
+
+    def issue(self, quantity: float, fallback_cost: float) -> None:
+        remaining = quantity
+        while remaining > _EPSILON and self.layers:
+            layer = self.layers[0]
+            taken = min(layer[0], remaining)
+            layer[0] -= taken
+            remaining -= taken
+            if layer[0] <= _EPSILON:
+                self.layers.popleft()
+        if remaining > _EPSILON:
+            if not self.last_cost:
+                self.last_cost = fallback_cost
+            self.shortfall += remaining
+
+    def to_checkpoint(self) -> Dict[str, Any]:
+        # The shortfall rides along as a trailing negative pseudo-layer carrying the last cost
+        layers = [list(layer) for layer in self.layers]
+        layers.append([-self.shortfall, self.last_cost])
+        return {'quantity': self.quantity, 'value': self.value, 'layers': layers}
+
+    @classmethod
+    def from_checkpoint(cls, cp: StockValuationCheckpoint) -> "FifoState":
+        stored = list(cp.layers or [])
+        if not stored or stored[-1][0] > 0:
+            return cls(stored)
+        shortfall, last_cost = stored[-1]
+        return cls(stored[:-1], -shortfall, last_cost)
+
+
+_STATES = {
+    ValuationMethod.FIFO: FifoState,
+    ValuationMethod.WEIGHTED_AVERAGE: AverageCostState,
+}
+
+
+def apply_movement(state, movement_type: MovementType, quantity: float,
+                   unit_cost: Optional[float], fallback_cost: float) -> None:
+    """
+    Folds one ledger entry into a cost state.
+    IN uses its own (snapshotted) cost. RETURN and positive ADJ re-enter at the
+    current unit cost unless the movement carries one. OUT and negative ADJ issue.
+    """
+    if movement_type == MovementType.IN:
+        state.receive(quantity, unit_cost if unit_cost is not None else fallback_cost)
+    elif movement_type == MovementType.OUT:
+        state.issue(quantity, fallback_cost)
+    elif quantity >= 0:
+        if unit_cost is None:
+            unit_cost = state.unit_cost if state.quantity > _EPSILON else fallback_cost
+        state.receive(quantity, unit_cost)
+    else:
+        state.issue(-quantity, fallback_cost)
+
+
+# ==============================================================================
+# 2. LEDGER STREAMING + CHECKPOINTS
+# ==============================================================================
+def _as_of_datetime(as_of: Union[date, datetime, None]) -> datetime:
+    """
+    The cutoff as a naive UTC datetime, comparable with the (UTC) movement timestamps.
+    A date means the end of that day in UTC; aware datetimes are converted to UTC and
+    naive ones are taken as UTC already.
+    """
+    if as_of is None:
+        cutoff = datetime.now(timezone.utc)
+    elif isinstance(as_of, datetime):
+        cutoff = as_of.astimezone(timezone.utc) if as_of.tzinfo else as_of
+    else:
+        cutoff = datetime.combine(as_of, time.max, tzinfo=timezone.utc)
+    return cutoff.replace(tzinfo=None)
+
+
+def _drop_stale_checkpoints(method: ValuationMethod) -> int:
+    """
+    Deletes checkpoints that a back-dated movement has invalidated
+    (recorded after the checkpoint, but timestamped before its position).
+    """
+    cp = StockValuationCheckpoint
+    stale = (
+        db.select(StockMovement.item_id)
+        .join(cp, and_(cp.item_id == StockMovement.item_id, cp.method == method))
+        .filter(StockMovement.movement_id > cp.last_movement_id,
+                StockMovement.timestamp < cp.last_timestamp)
+        .distinct()
+    )
+    result = db.session.execute(
+        db.delete(cp).where(cp.method == method, cp.item_id.in_(stale))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount or 0
+
+
+def value_inventory(as_of: Union[date, datetime, None] = None,
+                    method: ValuationMethod = ValuationMethod.WEIGHTED_AVERAGE,
+                    item_ids: Optional[Sequence[int]] = None,
+                    category_id: Optional[int] = None,
+                    save_checkpoints: bool = True) -> Dict[str, Any]:
+    """
+    Values every item with ledger history as of the end of `as_of` (default: now).
+    Returns {'as_of', 'method', 'total_value', 'items': [...]}.
+
+    Items whose checkpoint lies at or before `as_of` resume from it; items whose
+    checkpoint lies after (a historical re-run) are replayed from the start of
+    the ledger without touching their checkpoint.
+    """
+    cutoff = _as_of_datetime(as_of)
+    cp = StockValuationCheckpoint
+    state_cls = _STATES[method]
+
+    dropped = _drop_stale_checkpoints(method)
+    if dropped:
+        db.session.commit()
+        logger.info(f"Valuation: {dropped} checkpoints invalidated by back-dated movements.")
+
+    scope = []
+    if item_ids:
+        scope.append(Item.item_id.in_(list(item_ids)))
+    if category_id:
+        scope.append(Item.item_id.in_(subtree_ids_select(category_id)))
+
+    # 1. Item master data and checkpoints in two flat queries
+    items = {row.item_id: row for row in db.session.execute(
+        db.select(Item.item_id, Item.code, Item.name, Item.uom, Item.base_cost)
+        .filter(Item.is_category.is_not(True), *scope)
+    )}
+    cp_query = db.select(cp).filter(cp.method == method)
+    if scope:
+        cp_query = cp_query.filter(cp.item_id.in_(db.select(Item.item_id).filter(*scope)))
+    checkpoints = {c.item_id: c for c in db.session.scalars(cp_query)}
+
+    # 2. One ordered stream of only the movements each item still needs
+    m = StockMovement
+    stream = (
+        db.select(m.item_id, m.movement_id, m.timestamp, m.movement_type, m.quantity, m.unit_cost)
+        .outerjoin(cp, and_(cp.item_id == m.item_id, cp.method == method))
+        .filter(m.timestamp <= cutoff)
+        .filter(or_(
+            cp.item_id.is_(None),
+            cp.last_timestamp > cutoff,
+            m.timestamp > cp.last_timestamp,
+            and_(m.timestamp == cp.last_timestamp, m.movement_id > cp.last_movement_id)
+        ))
+        .order_by(m.item_id, m.timestamp, m.movement_id)
+        .execution_options(yield_per=_STREAM_BATCH)
+    )
+    if scope:
+        stream = stream.filter(m.item_id.in_(db.select(Item.item_id).filter(*scope)))
+
+    states: Dict[int, Any] = {}
+    new_positions: Dict[int, tuple] = {}
+    replayed = 0
+
+    for item_id, rows in itertools.groupby(db.session.execute(stream), key=lambda r: r.item_id):
+        item = items.get(item_id)
+        fallback = float(item.base_cost or 0.0) if item else 0.0
+        checkpoint = checkpoints.get(item_id)
+        resumable = checkpoint is not None and checkpoint.last_timestamp <= cutoff
+        state = state_cls.from_checkpoint(checkpoint) if resumable else state_cls()
+
+        last = None
+        for row in rows:
+            apply_movement(state, row.movement_type, float(row.quantity or 0.0), row.unit_cost, fallback)
+            last = row
+            replayed += 1
+
+        states[item_id] = state
+        # Historical re-runs must not move a newer checkpoint backwards
+        if last is not None and (checkpoint is None or resumable):
+            new_positions[item_id] = (last.timestamp, last.movement_id)
+
+    # 3. Items with nothing new since their checkpoint
+    for item_id, checkpoint in checkpoints.items():
+        if item_id not in states and checkpoint.last_timestamp <= cutoff:
+            states[item_id] = state_cls.from_checkpoint(checkpoint)
+
+    if save_checkpoints and new_positions:
+        _save_checkpoints(method, states, new_positions)
+
+    results = []
+    total = 0.0
+    for item_id, state in states.items():
+        item = items.get(item_id)
+        if item is None:
+            continue
+        quantity, value = state.quantity, state.value
+        total += value
+        results.append({
+            'item_id': item_id,
+            'code': item.code,
+            'name': item.name,
+            'uom': item.uom,
+            'quantity': round(quantity, 4),
+            'unit_cost': round(state.unit_cost, 4),
+            'value': round(value, 2)
+        })
+
+    results.sort(key=lambda r: r['code'])
+    logger.info(f"Valuation ({method.name}) as of {cutoff:%Y-%m-%d}: {len(results)} items, "
+                f"{replayed} movements replayed.")
+    return {
+        'as_of': cutoff.date().isoformat(),
+        'method': method.value,
+        'total_value': round(total, 2),
+        'items': results
+    }
+
+
+def _save_checkpoints(method: ValuationMethod, states: Dict[int, Any], positions: Dict[int, tuple]) -> None:
+    """Replaces the checkpoints of the advanced items in one DELETE plus one bulk INSERT."""
+    cp = StockValuationCheckpoint
+    now = datetime.now(timezone.utc)
+    rows = [{
+        'item_id': item_id,
+        'method': method,
+        'last_timestamp': ts,
+        'last_movement_id': movement_id,
+        'updated_at': now,
+        **states[item_id].to_checkpoint()
+    } for item_id, (ts, movement_id) in positions.items()]
+
+    ids = list(positions.keys())
+    for start in range(0, len(ids), 500):
+        db.session.execute(
+            db.delete(cp).where(cp.method == method, cp.item_id.in_(ids[start:start + 500]))
+            .execution_options(synchronize_session=False)
+        )
+    db.session.execute(db.insert(cp), rows)
+    db.session.commit()
+
+
+def reset_checkpoints(method: Optional[ValuationMethod] = None) -> int:
+    """Forces the next run to replay the full ledger (e.g. after correcting historical unit costs)."""
+    stmt = db.delete(StockValuationCheckpoint)
+    if method is not None:
+        stmt = stmt.where(StockValuationCheckpoint.method == method)
+    result = db.session.execute(stmt)
+    db.session.commit()
+    return result.rowcount or 0
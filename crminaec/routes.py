@@ -2,11 +2,16 @@
 import datetime
 import secrets
 
-from flask import (Blueprint, current_app, flash, redirect, render_template,
-                   request, send_from_directory, session, url_for)
+from flask import (Blueprint, abort, current_app, flash, jsonify, redirect,
+                   render_template, request, send_from_directory, session,
+                   url_for)
 from flask_login import current_user, login_required, login_user, logout_user
 
-from crminaec.core.models import Party, UserAccount, db
+from crminaec.core import parties, pricing  # noqa: F401 (register the dedupe and repricing job handlers)
+from crminaec.core.jobs import job_status, submit_job
+from crminaec.core.models import (BackgroundJob, JobStatus, Party,
+                                  UserAccount, db)
+from crminaec.core.pricing import REPRICEABLE_PRICE_TYPES
 from crminaec.core.security import role_required
 
 main_bp = Blueprint('main', __name__)
@@ -88,6 +93,52 @@ def manage_users():
     users = db.session.query(Party).all()
     return render_template('admin/manage_users.html', users=users)
 
+@main_bp.route('/admin/pricing/reprice', methods=['POST'])
+@login_required
+@role_required('admin')
+def reprice_catalogue():
+    """Applies a company-wide margin / overhead policy and recomputes every derived price in the background."""
+    options = {}
+    try:
+        for field in ('profit_margin_pct', 'general_expenses_pct'):
+            raw = (request.form.get(field) or '').strip().replace(',', '.')
+            if raw:
+                options[field] = float(raw)
+    except ValueError:
+        flash('Geçersiz yüzde değeri (Invalid percentage).', 'error')
+        return redirect(url_for('main.manage_users'))
+
+    # Only sell prices are derived; imported and hand-set cost records are never rewritten
+    options['price_type'] = request.form.get('price_type') or 'sell'
+    if options['price_type'] not in REPRICEABLE_PRICE_TYPES:
+        flash('Sadece satış fiyatları yeniden hesaplanabilir (Only sell prices can be repriced).', 'error')
+        return redirect(url_for('main.manage_users'))
+    if request.form.get('supplier'):
+        options['supplier'] = request.form['supplier']
+    options['include_tax'] = request.form.get('include_tax') == 'on'
+
+    job_id = submit_job('price_reprice', options, created_by=current_user.party_id,  # type: ignore
+                        return_url=url_for('main.manage_users'))
+    return redirect(url_for('main.job_progress', job_id=job_id))
+
+@main_bp.route('/admin/parties/dedupe', methods=['POST'])
+@login_required
+@role_required('admin')
+def party_dedupe():
+    """Refreshes contact matching keys and reports likely duplicate parties in the background."""
+    job_id = submit_job('party_dedupe', created_by=current_user.party_id,  # type: ignore
+                        return_url=url_for('main.manage_users'))
+    return redirect(url_for('main.job_progress', job_id=job_id))
+
+@main_bp.route('/admin/attachments/variants', methods=['POST'])
+@login_required
+@role_required('admin')
+def attachment_variants():
+    """Renders web-sized copies and thumbnails for image attachments uploaded before they existed."""
+    job_id = submit_job('attachment_variants', created_by=current_user.party_id,  # type: ignore
+                        return_url=url_for('main.manage_users'))
+    return redirect(url_for('main.job_progress', job_id=job_id))
+
 @main_bp.route('/admin/users/edit_party', methods=['POST'])
 @login_required
 @role_required('admin')
@@ -169,4 +220,53 @@ def profile():
         flash('Profil bilgileriniz başarıyla kaydedildi.', 'success')
         return redirect(url_for('main.profile'))
         
-    return render_template('profile.html', user=current_user)
\ No newline at end of file
+    return render_template('profile.html', user=current_user)
+
+# ==========================================
+# ⚙️ BACKGROUND JOBS (Import Progress)
+# ==========================================
+def _visible_job(job_id):
+    """Jobs are visible to whoever submitted them, and to admins."""
+    job = db.session.get(BackgroundJob, job_id)
+    if job is None:
+        abort(404)
+    is_admin = current_user.account and current_user.account.role == 'admin'  # type: ignore
+    if job.created_by != current_user.party_id and not is_admin:  # type: ignore
+        abort(404)
+    return job
+
+@main_bp.route('/api/jobs/<job_id>')
+@login_required
+def job_status_api(job_id):
+    """Polling endpoint: status, progress (0-1), message and result of a background job."""
+    return jsonify(job_status(_visible_job(job_id)))
+
+@main_bp.route('/jobs/<job_id>')
+@login_required
+def job_progress(job_id):
+    """Progress page shown after a form upload; moves on to job_done when the job ends."""
+    job = _visible_job(job_id)
+    return render_template('job_status.html', job=job, status=job_status(job))
+
+@main_bp.route('/jobs/<job_id>/done')
+@login_required
+def job_done(job_id):
+    """Turns a finished job into the flash message and redirect the upload route used to give."""
+    job = _visible_job(job_id)
+    if not job.is_finished:
+        return redirect(url_for('main.job_progress', job_id=job.job_id))
+
+    result = job.result or {}
+    if job.status == JobStatus.SUCCEEDED and result.get('redirect_url'):
+        # The job produced an external document (e.g. Google Docs): open it directly
+        return redirect(result['redirect_url'])
+
+    if job.status == JobStatus.FAILED:
+        flash(f'İşlem sırasında bir hata oluştu: {job.error}', 'danger')
+    elif job.message:
+        flash(job.message, result.get('category', 'success'))
+
+    target = result.get('redirect')
+    if target:
+        return redirect(url_for(target['endpoint'], **target.get('values', {})))
+    return redirect(job.return_url or url_for('main.index'))
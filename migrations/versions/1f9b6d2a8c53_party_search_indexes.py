@@ -0,0 +1,69 @@
+"""Party typeahead: folded name columns and name / phone indexes
+
+Revision ID: 1f9b6d2a8c53
+Revises: c3e7a1d95b42
+Create Date: 2026-10-18 14:48:05.117392
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1f9b6d2a8c53'
+down_revision = 'c3e7a1d95b42'
+branch_labels = None
+depends_on = None
+
+
+FOLDED = ('first_name_folded', 'last_name_folded')
+INDEXED = ('first_name', 'last_name', 'phone') + FOLDED
+
+
+def _backfill_folded_names():
+    """Fills the folded names of existing parties (the typeahead only searches those)."""
+    from crminaec.core.contacts import fold_name
+
+    bind = op.get_bind()
+    parties = sa.table('parties', sa.column('party_id'), sa.column('first_name'), sa.column('last_name'),
+                       sa.column('first_name_folded'), sa.column('last_name_folded'))
+    rows = bind.execute(sa.select(parties.c.party_id, parties.c.first_name, parties.c.last_name)).all()
+    updates = [
+        {'pid': row.party_id,
+         'first_name_folded': fold_name(row.first_name) or None,
+         'last_name_folded': fold_name(row.last_name) or None}
+        for row in rows
+    ]
+    if updates:
+        bind.execute(
+            parties.update().where(parties.c.party_id == sa.bindparam('pid'))
+            .values(first_name_folded=sa.bindparam('first_name_folded'),
+                    last_name_folded=sa.bindparam('last_name_folded')),
+            updates
+        )
+
+
+def upgrade():
+    # Each step is skipped when db.create_all() has already done it
+    inspector = sa.inspect(op.get_bind())
+    columns = {c['name'] for c in inspector.get_columns('parties')}
+    indexes = {i['name'] for i in inspector.get_indexes('parties')}
+
+    missing = [name for name in FOLDED if name not in columns]
+    with op.batch_alter_table('parties', schema=None) as batch_op:
+        for name in missing:
+            batch_op.add_column(sa.Column(name, sa.String(length=50), nullable=True))
+        for column in INDEXED:
+            if f'ix_parties_{column}' not in indexes:
+                batch_op.create_index(batch_op.f(f'ix_parties_{column}'), [column], unique=False)
+
+    if missing:
+        _backfill_folded_names()
+
+
+def downgrade():
+    with op.batch_alter_table('parties', schema=None) as batch_op:
+        for column in reversed(INDEXED):
+            batch_op.drop_index(batch_op.f(f'ix_parties_{column}'))
+        for name in reversed(FOLDED):
+            batch_op.drop_column(name)
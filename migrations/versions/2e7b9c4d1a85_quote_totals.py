@@ -0,0 +1,40 @@
+"""Server-computed quote totals: typology breakdown, computed-at stamp, revision
+
+Revision ID: 2e7b9c4d1a85
+Revises: 9c5f3a2e6d18
+Create Date: 2026-10-18 16:57:40.218336
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2e7b9c4d1a85'
+down_revision = '9c5f3a2e6d18'
+branch_labels = None
+depends_on = None
+
+
+def _columns():
+    return [
+        sa.Column('totals', sa.JSON(), nullable=True),
+        sa.Column('totals_at', sa.DateTime(), nullable=True),
+        sa.Column('revision', sa.Integer(), server_default='0', nullable=False),
+    ]
+
+
+def upgrade():
+    # Skipped when db.create_all() has already added them
+    existing = {c['name'] for c in sa.inspect(op.get_bind()).get_columns('quotes')}
+    missing = [column for column in _columns() if column.name not in existing]
+    if missing:
+        with op.batch_alter_table('quotes', schema=None) as batch_op:
+            for column in missing:
+                batch_op.add_column(column)
+
+
+def downgrade():
+    with op.batch_alter_table('quotes', schema=None) as batch_op:
+        for column in reversed(_columns()):
+            batch_op.drop_column(column.name)
@@ -0,0 +1,59 @@
+"""Soft-delete / archive indexes for the hot list queries
+
+Composite and partial indexes for the Arkhon dashboard (orders by customer
+and soft-delete flags), the EMEK catalogue and tree roots, and the Pearson
+course lists (emek_items by item_type). The partial indexes' WHERE clause is
+written exactly as SQLAlchemy renders `col.is_not(True)` on each backend;
+the planner only uses a partial index when the query repeats that term.
+
+Revision ID: 3c1e8b27d4f6
+Revises: b5e9d2c7a416
+Create Date: 2026-10-18 09:12:41.532118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1e8b27d4f6'
+down_revision = 'b5e9d2c7a416'
+branch_labels = None
+depends_on = None
+
+
+# Partial WHERE per dialect: (SQLite, PostgreSQL)
+LIVE = ('is_deleted IS NOT 1', 'is_deleted IS NOT true')
+
+# (name, table, columns, partial WHERE)
+INDEXES = [
+    ('ix_orders_party_flags', 'orders', ['party_id', 'is_deleted', 'is_archived', 'order_id'], None),
+    ('ix_orders_live_open', 'orders', ['is_archived', 'handover_date'], LIVE),
+    ('ix_order_items_order_typology', 'order_items', ['order_id', 'typology_id'], None),
+    ('ix_emek_items_type_flags_code', 'emek_items', ['item_type', 'is_deleted', 'is_archived', 'code'], None),
+    ('ix_emek_items_live_code', 'emek_items', ['code', 'is_archived'], LIVE),
+    ('ix_emek_item_compositions_parent_sort', 'emek_item_compositions', ['parent_id', 'sort_order'], None),
+    ('ix_emek_item_compositions_child', 'emek_item_compositions', ['child_id'], None),
+]
+
+
+def _existing_indexes(inspector, table):
+    return {i['name'] for i in inspector.get_indexes(table)}
+
+
+def upgrade():
+    # Each index is skipped when db.create_all() has already created it
+    inspector = sa.inspect(op.get_bind())
+
+    for name, table, columns, where in INDEXES:
+        if inspector.has_table(table) and name not in _existing_indexes(inspector, table):
+            kwargs = {'sqlite_where': sa.text(where[0]), 'postgresql_where': sa.text(where[1])} if where else {}
+            op.create_index(name, table, columns, unique=False, **kwargs)
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    for name, table, _columns, _where in reversed(INDEXES):
+        if inspector.has_table(table) and name in _existing_indexes(inspector, table):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,67 @@
+"""Background jobs, with owner and heartbeat for stale-only recovery
+
+Revision ID: 4b8d1e7a3c60
+Revises: e6a2c8f4b719
+Create Date: 2026-10-18 15:58:12.390547
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b8d1e7a3c60'
+down_revision = 'e6a2c8f4b719'
+branch_labels = None
+depends_on = None
+
+
+def _ownership_columns():
+    return [
+        sa.Column('owner', sa.String(length=64), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+    ]
+
+
+def upgrade():
+    # Each step is skipped when db.create_all() has already done it
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('background_jobs'):
+        op.create_table('background_jobs',
+        sa.Column('job_id', sa.String(length=32), nullable=False),
+        sa.Column('kind', sa.String(length=50), nullable=False),
+        sa.Column('status', sa.Enum('QUEUED', 'RUNNING', 'SUCCEEDED', 'FAILED', name='jobstatus'), nullable=False),
+        sa.Column('progress', sa.Float(), nullable=False),
+        sa.Column('message', sa.String(length=255), nullable=True),
+        sa.Column('payload', sa.JSON(), nullable=True),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('return_url', sa.String(length=255), nullable=True),
+        sa.Column('created_by', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        *_ownership_columns(),
+        sa.ForeignKeyConstraint(['created_by'], ['parties.party_id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('job_id')
+        )
+        with op.batch_alter_table('background_jobs', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_background_jobs_kind'), ['kind'], unique=False)
+            batch_op.create_index(batch_op.f('ix_background_jobs_status'), ['status'], unique=False)
+        return
+
+    columns = {c['name'] for c in inspector.get_columns('background_jobs')}
+    missing = [column for column in _ownership_columns() if column.name not in columns]
+    if missing:
+        with op.batch_alter_table('background_jobs', schema=None) as batch_op:
+            for column in missing:
+                batch_op.add_column(column)
+
+
+def downgrade():
+    with op.batch_alter_table('background_jobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_background_jobs_status'))
+        batch_op.drop_index(batch_op.f('ix_background_jobs_kind'))
+
+    op.drop_table('background_jobs')
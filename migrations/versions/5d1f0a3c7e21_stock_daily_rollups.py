@@ -0,0 +1,47 @@
+"""Daily stock rollups
+
+Per-item, per-day movement totals the inventory reports read instead of the
+ledger. The table starts empty: run `python run.py rebuild-stock-rollups` once to
+backfill it from emek_stock_movements.
+
+Revision ID: 5d1f0a3c7e21
+Revises: a9f7a2bbc3f5
+Create Date: 2026-10-18 08:02:11.418305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d1f0a3c7e21'
+down_revision = 'a9f7a2bbc3f5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases set up with db.create_all() already have the table
+    if sa.inspect(op.get_bind()).has_table('emek_stock_daily_rollups'):
+        return
+
+    op.create_table('emek_stock_daily_rollups',
+    sa.Column('item_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('qty_in', sa.Float(), nullable=False),
+    sa.Column('qty_out', sa.Float(), nullable=False),
+    sa.Column('qty_return', sa.Float(), nullable=False),
+    sa.Column('qty_adj', sa.Float(), nullable=False),
+    sa.Column('movement_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['item_id'], ['emek_items.item_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('item_id', 'day')
+    )
+    with op.batch_alter_table('emek_stock_daily_rollups', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_emek_stock_daily_rollups_day'), ['day'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('emek_stock_daily_rollups', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_emek_stock_daily_rollups_day'))
+
+    op.drop_table('emek_stock_daily_rollups')
@@ -0,0 +1,76 @@
+"""Party matching keys: normalised email, E.164 phone and name blocking key
+
+Revision ID: 6f1c4a9e2b38
+Revises: d8a3f6b2e547
+Create Date: 2026-10-18 17:31:46.902157
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f1c4a9e2b38'
+down_revision = 'd8a3f6b2e547'
+branch_labels = None
+depends_on = None
+
+
+KEYS = {
+    'email_normalized': sa.String(length=120),
+    'phone_e164': sa.String(length=20),
+    'name_key': sa.String(length=20),
+}
+
+
+def _backfill_party_keys():
+    """Fills the matching keys of existing parties (lead intake and logins look parties up by them)."""
+    from crminaec.core.contacts import name_key, normalize_email, normalize_phone
+
+    bind = op.get_bind()
+    parties = sa.table('parties', sa.column('party_id'), sa.column('email'), sa.column('phone'),
+                       sa.column('first_name'), sa.column('last_name'), sa.column('email_normalized'),
+                       sa.column('phone_e164'), sa.column('name_key'))
+    rows = bind.execute(sa.select(parties.c.party_id, parties.c.email, parties.c.phone,
+                                  parties.c.first_name, parties.c.last_name)).all()
+    updates = [
+        {'pid': row.party_id,
+         'email_normalized': normalize_email(row.email),
+         'phone_e164': normalize_phone(row.phone),
+         'name_key': name_key(row.first_name, row.last_name)}
+        for row in rows
+    ]
+    if updates:
+        bind.execute(
+            parties.update().where(parties.c.party_id == sa.bindparam('pid'))
+            .values(email_normalized=sa.bindparam('email_normalized'),
+                    phone_e164=sa.bindparam('phone_e164'),
+                    name_key=sa.bindparam('name_key')),
+            updates
+        )
+
+
+def upgrade():
+    # Each step is skipped when db.create_all() has already done it
+    inspector = sa.inspect(op.get_bind())
+    columns = {c['name'] for c in inspector.get_columns('parties')}
+    indexes = {i['name'] for i in inspector.get_indexes('parties')}
+
+    missing = [name for name in KEYS if name not in columns]
+    with op.batch_alter_table('parties', schema=None) as batch_op:
+        for name in missing:
+            batch_op.add_column(sa.Column(name, KEYS[name], nullable=True))
+        for name in KEYS:
+            if f'ix_parties_{name}' not in indexes:
+                batch_op.create_index(batch_op.f(f'ix_parties_{name}'), [name], unique=False)
+
+    if missing:
+        _backfill_party_keys()
+
+
+def downgrade():
+    with op.batch_alter_table('parties', schema=None) as batch_op:
+        for name in reversed(list(KEYS)):
+            batch_op.drop_index(batch_op.f(f'ix_parties_{name}'))
+        for name in reversed(list(KEYS)):
+            batch_op.drop_column(name)
@@ -0,0 +1,39 @@
+"""Web-sized and thumbnail variants on order attachments
+
+Revision ID: 7b42d9e0c5a1
+Revises: 3c1e8b27d4f6
+Create Date: 2026-10-18 11:40:07.218664
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b42d9e0c5a1'
+down_revision = '3c1e8b27d4f6'
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = ('web_path', 'thumb_path')
+
+
+def _existing_columns():
+    return {c['name'] for c in sa.inspect(op.get_bind()).get_columns('order_attachments')}
+
+
+def upgrade():
+    missing = [name for name in COLUMNS if name not in _existing_columns()]
+    if missing:
+        with op.batch_alter_table('order_attachments', schema=None) as batch_op:
+            for name in missing:
+                batch_op.add_column(sa.Column(name, sa.String(length=500), nullable=True))
+
+
+def downgrade():
+    present = [name for name in COLUMNS if name in _existing_columns()]
+    if present:
+        with op.batch_alter_table('order_attachments', schema=None) as batch_op:
+            for name in present:
+                batch_op.drop_column(name)
@@ -0,0 +1,51 @@
+"""Inventory valuation: movement unit cost, ledger order index, checkpoints
+
+Revision ID: 8a4c2e9b1f07
+Revises: 5d1f0a3c7e21
+Create Date: 2026-10-18 08:09:47.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a4c2e9b1f07'
+down_revision = '5d1f0a3c7e21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Each step is skipped when db.create_all() has already done it
+    inspector = sa.inspect(op.get_bind())
+    columns = {c['name'] for c in inspector.get_columns('emek_stock_movements')}
+    indexes = {i['name'] for i in inspector.get_indexes('emek_stock_movements')}
+
+    with op.batch_alter_table('emek_stock_movements', schema=None) as batch_op:
+        if 'unit_cost' not in columns:
+            batch_op.add_column(sa.Column('unit_cost', sa.Float(), nullable=True))
+        if 'ix_emek_stock_movements_item_ts' not in indexes:
+            batch_op.create_index('ix_emek_stock_movements_item_ts', ['item_id', 'timestamp', 'movement_id'], unique=False)
+
+    if not inspector.has_table('emek_stock_valuation_checkpoints'):
+        op.create_table('emek_stock_valuation_checkpoints',
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('method', sa.Enum('FIFO', 'WEIGHTED_AVERAGE', name='valuationmethod'), nullable=False),
+        sa.Column('last_timestamp', sa.DateTime(), nullable=False),
+        sa.Column('last_movement_id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Float(), nullable=False),
+        sa.Column('value', sa.Float(), nullable=False),
+        sa.Column('layers', sa.JSON(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['item_id'], ['emek_items.item_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('item_id', 'method')
+        )
+
+
+def downgrade():
+    op.drop_table('emek_stock_valuation_checkpoints')
+
+    with op.batch_alter_table('emek_stock_movements', schema=None) as batch_op:
+        batch_op.drop_index('ix_emek_stock_movements_item_ts')
+        batch_op.drop_column('unit_cost')
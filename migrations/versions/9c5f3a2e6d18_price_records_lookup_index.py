@@ -0,0 +1,29 @@
+"""Effective-price lookup index on price_records
+
+Revision ID: 9c5f3a2e6d18
+Revises: 4b8d1e7a3c60
+Create Date: 2026-10-18 16:31:27.554091
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c5f3a2e6d18'
+down_revision = '4b8d1e7a3c60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Skipped when db.create_all() has already created it
+    indexes = {i['name'] for i in sa.inspect(op.get_bind()).get_indexes('price_records')}
+    if 'ix_price_records_lookup' not in indexes:
+        with op.batch_alter_table('price_records', schema=None) as batch_op:
+            batch_op.create_index('ix_price_records_lookup', ['entity_code', 'price_type', 'supplier', 'valid_from'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('price_records', schema=None) as batch_op:
+        batch_op.drop_index('ix_price_records_lookup')
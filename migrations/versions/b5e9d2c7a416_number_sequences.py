@@ -0,0 +1,30 @@
+"""Block-reserved document number sequences
+
+Revision ID: b5e9d2c7a416
+Revises: 6f1c4a9e2b38
+Create Date: 2026-10-18 17:52:20.446810
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e9d2c7a416'
+down_revision = '6f1c4a9e2b38'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Skipped when db.create_all() has already created the table
+    if not sa.inspect(op.get_bind()).has_table('number_sequences'):
+        op.create_table('number_sequences',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('next_value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+        )
+
+
+def downgrade():
+    op.drop_table('number_sequences')
@@ -0,0 +1,75 @@
+"""Order-driven stock reservations and expected deliveries
+
+Revision ID: c3e7a1d95b42
+Revises: 8a4c2e9b1f07
+Create Date: 2026-10-18 14:12:31.640275
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e7a1d95b42'
+down_revision = '8a4c2e9b1f07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Each table is skipped when db.create_all() has already created it
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('emek_stock_reservations'):
+        op.create_table('emek_stock_reservations',
+        sa.Column('reservation_id', sa.Integer(), nullable=False),
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=False),
+        sa.Column('order_item_id', sa.Integer(), nullable=True),
+        sa.Column('quantity', sa.Float(), nullable=False),
+        sa.Column('fulfilled_quantity', sa.Float(), nullable=False),
+        sa.Column('needed_by', sa.DateTime(), nullable=True),
+        sa.Column('expected_on', sa.DateTime(), nullable=True),
+        sa.Column('status', sa.Enum('ACTIVE', 'FULFILLED', name='reservationstatus'), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['item_id'], ['emek_items.item_id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['order_id'], ['orders.order_id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['order_item_id'], ['order_items.item_id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('reservation_id')
+        )
+        with op.batch_alter_table('emek_stock_reservations', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_emek_stock_reservations_item_id'), ['item_id'], unique=False)
+            batch_op.create_index('ix_emek_stock_reservations_item_status', ['item_id', 'status', 'needed_by'], unique=False)
+            batch_op.create_index(batch_op.f('ix_emek_stock_reservations_order_id'), ['order_id'], unique=False)
+
+    if not inspector.has_table('emek_stock_inbound'):
+        op.create_table('emek_stock_inbound',
+        sa.Column('inbound_id', sa.Integer(), nullable=False),
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Float(), nullable=False),
+        sa.Column('received_quantity', sa.Float(), nullable=False),
+        sa.Column('reference_document', sa.String(length=100), nullable=True),
+        sa.Column('expected_on', sa.DateTime(), nullable=True),
+        sa.Column('status', sa.Enum('OPEN', 'RECEIVED', name='inboundstatus'), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['item_id'], ['emek_items.item_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('inbound_id')
+        )
+        with op.batch_alter_table('emek_stock_inbound', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_emek_stock_inbound_item_id'), ['item_id'], unique=False)
+            batch_op.create_index('ix_emek_stock_inbound_item_status', ['item_id', 'status', 'expected_on'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('emek_stock_inbound', schema=None) as batch_op:
+        batch_op.drop_index('ix_emek_stock_inbound_item_status')
+        batch_op.drop_index(batch_op.f('ix_emek_stock_inbound_item_id'))
+
+    op.drop_table('emek_stock_inbound')
+
+    with op.batch_alter_table('emek_stock_reservations', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_emek_stock_reservations_order_id'))
+        batch_op.drop_index('ix_emek_stock_reservations_item_status')
+        batch_op.drop_index(batch_op.f('ix_emek_stock_reservations_item_id'))
+
+    op.drop_table('emek_stock_reservations')
@@ -0,0 +1,47 @@
+"""Email outbox for the background mail sender
+
+Revision ID: d8a3f6b2e547
+Revises: 2e7b9c4d1a85
+Create Date: 2026-10-18 17:05:12.318904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8a3f6b2e547'
+down_revision = '2e7b9c4d1a85'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Skipped when db.create_all() has already created the table
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('email_outbox'):
+        op.create_table('email_outbox',
+        sa.Column('email_id', sa.Integer(), nullable=False),
+        sa.Column('recipients', sa.JSON(), nullable=False),
+        sa.Column('subject', sa.String(length=255), nullable=False),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('html', sa.Text(), nullable=True),
+        sa.Column('sender', sa.String(length=255), nullable=True),
+        sa.Column('status', sa.Enum('PENDING', 'SENDING', 'SENT', 'FAILED', name='emailstatus'), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('email_id')
+        )
+        with op.batch_alter_table('email_outbox', schema=None) as batch_op:
+            batch_op.create_index('ix_email_outbox_due', ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('email_outbox', schema=None) as batch_op:
+        batch_op.drop_index('ix_email_outbox_due')
+
+    op.drop_table('email_outbox')
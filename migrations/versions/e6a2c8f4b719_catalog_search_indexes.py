@@ -0,0 +1,76 @@
+"""Catalogue typeahead: product list indexes and the product word index
+
+Revision ID: e6a2c8f4b719
+Revises: 1f9b6d2a8c53
+Create Date: 2026-10-18 15:21:44.806113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6a2c8f4b719'
+down_revision = '1f9b6d2a8c53'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_catalog_products_brand_name', ['brand', 'product_name']),
+    ('ix_catalog_products_category_brand_name', ['category', 'brand', 'product_name']),
+    ('ix_catalog_products_product_name', ['product_name']),
+]
+
+
+def _backfill_words():
+    """Indexes the words of every existing product (the typeahead only searches those)."""
+    from crminaec.core.search import search_words
+
+    bind = op.get_bind()
+    products = sa.table('catalog_products', sa.column('product_id'), sa.column('product_code'),
+                        sa.column('brand'), sa.column('product_name'))
+    words = sa.table('catalog_product_words', sa.column('word'), sa.column('product_id'))
+    rows = bind.execute(sa.select(products.c.product_id, products.c.product_code,
+                                  products.c.brand, products.c.product_name)).all()
+    values = [
+        {'word': word, 'product_id': row.product_id}
+        for row in rows
+        for word in search_words(row.product_code, row.brand, row.product_name)
+    ]
+    if values:
+        bind.execute(words.insert(), values)
+
+
+def upgrade():
+    # Each step is skipped when db.create_all() has already done it
+    inspector = sa.inspect(op.get_bind())
+    indexes = {i['name'] for i in inspector.get_indexes('catalog_products')}
+
+    with op.batch_alter_table('catalog_products', schema=None) as batch_op:
+        for name, columns in INDEXES:
+            if name not in indexes:
+                batch_op.create_index(name, columns, unique=False)
+
+    if not inspector.has_table('catalog_product_words'):
+        op.create_table('catalog_product_words',
+        sa.Column('word', sa.String(length=100), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['catalog_products.product_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('word', 'product_id')
+        )
+        with op.batch_alter_table('catalog_product_words', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_catalog_product_words_product_id'), ['product_id'], unique=False)
+
+        _backfill_words()
+
+
+def downgrade():
+    with op.batch_alter_table('catalog_product_words', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_catalog_product_words_product_id'))
+
+    op.drop_table('catalog_product_words')
+
+    with op.batch_alter_table('catalog_products', schema=None) as batch_op:
+        for name, _ in reversed(INDEXES):
+            batch_op.drop_index(name)
@@ -447,6 +447,100 @@ def exportdata(output_dir):
         
         click.echo(f"✅ Fail-safe export complete! Files saved to {os.path.abspath(output_dir)}")
 
+# =====================================================================
+# 📦 INVENTORY (EMEK Warehouse)
+# =====================================================================
+
+@cli.command('labels')
+@click.option('--item-id', 'item_ids', type=int, multiple=True, help='Item ID to label (repeatable)')
+@click.option('--category-id', type=int, help='Label every item under this category')
+@click.option('--layout', type=click.Choice(['a4', 'roll']), default='a4', help='A4 sheet grid or 50x50mm roll')
+@click.option('--output', '-o', type=click.Path(), default='output/labels.pdf', help='Output PDF path')
+def labels(item_ids, category_id, layout, output):
+    """Generate one QR label PDF for many items (e.g. a new delivery)"""
+    from crminaec.platforms.emek.labels import generate_label_sheet
+
+    if not item_ids and not category_id:
+        click.echo("❌ Provide --item-id and/or --category-id.")
+        sys.exit(1)
+
+    app = create_app()
+    with app.app_context():
+        pdf_bytes = generate_label_sheet(
+            item_ids=list(item_ids),
+            category_id=category_id,
+            cache_dir=app.config['QR_CACHE_DIR'],
+            layout=layout,
+            font_path=app.config.get('LABEL_FONT_PATH'),
+            max_workers=app.config.get('WORKER_PROCESSES') or None
+        )
+
+    if pdf_bytes is None:
+        click.echo("⚠️ No printable items found.")
+        sys.exit(1)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'wb') as f:
+        f.write(pdf_bytes)
+    click.echo(f"✅ Label sheet saved to {os.path.abspath(output)}")
+
+@cli.command('rebuild-stock-rollups')
+def rebuild_stock_rollups():
+    """Recompute the daily stock rollup table from the full movement ledger"""
+    from crminaec.platforms.emek.stock import rebuild_daily_rollups
+
+    app = create_app()
+    with app.app_context():
+        count = rebuild_daily_rollups()
+    click.echo(f"✅ {count} daily rollup rows rebuilt.")
+
+@cli.command('sync-reservations')
+@click.option('--order-id', 'order_ids', type=int, multiple=True, help='Order to sync (repeatable). Default: all open orders')
+def sync_reservations(order_ids):
+    """Rebuild stock reservations from Arkhon order lines and milestone dates"""
+    from crminaec.platforms.emek.reservations import (sync_open_orders,
+                                                      sync_order_reservations)
+
+    app = create_app()
+    with app.app_context():
+        active = sync_order_reservations(list(order_ids)) if order_ids else sync_open_orders()
+    click.echo(f"✅ {active} active reservations.")
+
+@cli.command('valuation')
+@click.option('--as-of', type=click.DateTime(formats=['%Y-%m-%d']), default=None, help='Value stock at the end of this day (default: today)')
+@click.option('--method', type=click.Choice(['avg', 'fifo']), default='avg', help='Weighted average or FIFO')
+@click.option('--category-id', type=int, help='Only items under this category')
+@click.option('--output', '-o', type=click.Path(), default=None, help='Optional CSV output path')
+@click.option('--reset', is_flag=True, help='Discard checkpoints and replay the whole ledger')
+def valuation(as_of, method, category_id, output, reset):
+    """Inventory valuation (month-end close) from the stock ledger"""
+    import csv
+
+    from crminaec.platforms.emek.models import ValuationMethod
+    from crminaec.platforms.emek.valuation import (reset_checkpoints,
+                                                   value_inventory)
+
+    valuation_method = ValuationMethod.FIFO if method == 'fifo' else ValuationMethod.WEIGHTED_AVERAGE
+
+    app = create_app()
+    with app.app_context():
+        if reset:
+            removed = reset_checkpoints(valuation_method)
+            click.echo(f"♻️ {removed} checkpoints cleared.")
+        result = value_inventory(as_of=as_of.date() if as_of else None, method=valuation_method,
+                                 category_id=category_id)
+
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.DictWriter(f, fieldnames=['item_id', 'code', 'name', 'uom', 'quantity', 'unit_cost', 'value'])
+            writer.writeheader()
+            writer.writerows(result['items'])
+        click.echo(f"✅ Valuation saved to {os.path.abspath(output)}")
+
+    click.echo(f"📦 {len(result['items'])} items | {result['method']} | as of {result['as_of']} | "
+               f"Total: {result['total_value']:,.2f}")
+
 from crminaec.cli.report_commands import report
 
 cli.add_command(report)
@@ -0,0 +1,58 @@
+"""
+Flask application fixture for integration tests of the crminaec app.
+
+Each test gets a fresh app on its own SQLite file (tests/conftest.py still
+targets the retired course schema, so these tests import the fixture from
+here). Import it into a test module with `from tests.integration.support import app`.
+"""
+import pytest
+
+from crminaec import create_app
+from crminaec.config import TestingConfig
+from crminaec.core.models import db
+
+
+def make_app(tmp_path, monkeypatch, **overrides):
+    """A 'testing' app on tmp_path/test.db with every file-writing directory under tmp_path."""
+    settings = {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'MAIL_OUTBOX_SINK_DIR': str(tmp_path / 'mail'),
+        'JOB_UPLOAD_DIR': tmp_path / 'job_uploads',
+        'QR_CACHE_DIR': tmp_path / 'qr_cache',
+        'PDF_CACHE_DIR': tmp_path / 'pdf_cache',
+        **overrides
+    }
+    for key, value in settings.items():
+        monkeypatch.setattr(TestingConfig, key, value, raising=False)
+
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """Testing app with an application context pushed for the whole test."""
+    application = make_app(tmp_path, monkeypatch)
+    with application.app_context():
+        yield application
+        db.session.remove()
+        db.engine.dispose()
+
+
+def login_client(app, role='admin', email='admin@example.com'):
+    """Test client signed in as a new party holding a portal account with `role`."""
+    from crminaec.core.models import Party, UserAccount
+
+    party = Party(email=email, first_name='Test', last_name='Yönetici')
+    party.account = UserAccount(party_id=0, role=role, is_confirmed=True)
+    party.account.set_password('secret')
+    db.session.add(party)
+    db.session.commit()
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(party.party_id)
+        session['_fresh'] = True
+    return client
@@ -0,0 +1,88 @@
+"""
+Integration tests for attachment image variants (platforms/arkhon/attachments.py).
+"""
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from crminaec.core.jobs import JobContext
+from crminaec.core.models import Order, OrderAttachment, db
+from crminaec.platforms.arkhon import attachments
+from crminaec.platforms.arkhon.attachments import (render_variants,
+                                                   run_attachment_variants)
+from tests.integration.support import app
+
+SIZES = {'web': 200, 'thumb': 50}
+ORIENTATION, GPS_INFO = 0x0112, 0x8825
+
+
+def _photo(path: Path, size=(400, 300), orientation=None) -> Path:
+    """A JPEG as a phone writes it: EXIF with a GPS block and, optionally, a rotation flag."""
+    image = Image.new('RGB', size, (200, 30, 30))
+    exif = Image.Exif()
+    exif[GPS_INFO] = {1: 'N', 2: (41.0, 0.0, 0.0)}
+    if orientation:
+        exif[ORIENTATION] = orientation
+    image.save(path, 'JPEG', exif=exif)
+    return path
+
+
+@pytest.mark.integration
+class TestRenderVariants:
+    """Variants are downscaled, upright and carry no EXIF."""
+
+    def test_sizes_orientation_and_exif(self, tmp_path):
+        # Orientation 6: stored landscape, shown portrait
+        source = _photo(tmp_path / 'olcu.jpg', orientation=6)
+        names = render_variants(str(source), str(tmp_path / 'variants'), 'olcu', SIZES)
+        assert names == {'web': 'olcu_web.webp', 'thumb': 'olcu_thumb.webp'}
+
+        with Image.open(tmp_path / 'variants' / names['web']) as web:
+            assert web.size == (150, 200)
+            assert not web.getexif()
+        with Image.open(tmp_path / 'variants' / names['thumb']) as thumb:
+            assert max(thumb.size) == 50
+        assert not list((tmp_path / 'variants').glob('*.tmp'))
+
+    def test_transparent_png_as_jpeg_gets_white_background(self, tmp_path):
+        source = tmp_path / 'logo.png'
+        Image.new('RGBA', (100, 100), (0, 0, 0, 0)).save(source)
+        names = render_variants(str(source), str(tmp_path), 'logo', {'thumb': 40}, fmt='JPEG')
+
+        with Image.open(tmp_path / names['thumb']) as thumb:
+            assert (thumb.format, thumb.mode) == ('JPEG', 'RGB')
+            assert thumb.getpixel((20, 20)) >= (250, 250, 250)
+
+
+@pytest.mark.integration
+class TestAttachmentVariantsJob:
+    """The job records rendered variants and skips what it cannot read."""
+
+    def test_rendered_failed_and_missing(self, app, tmp_path, monkeypatch):
+        monkeypatch.setattr(attachments, '_disk_path', lambda url: tmp_path / url.removeprefix('/static/'))
+        app.config['ATTACHMENT_VARIANT_SIZES'] = SIZES
+        uploads = tmp_path / 'uploads' / 'orders'
+        uploads.mkdir(parents=True)
+        _photo(uploads / 'S-1_olcu.jpg')
+        (uploads / 'S-1_bozuk.jpg').write_bytes(b'not an image')
+
+        order = Order(order_number='S-1')
+        for name in ('olcu', 'bozuk', 'kayip'):
+            order.attachments.append(OrderAttachment(
+                original_filename=f'{name}.jpg', semantic_filename=f'S-1_{name}.jpg',
+                file_path=f'/static/uploads/orders/S-1_{name}.jpg', file_type='image'))
+        db.session.add(order)
+        db.session.commit()
+
+        result = run_attachment_variants(JobContext('variants'))
+        assert (result['processed'], result['failed'], result['missing']) == (1, 1, 1)
+
+        olcu, bozuk, kayip = order.attachments
+        assert olcu.thumb_path == '/static/uploads/orders/variants/S-1_olcu_thumb.webp'
+        assert olcu.view_path == '/static/uploads/orders/variants/S-1_olcu_web.webp'
+        assert (uploads / 'variants' / 'S-1_olcu_thumb.webp').exists()
+        assert bozuk.view_path == bozuk.file_path and kayip.thumb_path is None
+
+        # The backfill run only picks up images still without variants
+        assert run_attachment_variants(JobContext('variants'))['processed'] == 0
@@ -0,0 +1,70 @@
+"""
+Integration tests for the catalogue typeahead and its word index (CatalogProductWord).
+"""
+import pytest
+from sqlalchemy import event
+
+from crminaec.core.models import CatalogProduct, CatalogProductWord, db
+from crminaec.platforms.arkhon.routes import catalog_search_stmt
+from tests.integration.support import app
+
+
+def _codes(term, category=''):
+    return [row.product_code for row in db.session.execute(catalog_search_stmt(term, category))]
+
+
+@pytest.mark.integration
+class TestCatalogSearch:
+    """Every typed word must start a word of the code, brand or name; case and Turkish letters don't matter."""
+
+    @pytest.fixture
+    def products(self, app):
+        db.session.add_all([
+            CatalogProduct(category='Ankastre', brand='Bosch', product_code='HBG-635', product_name='Serie 8 Ankastre Fırın'),
+            CatalogProduct(category='Ankastre', brand='Siemens', product_code='HB-578', product_name='iQ700 Fırın'),
+            CatalogProduct(category='Evye', brand='Franke', product_code='MRG-610', product_name='Maris Granit Evye'),
+        ])
+        db.session.commit()
+
+    def test_words_match_in_any_field(self, products):
+        assert _codes('FIRIN') == ['HBG-635', 'HB-578']
+        assert _codes('bosch fır') == ['HBG-635']
+        assert _codes('hbg-63') == ['HBG-635']
+        assert _codes('gran') == ['MRG-610']
+
+    def test_prefix_only_inside_words(self, products):
+        assert _codes('ranit') == []
+
+    def test_category_narrows(self, products):
+        assert _codes('', 'Evye') == ['MRG-610']
+        assert _codes('fırın', 'Evye') == []
+
+    def test_renamed_and_deleted_products_reindex(self, products):
+        product = db.session.scalar(db.select(CatalogProduct).filter_by(product_code='MRG-610'))
+        product.product_name = 'Maris Kompozit Evye'
+        db.session.commit()
+        assert _codes('gran') == []
+        assert _codes('kompo') == ['MRG-610']
+
+        db.session.delete(product)
+        db.session.commit()
+        assert db.session.scalar(db.select(db.func.count()).select_from(CatalogProductWord)
+                                 .where(CatalogProductWord.product_id == product.product_id)) == 0
+
+    def test_edit_outside_searched_fields_keeps_the_words(self, products):
+        product = db.session.scalar(db.select(CatalogProduct).filter_by(product_code='HB-578'))
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            product.default_price = 24999
+            product.image_url = '/static/img/hb-578.jpg'
+            db.session.commit()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+        assert statements and not any('catalog_product_words' in s for s in statements)
+        assert _codes('iq700') == ['HB-578']
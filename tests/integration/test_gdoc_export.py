@@ -0,0 +1,168 @@
+"""
+Integration tests for the Google Docs quote export (platforms/arkhon/documents.py
+build_gdoc_replacements / run_quote_gdoc_export), with the Docs client stubbed.
+"""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from crminaec.core.cache import cache
+from crminaec.core.interop import Platform
+from crminaec.core.models import (Order, OrderItem, Party, PaymentInstallment,
+                                  PriceRecord, ProjectTypology, Quote, db)
+from crminaec.core.pricing import INTERVAL_NAMESPACE
+from crminaec.platforms.arkhon import documents
+from crminaec.platforms.arkhon.documents import (build_gdoc_replacements,
+                                                 run_quote_gdoc_export)
+from crminaec.platforms.arkhon.quotes import (apply_quote_totals,
+                                              compute_quote_totals)
+from tests.integration.support import app
+
+
+def _tags(replacements):
+    return {tag: value for replacement in replacements for tag, value in replacement.items()}
+
+
+def _price(code, price):
+    db.session.add(PriceRecord(entity_code=code, supplier='Kelebek (ProSAP)', final_unit_price=price,
+                               valid_from=datetime.now() - timedelta(days=30)))
+
+
+def _quote(order, **totals):
+    quote = Quote(payment_terms=totals.pop('payment_terms', None))
+    order.quotes.append(quote)
+    db.session.add(order)
+    db.session.flush()
+    apply_quote_totals(quote, compute_quote_totals(order, **totals))
+    db.session.commit()
+    return quote
+
+
+@pytest.fixture
+def typology_quote(app):
+    """T1 x3 and T2 x2 with priced lines, one unassigned line and one hidden line."""
+    cache.invalidate(INTERVAL_NAMESPACE)
+    _price('GÖVDE', 100)
+    _price('KAPAK', 50)
+    _price('KULP', 5)
+    order = Order(order_number='T-5', party=Party(email='ayse@example.com', first_name='Ayşe', last_name='Demir'))
+    t1 = ProjectTypology(name='T1', description='Tip 1', quantity=3)
+    t2 = ProjectTypology(name='T2', description='Tip 2', quantity=2)
+    order.typologies.extend([t1, t2])
+    t1.items.extend([OrderItem(urk='GÖVDE', ura='Alt gövde', adet=2, brm='AD'),
+                     OrderItem(urk='GİZLİ', ura='Montaj payı', adet=1, brm='AD', is_visible_on_quote=False)])
+    t2.items.append(OrderItem(urk='KAPAK', ura='Kapak', adet=1, brm='AD'))
+    order.items.extend(t1.items + t2.items + [OrderItem(urk='KULP', ura='Kulp', adet=4, brm='AD')])
+    return _quote(order)
+
+
+@pytest.fixture
+def kitchen_quote(app):
+    """No typologies: one kitchen, priced by the manual list price, with an installment plan."""
+    order = Order(order_number='M-1', items=[OrderItem(urk='GÖVDE', ura='Alt gövde', adet=1, brm='AD',
+                                                       oza='Lugano', ozk='LG-1')])
+    quote = _quote(order, tax_rate=20, manual_list_price='1000', payment_terms='Peşin')
+    quote.installments.append(PaymentInstallment(date=datetime(2026, 7, 1), method='Havale', amount=600))
+    db.session.commit()
+    return quote
+
+
+class _DocsStub:
+    def __init__(self, document_id='doc-123'):
+        self.document_id = document_id
+        self.calls = []
+
+    def generate_from_template(self, **kwargs):
+        self.calls.append(kwargs)
+        return self.document_id
+
+
+@pytest.fixture
+def docs(app, monkeypatch):
+    stub = _DocsStub()
+    manager = SimpleNamespace(clients={Platform.GOOGLE_DOCS: stub})
+    monkeypatch.setattr(documents, 'get_interop_manager', lambda: manager)
+    monkeypatch.setitem(app.config, 'GDOC_QUOTE_TEMPLATE_ID', 'template-1')
+    monkeypatch.setitem(app.config, 'GDOC_QUOTE_FOLDER_ID', 'folder-1')
+    return stub
+
+
+class _Job:
+    def __init__(self):
+        self.steps = []
+
+    def progress(self, fraction, message=None):
+        self.steps.append((fraction, message))
+
+
+# ==============================================================================
+# REPLACEMENTS
+# ==============================================================================
+class TestBuildGdocReplacements:
+    def test_typology_quote(self, typology_quote):
+        title, replacements = build_gdoc_replacements(typology_quote)
+        tags = _tags(replacements)
+
+        assert title == 'Teklif_T-5_Ayşe Demir'
+        assert [list(r)[0] for r in replacements][:3] == ['{{quote_number}}', '{{date}}', '{{customer_name}}']
+        assert tags['{{quote_number}}'] == 'T-5-V1'
+        assert tags['{{total_kitchen_count}}'] == '5'
+        assert tags['{{typology_list_bulleted}}'] == ('• T1 MUTFAK (Tip 1) - 3 ADET\n'
+                                                     '• T2 MUTFAK (Tip 2) - 2 ADET')
+        # T1: 2 x 100 x 3, T2: 50 x 2, unassigned: 4 x 5
+        assert tags['{{project_summary_table}}'] == ('• T1 (Tip 1) : 600,00 ₺\n'
+                                                    '• T2 (Tip 2) : 100,00 ₺\n'
+                                                    '• Diğer Kalemler : 20,00 ₺\n'
+                                                    '\nGENEL TOPLAM: 720,00 ₺\n')
+        assert tags['{{typology_itemized_pages}}'] == ('\n--- T1 MUTFAK ÜNİTELERİ ---\n'
+                                                      '• [GÖVDE] Alt gövde - 2.0 AD\n'
+                                                      '\n--- T2 MUTFAK ÜNİTELERİ ---\n'
+                                                      '• [KAPAK] Kapak - 1.0 AD\n')
+        assert tags['{{installment_plan_table}}'] == 'Özel bir ödeme planı belirtilmemiştir.'
+        assert tags['{{payment_terms}}'] == 'Ödeme planı ektedir.'
+
+    def test_single_kitchen_quote(self, kitchen_quote):
+        title, replacements = build_gdoc_replacements(kitchen_quote)
+        tags = _tags(replacements)
+
+        assert title == 'Teklif_M-1_Müşteri'
+        assert tags['{{customer_name}}'] == 'Müşteri'
+        assert tags['{{total_kitchen_count}}'] == '1'
+        assert tags['{{typology_list_bulleted}}'] == ''
+        assert tags['{{project_summary_table}}'] == '• Lugano (LG-1) : 1.200,00 ₺\n'
+        assert tags['{{typology_itemized_pages}}'] == ('\n--- Lugano (LG-1) MUTFAK ÜNİTELERİ ---\n'
+                                                      '• [GÖVDE] Alt gövde - 1.0 AD\n')
+        assert tags['{{installment_plan_table}}'] == '• 01.07.2026  |  Havale  |  600,00 ₺\n'
+        assert tags['{{payment_terms}}'] == 'Peşin'
+        assert tags['{{validity_date}}'] == (datetime.now() + timedelta(days=15)).strftime('%d.%m.%Y')
+
+
+# ==============================================================================
+# JOB
+# ==============================================================================
+class TestRunQuoteGdocExport:
+    def test_fills_the_template_copy(self, typology_quote, docs):
+        result = run_quote_gdoc_export(_Job(), quote_id=typology_quote.quote_id)
+
+        [call] = docs.calls
+        assert call['template_id'] == 'template-1'
+        assert call['folder_id'] == 'folder-1'
+        assert (call['title'], call['replacements']) == build_gdoc_replacements(typology_quote)
+        assert result['document_id'] == 'doc-123'
+        assert result['document_url'] == 'https://docs.google.com/document/d/doc-123/edit'
+
+    def test_unknown_quote(self, app, docs):
+        with pytest.raises(ValueError):
+            run_quote_gdoc_export(_Job(), quote_id=999)
+        assert docs.calls == []
+
+    def test_rejected_by_the_api(self, kitchen_quote, docs):
+        docs.document_id = None
+        with pytest.raises(RuntimeError):
+            run_quote_gdoc_export(_Job(), quote_id=kitchen_quote.quote_id)
+
+    def test_platform_not_enabled(self, kitchen_quote, docs):
+        documents.get_interop_manager().clients.pop(Platform.GOOGLE_DOCS)
+        with pytest.raises(RuntimeError):
+            run_quote_gdoc_export(_Job(), quote_id=kitchen_quote.quote_id)
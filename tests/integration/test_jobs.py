@@ -0,0 +1,89 @@
+"""
+Integration tests for the background job runner's claim and recovery (core/jobs.py).
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from crminaec.core import jobs
+from crminaec.core.models import BackgroundJob, JobStatus, Party, db
+from tests.integration.support import app
+
+RUNS = []
+
+
+@jobs.job_handler('test_echo')
+def _echo(job, **payload):
+    RUNS.append(job.job_id)
+    return {'echo': payload.get('value')}
+
+
+class _Executor:
+    """Collects submissions instead of running them on threads."""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, func, *args):
+        self.submitted.append(args[-1])
+
+
+def _job(status, **fields):
+    job = BackgroundJob(kind='test_echo', payload={'value': 1, 'uploads': []}, status=status, **fields)
+    db.session.add(job)
+    db.session.commit()
+    return job.job_id
+
+
+@pytest.mark.integration
+class TestRecovery:
+    """Only jobs whose owner stopped beating are failed; live processes keep theirs."""
+
+    def test_stale_running_job_fails_and_live_one_survives(self, app):
+        now = datetime.now(timezone.utc)
+        stale = _job(JobStatus.RUNNING, owner='old-host:1:dead', started_at=now - timedelta(hours=1),
+                     heartbeat_at=now - timedelta(minutes=10))
+        live = _job(JobStatus.RUNNING, owner='other-host:2:beef', started_at=now - timedelta(hours=1),
+                    heartbeat_at=now - timedelta(seconds=20))
+        queued = _job(JobStatus.QUEUED)
+
+        executor = _Executor()
+        jobs._recover_jobs(app, executor)
+
+        db.session.expire_all()
+        assert db.session.get(BackgroundJob, stale).status == JobStatus.FAILED
+        assert db.session.get(BackgroundJob, live).status == JobStatus.RUNNING
+        assert executor.submitted == [queued]
+
+    def test_recovery_leaves_the_request_session_alone(self, app):
+        db.session.add(Party(email='pending@example.com'))
+        jobs._recover_jobs(app, _Executor())
+
+        db.session.rollback()
+        assert db.session.scalar(db.select(Party).filter_by(email='pending@example.com')) is None
+
+    def test_finished_jobs_past_retention_are_purged(self, app):
+        old = _job(JobStatus.SUCCEEDED, created_at=datetime.now(timezone.utc) - timedelta(days=90))
+        jobs._recover_jobs(app, _Executor())
+        assert db.session.get(BackgroundJob, old) is None
+
+
+@pytest.mark.integration
+class TestClaim:
+    """A job is moved out of QUEUED exactly once and stamped with its owner."""
+
+    def test_queued_job_runs_once(self, app):
+        job_id = _job(JobStatus.QUEUED)
+        jobs._run_job(app, job_id)
+        jobs._run_job(app, job_id)
+
+        job = db.session.get(BackgroundJob, job_id)
+        db.session.refresh(job)
+        assert RUNS.count(job_id) == 1
+        assert job.status == JobStatus.SUCCEEDED and job.result == {'echo': 1}
+        assert job.owner == jobs._owner_id() and job.heartbeat_at is not None
+
+    def test_job_claimed_elsewhere_is_not_run(self, app):
+        job_id = _job(JobStatus.RUNNING, owner='other-host:2:beef', started_at=datetime.now(timezone.utc))
+        jobs._run_job(app, job_id)
+        assert job_id not in RUNS
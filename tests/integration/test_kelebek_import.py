@@ -0,0 +1,79 @@
+"""
+Integration tests for the batched Kelebek line import (platforms/arkhon/importers.py
+import_kelebek_items / _insert_batch).
+"""
+import io
+
+import pytest
+
+from crminaec.core.models import Order, OrderItem, db
+from crminaec.platforms.arkhon import importers
+from tests.integration.support import app
+
+
+def _export(rows):
+    lines = ''.join(
+        f'<tr><input name="pozno" value="{n}"><input name="urk" value="GÖVDE-{n}">'
+        f'<input name="ura" value="Alt dolap {n}"><input name="adet" value="{n}"><input name="brm" value="AD"></tr>'
+        for n in range(1, rows + 1)
+    )
+    return (f'<html><body><input name="MusteriAdi" value="Şule"><table>{lines}</table></body></html>'
+            .encode('utf-8'))
+
+
+@pytest.fixture
+def order(app):
+    order = Order(order_number='K-1')
+    db.session.add(order)
+    db.session.flush()
+    return order
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    """Batch size 3, recording the size of every executemany."""
+    sizes = []
+    insert_batch = importers._insert_batch
+    monkeypatch.setattr(importers, 'IMPORT_BATCH_SIZE', 3)
+    monkeypatch.setattr(importers, '_insert_batch', lambda batch: (sizes.append(len(batch)), insert_batch(batch)))
+    return sizes
+
+
+class TestImportKelebekItems:
+    def test_lines_are_flushed_across_batch_boundaries(self, order, batches):
+        count, customer = importers.import_kelebek_items(order, io.BytesIO(_export(7)))
+        db.session.commit()
+
+        assert count == 7
+        assert customer['first_name'] == 'Şule'
+        # Two full batches while reading, the remainder at the end
+        assert [size for size in batches if size] == [3, 3, 1]
+        assert db.session.scalar(db.select(db.func.count()).select_from(OrderItem)) == 7
+
+    def test_rows_get_the_order_id_and_column_defaults(self, order, batches):
+        importers.import_kelebek_items(order, io.BytesIO(_export(4)))
+        db.session.commit()
+
+        lines = db.session.scalars(db.select(OrderItem).order_by(OrderItem.item_id)).all()
+        assert [line.urk for line in lines] == ['GÖVDE-1', 'GÖVDE-2', 'GÖVDE-3', 'GÖVDE-4']
+        assert [line.adet for line in lines] == [1, 2, 3, 4]
+        assert all(line.order_id == order.order_id for line in lines)
+        assert all(line.is_visible_on_quote is True for line in lines)
+        assert all(line.category == 'Furniture' for line in lines)
+        # The expired collection reloads with the bulk-inserted lines
+        assert len(order.items) == 4
+
+    def test_exact_multiple_leaves_no_empty_insert(self, order, batches):
+        importers.import_kelebek_items(order, io.BytesIO(_export(6)))
+        assert [size for size in batches if size] == [3, 3]
+
+    def test_progress_is_reported(self, order, monkeypatch):
+        monkeypatch.setattr(importers, 'PROGRESS_EVERY', 2)
+        seen = []
+        importers.import_kelebek_items(order, io.BytesIO(_export(5)), on_progress=seen.append)
+        assert seen == [2, 4]
+
+    def test_nothing_is_committed(self, order):
+        importers.import_kelebek_items(order, io.BytesIO(_export(2)))
+        db.session.rollback()
+        assert db.session.scalar(db.select(db.func.count()).select_from(OrderItem)) == 0
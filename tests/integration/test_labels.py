@@ -0,0 +1,88 @@
+"""
+Integration tests for batch QR label preparation (platforms/emek/labels.py).
+"""
+import pytest
+
+from crminaec.core.models import db
+from crminaec.platforms.emek.labels import (assign_missing_qr_codes,
+                                            generate_label_sheet,
+                                            resolve_label_items)
+from crminaec.platforms.emek.models import Item, ItemComposition
+from tests.integration.support import login_client, make_app
+
+
+def _item(code, name, **fields):
+    # technical_specs' model default is the dict type itself, not an empty dict
+    return Item(code=code, name=name, technical_specs={}, **fields)
+
+
+@pytest.fixture
+def legacy_app(tmp_path, monkeypatch):
+    """App whose emek_items.code is nullable, as in databases created before the column was required."""
+    monkeypatch.setattr(Item.__table__.c.code, 'nullable', True)
+    application = make_app(tmp_path, monkeypatch)
+    with application.app_context():
+        yield application
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.mark.integration
+class TestAssignMissingQrCodes:
+    """QR codes are assigned in bulk with the same format print_label uses."""
+
+    def test_assigns_formal_code_once(self, legacy_app):
+        item = _item('DOLAP-01', 'Dolap', item_type='product')
+        keep = _item('VIDA-01', 'Vida', item_type='raw_material', qr_code='CUSTOM-QR')
+        db.session.add_all([item, keep])
+        db.session.commit()
+
+        assert assign_missing_qr_codes([item, keep]) == 1
+        assert item.qr_code == f"EMEK-{item.item_id}-DOLAP-01"
+        assert keep.qr_code == 'CUSTOM-QR'
+
+        # Nothing left to assign on a second run
+        assert assign_missing_qr_codes([item, keep]) == 0
+
+    def test_item_without_code_still_gets_qr(self, legacy_app):
+        item = _item(None, 'Kodsuz Parça', item_type='raw_material')
+        db.session.add(item)
+        db.session.commit()
+
+        assert assign_missing_qr_codes([item]) == 1
+        assert item.qr_code == f"EMEK-{item.item_id}-"
+
+    def test_resolve_sorts_items_without_code(self, legacy_app):
+        folder = _item('KAT', 'Kategori', is_category=True)
+        coded = _item('B-01', 'B', item_type='product')
+        uncoded = _item(None, 'A', item_type='product')
+        db.session.add_all([folder, coded, uncoded])
+        db.session.add_all([
+            ItemComposition(parent_item=folder, child_item=coded, optional_attributes={}),
+            ItemComposition(parent_item=folder, child_item=uncoded, optional_attributes={}),
+        ])
+        db.session.commit()
+
+        items = resolve_label_items(category_id=folder.item_id)
+        assert [i.name for i in items] == ['A', 'B']
+
+
+@pytest.mark.integration
+class TestLabelSheet:
+    """Sheets render for every printable item, whatever its data looks like."""
+
+    def test_sheet_with_item_without_code(self, legacy_app, tmp_path):
+        uncoded = _item(None, 'Kodsuz Parça', item_type='raw_material')
+        coded = _item('VIDA-01', 'Vida', item_type='raw_material')
+        db.session.add_all([uncoded, coded])
+        db.session.commit()
+
+        pdf = generate_label_sheet(item_ids=[uncoded.item_id, coded.item_id], cache_dir=tmp_path / 'qr')
+        assert pdf.startswith(b'%PDF')
+        assert uncoded.qr_code == f"EMEK-{uncoded.item_id}-"
+
+    @pytest.mark.parametrize('category_id', ['abc', [1], {'id': 1}])
+    def test_print_route_rejects_bad_category(self, legacy_app, category_id):
+        client = login_client(legacy_app)
+        response = client.post('/api/inventory/print-labels', json={'category_id': category_id})
+        assert response.status_code == 400
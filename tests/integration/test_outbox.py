@@ -0,0 +1,134 @@
+"""
+Integration tests for the email outbox (core/email.py).
+"""
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+from flask import current_app
+
+from crminaec.core import email as outbox
+from crminaec.core.models import EmailStatus, Order, OutboxEmail, Party, db
+from tests.integration.support import app, login_client
+
+
+@pytest.fixture(autouse=True)
+def no_sender_thread(monkeypatch):
+    """Tests drive deliver_due() themselves instead of the background thread."""
+    monkeypatch.setattr(outbox, '_ensure_sender', lambda app: None)
+
+
+def _queue(subject='Teklif hazır'):
+    email = outbox.queue_email(['ali@example.com'], subject=subject, body='Merhaba')
+    db.session.commit()
+    return email
+
+
+def _sink_files():
+    return sorted(p.name for p in Path(current_app.config['MAIL_OUTBOX_SINK_DIR']).glob('*.eml'))
+
+
+@pytest.mark.integration
+class TestQueueing:
+    """Messages live and die with the caller's transaction and always carry a sender."""
+
+    def test_rollback_discards_the_message(self, app):
+        outbox.queue_email(['ali@example.com'], subject='x', body='y')
+        db.session.rollback()
+        assert db.session.scalar(db.select(db.func.count(OutboxEmail.email_id))) == 0
+
+    def test_default_sender_is_resolved_when_sending(self, app):
+        email = _queue()
+        assert (email.sender, email.status) == (None, EmailStatus.PENDING)
+
+        outbox.deliver_due()
+        eml = (Path(current_app.config['MAIL_OUTBOX_SINK_DIR']) / f"{email.email_id:06d}.eml").read_text()
+        assert f"From: {current_app.config['MAIL_DEFAULT_SENDER']}" in eml
+
+    def test_missing_sender_fails_the_send_not_the_request(self, app):
+        current_app.config['MAIL_DEFAULT_SENDER'] = None
+        email = _queue()
+
+        assert outbox.deliver_due() == 0
+        db.session.refresh(email)
+        assert email.status == EmailStatus.PENDING
+        assert 'MAIL_DEFAULT_SENDER' in email.last_error
+
+    def test_milestone_dates_are_saved_without_a_sender(self, app):
+        current_app.config['MAIL_DEFAULT_SENDER'] = None
+        order = Order(order_number='S-1', party=Party(email='ali@example.com', first_name='Ali'))
+        db.session.add(order)
+        db.session.commit()
+        client = login_client(app, email='admin@crminaec.com')
+
+        response = client.post(f'/arkhon/order/{order.order_id}/update_milestones',
+                               data={'kitchen_installation_date': '2030-03-04T09:00'})
+        assert response.status_code == 302
+
+        db.session.expire_all()
+        assert order.kitchen_installation_date == datetime(2030, 3, 4, 9, 0)
+        assert db.session.scalar(db.select(OutboxEmail.recipients)) == ['ali@example.com']
+
+
+@pytest.mark.integration
+class TestDelivery:
+    """Due messages are claimed, sent once and retried with backoff."""
+
+    def test_due_messages_are_sent(self, app):
+        email = _queue()
+        assert outbox.deliver_due() == 1
+
+        db.session.refresh(email)
+        assert (email.status, email.attempts) == (EmailStatus.SENT, 1)
+        assert _sink_files() == [f"{email.email_id:06d}.eml"]
+        assert outbox.deliver_due() == 0
+
+    def test_failure_is_retried_later_then_given_up(self, app, monkeypatch):
+        monkeypatch.setattr(outbox, '_deliver_to_sink', lambda batch, sink: {e.email_id: 'boom' for e in batch})
+        current_app.config['MAIL_OUTBOX_MAX_ATTEMPTS'] = 2
+        email = _queue()
+
+        assert outbox.deliver_due() == 0
+        db.session.refresh(email)
+        assert (email.status, email.attempts, email.last_error) == (EmailStatus.PENDING, 1, 'boom')
+        assert email.next_attempt_at > datetime.now(timezone.utc).replace(tzinfo=None)
+        # Not due yet: nothing is attempted
+        outbox.deliver_due()
+        db.session.refresh(email)
+        assert email.attempts == 1
+
+        email.next_attempt_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+        db.session.commit()
+        outbox.deliver_due()
+        db.session.refresh(email)
+        assert (email.status, email.attempts) == (EmailStatus.FAILED, 2)
+
+    def test_message_claimed_elsewhere_is_skipped(self, app):
+        email = _queue()
+        assert outbox._claim([email.email_id], datetime.now(timezone.utc)) == [email.email_id]
+        # A second sender that read the same candidate loses the race
+        assert outbox._claim([email.email_id], datetime.now(timezone.utc)) == []
+
+        db.session.refresh(email)
+        assert (email.status, email.attempts) == (EmailStatus.SENDING, 1)
+
+
+@pytest.mark.integration
+class TestRecovery:
+    """Only messages whose lease ran out go back to the queue."""
+
+    def test_expired_lease_is_requeued_live_one_is_not(self, app):
+        now = datetime.now(timezone.utc)
+        stale, live = _queue('stale'), _queue('live')
+        outbox._claim([stale.email_id, live.email_id], now)
+        stale.next_attempt_at = now - timedelta(seconds=1)
+        db.session.commit()
+
+        outbox._recover_outbox(app)
+        db.session.refresh(stale)
+        db.session.refresh(live)
+        assert stale.status == EmailStatus.PENDING
+        assert live.status == EmailStatus.SENDING
+
+        assert outbox.deliver_due() == 1
+        assert _sink_files() == [f"{stale.email_id:06d}.eml"]
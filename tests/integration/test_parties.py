@@ -0,0 +1,122 @@
+"""
+Integration tests for party lookup (core/parties.py).
+"""
+import pytest
+
+from crminaec.core.jobs import JobContext
+from crminaec.core.models import Order, Party, db
+from crminaec.core.parties import (find_duplicate_clusters, find_party,
+                                   run_party_dedupe, search_parties_stmt)
+from crminaec.platforms.arkhon.importers import _link_customer
+from tests.integration.support import app
+
+
+def _search(term):
+    return [row.email for row in db.session.execute(search_parties_stmt(term))]
+
+
+@pytest.mark.integration
+class TestPartySearch:
+    """The typeahead matches prefixes case- and accent-insensitively through the folded keys."""
+
+    @pytest.fixture
+    def parties(self, app):
+        db.session.add_all([
+            Party(email='Sukru@Example.com', first_name='Şükrü', last_name='Öztürk', phone='0532 123 45 67'),
+            Party(email='ayse@example.com', first_name='Ayşe', last_name='Işık', phone='+90 216 555 00 11'),
+            Party(email='gone@example.com', first_name='Şükran', last_name='Silinmiş', is_deleted=True),
+        ])
+        db.session.commit()
+
+    def test_name_prefix_ignores_case_and_turkish_letters(self, parties):
+        assert _search('sük') == ['Sukru@Example.com']
+        assert _search('ISI') == ['ayse@example.com']
+
+    def test_email_prefix(self, parties):
+        assert _search('SUKRU@') == ['Sukru@Example.com']
+
+    def test_phone_prefix_in_any_notation(self, parties):
+        assert _search('0532 12') == ['Sukru@Example.com']
+        assert _search('+90216') == ['ayse@example.com']
+
+    def test_no_match_and_deleted_parties(self, parties):
+        assert _search('zz') == []
+        assert _search('Silin') == []
+
+    def test_renamed_party_is_found_by_new_name(self, parties):
+        party = db.session.scalar(db.select(Party).filter_by(email='ayse@example.com'))
+        party.first_name = 'Çiğdem'
+        db.session.commit()
+        assert _search('cig') == ['ayse@example.com']
+
+
+@pytest.mark.integration
+class TestFindParty:
+    """Lookups go through the normalised keys the flush computes from the constructor's values."""
+
+    @pytest.fixture
+    def ali(self, app):
+        party = Party(email=' Ali@Example.com', first_name='Ali', last_name='Yılmaz', phone='0532 123 45 67')
+        db.session.add(party)
+        db.session.commit()
+        return party
+
+    def test_keys_are_set_from_the_constructor(self, ali):
+        assert (ali.email_normalized, ali.phone_e164, ali.name_key) == ('ali@example.com', '+905321234567', 'yilm:a')
+
+    def test_email_then_phone_in_any_notation(self, ali):
+        assert find_party(email='ALI@example.com') is ali
+        assert find_party(email='other@example.com', phone='+90 (532) 123 4567') is ali
+        assert find_party(email='lead_000001@crminaec.local') is None
+
+    def test_changed_phone_is_found_after_update(self, ali):
+        ali.phone = '0216 555 00 11'
+        db.session.commit()
+        assert find_party(phone='+902165550011') is ali
+        assert find_party(phone='0532 123 45 67') is None
+
+    def test_import_links_the_existing_customer(self, ali):
+        order = Order(order_number='S-1')
+        db.session.add(order)
+        _link_customer(order, {'email': 'ali@EXAMPLE.com', 'first_name': 'Ali'}, 'temp_000001@crminaec.local')
+        db.session.commit()
+
+        assert order.party is ali
+        assert db.session.scalar(db.select(db.func.count(Party.party_id))) == 1
+
+
+@pytest.mark.integration
+class TestDuplicateClusters:
+    """Shared email or phone links parties; similar names link them unless their phones differ."""
+
+    @pytest.fixture
+    def parties(self, app):
+        people = [
+            Party(email='ali@example.com', first_name='Ali', last_name='Yılmaz', phone='0532 123 45 67'),
+            Party(email='ALI@example.com ', first_name='A.', last_name='Yilmaz'),
+            Party(email='ali.y@example.com', first_name='Ali', last_name='Yılmaz', phone='+90 532 123 4567'),
+            Party(email='mehmet@example.com', first_name='Mehmet', last_name='Kaya'),
+            Party(email='m.kaya@example.com', first_name='Mehmed', last_name='Kaya'),
+            Party(email='ahmet1@example.com', first_name='Ahmet', last_name='Demir', phone='0532 000 00 01'),
+            Party(email='ahmet2@example.com', first_name='Ahmet', last_name='Demir', phone='0532 000 00 02'),
+            Party(email='deleted@example.com', first_name='Mehmet', last_name='Kaya', is_deleted=True),
+        ]
+        db.session.add_all(people)
+        db.session.commit()
+        return [party.party_id for party in people]
+
+    def test_clusters_and_reasons(self, parties):
+        ali, ali_upper, ali_phone, mehmet, mehmet_alt, ahmet1, ahmet2, deleted = parties
+        clusters = find_duplicate_clusters()
+
+        assert clusters[0] == {'party_ids': [ali, ali_upper, ali_phone], 'reasons': ['email', 'name', 'phone']}
+        assert {'party_ids': [mehmet, mehmet_alt], 'reasons': ['name']} in clusters
+        assert not any(ahmet1 in c['party_ids'] or deleted in c['party_ids'] for c in clusters)
+
+    def test_job_refreshes_stale_keys_first(self, parties):
+        db.session.execute(db.update(Party).values(email_normalized=None, phone_e164=None, name_key=None))
+        db.session.commit()
+
+        result = run_party_dedupe(JobContext('dedupe'))
+        assert result['keys_updated'] == len(parties)
+        assert result['cluster_count'] == 2
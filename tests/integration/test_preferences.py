@@ -0,0 +1,140 @@
+"""
+Integration tests for preference auto-extraction (platforms/arkhon/preferences.py):
+the keyword rules, the digest cache and the read-only preferences form.
+"""
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import event
+
+from crminaec.core.cache import cache
+from crminaec.core.models import Order, OrderItem, ProjectPreference, db
+from crminaec.platforms.arkhon import preferences
+from crminaec.platforms.arkhon.preferences import (CACHE_NAMESPACE, _compile,
+                                                   _flags,
+                                                   extract_from_rows,
+                                                   extract_order_preferences)
+from tests.integration.support import app, login_client
+
+
+def _row(ura='', urk='', **fields):
+    values = {'item_id': 1, 'oza': None, 'ozk': None, 'govderna': None, 'govdernk': None, 'rna': None, 'rnk': None}
+    return SimpleNamespace(ura=ura, urk=urk, **{**values, **fields})
+
+
+# ==============================================================================
+# RULES
+# ==============================================================================
+class TestExtractFromRows:
+    @pytest.mark.parametrize('ura, urk, expected', [
+        ('Kulp 128mm', 'X1', {'handle_code': 'Kulp 128mm'}),
+        ('Profil tutamak', 'YH0128', {'handle_code': 'Profil tutamak'}),
+        ('Tamel', 'M7600-05', {'plinth_height': '12cm'}),
+        ('Baza', 'B1', {'plinth_height': '15cm'}),
+        ('Kaşıklığı 60', '', {'cutlery_tray': 'Kaşıklığı 60'}),
+        ('Çöp kovası', '', {'trash_bin': 'Çöp kovası'}),
+        ('Kiler mekanizması', '', {'mechanisms': 'Kiler mekanizması'}),
+        ('Tezgah altı spot', '', {'light_counter_spot': True}),
+        ('Dolap içi spot', '', {'light_cab_spot': True}),
+        ('Çift yan LED', '', {'light_cab_led': 'Çift Yan'}),
+        ('LED aydınlatma', '', {'light_cab_led': 'Tek Yan'}),
+        ('Bluetooth LED', '', {'light_bt_led': True}),
+        ('Tezgah LED', '', {'light_counter_led': True}),
+        ('Kapak sensörü', '', {'sensor_door': True}),
+        ('Dimmer sensor', '', {'sensor_dimmer': True}),
+        ('Sade gövde', 'G1', {}),
+        (None, None, {}),
+    ])
+    def test_single_line(self, ura, urk, expected):
+        assert extract_from_rows([_row(ura, urk)]) == expected
+
+    def test_first_text_wins_and_mechanisms_are_deduplicated(self):
+        rows = [
+            _row('Kulp A', oza='-', rna='Beyaz', rnk='-'),
+            _row('Kulp B', oza='Lugano', ozk='LG-1', govderna='Antrasit', govdernk='AN'),
+            _row('Kiler mekanizması', oza='Başka model'),
+            _row('Kör köşe'),
+            _row('Kiler mekanizması'),
+        ]
+        assert extract_from_rows(rows) == {
+            'handle_code': 'Kulp A',
+            'front_color': 'Beyaz',
+            'model_name': 'Lugano (LG-1)',
+            'body_color': 'Antrasit (AN)',
+            'mechanisms': 'Kiler mekanizması \nKör köşe',
+        }
+
+
+class TestMatcher:
+    def test_patterns_starting_at_the_same_position_are_all_found(self):
+        matcher = _compile([('long', 'led'), ('short', 'le')])
+        assert _flags(matcher, 'le mans led') == {'long', 'short'}
+
+    def test_overlapping_keywords_of_different_flags(self):
+        matcher = _compile([('a', 'kaşık'), ('b', 'şıklık'), ('c', 'yok')])
+        assert _flags(matcher, 'kaşıklık') == {'a', 'b'}
+
+    def test_no_match(self):
+        assert _flags(_compile([('a', 'led')]), 'gövde') == set()
+
+
+# ==============================================================================
+# CACHE AND FORM
+# ==============================================================================
+@pytest.fixture
+def order(app):
+    cache.invalidate(CACHE_NAMESPACE)
+    order = Order(order_number='P-1', items=[OrderItem(urk='YH01', ura='Kulp 128mm'),
+                                             OrderItem(urk='S1', ura='Tezgah altı spot')])
+    db.session.add(order)
+    db.session.commit()
+    return order
+
+
+@pytest.fixture
+def extractions(monkeypatch):
+    calls = []
+    extract = preferences.extract_from_rows
+    monkeypatch.setattr(preferences, 'extract_from_rows', lambda rows: calls.append(1) or extract(rows))
+    return calls
+
+
+class TestDigestCache:
+    def test_unchanged_lines_are_not_extracted_again(self, order, extractions):
+        first = extract_order_preferences(order.order_id)
+        assert extract_order_preferences(order.order_id) == first
+        assert len(extractions) == 1
+
+    def test_edited_line_is_extracted_again(self, order, extractions):
+        extract_order_preferences(order.order_id)
+        order.items[1].ura = 'Tezgah LED'
+        db.session.commit()
+
+        values = extract_order_preferences(order.order_id)
+        assert len(extractions) == 2
+        assert values['light_counter_led'] is True and 'light_counter_spot' not in values
+
+    def test_callers_get_a_copy(self, order):
+        extract_order_preferences(order.order_id)['handle_code'] = 'değişti'
+        assert extract_order_preferences(order.order_id)['handle_code'] == 'Kulp 128mm'
+
+
+class TestPreferencesForm:
+    def test_get_prefills_without_writing(self, app, order):
+        client = login_client(app)
+        writes = []
+
+        def record(conn, cursor, statement, *args):
+            if not statement.lstrip().upper().startswith('SELECT'):
+                writes.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            response = client.get(f'/arkhon/order/{order.order_id}/preferences')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+        assert response.status_code == 200
+        assert 'Kulp 128mm' in response.get_data(as_text=True)
+        assert writes == []
+        assert db.session.scalar(db.select(db.func.count()).select_from(ProjectPreference)) == 0
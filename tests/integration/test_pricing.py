@@ -0,0 +1,171 @@
+"""
+Integration tests for price record ingestion, resolution and repricing
+(platforms/arkhon/importers.py, core/pricing.py).
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from crminaec.core.models import Order, OrderItem, PriceRecord, db
+from crminaec.core.cache import cache
+from crminaec.core.pricing import (INTERVAL_NAMESPACE,
+                                   reprice_price_records, resolve_price,
+                                   resolve_prices)
+from crminaec.platforms.arkhon.importers import (_link_price_records,
+                                                 upsert_price_records)
+from tests.integration.support import app
+
+SUPPLIER = 'Kelebek (ProSAP)'
+JAN, FEB, MAR = datetime(2026, 1, 1), datetime(2026, 2, 1), datetime(2026, 3, 1)
+
+
+def _records():
+    return db.session.scalars(db.select(PriceRecord).order_by(PriceRecord.price_id)).all()
+
+
+@pytest.mark.integration
+class TestUpsertPriceRecords:
+    """One record per (supplier, type, code, price), reused across lines and re-imports."""
+
+    def test_creates_once_and_reuses(self, app):
+        first = upsert_price_records(SUPPLIER, {'A-1': 10.0, 'B-2': 20.5})
+        db.session.commit()
+        again = upsert_price_records(SUPPLIER, {'A-1': 10.001, 'B-2': 20.5})
+        db.session.commit()
+
+        assert again == first
+        assert len(_records()) == 2
+
+    def test_changed_price_gets_a_new_record(self, app):
+        old = upsert_price_records(SUPPLIER, {'A-1': 10.0})
+        new = upsert_price_records(SUPPLIER, {'A-1': 12.0})
+        db.session.commit()
+
+        assert old['A-1'] != new['A-1']
+        assert [r.final_unit_price for r in _records()] == [Decimal('10.00'), Decimal('12.00')]
+
+    def test_other_supplier_or_inactive_record_is_not_reused(self, app):
+        db.session.add_all([
+            PriceRecord(entity_code='A-1', supplier='Başka', final_unit_price=10.0),
+            PriceRecord(entity_code='A-1', supplier=SUPPLIER, final_unit_price=10.0, is_active=False),
+        ])
+        db.session.commit()
+
+        ids = upsert_price_records(SUPPLIER, {'A-1': 10.0})
+        record = db.session.get(PriceRecord, ids['A-1'])
+        assert (record.supplier, record.is_active, record.price_type) == (SUPPLIER, True, 'cost')
+        assert len(_records()) == 3
+
+    def test_lines_are_linked_per_code(self, app):
+        order = Order(order_number='S-1', items=[OrderItem(urk='A-1'), OrderItem(urk='A-1'),
+                                                 OrderItem(urk='B-2'), OrderItem(urk='C-3')])
+        db.session.add(order)
+        db.session.commit()
+
+        ids = upsert_price_records(SUPPLIER, {'A-1': 10.0, 'B-2': 20.0})
+        assert _link_price_records(order.order_id, ids) == 3
+        db.session.commit()
+
+        db.session.expire_all()
+        linked = {item.urk: item.price_record_id for item in order.items}
+        assert linked == {'A-1': ids['A-1'], 'B-2': ids['B-2'], 'C-3': None}
+
+
+def _price(code, price, valid_from, **fields):
+    record = PriceRecord(entity_code=code, supplier=fields.pop('supplier', SUPPLIER), final_unit_price=price,
+                         valid_from=valid_from, **fields)
+    db.session.add(record)
+    return record
+
+
+@pytest.mark.integration
+class TestResolvePrices:
+    """Highest quantity tier first, then the latest valid_from, then the newest record."""
+
+    @pytest.fixture(autouse=True)
+    def _fresh_intervals(self, app):
+        # The interval cache is process-wide; every test starts from its own empty database
+        cache.invalidate(INTERVAL_NAMESPACE)
+
+    def test_latest_valid_from_wins_and_validity_window_is_respected(self, app):
+        _price('A-1', 10, JAN)
+        _price('A-1', 12, MAR)
+        _price('A-1', 99, JAN, valid_to=FEB)  # expired before the lookup date
+        db.session.commit()
+
+        assert resolve_price('A-1', on=FEB + timedelta(days=1)).unit_price == Decimal('10.00')
+        assert resolve_price('A-1', on=MAR).unit_price == Decimal('12.00')
+        assert resolve_price('A-1', on=JAN - timedelta(days=1)) is None
+
+    def test_quantity_tiers_and_fallback_to_lowest_tier(self, app):
+        _price('A-1', 10, JAN, min_quantity=1)
+        _price('A-1', 8, JAN, min_quantity=10)
+        db.session.commit()
+
+        assert resolve_price('A-1', on=FEB, quantity=25).unit_price == Decimal('8.00')
+        assert resolve_price('A-1', on=FEB, quantity=3).unit_price == Decimal('10.00')
+        assert resolve_price('A-1', on=FEB, quantity=0.5).unit_price == Decimal('10.00')
+
+    def test_tie_goes_to_newest_record_and_inactive_is_ignored(self, app):
+        _price('A-1', 10, JAN)
+        newest = _price('A-1', 11, JAN)
+        _price('A-1', 50, MAR, is_active=False)
+        db.session.commit()
+
+        assert resolve_price('A-1', on=MAR).price_id == newest.price_id
+
+    def test_type_and_supplier_filters(self, app):
+        _price('A-1', 10, JAN)
+        _price('A-1', 15, JAN, price_type='sell')
+        _price('A-1', 9, JAN, supplier='Başka')
+        db.session.commit()
+
+        assert resolve_price('A-1', on=FEB, price_type='sell').unit_price == Decimal('15.00')
+        assert resolve_price('A-1', on=FEB, supplier='Başka').unit_price == Decimal('9.00')
+        assert set(resolve_prices(['A-1', 'NONE'], on=FEB)) == {'A-1'}
+
+    def test_new_record_is_seen_after_commit(self, app):
+        _price('A-1', 10, JAN)
+        db.session.commit()
+        assert resolve_price('A-1', on=MAR).unit_price == Decimal('10.00')
+
+        _price('A-1', 12, FEB)
+        db.session.commit()
+        assert resolve_price('A-1', on=MAR).unit_price == Decimal('12.00')
+
+
+@pytest.mark.integration
+class TestRepricePriceRecords:
+    """Only active sell records with a cost breakdown are recomputed; cost rows are inputs."""
+
+    def test_sell_records_follow_the_new_margin(self, app):
+        sell = _price('A-1', 100, JAN, price_type='sell', base_material_cost=80, base_labor_cost=20)
+        db.session.commit()
+
+        assert reprice_price_records(profit_margin_pct=25) == {'scanned': 1, 'updated': 1}
+        db.session.commit()
+        db.session.refresh(sell)
+        assert (sell.final_unit_price, sell.profit_margin_pct) == (Decimal('125.00'), 25)
+
+    def test_imported_and_hand_set_rows_are_never_rewritten(self, app):
+        ids = upsert_price_records(SUPPLIER, {'A-1': 10.0})
+        hand_set = _price('B-2', 42, JAN, price_type='sell')
+        db.session.commit()
+
+        assert reprice_price_records(profit_margin_pct=50) == {'scanned': 0, 'updated': 0}
+        db.session.commit()
+        imported = db.session.get(PriceRecord, ids['A-1'])
+        db.session.refresh(imported)
+        db.session.refresh(hand_set)
+        assert (imported.final_unit_price, imported.profit_margin_pct) == (Decimal('10.00'), 0)
+        assert (hand_set.final_unit_price, hand_set.profit_margin_pct) == (Decimal('42.00'), 0)
+
+    def test_cost_types_are_refused(self, app):
+        with pytest.raises(ValueError):
+            reprice_price_records(price_type='cost')
+
+    def test_unchanged_prices_are_not_written(self, app):
+        _price('A-1', 120, JAN, price_type='sell', base_material_cost=100, general_expenses_pct=20)
+        db.session.commit()
+        assert reprice_price_records() == {'scanned': 1, 'updated': 0}
@@ -0,0 +1,104 @@
+"""
+Integration tests for the public quote page's HTTP caching (platforms/arkhon/routes.py
+public_quote / _render_public_quote): ETag revalidation, invalidation on writes and
+the uncached flash view.
+"""
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from crminaec.core.cache import cache
+from crminaec.core.models import Order, OrderItem, Quote, db
+from crminaec.platforms.arkhon.quotes import (apply_quote_totals,
+                                              compute_quote_totals)
+from tests.integration.support import app
+
+APPROVAL_TEXT = "Okudum anladım onaylıyorum"
+
+
+@pytest.fixture
+def quote(app):
+    # The cache is process-wide; start every test from an empty namespace
+    cache.invalidate('public_quote')
+    order = Order(order_number='Ş-7', items=[OrderItem(urk='KAPAK', ura='Işıklı kapak', adet=2)])
+    quote = Quote()
+    order.quotes.append(quote)
+    db.session.add(order)
+    apply_quote_totals(quote, compute_quote_totals(order, tax_rate=20, manual_list_price='1000'))
+    db.session.commit()
+    return quote
+
+
+@contextmanager
+def count_queries():
+    statements = []
+    record = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def _url(quote):
+    return f'/arkhon/quote/p/{quote.access_token}'
+
+
+class TestPublicQuoteCaching:
+    def test_first_view_is_revalidated_by_etag(self, app, quote):
+        response = app.test_client().get(_url(quote))
+
+        assert response.status_code == 200
+        assert response.headers['ETag'].startswith(f'"q{quote.quote_id}-r{quote.revision}-')
+        assert response.cache_control.private and response.cache_control.no_cache
+
+    def test_repeat_view_is_304_without_queries(self, app, quote):
+        client = app.test_client()
+        etag = client.get(_url(quote)).headers['ETag']
+
+        with count_queries() as statements:
+            response = client.get(_url(quote), headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+        assert statements == []
+
+    def test_approving_changes_the_etag(self, app, quote):
+        client = app.test_client()
+        etag = client.get(_url(quote)).headers['ETag']
+
+        client.post(f'{_url(quote)}/approve', data={'approval_text': APPROVAL_TEXT})
+        client.get(_url(quote))  # consumes the approval flash
+        response = client.get(_url(quote), headers={'If-None-Match': etag})
+
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+    def test_editing_a_line_changes_the_etag(self, app, quote):
+        client = app.test_client()
+        etag = client.get(_url(quote)).headers['ETag']
+
+        line = db.session.scalar(db.select(OrderItem).filter_by(urk='KAPAK'))
+        line.ura = 'Mat kapak'
+        db.session.commit()
+        response = client.get(_url(quote), headers={'If-None-Match': etag})
+
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+        assert 'Mat kapak' in response.get_data(as_text=True)
+
+    def test_pending_flash_is_served_no_store_and_not_cached(self, app, quote):
+        client = app.test_client()
+        client.post(f'{_url(quote)}/approve', data={'approval_text': 'yanlış metin'})
+
+        response = client.get(_url(quote))
+        assert response.status_code == 200
+        assert response.cache_control.no_store
+        assert 'ETag' not in response.headers
+        assert 'Approval text does not match' in response.get_data(as_text=True)
+        assert cache.get('public_quote', quote.access_token) is None
+
+        # Another visitor gets the shared, flash-free page
+        other = app.test_client().get(_url(quote))
+        assert 'ETag' in other.headers
+        assert 'Approval text does not match' not in other.get_data(as_text=True)
@@ -0,0 +1,97 @@
+"""
+Query plan checks for the hot list queries.
+
+Builds the statements the dashboard, catalogue and Pearson pages run (same
+SQLAlchemy expressions), asks SQLite for EXPLAIN QUERY PLAN and fails when a
+table is scanned without an index. Dropping or reshaping one of the
+soft-delete / archive indexes shows up here instead of as a slow page.
+"""
+import pytest
+from sqlalchemy import create_engine
+
+from crminaec.core.models import Order, OrderItem, Party, db
+from crminaec.core.parties import search_parties_stmt
+from crminaec.platforms.arkhon.routes import catalog_search_stmt
+from crminaec.platforms.emek.models import Item, ItemComposition
+
+
+@pytest.fixture(scope='module')
+def plan_engine():
+    """Empty in-memory database with the full schema (indexes included)."""
+    engine = create_engine('sqlite:///:memory:')
+    db.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def _plan(engine, statement):
+    sql = str(statement.compile(dialect=engine.dialect, compile_kwargs={'literal_binds': True}))
+    with engine.connect() as conn:
+        return [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def _full_scans(plan):
+    """Plan steps that read a whole table ('SCAN orders'), as opposed to index scans and searches."""
+    return [step for step in plan if step.startswith('SCAN ') and 'INDEX' not in step]
+
+
+def _live(model):
+    return [model.is_deleted.is_not(True), model.is_archived.is_not(True)]
+
+
+HOT_QUERIES = {
+    # Arkhon dashboard, customer scope
+    'customer_order_count': db.select(db.func.count(Order.order_id)).filter(*_live(Order), Order.party_id == 7),
+    'customer_recent_orders': db.select(Order).filter(*_live(Order), Order.party_id == 7)
+                                .order_by(Order.order_id.desc()).limit(10),
+    'customer_item_count': db.select(db.func.count(OrderItem.item_id)).join(Order).filter(Order.party_id == 7),
+    'order_lines': db.select(OrderItem).filter(OrderItem.order_id == 42),
+    # EMEK catalogue
+    'catalog_page': db.select(Item).filter(*_live(Item)).order_by(Item.code).limit(50).offset(100),
+    'catalog_by_type': db.select(Item).filter(*_live(Item), Item.item_type == 'product')
+                         .order_by(Item.code).limit(50),
+    'composition_children': db.select(ItemComposition).filter(ItemComposition.parent_id == 3)
+                              .order_by(ItemComposition.sort_order),
+    'composition_parents': db.select(ItemComposition).filter(ItemComposition.child_id == 3),
+    # Pearson
+    'pearson_courses': db.select(Item).filter_by(item_type='course'),
+    'pearson_lesson_count': db.select(db.func.count(Item.item_id)).filter_by(item_type='lesson'),
+    # Lead intake
+    'party_by_email': db.select(Party).where(Party.email_normalized == 'ali@example.com').limit(1),
+    'party_by_phone': db.select(Party).where(Party.phone_e164 == '+905321234567')
+                        .order_by(Party.party_id).limit(1),
+    # Customer typeahead
+    'party_search_name': search_parties_stmt('Şükrü'),
+    'party_search_phone': search_parties_stmt('0532 12'),
+    # Catalogue typeahead
+    'catalog_search_words': catalog_search_stmt('bosch fır').limit(31),
+    'catalog_search_category': catalog_search_stmt('bosch', 'Ankastre').limit(31),
+}
+
+
+@pytest.mark.integration
+class TestQueryPlans:
+    """Hot queries must be answered from an index."""
+
+    @pytest.mark.parametrize('name', sorted(HOT_QUERIES))
+    def test_no_full_table_scan(self, plan_engine, name):
+        plan = _plan(plan_engine, HOT_QUERIES[name])
+        assert not _full_scans(plan), f"{name} scans a table: {plan}"
+
+    def test_partial_index_matches_soft_delete_filter(self, plan_engine):
+        """`is_not(True)` must render as the partial indexes' WHERE term, or SQLite ignores them."""
+        plan = _plan(plan_engine, HOT_QUERIES['catalog_page'])
+        assert any('ix_emek_items_live_code' in step for step in plan), plan
+
+    def test_catalog_page_needs_no_sort(self, plan_engine):
+        plan = _plan(plan_engine, HOT_QUERIES['catalog_page'])
+        assert not any('TEMP B-TREE' in step for step in plan), plan
+
+    @pytest.mark.parametrize('name', ['party_search_name', 'party_search_phone'])
+    def test_party_search_uses_index_ranges(self, plan_engine, name):
+        plan = _plan(plan_engine, HOT_QUERIES[name])
+        assert any(step.startswith('SEARCH parties USING INDEX') for step in plan), plan
+
+    def test_catalog_search_uses_word_index(self, plan_engine):
+        plan = _plan(plan_engine, HOT_QUERIES['catalog_search_words'])
+        assert any(step.startswith('SEARCH catalog_product_words') and 'word>?' in step for step in plan), plan
@@ -0,0 +1,62 @@
+"""
+Integration tests for the quote PDF (platforms/arkhon/documents.py).
+"""
+from pathlib import Path
+
+import pytest
+from flask import current_app
+
+from crminaec.core.models import Order, OrderItem, Quote, db
+from crminaec.platforms.arkhon.documents import (quote_pdf, quote_pdf_path,
+                                                 render_quote_html)
+from crminaec.platforms.arkhon.quotes import (apply_quote_totals,
+                                              compute_quote_totals)
+from tests.integration.support import app
+
+
+@pytest.fixture
+def quote(app):
+    order = Order(order_number='Ş-1', items=[OrderItem(urk='KAPAK', ura='Işıklı kapak', adet=1)])
+    quote = Quote()
+    order.quotes.append(quote)
+    db.session.add(order)
+    apply_quote_totals(quote, compute_quote_totals(order, tax_rate=20, manual_list_price='12345.5'))
+    db.session.commit()
+    return quote
+
+
+@pytest.mark.integration
+class TestQuotePdf:
+    """Turkish text and amounts must survive the HTML to PDF step."""
+
+    def test_bundled_unicode_font_is_the_default(self, app):
+        assert Path(current_app.config['PDF_FONT_PATH']).name == 'DejaVuSans.ttf'
+        assert Path(current_app.config['PDF_FONT_PATH']).is_file()
+
+    def test_tax_row_uses_money_format(self, quote):
+        html = render_quote_html(quote)
+        assert '2,469.10 ₺' in html
+        assert '14,814.60 ₺' in html
+
+    def test_pdf_embeds_the_font(self, quote):
+        assert b'DejaVuSans' in quote_pdf(quote).read_bytes()
+
+    def test_line_edit_renders_a_new_pdf(self, quote):
+        """Lines are read live, so the cache key must change with them even without a new revision."""
+        first = quote_pdf(quote)
+        assert quote_pdf(quote) == first
+
+        line = quote.order.items[0]
+        line.ura = 'Mat kapak'
+        db.session.commit()
+        second = quote_pdf(quote)
+
+        assert second != first
+        assert not first.exists()
+        assert 'Mat kapak' in render_quote_html(quote)
+
+    def test_hiding_a_line_changes_the_cache_key(self, quote):
+        before = quote_pdf_path(quote)
+        quote.order.items[0].is_visible_on_quote = False
+        db.session.commit()
+        assert quote_pdf_path(quote) != before
@@ -0,0 +1,124 @@
+"""
+Integration tests for server-side quote totals (platforms/arkhon/quotes.py).
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from crminaec.core.cache import cache
+from crminaec.core.models import (Order, OrderItem, PriceRecord,
+                                  ProjectTypology, Quote, db)
+from crminaec.core.pricing import INTERVAL_NAMESPACE, order_item_unit_prices
+from crminaec.platforms.arkhon.quotes import (apply_quote_totals,
+                                              compute_quote_totals,
+                                              stored_typologies,
+                                              typology_subtotals)
+from tests.integration.support import app
+
+SUPPLIER = 'Kelebek (ProSAP)'
+NOW = datetime(2026, 6, 1)
+
+
+def _record(code, price, valid_from=NOW - timedelta(days=30), **fields):
+    record = PriceRecord(entity_code=code, supplier=fields.pop('supplier', SUPPLIER),
+                         final_unit_price=price, valid_from=valid_from, **fields)
+    db.session.add(record)
+    return record
+
+
+def _line(order, code, adet, record=None, typology=None, visible=True):
+    line = OrderItem(urk=code, adet=adet, is_visible_on_quote=visible)
+    line.price_record = record
+    line.typology = typology
+    order.items.append(line)
+    return line
+
+
+@pytest.fixture
+def order(app):
+    cache.invalidate(INTERVAL_NAMESPACE)
+    t1 = ProjectTypology(name='T1', quantity=16)
+    order = Order(order_number='S-1', typologies=[t1])
+    db.session.add(order)
+
+    dolap = _record('DOLAP', 100)
+    kapak = _record('KAPAK', 10)
+    _line(order, 'DOLAP', 2, dolap, typology=t1)
+    _line(order, 'KAPAK', 3, kapak, typology=t1)
+    _line(order, 'KAPAK', 1, kapak)
+    _line(order, 'DOLAP', 5, dolap, typology=t1, visible=False)
+    _line(order, 'YOK', 4)
+    db.session.commit()
+    return order
+
+
+@pytest.mark.integration
+class TestQuoteTotals:
+    """Lines are priced by the resolver, summed per typology and multiplied by its unit count."""
+
+    def test_typology_rows_discount_and_vat(self, order):
+        totals = compute_quote_totals(order, discount_amount=100, tax_rate=20, on=NOW)
+        t1, loose = totals['typologies']
+
+        assert (t1['unit_total'], t1['row_total'], t1['priced_count']) == (Decimal('230.00'), Decimal('3680.00'), 2)
+        assert (loose['typology_id'], loose['unit_total'], loose['line_count'], loose['priced_count']) == \
+               (None, Decimal('10.00'), 2, 1)
+        assert totals['list_price'] == Decimal('3690.00')
+        assert totals['tax_amount'] == Decimal('718.00')
+        assert totals['total_amount'] == Decimal('4308.00')
+
+    def test_newer_price_of_the_linked_supplier_wins(self, order):
+        _record('DOLAP', 120, valid_from=NOW - timedelta(days=1))
+        _record('DOLAP', 1, valid_from=NOW - timedelta(days=1), supplier='Başka')
+        db.session.commit()
+
+        t1 = compute_quote_totals(order, on=NOW)['typologies'][0]
+        assert t1['unit_total'] == Decimal('270.00')
+
+        # Quoting an earlier date still uses the price effective then
+        t1 = compute_quote_totals(order, on=NOW - timedelta(days=2))['typologies'][0]
+        assert t1['unit_total'] == Decimal('230.00')
+
+    def test_manual_list_price_only_without_any_priced_line(self, app):
+        order = Order(order_number='S-2')
+        db.session.add(order)
+        _line(order, 'YOK', 1)
+        db.session.commit()
+
+        totals = compute_quote_totals(order, tax_rate=0, manual_list_price='5000', on=NOW)
+        assert (totals['is_priced'], totals['list_price'], totals['total_amount']) == \
+               (False, Decimal('5000.00'), Decimal('5000.00'))
+
+    def test_apply_stores_breakdown_and_bumps_revision(self, order):
+        quote = Quote()
+        order.quotes.append(quote)
+        totals = compute_quote_totals(order, on=NOW)
+        apply_quote_totals(quote, totals)
+        apply_quote_totals(quote, totals)
+        db.session.commit()
+
+        db.session.refresh(quote)
+        assert quote.revision == 2
+        assert quote.total_amount == Decimal('4428.00')
+        assert stored_typologies(quote)[0]['row_total'] == Decimal('3680.00')
+
+    def test_sql_pricing_matches_the_resolver(self, app):
+        """Tiers, expiry and supplier scope: the grouped query prices each line like order_item_unit_prices."""
+        order = Order(order_number='S-3')
+        db.session.add(order)
+        _record('RAY', 100, min_quantity=1)
+        _record('RAY', 90, min_quantity=5)
+        _record('RAY', 80, min_quantity=10, valid_to=NOW - timedelta(days=1))
+        _record('MENTEŞE', 7, min_quantity=2)
+        other = _record('MENTEŞE', 3, supplier='Başka', min_quantity=2, valid_from=NOW - timedelta(days=2))
+        unsupplied = _record('KULP', 5, supplier=None)
+        lines = [_line(order, 'RAY', 12), _line(order, 'RAY', 3), _line(order, 'MENTEŞE', 1),
+                 _line(order, 'MENTEŞE', 4, other), _line(order, 'KULP', 2, unsupplied), _line(order, 'YOK', 1)]
+        db.session.commit()
+
+        prices = order_item_unit_prices(lines, on=NOW)
+        expected = sum(prices[line.item_id] * Decimal(str(line.adet)) for line in lines if line.item_id in prices)
+        [group] = typology_subtotals(order.order_id, on=NOW)
+        assert group['unit_total'] == expected == Decimal('1405.00')
+        assert group['priced_count'] == len(prices) == 5
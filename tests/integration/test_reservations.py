@@ -0,0 +1,143 @@
+"""
+Integration tests for order-driven stock reservations (platforms/emek/reservations.py).
+"""
+from datetime import datetime
+
+import pytest
+
+from crminaec.core.models import Order, OrderItem, db
+from crminaec.platforms.emek.inventory_routes import _parse_iso_datetime
+from crminaec.platforms.emek.models import (InboundStatus, Item, MovementType,
+                                            StockInbound)
+from crminaec.platforms.emek.reservations import (availability, plan_lines,
+                                                  sync_order_reservations)
+from crminaec.platforms.emek.stock import post_movement
+from tests.integration.support import app, login_client
+
+MONDAY = datetime(2030, 3, 4)
+
+
+def _stock_item(code, on_hand):
+    item = Item(code=code, name=code, item_type='raw_material', stock_quantity=on_hand, technical_specs={})
+    db.session.add(item)
+    return item
+
+
+def _order(number, urk, adet, installation, factory_delivery=None):
+    order = Order(order_number=number, kitchen_installation_date=installation,
+                  factory_delivery_date=factory_delivery,
+                  items=[OrderItem(urk=urk, adet=adet, category='Furniture')])
+    db.session.add(order)
+    db.session.commit()
+    sync_order_reservations([order.order_id])
+    return order
+
+
+@pytest.mark.integration
+class TestIncomingSupply:
+    """Incoming comes from expected deliveries, never from the reservations themselves."""
+
+    def test_reservation_factory_date_is_not_supply(self, app):
+        item = _stock_item('KAPAK-01', 2)
+        _order('S-1', 'KAPAK-01', 5, installation=MONDAY, factory_delivery=datetime(2030, 3, 1))
+
+        [row] = availability(item_ids=[item.item_id])
+        assert row['reserved'] == 5
+        assert row['incoming'] == 0
+        assert row['free'] == -3
+
+    def test_open_deliveries_count_until_received(self, app):
+        item = _stock_item('KAPAK-01', 2)
+        _order('S-1', 'KAPAK-01', 5, installation=MONDAY)
+        db.session.add(StockInbound(item_id=item.item_id, quantity=4, reference_document='IRS-9',
+                                    expected_on=datetime(2030, 3, 1)))
+        db.session.commit()
+
+        [row] = availability(item_ids=[item.item_id])
+        assert (row['incoming'], row['free']) == (4, 1)
+
+        # A delivery due after the horizon is not counted
+        [row] = availability(item_ids=[item.item_id], until=datetime(2030, 2, 28, 23, 59, 59))
+        assert row['incoming'] == 0
+
+        post_movement(item, MovementType.IN, 4, reference_document='IRS-9')
+        db.session.commit()
+        inbound = db.session.scalar(db.select(StockInbound))
+        assert inbound.status == InboundStatus.RECEIVED
+
+        [row] = availability(item_ids=[item.item_id])
+        assert (row['on_hand'], row['incoming'], row['free']) == (6, 0, 1)
+
+    def test_two_reservations_do_not_multiply_incoming(self, app):
+        item = _stock_item('KAPAK-01', 0)
+        _order('S-1', 'KAPAK-01', 1, installation=MONDAY)
+        _order('S-2', 'KAPAK-01', 1, installation=MONDAY)
+        db.session.add(StockInbound(item_id=item.item_id, quantity=3, expected_on=datetime(2030, 3, 1)))
+        db.session.commit()
+
+        [row] = availability(item_ids=[item.item_id])
+        assert (row['reserved'], row['incoming']) == (2, 3)
+
+
+@pytest.mark.integration
+class TestPlanLines:
+    """Week planning covers every line due from the first second of the start day."""
+
+    def test_bare_start_date_begins_at_midnight(self, app):
+        _stock_item('KAPAK-01', 10)
+        _order('S-1', 'KAPAK-01', 1, installation=MONDAY.replace(hour=8))
+
+        start = _parse_iso_datetime('2030-03-04')
+        end = _parse_iso_datetime('2030-03-04', end_of_day=True)
+        assert (start, end) == (MONDAY, MONDAY.replace(hour=23, minute=59, second=59))
+
+        lines = plan_lines(start, end)
+        assert [line['order_number'] for line in lines] == ['S-1']
+
+    def test_shortage_uses_deliveries_due_by_each_line(self, app):
+        item = _stock_item('KAPAK-01', 1)
+        _order('S-1', 'KAPAK-01', 1, installation=datetime(2030, 3, 4, 9))
+        _order('S-2', 'KAPAK-01', 2, installation=datetime(2030, 3, 6, 9))
+        db.session.add(StockInbound(item_id=item.item_id, quantity=2, expected_on=datetime(2030, 3, 5)))
+        db.session.commit()
+
+        lines = {line['order_number']: line for line in plan_lines(MONDAY, datetime(2030, 3, 10))}
+        assert lines['S-1']['covered']
+        assert lines['S-2']['covered']
+
+        # Without the delivery the second line is short by everything the first one didn't use
+        db.session.execute(db.delete(StockInbound))
+        db.session.commit()
+        lines = {line['order_number']: line for line in plan_lines(MONDAY, datetime(2030, 3, 10))}
+        assert not lines['S-2']['covered']
+        assert lines['S-2']['shortage'] == 2
+
+
+@pytest.mark.integration
+class TestRegisterInbound:
+    """Receipts match inbound lines by reference_document, so the route refuses lines without one."""
+
+    @pytest.mark.parametrize('reference', [None, '', '   '])
+    def test_missing_reference_document_is_rejected(self, app, reference):
+        item = _stock_item('KAPAK-01', 0)
+        db.session.commit()
+        body = {'reference_document': reference, 'lines': [{'item_id': item.item_id, 'quantity': 3}]}
+
+        response = login_client(app).post('/api/inventory/inbound', json=body)
+        assert response.status_code == 400
+        assert 'reference_document' in response.get_json()['error']
+        assert db.session.scalar(db.select(db.func.count()).select_from(StockInbound)) == 0
+
+    def test_registered_inbound_can_be_received(self, app):
+        item = _stock_item('KAPAK-01', 0)
+        db.session.commit()
+        body = {'reference_document': ' IRS-12 ', 'expected_on': '2030-03-01',
+                'lines': [{'item_id': item.item_id, 'quantity': 3}]}
+
+        response = login_client(app).post('/api/inventory/inbound', json=body)
+        assert response.status_code == 201
+
+        post_movement(item, MovementType.IN, 3, reference_document='IRS-12')
+        db.session.commit()
+        inbound = db.session.scalar(db.select(StockInbound))
+        assert (inbound.reference_document, inbound.status) == ('IRS-12', InboundStatus.RECEIVED)
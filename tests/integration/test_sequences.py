@@ -0,0 +1,67 @@
+"""
+Integration tests for block-reserved document numbers (core/sequences.py).
+"""
+import threading
+
+import pytest
+from flask import current_app
+
+from crminaec.core import sequences
+from crminaec.core.models import NumberSequence, db
+from tests.integration.support import app
+
+
+@pytest.fixture(autouse=True)
+def fresh_blocks(monkeypatch):
+    """Blocks reserved against another test's database must not leak into this one."""
+    monkeypatch.setattr(sequences, '_blocks', {})
+
+
+def _counter(series):
+    return db.session.scalar(db.select(NumberSequence.next_value).where(NumberSequence.name == series))
+
+
+@pytest.mark.integration
+class TestAllocation:
+    """Values come from memory until the reserved block runs out."""
+
+    def test_one_reservation_per_block(self, app):
+        current_app.config['NUMBER_BLOCK_SIZE'] = 3
+        assert [sequences.allocate('lead') for _ in range(3)] == [1, 2, 3]
+        assert _counter('lead') == 4
+
+        assert sequences.allocate('lead') == 4
+        assert _counter('lead') == 7
+
+    def test_restarted_process_skips_the_unused_block(self, app, monkeypatch):
+        current_app.config['NUMBER_BLOCK_SIZE'] = 5
+        assert sequences.allocate('lead') == 1
+
+        monkeypatch.setattr(sequences, '_blocks', {})
+        assert sequences.allocate('lead') == 6
+
+    def test_series_are_independent(self, app):
+        assert sequences.allocate('lead') == 1
+        assert sequences.allocate('kelebek_order') == 1
+
+    def test_concurrent_allocations_are_unique(self, app):
+        current_app.config['NUMBER_BLOCK_SIZE'] = 4
+        flask_app = current_app._get_current_object()
+        values, lock = [], threading.Lock()
+
+        def worker():
+            with flask_app.app_context():
+                got = [sequences.allocate('lead') for _ in range(25)]
+            with lock:
+                values.extend(got)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted(values) == list(range(1, 101))
+
+    def test_next_number_formats_the_series_pattern(self, app):
+        assert sequences.next_number('kelebek_order', prefix='KLB') == 'KLB-00001'
+        assert sequences.next_number('lead_email') == 'lead_000001@crminaec.local'
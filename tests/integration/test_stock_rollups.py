@@ -0,0 +1,152 @@
+"""
+Integration tests for the daily stock rollups (emek/models.py insert hook,
+stock.rebuild_daily_rollups) and the reports that read them (stock_reports.py).
+
+The ledger is the source of truth: rollups must always equal a GROUP BY over it.
+"""
+from datetime import date, datetime
+
+import pytest
+
+from crminaec.core.models import db
+from crminaec.platforms.emek.models import (Item, MovementType, StockDailyRollup,
+                                            StockMovement)
+from crminaec.platforms.emek.stock import post_movement, rebuild_daily_rollups
+from crminaec.platforms.emek.stock_reports import (consumption, throughput,
+                                                   turnover)
+from tests.integration.support import app
+
+# 2026-03-02 and 2026-03-09 are Mondays, so the postings span two weeks
+WEEK_1 = date(2026, 3, 2)
+WEEK_2 = date(2026, 3, 9)
+
+
+def _item(code):
+    item = Item(code=code, name=code, item_type='raw_material', base_cost=1.0, technical_specs={})
+    db.session.add(item)
+    db.session.commit()
+    return item
+
+
+def _post(item, movement_type, quantity, day, hour=9):
+    movement = post_movement(item, movement_type, quantity)
+    movement.timestamp = datetime(day.year, day.month, day.day, hour)
+    db.session.commit()
+
+
+def _rollup_rows():
+    return {
+        (r.item_id, str(r.day)): (r.qty_in, r.qty_out, r.qty_return, r.qty_adj, r.movement_count)
+        for r in db.session.scalars(db.select(StockDailyRollup))
+    }
+
+
+def _ledger_group_by():
+    """Reference figures straight from emek_stock_movements."""
+    totals = {}
+    rows = db.session.execute(
+        db.select(StockMovement.item_id, db.func.date(StockMovement.timestamp), StockMovement.movement_type,
+                  db.func.sum(StockMovement.quantity), db.func.count())
+        .group_by(StockMovement.item_id, db.func.date(StockMovement.timestamp), StockMovement.movement_type)
+    )
+    slot = {MovementType.IN: 0, MovementType.OUT: 1, MovementType.RETURN: 2, MovementType.ADJUSTMENT: 3}
+    for item_id, day, movement_type, quantity, count in rows:
+        bucket = totals.setdefault((item_id, str(day)), [0.0, 0.0, 0.0, 0.0, 0])
+        bucket[slot[movement_type]] += quantity
+        bucket[4] += count
+    return {key: tuple(value) for key, value in totals.items()}
+
+
+@pytest.fixture
+def ledger(app):
+    """
+    A: IN 10, OUT 3 (Mon) / OUT 2, RETURN 1 (Tue) / IN 5 (next Mon) / ADJ -1 (next Tue) -> stock 10
+    B: IN 5 (Tue) / OUT 5 (next Mon) -> stock 0
+    """
+    a, b = _item('VIDA-A'), _item('VIDA-B')
+    _post(a, MovementType.IN, 10, WEEK_1, hour=8)
+    _post(a, MovementType.OUT, 3, WEEK_1, hour=17)
+    _post(a, MovementType.OUT, 2, date(2026, 3, 3))
+    _post(a, MovementType.RETURN, 1, date(2026, 3, 3))
+    _post(a, MovementType.IN, 5, WEEK_2)
+    _post(a, MovementType.ADJUSTMENT, -1, date(2026, 3, 10))
+    _post(b, MovementType.IN, 5, date(2026, 3, 3))
+    _post(b, MovementType.OUT, 5, WEEK_2)
+    return a, b
+
+
+# ==============================================================================
+# ROLLUP MAINTENANCE
+# ==============================================================================
+class TestDailyRollups:
+    def test_insert_hook_matches_the_ledger(self, ledger):
+        a, _ = ledger
+        rows = _rollup_rows()
+        assert rows == _ledger_group_by()
+        # Two movements of different types on one day share a single bucket
+        assert rows[(a.item_id, '2026-03-02')] == (10.0, 3.0, 0.0, 0.0, 2)
+        assert a.stock_quantity == 10.0
+
+    def test_rebuild_reproduces_the_incremental_rollups(self, ledger):
+        incremental = _rollup_rows()
+
+        assert rebuild_daily_rollups() == len(incremental)
+        assert _rollup_rows() == incremental
+
+    def test_rebuild_is_idempotent(self, ledger):
+        rebuild_daily_rollups()
+        first = _rollup_rows()
+        rebuild_daily_rollups()
+        assert _rollup_rows() == first == _ledger_group_by()
+
+    def test_rebuild_backfills_a_missing_rollup_table(self, ledger):
+        db.session.execute(StockDailyRollup.__table__.delete())
+        db.session.commit()
+
+        rebuild_daily_rollups()
+        assert _rollup_rows() == _ledger_group_by()
+
+
+# ==============================================================================
+# REPORTS
+# ==============================================================================
+class TestStockReports:
+    def test_throughput_per_week(self, ledger):
+        rows = throughput(WEEK_1, date(2026, 3, 15), bucket='week')
+        assert rows == [
+            {'period': '2026-03-02', 'in': 15.0, 'out': 5.0, 'return': 1.0, 'adjustment': 0.0, 'movements': 5},
+            {'period': '2026-03-09', 'in': 5.0, 'out': 5.0, 'return': 0.0, 'adjustment': -1.0, 'movements': 3},
+        ]
+
+    def test_throughput_is_scoped_to_items_and_dates(self, ledger):
+        a, _ = ledger
+        rows = throughput(WEEK_1, WEEK_1, item_ids=[a.item_id])
+        assert rows == [{'period': '2026-03-02', 'in': 10.0, 'out': 3.0, 'return': 0.0,
+                         'adjustment': 0.0, 'movements': 2}]
+
+    def test_consumption_ranks_items_by_net_out(self, ledger):
+        a, b = ledger
+        report = consumption(WEEK_1, date(2026, 3, 15), bucket='week')
+
+        assert [row['item_id'] for row in report] == [b.item_id, a.item_id]
+        assert report[0]['total'] == 5.0
+        assert report[0]['series'] == [{'period': '2026-03-02', 'quantity': 0.0},
+                                       {'period': '2026-03-09', 'quantity': 5.0}]
+        # OUT 3 + OUT 2 - RETURN 1 in the first week
+        assert report[1]['series'] == [{'period': '2026-03-02', 'quantity': 4.0},
+                                       {'period': '2026-03-09', 'quantity': 0.0}]
+
+    def test_turnover_rebuilds_opening_and_closing_stock(self, ledger):
+        a, b = ledger
+        rows = {row['item_id']: row for row in turnover(WEEK_1, date(2026, 3, 8))}
+
+        # Closing = cached 10 minus the IN 5 / ADJ -1 after the period; opening = closing - net 6
+        assert rows[a.item_id]['consumed'] == 4.0
+        assert rows[a.item_id]['closing_stock'] == 6.0
+        assert rows[a.item_id]['opening_stock'] == 0.0
+        assert rows[a.item_id]['turnover'] == pytest.approx(4 / 3, abs=1e-4)
+        assert rows[a.item_id]['days_of_supply'] == 10.5
+
+        assert rows[b.item_id]['consumed'] == 0.0
+        assert rows[b.item_id]['closing_stock'] == 5.0
+        assert rows[b.item_id]['days_of_supply'] is None
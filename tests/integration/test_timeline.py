@@ -0,0 +1,117 @@
+"""
+Integration tests for the Customer 360 timeline (platforms/arkhon/timeline.py):
+keyset pages over the UNION ALL must add up to the unpaginated list.
+"""
+import base64
+from datetime import datetime
+
+import pytest
+
+from crminaec.core.models import (CustomerIssue, Order, OrderAttachment, Party,
+                                  Quote, db)
+from crminaec.platforms.arkhon.timeline import (ORDER_CREATED, decode_cursor,
+                                                encode_cursor, fetch_timeline)
+from tests.integration.support import app, login_client
+
+# Most events share this instant, so ordering relies entirely on (kind, source_id)
+AT = datetime(2026, 5, 4, 10, 30)
+EARLIER = datetime(2026, 5, 1, 9, 0)
+MILESTONES = ['measurement_date', 'info_docs_sent_at', 'factory_delivery_date', 'installation_appointment_date',
+              'kitchen_installation_date', 'countertop_installation_date', 'appliance_installation_date',
+              'handover_date']
+
+
+def _order(party, number, at):
+    """An order with every event kind at `at`: 1 + 8 milestones + quote + attachment + 3 issue steps."""
+    order = Order(order_number=number, party=party, date=at, **{column: at for column in MILESTONES})
+    # Distinct versions / titles keep every event's text unique, so a repeated row can't hide
+    order.quotes.append(Quote(version=int(number[2:]), status='approved', approval_date=at))
+    order.attachments.append(OrderAttachment(original_filename='olcu.jpg', semantic_filename=f'{number}-olcu.jpg',
+                                             file_path=f'/tmp/{number}.jpg', file_type='image', upload_date=at))
+    order.issues.append(CustomerIssue(title=f'Kapak {number}', description='Kapak çizik', reported_date=at,
+                                      investigation_date=at, solution_date=at))
+    return order
+
+
+@pytest.fixture
+def party(app):
+    owner = Party(email='musteri@example.com', first_name='Ayşe', last_name='Demir')
+    other = Party(email='baska@example.com', first_name='Ali', last_name='Kaya')
+    db.session.add_all([owner, other])
+    db.session.add_all([_order(owner, 'T-1', AT), _order(owner, 'T-2', AT), _order(owner, 'T-3', EARLIER),
+                        _order(other, 'T-9', AT)])
+    db.session.commit()
+    return owner
+
+
+def _walk(party_id, limit):
+    """Every page in turn, following next_cursor."""
+    events, cursor, pages = [], None, 0
+    while True:
+        page = fetch_timeline(party_id, limit=limit, cursor=cursor)
+        events += page['events']
+        pages += 1
+        cursor = page['next_cursor']
+        if cursor is None:
+            return events, pages
+
+
+class TestPagination:
+    def test_full_list_is_newest_first(self, party):
+        events = fetch_timeline(party.party_id, limit=100)['events']
+        assert len(events) == 3 * 14
+        assert len({(e['title'], e['desc']) for e in events}) == len(events)
+        assert [e['date'] for e in events] == sorted((e['date'] for e in events), reverse=True)
+        # The other party's order never shows up
+        assert not any('T-9' in e['title'] for e in events)
+
+    @pytest.mark.parametrize('limit', [1, 2, 5, 13, 14, 41, 42])
+    def test_pages_add_up_to_the_full_list(self, party, limit):
+        full = fetch_timeline(party.party_id, limit=100)['events']
+        events, pages = _walk(party.party_id, limit)
+
+        # Same sequence: no event repeated across a page boundary, none skipped
+        assert events == full
+        assert pages == -(-len(full) // limit)
+
+    def test_last_page_has_no_cursor(self, party):
+        page = fetch_timeline(party.party_id, limit=42)
+        assert len(page['events']) == 42
+        assert page['next_cursor'] is None
+
+    def test_cursor_resumes_after_its_row(self, party):
+        """A cursor excludes its own row and everything ahead of it in (event_at, kind, source_id) order."""
+        first, second = sorted(db.session.scalars(
+            db.select(Order).filter(Order.order_number.in_(['T-1', 'T-2']))), key=lambda o: o.order_id)
+        # "Order created" is the lowest kind, so of the shared instant only the older order's row is left
+        page = fetch_timeline(party.party_id, limit=100, cursor=encode_cursor(AT, ORDER_CREATED, second.order_id))
+
+        assert len(page['events']) == 1 + 14
+        assert page['events'][0]['title'] == f"Yeni Proje Başlatıldı ({first.order_number})"
+        assert all(e['date'] == EARLIER.isoformat() for e in page['events'][1:])
+
+
+class TestCursor:
+    def test_round_trip(self):
+        assert decode_cursor(encode_cursor(AT, 7, 12)) == (AT, 7, 12)
+
+    @pytest.mark.parametrize('cursor', [
+        'not a cursor',
+        'çğü',
+        base64.urlsafe_b64encode(b'2026-05-04T10:30:00|7').decode(),
+        base64.urlsafe_b64encode(b'yesterday|7|12').decode(),
+        base64.urlsafe_b64encode(b'2026-05-04T10:30:00|seven|12').decode(),
+        base64.urlsafe_b64encode(b'\xff\xfe').decode(),
+    ])
+    def test_malformed_cursor_raises_value_error(self, cursor):
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
+
+    def test_route_rejects_malformed_cursor_with_400(self, app, party):
+        client = login_client(app)
+
+        response = client.get(f'/arkhon/customer/{party.party_id}/timeline?cursor=bozuk')
+        assert response.status_code == 400
+        assert 'Invalid cursor' in response.get_json()['error']
+
+        assert client.get(f'/arkhon/customer/{party.party_id}/timeline?limit=3').status_code == 200
@@ -0,0 +1,91 @@
+"""
+Unit tests for the in-process TTL cache and its commit-driven invalidation (core/cache.py).
+"""
+import pytest
+from sqlalchemy import Column, Integer, String, create_engine
+from sqlalchemy.orm import Session, declarative_base
+
+from crminaec.core import cache as cache_module
+from crminaec.core.cache import TTLCache, cache, invalidate_on_write
+
+Base = declarative_base()
+
+
+class Widget(Base):
+    __tablename__ = 'widgets'
+    widget_id = Column(Integer, primary_key=True)
+    name = Column(String(20))
+
+
+class TestTTLCache:
+    """Entries expire, stay bounded and are dropped per namespace."""
+
+    def test_get_or_set_computes_once(self):
+        store, calls = TTLCache(), []
+        factory = lambda: calls.append(1) or 'value'
+        assert store.get_or_set('ns', 'k', factory, ttl=60) == 'value'
+        assert store.get_or_set('ns', 'k', factory, ttl=60) == 'value'
+        assert len(calls) == 1
+
+    def test_expired_entry_is_recomputed(self, monkeypatch):
+        store = TTLCache()
+        store.set('ns', 'k', 'old', ttl=10)
+        now = cache_module.time.monotonic()
+        monkeypatch.setattr(cache_module.time, 'monotonic', lambda: now + 11)
+        assert store.get('ns', 'k') is None
+
+    def test_namespace_limit_evicts_oldest(self):
+        store = TTLCache(max_entries=2)
+        for key in 'abc':
+            store.set('ns', key, key, ttl=60)
+        assert [store.get('ns', key) for key in 'abc'] == [None, 'b', 'c']
+
+        store.set_limit('wide', 3)
+        for key in 'abc':
+            store.set('wide', key, key, ttl=60)
+        assert store.get('wide', 'a') == 'a'
+
+    def test_invalidate_drops_only_named_namespaces(self):
+        store = TTLCache()
+        store.set('a', 1, 'x', ttl=60)
+        store.set('b', 1, 'y', ttl=60)
+        store.invalidate('a')
+        assert (store.get('a', 1), store.get('b', 1)) == (None, 'y')
+
+
+class TestInvalidateOnWrite:
+    """Committed writes to a watched model clear its namespaces; rollbacks don't."""
+
+    @pytest.fixture
+    def session(self, monkeypatch):
+        monkeypatch.setattr(cache_module, '_WATCHERS', {})
+        invalidate_on_write('test_widgets', [Widget])
+        engine = create_engine('sqlite://')
+        Base.metadata.create_all(engine)
+        with Session(engine) as session:
+            cache.set('test_widgets', 'list', ['stale'], ttl=60)
+            yield session
+        cache.invalidate('test_widgets')
+        engine.dispose()
+
+    def test_commit_of_new_row_invalidates(self, session):
+        session.add(Widget(name='a'))
+        assert cache.get('test_widgets', 'list') == ['stale']
+        session.commit()
+        assert cache.get('test_widgets', 'list') is None
+
+    def test_bulk_update_invalidates(self, session):
+        session.add(Widget(name='a'))
+        session.commit()
+        cache.set('test_widgets', 'list', ['stale'], ttl=60)
+
+        session.query(Widget).filter_by(name='a').update({'name': 'b'})
+        session.commit()
+        assert cache.get('test_widgets', 'list') is None
+
+    def test_rollback_keeps_entries(self, session):
+        session.add(Widget(name='a'))
+        session.flush()
+        session.rollback()
+        session.commit()
+        assert cache.get('test_widgets', 'list') == ['stale']
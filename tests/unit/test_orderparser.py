@@ -0,0 +1,110 @@
+"""
+Unit tests for the Kelebek order parser: the single-pass stream engine must
+produce exactly what the BeautifulSoup reference engine does.
+"""
+import io
+import random
+
+import pytest
+
+from crminaec.platforms.arkhon.orderparser import KelebekOrderParser
+
+pytest.importorskip('bs4')
+
+EDGE_CASES = {
+    'self_closing_after_void': '<input name="pozno" value=""><INPUT id="ura" value="xy"/><tr></input>'
+                               '<input name="pozno" value="1">',
+    'self_closing_then_stray_end': '<tr><input name="pozno" value="1"/></input><input name="urk" value="U"></tr>',
+    'stray_end_after_void': '<table><tr><input name="pozno" value="1"></input><input name="adet" value="2"></tr></table>',
+    'nested_rows': '<tr><input name="pozno" value="1"><tr><input name="pozno" value="2"></tr>'
+                   '<input name="urk" value="U"></tr>',
+    'unclosed_row': '<table><tr><input name="pozno" value="1"><input name="ura" value="A &amp; B">',
+    'self_closing_row': '<tr/><input name="pozno" value="1"><tr><input name="pozno" value="2"></tr>',
+    'script_body': '<tr><script>if (a<b) { x = "<input name=pozno value=9>"; }</script>'
+                   '<input name="pozno" value="1"></tr>',
+    'uppercase_and_bare_attrs': '<TR><INPUT NAME=pozno VALUE=7 disabled><INPUT name="brm" value></TR>',
+}
+
+
+def _both(markup):
+    return (KelebekOrderParser.parse_html(markup, engine='stream')['items'],
+            KelebekOrderParser.parse_html(markup, engine='soup')['items'])
+
+
+class TestStreamMatchesSoup:
+    """Edge-case markup is nested the way BeautifulSoup('html.parser') nests it."""
+
+    @pytest.mark.parametrize('name', sorted(EDGE_CASES))
+    def test_edge_case(self, name):
+        stream, soup = _both(EDGE_CASES[name])
+        assert stream == soup
+
+    def test_self_closing_input_keeps_following_row(self):
+        stream, _ = _both(EDGE_CASES['self_closing_after_void'])
+        assert [item['pozno'] for item in stream] == ['1']
+
+    def test_random_tag_soup(self):
+        pieces = ['<input name="pozno" value="">', '<INPUT id="ura" value="xy"/>', '<tr>', '</tr>', '</input>',
+                  '<input name="pozno" value="1">', '<input name="urk" value="U"/>', '<br/>', '</br>',
+                  '<td>', '</td>', '<table>', '</table>', '<div/>', '</div>', '<input name="pozno" value="2"/>']
+        rng = random.Random(34)
+        for _ in range(2000):
+            markup = ''.join(rng.choice(pieces) for _ in range(rng.randint(1, 9)))
+            stream, soup = _both(markup)
+            assert stream == soup, markup
+
+
+# A small export: customer inputs outside the table, Turkish text and '€' (multibyte UTF-8),
+# a raw "<br />" inside a quoted value, a script body and a comment between rows
+EXPORT = (
+    '<html><head><script>var s = "<tr><input name=pozno value=0>";</script></head><body>'
+    '<input type="hidden" name="MusteriAdi" value="Çağrı"><input id="MusteriSoyadi" value=" Öztürk ">'
+    '<input name="MusteriEmail" value="cagri@örnek.com.tr"><table>'
+    + ''.join(
+        f'<tr><input name="pozno" value="{n}"><input name="urk" value="GÖVDE-{n}">'
+        f'<input name="ura" value="Üst dolap kapağı №{n} — 45€"><input name="adet" value="{n}">'
+        f'<input name="nitelikdetay" value="Renk: Işıl<br />Kulp: Şerit"></tr><!-- satır {n} -->'
+        for n in range(1, 13)
+    )
+    + '<tr><input name="pozno" value=""><input name="urk" value="BOŞ"></tr></table>'
+    '<input name="FaturaAdresi" value="Kadıköy, İstanbul"></body></html>'
+)
+
+
+class TestStreamReader:
+    """Reading the export in chunks gives exactly what parse_html gives for the whole document."""
+
+    @pytest.mark.parametrize('chunk_size', [1, 7, 4096])
+    def test_chunked_read_matches_parse_html(self, chunk_size):
+        expected = KelebekOrderParser.parse_html(EXPORT, engine='stream')
+        assert len(expected['items']) == 12
+
+        reader = KelebekOrderParser.stream(io.BytesIO(EXPORT.encode('utf-8')), chunk_size=chunk_size)
+        items = list(reader)
+
+        assert items == expected['items'] == KelebekOrderParser.parse_html(EXPORT, engine='soup')['items']
+        assert reader.customer == expected['customer']
+        assert reader.item_count == 12
+
+    def test_every_split_point(self):
+        """Two chunks, split at every byte: inside tags, attribute values and multibyte characters."""
+        data = EXPORT.encode('utf-8')
+        expected = KelebekOrderParser.parse_html(EXPORT)
+
+        class TwoChunks(io.BytesIO):
+            def __init__(self, split):
+                super().__init__(data)
+                self.sizes = [split]
+
+            def read(self, size=-1):
+                return super().read(self.sizes.pop() if self.sizes else size)
+
+        for split in range(1, len(data)):
+            reader = KelebekOrderParser.stream(TwoChunks(split), chunk_size=len(data))
+            assert list(reader) == expected['items'], split
+            assert reader.customer == expected['customer'], split
+
+    def test_customer_needs_a_finished_read(self):
+        reader = KelebekOrderParser.stream(io.BytesIO(EXPORT.encode('utf-8')))
+        with pytest.raises(RuntimeError):
+            reader.customer
@@ -0,0 +1,42 @@
+"""
+Unit tests for the live stock movement stream (platforms/emek/stream.py).
+"""
+from crminaec.platforms.emek.stream import broker, iter_sse
+
+
+class TestSubscriptionLifetime:
+    """A subscription exists exactly while its SSE generator is streaming."""
+
+    def test_unstarted_stream_leaves_no_subscription(self):
+        before = broker.client_count
+        stream = iter_sse([1], heartbeat=0.01, lifetime=1)
+        # Client went away before the first frame was pulled
+        stream.close()
+        assert broker.client_count == before
+
+    def test_closing_a_running_stream_unsubscribes(self):
+        before = broker.client_count
+        stream = iter_sse([1], heartbeat=0.01, lifetime=5)
+        assert next(stream).startswith('retry:')
+        assert broker.client_count == before + 1
+
+        stream.close()
+        assert broker.client_count == before
+
+    def test_published_events_reach_matching_stream(self):
+        stream = iter_sse([7], heartbeat=0.01, lifetime=5)
+        next(stream)
+        broker.publish([{'movement_id': 1, 'item_id': 8}, {'movement_id': 2, 'item_id': 7}])
+
+        frame = next(stream)
+        stream.close()
+        assert 'id: 2' in frame and '"item_id": 7' in frame
+
+    def test_stream_at_capacity_reports_busy(self):
+        held = iter_sse(None, heartbeat=0.01, lifetime=5)
+        next(held)
+        try:
+            frames = list(iter_sse(None, max_clients=broker.client_count, heartbeat=0.01, lifetime=5))
+            assert any('event: busy' in frame for frame in frames)
+        finally:
+            held.close()
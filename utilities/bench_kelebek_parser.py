@@ -0,0 +1,92 @@
+"""
+Benchmark for KelebekOrderParser engines.
+
+Inflates the sample Kelebek export (static/content/order.html) to a multi-unit
+project size by repeating its product rows, then times the single-pass 'stream'
+engine, the chunked reader and the BeautifulSoup 'soup' engine, and checks that
+they all agree.
+
+    python utilities/bench_kelebek_parser.py --copies 250 --runs 3
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from crminaec.platforms.arkhon.orderparser import \
+    KelebekOrderParser  # noqa: E402
+
+SAMPLE = os.path.join(ROOT, 'crminaec', 'static', 'content', 'order.html')
+ROW_MARKER = '<tr style="background-color:White;">'
+
+
+def load_sample() -> str:
+    with open(SAMPLE, 'rb') as f:
+        raw = f.read()
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError:
+        return raw.decode('cp1254')
+
+
+def inflate(html: str, copies: int) -> str:
+    """Repeats the block of product rows `copies` times in place."""
+    start = html.index(ROW_MARKER)
+    end = html.index('</table>', start)
+    rows = html[start:end]
+    return html[:start] + rows * copies + html[end:]
+
+
+def timed(engine: str, html: str, runs: int):
+    best, result = None, None
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = KelebekOrderParser.parse_html(html, engine=engine)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--copies', type=int, default=250, help='Times to repeat the sample product rows')
+    parser.add_argument('--runs', type=int, default=3, help='Runs per engine (best time is reported)')
+    args = parser.parse_args()
+
+    html = inflate(load_sample(), args.copies)
+    print(f"📄 Input: {len(html) / 1024:.0f} KiB, {html.count(ROW_MARKER)} product rows")
+
+    stream_time, stream_result = timed('stream', html, args.runs)
+    print(f"⚡ stream: {stream_time:.3f}s ({len(stream_result['items'])} items)")
+
+    started = time.perf_counter()
+    reader = KelebekOrderParser.stream(io.BytesIO(html.encode('utf-8')))
+    streamed = list(reader)
+    print(f"📦 chunked: {time.perf_counter() - started:.3f}s ({len(streamed)} items)")
+    if streamed != stream_result['items'] or reader.customer != stream_result['customer']:
+        print("❌ Chunked reader disagrees with parse_html!")
+        return 1
+
+    try:
+        import bs4  # noqa: F401
+    except ImportError:
+        print("⚠️  bs4 not installed; skipping the 'soup' comparison.")
+        return 0
+
+    soup_time, soup_result = timed('soup', html, args.runs)
+    print(f"🐢 soup:   {soup_time:.3f}s ({len(soup_result['items'])} items)")
+    print(f"📈 Speed-up: {soup_time / stream_time:.1f}x")
+
+    if stream_result != soup_result:
+        print("❌ Engines disagree!")
+        return 1
+    print("✅ Outputs identical.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())